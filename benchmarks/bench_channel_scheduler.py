@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+قياس جدولة القنوات المنطقية على وصلة تسلسلية بطيئة: أوامر محركات وإيقاف طارئ
+وتيليمتري ونقل كبير على نفس الوصلة، مقارنة بطابور FIFO واحد يرسل النقل كإطار واحد
+"""
+
+import sys
+import os
+import time
+import struct
+import argparse
+
+# إضافة مجلد المشروع لـ Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from communication.channels import (CHANNEL_BULK, CHANNEL_CONTROL, CHANNEL_TELEMETRY, CHANNEL_SHIFT,
+                                    chunk_size_for_baud, iter_bulk_chunks)
+from communication.packet_handler import PacketHandler
+from communication.stream_decoder import FRAME_OVERHEAD
+from communication.transport_writer import (TransportWriter, KIND_EMERGENCY, KIND_MOTOR, KIND_NORMAL,
+                                            KIND_TELEMETRY)
+
+_STAMP = struct.Struct('<d')
+
+class SlowLink:
+    """وصلة وهمية تستغرق زمن إرسال البايتات الفعلي (10 بت لكل بايت) وتسجل تأخر كل قناة"""
+    
+    def __init__(self, baud_rate: int):
+        self.byte_time = 10.0 / baud_rate
+        self.latency = {CHANNEL_CONTROL: [], CHANNEL_TELEMETRY: []}
+        self.bytes = {CHANNEL_CONTROL: 0, CHANNEL_TELEMETRY: 0, CHANNEL_BULK: 0}
+        self.bulk_done = None
+    
+    def write(self, frame: bytes):
+        time.sleep(len(frame) * self.byte_time)
+        channel = struct.unpack_from('<I', frame, 2)[0] >> CHANNEL_SHIFT
+        self.bytes[min(channel, CHANNEL_BULK)] += len(frame)
+        if channel in self.latency:
+            # زمن الإضافة للطابور في أول 8 بايت من المحتوى
+            queued_at = _STAMP.unpack_from(frame, 10)[0]
+            self.latency[channel].append((time.perf_counter() - queued_at) * 1000.0)
+        else:
+            self.bulk_done = time.perf_counter()
+
+def run(args, scheduled: bool) -> dict:
+    """تشغيل الحمل نفسه بالجدولة الموزونة أو بطابور FIFO واحد"""
+    handler = PacketHandler()
+    link = SlowLink(args.baud)
+    writer = TransportWriter(link.write, 'BenchWriter')
+    writer.start()
+    
+    bulk = os.urandom(args.bulk_kb * 1024)
+    time.sleep(0.1)
+    start = time.perf_counter()
+    if scheduled:
+        chunk_size = chunk_size_for_baud(args.baud, args.chunk_ms) - FRAME_OVERHEAD
+        frames = [handler.frame_payload(chunk, CHANNEL_BULK) for chunk in iter_bulk_chunks(bulk, 1, chunk_size)]
+        writer.submit_bulk(frames)
+    else:
+        writer.submit(handler.frame_payload(bulk, CHANNEL_BULK))
+    
+    def frame(channel: int, size: int) -> bytes:
+        return handler.frame_payload(_STAMP.pack(time.perf_counter()) + bytes(size), channel)
+    
+    # أوامر محركات وتيليمتري بمعدل ثابت، وإيقاف طارئ كل ثانية
+    period = 1.0 / args.rate
+    next_tick = time.perf_counter()
+    tick = 0
+    while time.perf_counter() - start < args.duration:
+        tick += 1
+        writer.submit(frame(CHANNEL_CONTROL, 30), KIND_MOTOR if scheduled else KIND_NORMAL)
+        writer.submit(frame(CHANNEL_TELEMETRY, args.telemetry_bytes), KIND_TELEMETRY if scheduled else KIND_NORMAL)
+        if tick % int(args.rate) == 0:
+            writer.submit(frame(CHANNEL_CONTROL, 8), KIND_EMERGENCY if scheduled else KIND_NORMAL)
+        next_tick += period
+        delay = next_tick - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    
+    elapsed = time.perf_counter() - start
+    writer.stop(timeout=0.0)
+    
+    result = {'elapsed': elapsed, 'bytes': dict(link.bytes),
+              'bulk_seconds': link.bulk_done - start if link.bulk_done else None,
+              'max_control_wait_ms': writer.queue.stats['max_control_wait_ms']}
+    for channel, name in ((CHANNEL_CONTROL, 'control'), (CHANNEL_TELEMETRY, 'telemetry')):
+        values = sorted(link.latency[channel]) or [0.0]
+        result[name] = (values[len(values) // 2], values[int(len(values) * 0.99)], values[-1], len(values))
+    return result
+
+def report(title: str, result: dict, baud: int):
+    capacity = baud / 10.0 * result['elapsed']
+    control, telemetry = result['control'], result['telemetry']
+    print(title)
+    print(f"  التحكم:    p50 {control[0]:.1f} ms، p99 {control[1]:.1f} ms، أقصى {control[2]:.1f} ms ({control[3]} إطار)، "
+          f"أقصى انتظار في الطابور {result['max_control_wait_ms']:.1f} ms")
+    print(f"  التيليمتري: p50 {telemetry[0]:.1f} ms، p99 {telemetry[1]:.1f} ms، أقصى {telemetry[2]:.1f} ms ({telemetry[3]} إطار)")
+    shares = '، '.join(f"{name} {result['bytes'][channel] / capacity * 100:.0f}%"
+                       for channel, name in ((CHANNEL_CONTROL, 'تحكم'), (CHANNEL_TELEMETRY, 'تيليمتري'),
+                                             (CHANNEL_BULK, 'نقل كبير')))
+    print(f"  استخدام الوصلة: {shares}")
+    bulk = f"{result['bulk_seconds']:.2f} ث" if result['bulk_seconds'] else "لم يكتمل"
+    print(f"  اكتمال النقل الكبير: {bulk}")
+
+def main():
+    parser = argparse.ArgumentParser(description='قياس جدولة القنوات المنطقية')
+    parser.add_argument('--baud', type=int, default=115200, help='سرعة الوصلة الوهمية')
+    parser.add_argument('--bulk-kb', type=int, default=32, help='حجم النقل الكبير (KB)')
+    parser.add_argument('--chunk-ms', type=float, default=10.0, help='زمن إرسال كل جزء من النقل الكبير')
+    parser.add_argument('--rate', type=float, default=50.0, help='معدل أوامر المحركات والتيليمتري (Hz)')
+    parser.add_argument('--telemetry-bytes', type=int, default=80, help='حجم إطار التيليمتري')
+    parser.add_argument('--duration', type=float, default=5.0, help='مدة كل قياس (ثانية)')
+    args = parser.parse_args()
+    
+    chunk_time = chunk_size_for_baud(args.baud, args.chunk_ms) * 10.0 / args.baud * 1000.0
+    print(f"الوصلة {args.baud} baud، نقل كبير {args.bulk_kb} KB، زمن الجزء {chunk_time:.1f} ms")
+    report("طابور FIFO واحد (النقل كإطار واحد):", run(args, scheduled=False), args.baud)
+    report("القنوات مع الجدولة الموزونة:", run(args, scheduled=True), args.baud)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+قياس معدل تحليل أسطر التيليمتري النصية (أسطر/ثانية): المحلل المجهز من المخطط
+مقابل التقسيم وبناء قاموس لكل سطر ومقابل رسائل JSON بنفس الحقول
+"""
+
+import sys
+import os
+import json
+import math
+import time
+import random
+import argparse
+
+# إضافة مجلد المشروع لـ Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from communication.line_telemetry import LineTelemetryParser, LineTelemetrySchema, DEFAULT_LINE_SCHEMA
+
+def new_state():
+    return {
+        'position': {'x': 0, 'y': 0, 'z': 0},
+        'orientation': {'roll': 0, 'pitch': 0, 'yaw': 0},
+        'velocity': {'x': 0, 'y': 0, 'z': 0},
+        'sensors': {},
+        'battery': 100,
+        'status': 'disconnected'
+    }
+
+def generate_lines(schema: LineTelemetrySchema, count: int, malformed: float, seed: int):
+    """أسطر بقيم متغيرة مع نسبة أسطر تالفة (حقل ناقص أو قيمة غير رقمية)"""
+    rng = random.Random(seed)
+    lines = []
+    for i in range(count):
+        t = i / 100.0
+        depth = 10.0 + 2.0 * math.sin(t)
+        state = {
+            'orientation': {'roll': 2.0 * math.sin(t), 'pitch': math.cos(t), 'yaw': (t * 10.0) % 360.0},
+            'sensors': {'depth': depth, 'temperature': 18.0 - depth * 0.05, 'pressure': 1013.25 + depth * 100.52},
+            'battery': 100 - i * 50 // count
+        }
+        line = schema.format(state)
+        if rng.random() < malformed:
+            line = line.rsplit(',', 1)[0] if rng.random() < 0.5 else line.replace('.', 'x', 1)
+        lines.append(line)
+    return lines
+
+def naive_apply(state, line: str, names) -> bool:
+    """الطريقة المعتادة: تقسيم وبناء قاموس متداخل لكل سطر ثم دمجه في الحالة"""
+    fields = line.split(',')
+    if fields[0] != 'TLM' or len(fields) != len(names) + 1:
+        return False
+    try:
+        values = dict(zip(names, map(float, fields[1:])))
+    except ValueError:
+        return False
+    data = {
+        'position': {'z': -values['depth']},
+        'orientation': {'roll': values['roll'], 'pitch': values['pitch'], 'yaw': values['yaw']},
+        'sensors': {'depth': values['depth'], 'temperature': values['temp'], 'pressure': values['pressure']},
+        'battery': int(values['battery'])
+    }
+    for group in ('position', 'orientation', 'sensors'):
+        state[group].update(data[group])
+    state['battery'] = data['battery']
+    return True
+
+def json_apply(state, text: str) -> bool:
+    data = json.loads(text)
+    for group in ('position', 'orientation', 'sensors'):
+        if group in data:
+            state[group].update(data[group])
+    if 'battery' in data:
+        state['battery'] = data['battery']
+    return True
+
+def measure(apply, items, repeat: int) -> float:
+    """أفضل معدل (أسطر/ثانية) عبر عدة تكرارات"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            apply(item)
+        best = min(best, time.perf_counter() - start)
+    return len(items) / best
+
+def main():
+    parser = argparse.ArgumentParser(description='قياس معدل تحليل أسطر التيليمتري النصية')
+    parser.add_argument('--lines', type=int, default=200000, help='عدد الأسطر')
+    parser.add_argument('--malformed', type=float, default=0.01, help='نسبة الأسطر التالفة')
+    parser.add_argument('--schema', default=DEFAULT_LINE_SCHEMA, help='مخطط السطر')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    
+    schema = LineTelemetrySchema(args.schema.split(';')[0])
+    lines = generate_lines(schema, args.lines, args.malformed, args.seed)
+    print(f"{len(lines)} سطر، مثال: {lines[0]}")
+    
+    state = new_state()
+    line_parser = LineTelemetryParser(args.schema)
+    line_parser.bind(state)
+    compiled_rate = measure(line_parser.apply, lines, args.repeat)
+    stats = line_parser.get_stats()
+    print(f"المحلل المجهز:         {compiled_rate:12,.0f} سطر/ث ({1e6 / compiled_rate:.2f} µs/سطر)، "
+          f"تالف {stats['malformed'] // args.repeat}")
+    
+    if args.schema == DEFAULT_LINE_SCHEMA:
+        names = DEFAULT_LINE_SCHEMA.split(',')[1:]
+        naive_state = new_state()
+        naive_rate = measure(lambda line: naive_apply(naive_state, line, names), lines, args.repeat)
+        print(f"تقسيم + قاموس لكل سطر: {naive_rate:12,.0f} سطر/ث ({1e6 / naive_rate:.2f} µs/سطر)، "
+              f"المحلل المجهز أسرع {compiled_rate / naive_rate:.1f}x")
+    
+    messages = [json.dumps({'orientation': dict(state['orientation']), 'sensors': dict(state['sensors']),
+                            'battery': state['battery']})] * len(lines)
+    json_state = new_state()
+    json_rate = measure(lambda text: json_apply(json_state, text), messages, args.repeat)
+    print(f"JSON بنفس الحقول:      {json_rate:12,.0f} رسالة/ث ({1e6 / json_rate:.2f} µs/رسالة)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+قياس كلفة ترميز وفك رسائل MAVLink 2 لكل رسالة: تدفق ArduSub نموذجي (ATTITUDE
+بمعدل 50 Hz مع الضغط وحالة النظام و HEARTBEAT) مقسم كقراءات تسلسلية أو datagrams
+"""
+
+import sys
+import os
+import math
+import time
+import argparse
+
+# إضافة مجلد المشروع لـ Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from communication.mavlink import (MAVLinkCodec, MAVLinkParser, MSG_ATTITUDE, MSG_HEARTBEAT, MSG_MANUAL_CONTROL,
+                                   MSG_SCALED_PRESSURE2, MSG_SYS_STATUS, MAV_TYPE_SUBMARINE,
+                                   MAV_AUTOPILOT_ARDUPILOTMEGA)
+
+def generate_stream(seconds: float, rate_hz: float):
+    """إطارات ثانية بعد ثانية: ATTITUDE بكل دورة، الضغط بخُمسها، حالة النظام و HEARTBEAT مرة في الثانية"""
+    codec = MAVLinkCodec(1, 1)
+    frames = []
+    ticks = int(seconds * rate_hz)
+    for tick in range(ticks):
+        t = tick / rate_hz
+        boot_ms = int(t * 1000)
+        frames.append(codec.encode(MSG_ATTITUDE, boot_ms, 0.02 * math.sin(t), 0.01 * math.cos(t), t % math.pi,
+                                   0.001, 0.002, 0.05))
+        if tick % 5 == 0:
+            frames.append(codec.encode(MSG_SCALED_PRESSURE2, boot_ms, 1013.25 + 500.0 + math.sin(t), 0.0, 1520))
+        if tick % int(rate_hz) == 0:
+            frames.append(codec.encode(MSG_HEARTBEAT, 19, MAV_TYPE_SUBMARINE, MAV_AUTOPILOT_ARDUPILOTMEGA, 0x81, 4, 3))
+            frames.append(codec.encode(MSG_SYS_STATUS, 0, 0, 0, 250, 15800, 1200, 0, 0, 0, 0, 0, 0, 76))
+    return frames
+
+def measure_decode(data_chunks, message_count: int, repeat: int) -> float:
+    """زمن فك الرسالة الواحدة (ميكروثانية) كأفضل تكرار"""
+    best = float('inf')
+    for _ in range(repeat):
+        parser = MAVLinkParser()
+        start = time.perf_counter()
+        decoded = 0
+        for chunk in data_chunks:
+            decoded += len(parser.feed(chunk))
+        elapsed = time.perf_counter() - start
+        assert decoded == message_count, (decoded, message_count)
+        best = min(best, elapsed)
+    return best / message_count * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description='قياس كلفة ترميز وفك MAVLink')
+    parser.add_argument('--seconds', type=float, default=20.0, help='مدة التدفق المولَّد')
+    parser.add_argument('--rate', type=float, default=50.0, help='معدل ATTITUDE (Hz)')
+    parser.add_argument('--read-size', type=int, default=64, help='حجم القراءة التسلسلية (بايت)')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    
+    frames = generate_stream(args.seconds, args.rate)
+    stream = b''.join(frames)
+    reads = [stream[i:i + args.read_size] for i in range(0, len(stream), args.read_size)]
+    
+    print(f"{len(frames)} رسالة، {len(stream)} بايت ({len(stream) / args.seconds:.0f} بايت/ث)")
+    serial_us = measure_decode(reads, len(frames), args.repeat)
+    datagram_us = measure_decode(frames, len(frames), args.repeat)
+    print(f"فك (قراءات {args.read_size} بايت): {serial_us:.2f} µs/رسالة")
+    print(f"فك (datagram لكل رسالة):   {datagram_us:.2f} µs/رسالة")
+    
+    codec = MAVLinkCodec()
+    count = 20000
+    start = time.perf_counter()
+    for i in range(count):
+        codec.encode(MSG_MANUAL_CONTROL, i % 1000, -200, 500, 0, 0, 1)
+    encode_us = (time.perf_counter() - start) / count * 1e6
+    print(f"ترميز MANUAL_CONTROL: {encode_us:.2f} µs/رسالة")
+    
+    # الحمل على المعالج لتدفق المركبة مع أوامر تحكم بمعدل 50 Hz
+    load = (len(frames) / args.seconds * serial_us + 50.0 * encode_us) / 1e6 * 100.0
+    print(f"الحمل على المعالج للتدفق وأوامر 50 Hz: {load:.3f}% من نواة واحدة")
+    
+    try:
+        from pymavlink.dialects.v20 import ardupilotmega
+    except ImportError:
+        return
+    best = float('inf')
+    for _ in range(args.repeat):
+        mav = ardupilotmega.MAVLink(None)
+        start = time.perf_counter()
+        decoded = sum(len(mav.parse_buffer(chunk) or []) for chunk in reads)
+        best = min(best, time.perf_counter() - start)
+    print(f"pymavlink للمقارنة: {best / max(decoded, 1) * 1e6:.2f} µs/رسالة")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+قياس ناقل الذاكرة المشتركة: زمن الكتابة مع وبدون قراء في عمليات أخرى
+وزمن القراءة ونسبة إعادة المحاولة (القراء لا يجب أن يبطئوا الكاتب)
+"""
+
+import sys
+import os
+import time
+import argparse
+import subprocess
+
+# إضافة مجلد المشروع لـ Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.telemetry_bus import TelemetryBus
+from utils.shared_telemetry import SharedTelemetryPublisher, SharedTelemetryReader
+
+SEGMENT = 'rov_bench_telemetry'
+MOTORS = ['front_left', 'front_right', 'back_left', 'back_right', 'vertical_1', 'vertical_2']
+
+def run_reader(duration: float):
+    """عملية قارئ: قراءة متواصلة والتحقق من اتساق كل قراءة"""
+    reader = SharedTelemetryReader(SEGMENT)
+    reads = 0
+    torn = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        # الكاتب يضع نفس القيمة في x و y و z: أي اختلاف يعني قراءة ممزقة
+        values = reader.read(lambda state: state['position'].tolist())
+        reads += 1
+        if values is None or not values[0] == values[1] == values[2]:
+            torn += 1
+    elapsed = time.perf_counter() - start
+    print(f"{reads} {torn} {reader.retries} {elapsed}")
+    reader.close()
+
+def measure_writes(publisher: SharedTelemetryPublisher, duration: float) -> float:
+    """زمن كتابة الحالة والمحركات وعينة IMU (ميكروثانية لكل دورة)"""
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration:
+        count += 1
+        publisher.write_state({'position': {'x': count, 'y': count, 'z': count}, 'battery': 90, 'status': 'connected'})
+        publisher.write_imu({'orientation': {'roll': count, 'pitch': 0.0, 'yaw': 0.0}})
+        publisher.write_motors({motor: 1500 + count % 100 for motor in MOTORS})
+    return (time.perf_counter() - start) / count * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description='قياس ناقل الذاكرة المشتركة')
+    parser.add_argument('--duration', type=float, default=2.0, help='مدة كل قياس (ثانية)')
+    parser.add_argument('--readers', type=int, default=2, help='عدد عمليات القراءة')
+    parser.add_argument('--reader', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.reader:
+        run_reader(args.duration)
+        return
+    
+    publisher = SharedTelemetryPublisher(TelemetryBus(), SEGMENT, motor_names=MOTORS)
+    try:
+        alone = measure_writes(publisher, args.duration)
+        
+        readers = [subprocess.Popen([sys.executable, os.path.abspath(__file__), '--reader',
+                                     '--duration', str(args.duration)],
+                                    stdout=subprocess.PIPE, text=True)
+                   for _ in range(args.readers)]
+        time.sleep(0.3)  # بدء القراء
+        contended = measure_writes(publisher, args.duration)
+        results = [reader.communicate()[0].split() for reader in readers]
+    finally:
+        publisher.close()
+    
+    print(f"الكتابة بدون قراء:        {alone:.2f} us/دورة")
+    print(f"الكتابة مع {args.readers} قارئ:       {contended:.2f} us/دورة")
+    for index, (reads, torn, retries, elapsed) in enumerate(results):
+        reads, torn, retries, elapsed = int(reads), int(torn), int(retries), float(elapsed)
+        print(f"القارئ {index + 1}: {reads / elapsed:,.0f} قراءة/ث، {elapsed / reads * 1e6:.2f} us/قراءة، "
+              f"إعادة محاولة {retries / max(reads, 1) * 100:.2f}%، قراءات ممزقة {torn}")
+
+if __name__ == '__main__':
+    main()
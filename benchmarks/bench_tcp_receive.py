@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+قياس أداء استقبال رسائل TCP
+يقارن الطريقة القديمة (recv + message += chunk) مع LengthPrefixedDecoder
+(recv_into في مخزن مخصص مسبقاً) لأحجام رسائل 1KB و 64KB و 1MB
+"""
+
+import sys
+import os
+import socket
+import threading
+import time
+import argparse
+
+# إضافة مجلد المشروع لـ Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from communication.stream_decoder import LengthPrefixedDecoder
+
+def sender(sock: socket.socket, payload: bytes, count: int, segment: int):
+    """إرسال count رسالة بنفس صيغة NetworkCommunication (مقسمة إلى مقاطع اختيارياً)"""
+    frame = len(payload).to_bytes(4, byteorder='big') + payload
+    view = memoryview(frame)
+    for _ in range(count):
+        if segment:
+            for offset in range(0, len(frame), segment):
+                sock.sendall(view[offset:offset + segment])
+        else:
+            sock.sendall(frame)
+    sock.shutdown(socket.SHUT_WR)
+
+def receive_legacy(sock: socket.socket) -> int:
+    """الطريقة القديمة في _read_tcp_data"""
+    received = 0
+    while True:
+        length_bytes = sock.recv(4)
+        if not length_bytes:
+            break
+        message_length = int.from_bytes(length_bytes, byteorder='big')
+        
+        message = b''
+        while len(message) < message_length:
+            chunk = sock.recv(message_length - len(message))
+            if not chunk:
+                break
+            message += chunk
+        
+        if message:
+            received += 1
+    return received
+
+def receive_decoder(sock: socket.socket) -> int:
+    """الطريقة الجديدة: recv_into ثم فك الرسائل من memoryview"""
+    decoder = LengthPrefixedDecoder()
+    received = 0
+    while decoder.recv_from(sock):
+        for message in decoder.frames():
+            received += 1
+    return received
+
+def run_case(receiver, size: int, count: int, segment: int) -> float:
+    """تشغيل حالة واحدة وإرجاع الزمن"""
+    left, right = socket.socketpair()
+    payload = os.urandom(size)
+    thread = threading.Thread(target=sender, args=(left, payload, count, segment), daemon=True)
+    
+    start = time.perf_counter()
+    thread.start()
+    received = receiver(right)
+    elapsed = time.perf_counter() - start
+    
+    thread.join()
+    left.close()
+    right.close()
+    
+    if received != count:
+        print(f"  ⚠️  استُقبلت {received} رسالة من {count}")
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="قياس أداء استقبال TCP")
+    parser.add_argument('--total-mb', type=float, default=64.0, help="حجم البيانات لكل حالة")
+    parser.add_argument('--segment', type=int, default=0,
+                        help="حجم مقاطع الإرسال بالبايت (مثلاً 1448 لمحاكاة MSS)، 0 لإرسال الرسالة كاملة")
+    args = parser.parse_args()
+    
+    print("📊 استقبال رسائل TCP ذات البادئة الطولية")
+    if args.segment:
+        print(f"  الإرسال على مقاطع بحجم {args.segment} بايت")
+    for size in (1024, 64 * 1024, 1024 * 1024):
+        count = max(1, int(args.total_mb * 1024 * 1024 / size))
+        legacy = run_case(receive_legacy, size, count, args.segment)
+        decoder = run_case(receive_decoder, size, count, args.segment)
+        total_mb = size * count / 1e6
+        print(f"  {size // 1024:>5} KB × {count:<6} "
+              f"قديم: {total_mb / legacy:8.1f} MB/s   جديد: {total_mb / decoder:8.1f} MB/s   "
+              f"({legacy / decoder:.1f}x)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+قياس حجم التيليمتري التفاضلي مقارنة بـ JSON والصيغة الثنائية الكاملة
+يولّد حركة ROV واقعية (تغير بطيء للعمق والاتجاه) ويقيس البايتات لكل إطار
+"""
+
+import sys
+import os
+import json
+import math
+import random
+import time
+import argparse
+
+# إضافة مجلد المشروع لـ Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from communication.binary_protocol import BinaryMessageCodec
+from communication.stream_decoder import FRAME_OVERHEAD
+
+def generate_states(frame_count: int, rate_hz: float, seed: int = 1):
+    """توليد حالات ROV متتالية بتغير بطيء وضوضاء حساسات خفيفة"""
+    rng = random.Random(seed)
+    for i in range(frame_count):
+        t = i / rate_hz
+        depth = 5.0 + 2.0 * math.sin(t * 0.05)
+        yield {
+            'position': {'x': 0.2 * t, 'y': 0.0, 'z': -depth},
+            'orientation': {
+                'roll': 1.5 * math.sin(t * 0.7),
+                'pitch': 0.8 * math.sin(t * 0.4),
+                'yaw': (t * 3.0) % 360
+            },
+            'velocity': {'x': 0.2, 'y': 0.0, 'z': 0.1 * math.cos(t * 0.05)},
+            'sensors': {
+                'depth': depth,
+                'temperature': 18.0 + rng.gauss(0, 0.02),
+                'pressure': 1013.25 + depth * 98.1
+            },
+            'battery': max(0, 100 - int(t / 60)),
+            'status': 'connected'
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description='قياس حجم التيليمتري التفاضلي')
+    parser.add_argument('--frames', type=int, default=10000, help='عدد الإطارات')
+    parser.add_argument('--rate', type=float, default=50.0, help='معدل التيليمتري (Hz)')
+    parser.add_argument('--keyframe-interval', type=int, default=50, help='إطار كامل كل N إطار')
+    args = parser.parse_args()
+    
+    states = list(generate_states(args.frames, args.rate))
+    encoder = BinaryMessageCodec(keyframe_interval=args.keyframe_interval)
+    decoder = BinaryMessageCodec()
+    
+    json_bytes = sum(len(json.dumps(state).encode('utf-8')) for state in states)
+    binary_bytes = sum(len(encoder.encode_telemetry(state)) for state in states)
+    
+    start = time.perf_counter()
+    messages = [encoder.encode_telemetry_delta(state) for state in states]
+    encode_time = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    for message in messages:
+        decoder.decode(message)
+    decode_time = time.perf_counter() - start
+    
+    delta_bytes = sum(len(message) for message in messages)
+    
+    # التحقق من دقة إعادة البناء مقابل آخر حالة
+    rebuilt = decoder.telemetry_decoder.state
+    error = abs(rebuilt['sensors']['depth'] - states[-1]['sensors']['depth'])
+    
+    frames = args.frames
+    print(f"الإطارات: {frames} بمعدل {args.rate:.0f} Hz، إطار كامل كل {args.keyframe_interval}")
+    print(f"{'الصيغة':<14}{'بايت/إطار':>12}{'مع التأطير':>14}{'bit/s':>12}")
+    for name, total in (('JSON', json_bytes), ('ثنائي كامل', binary_bytes), ('تفاضلي', delta_bytes)):
+        per_frame = total / frames
+        framed = per_frame + FRAME_OVERHEAD
+        print(f"{name:<14}{per_frame:>12.1f}{framed:>14.1f}{framed * 8 * args.rate:>12.0f}")
+    
+    print(f"التوفير مقارنة بـ JSON: {json_bytes / delta_bytes:.1f}x")
+    print(f"الترميز: {encode_time / frames * 1e6:.1f} µs/إطار، فك الترميز: {decode_time / frames * 1e6:.1f} µs/إطار")
+    print(f"خطأ العمق بعد إعادة البناء: {error:.4f} م")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+قياس تصحيح الأخطاء الأمامي على UDP مع حقن الفقد في المحاكي: نسبة وصول
+التيليمتري وأوامر المحركات والحمل الإضافي لكل وضع (بدون، XOR، Reed-Solomon)
+"""
+
+import sys
+import os
+import time
+import argparse
+
+# إضافة مجلد المشروع لـ Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from communication.network_comm import NetworkCommunication
+from simulator.impairment import LinkImpairment
+from simulator.server import ROVSimulator
+
+MOTORS = ['front_left', 'front_right', 'back_left', 'back_right', 'vertical_1', 'vertical_2']
+
+def run(mode: str, port: int, args) -> dict:
+    """تشغيل المحاكي والعميل بوضع FEC واحد وإرجاع نسب الوصول"""
+    impairment = LinkImpairment(args.latency_ms, args.jitter_ms, args.loss, 0.0, args.seed)
+    simulator = ROVSimulator(rate_hz=args.rate, impairment=impairment, seed=args.seed, fec_mode=mode)
+    simulator.start_udp(port, '127.0.0.1')
+    simulator.start()
+
+    received = set()
+
+    def handle(message):
+        if isinstance(message, dict) and message.get('type') == 'telemetry':
+            received.add(message['seq'])
+
+    client = NetworkCommunication('127.0.0.1', port, 'UDP', fec_mode=mode)
+    client.set_data_handler(handle)
+    client.connect()
+
+    # أوامر المحركات بمعدل 50 Hz (أول أمر يفتح جلسة UDP في المحاكي)
+    commands = 0
+    end = time.monotonic() + args.duration
+    while time.monotonic() < end:
+        client.send_motor_commands({motor: 1500 + commands % 100 for motor in MOTORS})
+        commands += 1
+        time.sleep(0.02)
+    time.sleep(0.3)  # وصول التكافؤ المتأخر
+
+    stats = simulator.get_stats()
+    fec = client.get_fec_stats()
+    client.disconnect()
+    simulator.stop()
+
+    session = next(iter(stats['sessions'].values()), {})
+    sent = len(range(min(received), max(received) + 1)) if received else 0
+    result = {
+        'telemetry': len(received) / max(sent, 1),
+        'commands': stats['motor_commands'] / max(commands, 1),
+        'uplink_overhead': fec['encoder']['overhead'] if fec else 0.0,
+        'downlink_overhead': session.get('fec_encoder', {}).get('overhead', 0.0),
+        'recovered': fec['decoder']['recovered'] if fec else 0,
+        'measured_loss': fec['decoder']['loss_rate'] if fec else None,
+        'parity': session.get('fec_encoder', {}).get('parity'),
+        'group_size': session.get('fec_encoder', {}).get('group_size')
+    }
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description='قياس FEC على UDP مع حقن الفقد')
+    parser.add_argument('--loss', type=float, default=0.05, help='احتمال فقد الرسالة في كل اتجاه')
+    parser.add_argument('--latency-ms', type=float, default=10.0, help='تأخير الوصلة')
+    parser.add_argument('--jitter-ms', type=float, default=2.0, help='تذبذب التأخير')
+    parser.add_argument('--rate', type=float, default=100.0, help='معدل التيليمتري (Hz)')
+    parser.add_argument('--duration', type=float, default=5.0, help='مدة كل وضع (ثانية)')
+    parser.add_argument('--port', type=int, default=9870, help='أول منفذ UDP (يستخدم كل وضع منفذين)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"فقد {args.loss * 100:.0f}% في كل اتجاه، تأخير {args.latency_ms:.0f}±{args.jitter_ms:.0f} ms، "
+          f"تيليمتري {args.rate:.0f} Hz، أوامر 50 Hz")
+    for index, mode in enumerate(('off', 'xor', 'rs')):
+        result = run(mode, args.port + index * 2, args)
+        line = (f"{mode:>4}: تيليمتري {result['telemetry'] * 100:6.2f}%، أوامر {result['commands'] * 100:6.2f}%، "
+                f"حمل إضافي صاعد {result['uplink_overhead'] * 100:.0f}% هابط {result['downlink_overhead'] * 100:.0f}%")
+        if mode != 'off':
+            line += (f"، مستعاد {result['recovered']}، الفقد المقاس {result['measured_loss'] * 100:.1f}%، "
+                     f"المجموعة {result['group_size']}+{result['parity']}")
+        print(line)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+قياس خادم WebSocket للتيليمتري: عشرات العملاء بمعدلات مختلفة وبعضهم لا يقرأ،
+مع قياس تذبذب حلقة تحكم 100 Hz في نفس العملية (يجب ألا يتأثر بعدد العملاء)
+"""
+
+import sys
+import os
+import time
+import json
+import asyncio
+import argparse
+import subprocess
+
+# إضافة مجلد المشروع لـ Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.telemetry_bus import TelemetryBus, TOPIC_TELEMETRY, TOPIC_IMU
+from communication.websocket_server import TelemetryWebSocketServer
+
+class FakeController:
+    """مصدر حالة بحجم قريب من ROVController.get_rov_status"""
+    
+    def __init__(self):
+        self.telemetry_bus = TelemetryBus()
+        self.counter = 0
+    
+    def get_rov_status(self):
+        return {
+            'state': {'position': {'x': self.counter, 'y': 0, 'z': 1.5}, 'battery': 87, 'status': 'connected'},
+            'control_mode': 'manual',
+            'motor_status': {f'motor_{index}': {'speed': 1500 + index} for index in range(6)},
+            'communication_status': {'connected': True, 'type': 'network',
+                                     'link_quality': {'rtt_p50_ms': 4.1, 'rtt_p99_ms': 9.8, 'loss': 0.0}}
+        }
+
+def control_loop(controller: FakeController, duration: float, rate: float = 100.0):
+    """حلقة تحكم وهمية: تنشر التيليمتري وتقيس تأخر كل دورة عن موعدها (ms)"""
+    period = 1.0 / rate
+    lateness = []
+    next_tick = time.perf_counter()
+    end = next_tick + duration
+    while next_tick < end:
+        next_tick += period
+        delay = next_tick - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        lateness.append((time.perf_counter() - next_tick) * 1000.0)
+        controller.counter += 1
+        controller.telemetry_bus.publish(TOPIC_TELEMETRY, {'depth': 1.5, 'seq': controller.counter,
+                                                           'orientation': {'roll': 0.1, 'pitch': 0.2, 'yaw': 3.0}})
+        controller.telemetry_bus.publish(TOPIC_IMU, {'orientation': {'roll': 0.1, 'pitch': 0.2, 'yaw': 3.0},
+                                                     'acceleration': {'x': 0.0, 'y': 0.0, 'z': 9.81}})
+    lateness.sort()
+    return lateness[len(lateness) // 2], lateness[int(len(lateness) * 0.99)], lateness[-1]
+
+async def run_clients(url: str, count: int, slow: int, rate: float, duration: float):
+    """عملاء سريعون يقرؤون كل شيء وعملاء بطيئون لا يقرؤون أبداً"""
+    import websockets
+    
+    received = [0] * count
+    
+    async def fast(index: int):
+        async with websockets.connect(f"{url}/?topics=status,telemetry,imu&rate={rate}") as websocket:
+            end = time.monotonic() + duration
+            while time.monotonic() < end:
+                try:
+                    await asyncio.wait_for(websocket.recv(), end - time.monotonic())
+                except asyncio.TimeoutError:
+                    break
+                received[index] += 1
+    
+    async def stalled():
+        # max_queue=1: المكتبة تتوقف عن القراءة من المقبس فيمتلئ مخزن الخادم
+        try:
+            async with websockets.connect(f"{url}/?topics=status,telemetry,imu&rate=30", max_queue=1):
+                await asyncio.sleep(duration)
+        except Exception:
+            pass
+    
+    await asyncio.gather(*[fast(index) for index in range(count)], *[stalled() for _ in range(slow)])
+    return received
+
+def main():
+    parser = argparse.ArgumentParser(description='قياس خادم WebSocket للتيليمتري')
+    parser.add_argument('--clients', type=int, default=60, help='عدد العملاء السريعين')
+    parser.add_argument('--slow', type=int, default=5, help='عدد العملاء الذين لا يقرؤون')
+    parser.add_argument('--rate', type=float, default=10.0, help='معدل كل عميل سريع (Hz)')
+    parser.add_argument('--duration', type=float, default=5.0, help='مدة القياس (ثانية)')
+    parser.add_argument('--port', type=int, default=8799)
+    parser.add_argument('--client-process', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    url = f"ws://127.0.0.1:{args.port}"
+    if args.client_process:
+        received = asyncio.run(run_clients(url, args.clients, args.slow, args.rate, args.duration))
+        print(json.dumps(received))
+        return
+    
+    controller = FakeController()
+    baseline = control_loop(controller, min(args.duration, 2.0))
+    
+    server = TelemetryWebSocketServer('127.0.0.1', args.port, max_rate=30, send_timeout=2.0,
+                                      write_limit=16 * 1024, max_clients=args.clients + args.slow)
+    server.add_vehicle('ROV', controller)
+    if not server.start():
+        sys.exit(1)
+    
+    # العملاء في عملية منفصلة حتى لا يُحسب عملهم على حلقة التحكم
+    clients = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--client-process',
+                                '--clients', str(args.clients), '--slow', str(args.slow),
+                                '--rate', str(args.rate), '--duration', str(args.duration),
+                                '--port', str(args.port)],
+                               stdout=subprocess.PIPE, text=True)
+    time.sleep(0.5)  # اتصال العملاء
+    loaded = control_loop(controller, args.duration - 1.0)
+    received = json.loads(clients.communicate()[0])
+    stats = server.get_stats()
+    server.stop()
+    
+    # 3 مواضيع بمعدل العميل (الحالة محدودة أيضاً بنفس المعدل)
+    expected = 3 * args.rate * args.duration
+    print(f"حلقة التحكم بدون عملاء:  p50 {baseline[0]:.3f} ms، p99 {baseline[1]:.3f} ms، أقصى {baseline[2]:.3f} ms")
+    print(f"حلقة التحكم مع {args.clients + args.slow} عميل: p50 {loaded[0]:.3f} ms، p99 {loaded[1]:.3f} ms، أقصى {loaded[2]:.3f} ms")
+    print(f"إطارات مُسلسلة: {stats['frames_serialized']:,}، مُرسلة: {stats['frames_sent']:,}، "
+          f"مُستبدلة: {stats['frames_dropped']:,}")
+    print(f"العملاء السريعون: متوسط {sum(received) / len(received):.0f} إطار "
+          f"(المتوقع ~{expected:.0f})، أقل عميل {min(received)}")
+    print(f"العملاء البطيئون المفصولون: {stats['slow_disconnects']} من {args.slow}")
+    print(f"زمن دورة البث: آخر {stats['tick_ms']:.2f} ms، أقصى {stats['max_tick_ms']:.2f} ms")
+
+if __name__ == '__main__':
+    main()
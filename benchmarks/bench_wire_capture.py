@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+قياس كلفة التقاط الإطارات (ميكروثانية لكل إطار) بأحجام مختلفة ومن خيطين معاً
+(القراءة والكتابة كما في الوصلة)، ثم معدل إعادة تشغيل الالتقاط عبر المحللات
+"""
+
+import sys
+import os
+import json
+import time
+import tempfile
+import argparse
+import threading
+
+# إضافة مجلد المشروع لـ Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from communication.capture import WireCapture, DIRECTION_IN, DIRECTION_OUT
+from communication.capture_replay import CaptureReplayer
+
+def measure_record(path: str, size: int, frames: int, threads: int) -> float:
+    """زمن تسجيل الإطار الواحد (ميكروثانية): الزمن الكلي على عدد الإطارات من كل الخيوط"""
+    capture = WireCapture(path, {'link': 'udp', 'binary_protocol': False})
+    data = bytes(size)
+    per_thread = frames // threads
+    
+    def run(direction: int):
+        record = capture.record
+        for _ in range(per_thread):
+            record(direction, data)
+    
+    workers = [threading.Thread(target=run, args=(DIRECTION_IN if i % 2 == 0 else DIRECTION_OUT,))
+               for i in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - start
+    capture.close()
+    return elapsed / (per_thread * threads) * 1e6
+
+def write_telemetry_capture(path: str, frames: int):
+    """التقاط UDP بتيليمتري JSON نموذجي وأوامر محركات بينها"""
+    capture = WireCapture(path, {'link': 'udp', 'binary_protocol': False, 'fec_mode': 'off'})
+    for i in range(frames):
+        capture.record(DIRECTION_IN, json.dumps({
+            'type': 'telemetry', 'timestamp': i * 0.02,
+            'orientation': {'roll': 1.5, 'pitch': -0.4, 'yaw': i % 360},
+            'sensors': {'depth': 10.0 + i * 0.001, 'temperature': 18.2, 'pressure': 2018.5},
+            'battery': 87
+        }).encode('utf-8'))
+        if i % 2 == 0:
+            capture.record(DIRECTION_OUT, b'{"type":"motor_command","motors":[1500,1500,1500,1500,1550,1550]}')
+    capture.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='قياس كلفة التقاط حركة الوصلة وإعادة تشغيله')
+    parser.add_argument('--frames', type=int, default=200000, help='عدد الإطارات لكل قياس')
+    parser.add_argument('--sizes', default='16,64,256,1400', help='أحجام الإطارات (بايت)')
+    parser.add_argument('--dir', default=tempfile.gettempdir(), help='مجلد ملفات القياس')
+    args = parser.parse_args()
+    
+    path = os.path.join(args.dir, 'bench_wire_capture.pcap')
+    for size in [int(size) for size in args.sizes.split(',')]:
+        single = measure_record(path, size, args.frames, 1)
+        shared = measure_record(path, size, args.frames, 2)
+        print(f"إطار {size:5d} بايت: {single:.2f} µs/إطار (خيط واحد)، {shared:.2f} µs/إطار (خيطان)")
+    
+    write_telemetry_capture(path, args.frames // 4)
+    print(f"ملف التيليمتري: {os.path.getsize(path)} بايت")
+    replayer = CaptureReplayer(path)
+    stats = replayer.run()
+    replayer.close()
+    rate = stats['messages'] / stats['elapsed_seconds']
+    print(f"إعادة التشغيل بأقصى سرعة: {stats['messages']} رسالة، {rate:,.0f} رسالة/ث")
+    os.remove(path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,777 @@
+import asyncio
+import json
+import threading
+import time
+from typing import Optional, Callable, Dict, Any, List
+from utils.logger import ROVLogger
+from .binary_protocol import BinaryMessageCodec
+from .packet_handler import PacketHandler
+from .transport_writer import OutboundQueue, KIND_BULK, KIND_EMERGENCY, KIND_MOTOR, KIND_NORMAL
+from .stream_decoder import FRAME_OVERHEAD
+from .fec import FEC_OFF, FecDecoder, FecEncoder
+from .multicast import open_multicast_listener
+from .capture import DIRECTION_IN, DIRECTION_OUT, STREAM_REPLY
+from .channels import (CHANNEL_BULK, CHANNEL_CONTROL, NETWORK_CHUNK_SIZE, BulkReassembler,
+                       chunk_size_for_baud, is_bulk_channel, iter_bulk_chunks, pack_length, split_length)
+
+class AsyncLinkLoop:
+    """حلقة asyncio واحدة في خيط واحد تخدم كل الوصلات (تسلسلي، TCP، UDP)
+    
+    عدد الخيوط يبقى ثابتاً مهما زاد عدد الوصلات أو المركبات.
+    """
+    
+    _shared_instance: Optional['AsyncLinkLoop'] = None
+    _shared_lock = threading.Lock()
+    
+    def __init__(self):
+        self.logger = ROVLogger('AsyncLinkLoop')
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self.links: List['AsyncTransport'] = []
+    
+    @classmethod
+    def shared(cls) -> 'AsyncLinkLoop':
+        """الحصول على الحلقة المشتركة للعملية"""
+        with cls._shared_lock:
+            if cls._shared_instance is None:
+                cls._shared_instance = cls()
+            return cls._shared_instance
+    
+    def start(self):
+        """بدء خيط الحلقة إذا لم يكن يعمل"""
+        with self._lock:
+            if self.thread and self.thread.is_alive():
+                return
+            
+            self._ready.clear()
+            self.loop = asyncio.new_event_loop()
+            self.thread = threading.Thread(target=self._run, name='AsyncLinkLoop', daemon=True)
+            self.thread.start()
+        
+        self._ready.wait(timeout=5)
+    
+    def stop(self):
+        """إيقاف الحلقة"""
+        with self._lock:
+            if self.loop and self.loop.is_running():
+                self.loop.call_soon_threadsafe(self.loop.stop)
+            if self.thread and self.thread is not threading.current_thread():
+                self.thread.join(timeout=2)
+            self.thread = None
+    
+    def _run(self):
+        """تشغيل الحلقة في خيطها"""
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._ready.set)
+        self.logger.info("تم بدء حلقة الاتصال غير المتزامنة")
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+    
+    def in_loop_thread(self) -> bool:
+        """هل الاستدعاء من داخل خيط الحلقة"""
+        return self.thread is threading.current_thread()
+    
+    def run(self, coroutine, timeout: Optional[float] = None):
+        """تشغيل coroutine على الحلقة وانتظار نتيجتها من خيط آخر"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop).result(timeout)
+    
+    def call_soon(self, callback: Callable, *args):
+        """جدولة استدعاء على الحلقة من أي خيط"""
+        if self.in_loop_thread():
+            callback(*args)
+        else:
+            self.loop.call_soon_threadsafe(callback, *args)
+    
+    def register(self, link: 'AsyncTransport'):
+        """تسجيل وصلة على الحلقة"""
+        with self._lock:
+            if link not in self.links:
+                self.links.append(link)
+    
+    def unregister(self, link: 'AsyncTransport'):
+        """إلغاء تسجيل وصلة"""
+        with self._lock:
+            if link in self.links:
+                self.links.remove(link)
+    
+    def link_count(self) -> int:
+        """عدد الوصلات النشطة على الحلقة"""
+        with self._lock:
+            return len(self.links)
+
+class AsyncTransport:
+    """الواجهة المشتركة لوسائل الاتصال غير المتزامنة
+    
+    نفس واجهة SerialCommunication و NetworkCommunication
+    (connect / send_motor_commands / set_data_handler ...) لكن القراءة والكتابة
+    تتم كلها على حلقة AsyncLinkLoop المشتركة بدلاً من خيوط خاصة بكل وصلة.
+    """
+    
+    def __init__(self, name: str, binary_protocol: bool = False,
+                 link_loop: Optional[AsyncLinkLoop] = None):
+        self.logger = ROVLogger(name)
+        self.link_loop = link_loop or AsyncLinkLoop.shared()
+        self.is_connected = False
+        self.connect_timeout = 10.0
+        
+        # الصيغة الثنائية لرسائل المسار السريع
+        self.binary_protocol = binary_protocol
+        self.binary_codec = BinaryMessageCodec()
+        
+        # معالجات البيانات الواردة
+        self.data_handler: Optional[Callable] = None
+        self.batch_handler: Optional[Callable] = None
+        
+        # الطابور الصادر (يُستخدم من خيط الحلقة فقط)
+        self.outbox = OutboundQueue()
+        self._outbox_event: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        
+        # النقل الكبير على قنوات 2-255
+        self.bulk_reassembler = BulkReassembler()
+        self._bulk_transfer_id = 0
+        
+        # التقاط الإطارات الواردة والصادرة (WireCapture يعيّنه المتحكم، None يعطله)
+        self.capture = None
+    
+    def connect(self) -> bool:
+        """الاتصال (يعطّل المستدعي حتى انتهاء الاتصال أو المهلة)"""
+        self.link_loop.start()
+        try:
+            self.link_loop.run(self._connect(), timeout=self.connect_timeout + 1)
+            self.link_loop.register(self)
+            return True
+        except Exception as e:
+            self.logger.error(f"خطأ في الاتصال: {e}")
+            self.is_connected = False
+            return False
+    
+    def disconnect(self):
+        """قطع الاتصال"""
+        if not self.link_loop.loop:
+            return
+        
+        self.link_loop.unregister(self)
+        try:
+            self.link_loop.run(self._disconnect(), timeout=3)
+        except Exception as e:
+            self.logger.error(f"خطأ في قطع الاتصال: {e}")
+    
+    async def _connect(self):
+        """فتح الوصلة وبدء مهام القراءة والكتابة"""
+        await asyncio.wait_for(self._open(), self.connect_timeout)
+        self.is_connected = True
+        self._outbox_event = asyncio.Event()
+        self._tasks = [asyncio.ensure_future(self._write_loop())]
+        
+        read_task = self._read_loop()
+        if read_task is not None:
+            self._tasks.append(asyncio.ensure_future(read_task))
+    
+    async def _disconnect(self):
+        """إيقاف المهام وإغلاق الوصلة"""
+        self.is_connected = False
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+        self.outbox.clear()
+        await self._close()
+    
+    # ---- واجهة الإرسال ----
+    
+    def send_data(self, data: Dict[str, Any], kind: str = KIND_NORMAL) -> bool:
+        """إرسال قاموس كرسالة JSON"""
+        return self.send_bytes(json.dumps(data).encode('utf-8'), kind)
+    
+    def send_bytes(self, message: bytes, kind: str = KIND_NORMAL) -> bool:
+        """إضافة رسالة إلى الطابور الصادر من أي خيط"""
+        if not self.is_connected:
+            self.logger.warning("لا يوجد اتصال - لا يمكن إرسال البيانات")
+            return False
+        
+        self.link_loop.call_soon(self._enqueue, self._frame_message(message), kind)
+        return True
+    
+    def send_bulk(self, data: bytes, channel: int = CHANNEL_BULK) -> bool:
+        """إرسال نقل كبير (سجل، لقطة) على قناة 2-255 من السعة المتبقية بعد التحكم والتيليمتري"""
+        chunk_size = self._bulk_chunk_size()
+        if chunk_size is None or not is_bulk_channel(channel):
+            self.logger.warning("النقل الكبير غير مدعوم على هذه الوصلة أو القناة")
+            return False
+        if not self.is_connected:
+            self.logger.warning("لا يوجد اتصال - لا يمكن إرسال البيانات")
+            return False
+        # قراءة تقريبية من خارج الحلقة؛ _enqueue_bulk يعيد التحقق
+        if len(data) > self.outbox.bulk_space():
+            self.logger.warning(f"طابور النقل الكبير ممتلئ - رُفض نقل {len(data)} بايت")
+            return False
+        
+        self._bulk_transfer_id += 1
+        frames = [self._frame_message(chunk, channel)
+                  for chunk in iter_bulk_chunks(data, self._bulk_transfer_id, chunk_size)]
+        self.link_loop.call_soon(self._enqueue_bulk, frames)
+        return True
+    
+    def send_motor_commands(self, motors: Dict[str, int]) -> bool:
+        """إرسال أوامر المحركات"""
+        if self.binary_protocol:
+            return self.send_bytes(self.binary_codec.encode_motor_command(motors), KIND_MOTOR)
+        
+        return self.send_data({
+            "type": "motor_command",
+            "motors": motors,
+            "timestamp": time.time()
+        }, KIND_MOTOR)
+    
+    def request_telemetry(self) -> bool:
+        """طلب بيانات التيليمتري"""
+        if self.binary_protocol:
+            return self.send_bytes(self.binary_codec.encode_telemetry_request())
+        
+        return self.send_data({"type": "telemetry_request", "timestamp": time.time()})
+    
+    def request_keyframe(self) -> bool:
+        """طلب إطار تيليمتري كامل (بعد فقد إطار تفاضلي)"""
+        if self.binary_protocol:
+            return self.send_bytes(self.binary_codec.encode_keyframe_request())
+        
+        return self.send_data({"type": "keyframe_request", "timestamp": time.time()})
+    
+    def emergency_stop(self) -> bool:
+        """إيقاف طارئ"""
+        self.logger.warning("تم تنفيذ إيقاف طارئ!")
+        if self.binary_protocol:
+            return self.send_bytes(self.binary_codec.encode_emergency_stop(), KIND_EMERGENCY)
+        
+        return self.send_data({"type": "emergency_stop", "timestamp": time.time()}, KIND_EMERGENCY)
+    
+    def ping(self, seq: Optional[int] = None) -> bool:
+        """اختبار الاتصال (seq اختياري لمطابقة الرد وقياس RTT)"""
+        ping_data = {"type": "ping", "timestamp": time.time()}
+        if seq is not None:
+            ping_data["seq"] = seq
+        return self.send_data(ping_data)
+    
+    def set_data_handler(self, handler: Callable):
+        """تعيين معالج البيانات الواردة"""
+        self.data_handler = handler
+    
+    def set_batch_handler(self, handler: Callable[[List[Any]], None]):
+        """تعيين معالج دفعات البيانات الواردة"""
+        self.batch_handler = handler
+    
+    def set_bulk_handler(self, handler: Callable[[int, bytes], None]):
+        """تعيين معالج النقل الكبير المكتمل: handler(channel, data)"""
+        self.bulk_reassembler.handler = handler
+    
+    def get_write_stats(self) -> Dict[str, float]:
+        """الحصول على إحصائيات الطابور الصادر"""
+        return self.outbox.get_stats()
+    
+    # ---- داخلي (خيط الحلقة فقط) ----
+    
+    def _enqueue(self, data: bytes, kind: str):
+        """إضافة رسالة للطابور وإيقاظ مهمة الكتابة"""
+        if not self.is_connected or self._outbox_event is None:
+            return
+        self.outbox.push(data, kind)
+        self._outbox_event.set()
+    
+    def _enqueue_bulk(self, frames: List[bytes]):
+        """إضافة أجزاء نقل كبير كاملة أو رفضها كلها"""
+        if not self.is_connected or self._outbox_event is None:
+            return
+        if sum(len(frame) for frame in frames) > self.outbox.bulk_space():
+            self.logger.warning("طابور النقل الكبير ممتلئ - تم تجاهل نقل")
+            return
+        for frame in frames:
+            self.outbox.push(frame, KIND_BULK)
+        self._outbox_event.set()
+        
+    async def _write_loop(self):
+        """مهمة الكتابة: تفريغ الطابور حسب الأولوية"""
+        while self.is_connected:
+            await self._outbox_event.wait()
+            self._outbox_event.clear()
+            
+            entry = self.outbox.pop()
+            while entry is not None:
+                data, queued_at = entry
+                write_start = time.perf_counter()
+                try:
+                    await self._write(data)
+                    self.outbox.record_write(len(data), queued_at, write_start, time.perf_counter())
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    self.outbox.stats['write_errors'] += 1
+                    self.logger.error(f"خطأ في الكتابة: {e}")
+                entry = self.outbox.pop()
+    
+    def _dispatch(self, batch: List[Any]):
+        """تمرير الرسائل المفكوكة للمعالجات"""
+        if not batch:
+            return
+        if self.batch_handler:
+            self.batch_handler(batch)
+        elif self.data_handler:
+            for item in batch:
+                self.data_handler(item)
+    
+    def _decode_message(self, message: bytes) -> Any:
+        """فك ترميز رسالة كاملة (ثنائية أو JSON أو نص)"""
+        if self.binary_codec.is_binary(message):
+            return self.binary_codec.decode(message)
+        
+        data_str = message.decode('utf-8', errors='replace')
+        try:
+            return json.loads(data_str)
+        except json.JSONDecodeError:
+            return data_str
+    
+    def _link_lost(self, reason: str):
+        """معالجة انقطاع الوصلة من جهة المركبة"""
+        if self.is_connected:
+            self.logger.error(f"انقطع الاتصال: {reason}")
+        self.is_connected = False
+        if self._outbox_event is not None:
+            self._outbox_event.set()
+    
+    # ---- تنفذها الفئات الفرعية ----
+    
+    def _frame_message(self, message: bytes, channel: int = CHANNEL_CONTROL) -> bytes:
+        return message
+    
+    def _bulk_chunk_size(self) -> Optional[int]:
+        """حجم جزء النقل الكبير (None إذا لم تدعمه الوصلة)"""
+        return None
+        
+    async def _open(self):
+        raise NotImplementedError
+    
+    async def _close(self):
+        raise NotImplementedError
+    
+    def _read_loop(self):
+        """إرجاع coroutine القراءة أو None إذا كانت القراءة عبر callbacks"""
+        return None
+    
+    async def _write(self, data: bytes):
+        raise NotImplementedError
+
+class AsyncTCPTransport(AsyncTransport):
+    """اتصال TCP عبر asyncio streams"""
+    
+    def __init__(self, host: str = "192.168.1.100", port: int = 8080, binary_protocol: bool = False,
+                 link_loop: Optional[AsyncLinkLoop] = None):
+        super().__init__('AsyncTCP', binary_protocol, link_loop)
+        self.host = host
+        self.port = port
+        self.protocol = "TCP"
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+    
+    async def _open(self):
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        self.logger.info(f"تم الاتصال TCP بنجاح إلى {self.host}:{self.port}")
+    
+    async def _close(self):
+        if self._writer:
+            self._writer.close()
+            try:
+                await self._writer.wait_closed()
+            except Exception:
+                pass
+            self._writer = None
+            self.logger.info("تم قطع الاتصال الشبكي")
+    
+    def _frame_message(self, message: bytes, channel: int = CHANNEL_CONTROL) -> bytes:
+        # طول الرسالة (4 بايت، القناة في البايت العلوي) ثم الرسالة - نفس صيغة NetworkCommunication
+        return pack_length(len(message), channel).to_bytes(4, byteorder='big') + message
+    
+    def _bulk_chunk_size(self) -> Optional[int]:
+        return NETWORK_CHUNK_SIZE
+    
+    async def _read(self):
+        try:
+            while self.is_connected:
+                header = await self._reader.readexactly(4)
+                channel, length = split_length(int.from_bytes(header, byteorder='big'))
+                message = await self._reader.readexactly(length)
+                if self.capture is not None:
+                    self.capture.record(DIRECTION_IN, header + message)
+                if is_bulk_channel(channel):
+                    self.bulk_reassembler.feed(channel, message)
+                else:
+                    self._dispatch([self._decode_message(message)])
+        except asyncio.IncompleteReadError:
+            self._link_lost("أغلق الطرف الآخر الاتصال")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._link_lost(str(e))
+    
+    def _read_loop(self):
+        return self._read()
+    
+    async def _write(self, data: bytes):
+        if self.capture is not None:
+            self.capture.record(DIRECTION_OUT, data)
+        self._writer.write(data)
+        await self._writer.drain()
+
+class _DatagramReceiver(asyncio.DatagramProtocol):
+    """بروتوكول استقبال UDP يمرر كل رسالة للوصلة"""
+    
+    def __init__(self, link: 'AsyncUDPTransport', handler: Callable[[bytes], None]):
+        self.link = link
+        self.handler = handler
+    
+    def datagram_received(self, data: bytes, addr):
+        self.handler(data)
+    
+    def error_received(self, exc: Exception):
+        self.link.logger.error(f"خطأ في UDP: {exc}")
+
+class AsyncUDPTransport(AsyncTransport):
+    """اتصال UDP عبر datagram endpoints (بدون خيط خادم أو مهلة استطلاع)"""
+    
+    def __init__(self, host: str = "192.168.1.100", port: int = 8080, binary_protocol: bool = False,
+                 link_loop: Optional[AsyncLinkLoop] = None, fec_mode: str = FEC_OFF, fec_group_size: int = 8,
+                 fec_max_parity: int = 4, fec_max_delay: float = 0.04, multicast_group: Optional[str] = None,
+                 multicast_interface: str = '0.0.0.0'):
+        super().__init__('AsyncUDP', binary_protocol, link_loop)
+        self.host = host
+        self.port = port
+        self.protocol = "UDP"
+        # التيليمتري من مجموعة multicast والردود المباشرة على مقبس الإرسال (نفس NetworkCommunication)
+        self.multicast_group = multicast_group or None
+        self.multicast_interface = multicast_interface
+        self._reply_fec_decoder: Optional[FecDecoder] = None
+        self._send_transport: Optional[asyncio.DatagramTransport] = None
+        self._listen_transport: Optional[asyncio.DatagramTransport] = None
+        
+        # تصحيح الأخطاء الأمامي (نفس صيغة NetworkCommunication)؛ المؤقت على الحلقة نفسها
+        self.fec_mode = fec_mode
+        self.fec_options = {'group_size': fec_group_size, 'max_parity': fec_max_parity, 'max_delay': fec_max_delay}
+        self.fec_encoder: Optional[FecEncoder] = None
+        self.fec_decoder: Optional[FecDecoder] = None
+        self._fec_timer: Optional[asyncio.TimerHandle] = None
+    
+    async def _open(self):
+        loop = asyncio.get_running_loop()
+        if self.fec_mode != FEC_OFF:
+            self.fec_encoder = FecEncoder(self.fec_mode, **self.fec_options)
+            self.fec_decoder = FecDecoder()
+            self._reply_fec_decoder = FecDecoder()
+        
+        if self.multicast_group:
+            self._send_transport, _ = await loop.create_datagram_endpoint(
+                lambda: _DatagramReceiver(self, self._on_reply), remote_addr=(self.host, self.port)
+            )
+            self._listen_transport, _ = await loop.create_datagram_endpoint(
+                lambda: _DatagramReceiver(self, self._on_datagram),
+                sock=open_multicast_listener(self.multicast_group, self.port + 1, self.multicast_interface)
+            )
+            self.logger.info(f"تم إعداد اتصال UDP إلى {self.host}:{self.port} "
+                             f"والانضمام لمجموعة {self.multicast_group}:{self.port + 1}")
+            return
+        
+        self._send_transport, _ = await loop.create_datagram_endpoint(
+            asyncio.DatagramProtocol, remote_addr=(self.host, self.port)
+        )
+        # الاستماع على المنفذ التالي - نفس سلوك NetworkCommunication
+        self._listen_transport, _ = await loop.create_datagram_endpoint(
+            lambda: _DatagramReceiver(self, self._on_datagram), local_addr=('0.0.0.0', self.port + 1)
+        )
+        self.logger.info(f"تم إعداد اتصال UDP إلى {self.host}:{self.port} والاستماع على {self.port + 1}")
+    
+    async def _close(self):
+        if self._fec_timer is not None:
+            self._fec_timer.cancel()
+            self._fec_timer = None
+        for transport in (self._send_transport, self._listen_transport):
+            if transport:
+                transport.close()
+        self._send_transport = self._listen_transport = None
+        self.logger.info("تم قطع الاتصال الشبكي")
+    
+    def _on_datagram(self, data: bytes):
+        if self.capture is not None:
+            self.capture.record(DIRECTION_IN, data)
+        if self.fec_decoder is None:
+            self._dispatch([self._decode_message(data)])
+            return
+        self._dispatch([self._decode_message(message) for message in self.fec_decoder.feed(data)])
+        self.fec_encoder.set_loss_rate(self.fec_decoder.loss_rate)
+    
+    def _on_reply(self, data: bytes):
+        """رد مباشر على مقبس الإرسال في وضع multicast (مجرى FEC منفصل عن المجموعة)"""
+        if self.capture is not None:
+            self.capture.record(DIRECTION_IN, data, STREAM_REPLY)
+        if self._reply_fec_decoder is None:
+            self._dispatch([self._decode_message(data)])
+            return
+        self._dispatch([self._decode_message(message) for message in self._reply_fec_decoder.feed(data)])
+    
+    async def _write(self, data: bytes):
+        if self.fec_encoder is None:
+            self._send_datagram(data)
+            return
+        for datagram in self.fec_encoder.encode(data):
+            self._send_datagram(datagram)
+        deadline = self.fec_encoder.next_deadline()
+        if deadline is not None and self._fec_timer is None:
+            self._fec_timer = asyncio.get_running_loop().call_later(deadline, self._on_fec_timer)
+    
+    def _on_fec_timer(self):
+        """إرسال تكافؤ المجموعة الناقصة بعد max_delay"""
+        self._fec_timer = None
+        if not self.is_connected or self._send_transport is None:
+            return
+        for datagram in self.fec_encoder.flush():
+            self._send_datagram(datagram)
+        deadline = self.fec_encoder.next_deadline()
+        if deadline is not None:
+            self._fec_timer = asyncio.get_running_loop().call_later(deadline, self._on_fec_timer)
+    
+    def _send_datagram(self, datagram: bytes):
+        if self.capture is not None:
+            self.capture.record(DIRECTION_OUT, datagram)
+        self._send_transport.sendto(datagram)
+    
+    def get_fec_stats(self) -> Dict[str, Any]:
+        """إحصائيات التكافؤ المُرسل والاستعادة عند الاستقبال"""
+        if self.fec_encoder is None:
+            return {}
+        return {'mode': self.fec_mode, 'encoder': self.fec_encoder.get_stats(),
+                'decoder': self.fec_decoder.get_stats()}
+
+class AsyncSerialTransport(AsyncTransport):
+    """اتصال تسلسلي غير معطّل على حلقة asyncio
+    
+    على الأنظمة التي توفر واصف ملف للمنفذ (Linux/macOS) تُستخدم add_reader
+    فلا توجد أي إيقاظات دون بيانات؛ على Windows تُستخدم مهمة استطلاع خفيفة.
+    """
+    
+    def __init__(self, port: str = "COM3", baud_rate: int = 9600, binary_protocol: bool = False,
+                 link_loop: Optional[AsyncLinkLoop] = None, bulk_chunk_ms: float = 10.0):
+        super().__init__('AsyncSerial', binary_protocol, link_loop)
+        self.port = port
+        self.baud_rate = baud_rate
+        self.serial_connection = None
+        self.packet_handler = PacketHandler()
+        self.bulk_reassembler = self.packet_handler.bulk_reassembler
+        self.bulk_chunk_ms = bulk_chunk_ms
+        self.poll_interval = 0.005
+        self.max_line_length = 64 * 1024
+        self._fileno: Optional[int] = None
+        self._line_buffer = bytearray()
+        
+        # ACK وإعادة الإرسال عبر نفس الطابور الصادر، والمؤقت على الحلقة نفسها
+        self._retransmit_timer: Optional[asyncio.TimerHandle] = None
+        self.packet_handler.set_packet_sender(self._send_reliable_packet, self._schedule_retransmit)
+    
+    async def _open(self):
+        import serial
+        
+        self.serial_connection = serial.Serial(
+            port=self.port,
+            baudrate=self.baud_rate,
+            timeout=0,
+            write_timeout=0,
+            parity=serial.PARITY_NONE,
+            stopbits=serial.STOPBITS_ONE,
+            bytesize=serial.EIGHTBITS
+        )
+        
+        try:
+            self._fileno = self.serial_connection.fileno()
+            asyncio.get_running_loop().add_reader(self._fileno, self._on_readable)
+        except Exception:
+            self._fileno = None  # لا يوجد واصف ملف (Windows) - الاستطلاع
+        
+        self.logger.info(f"تم الاتصال بنجاح عبر {self.port} بسرعة {self.baud_rate}")
+    
+    async def _close(self):
+        if self._retransmit_timer is not None:
+            self._retransmit_timer.cancel()
+            self._retransmit_timer = None
+        if self._fileno is not None:
+            asyncio.get_running_loop().remove_reader(self._fileno)
+            self._fileno = None
+        if self.serial_connection and self.serial_connection.is_open:
+            self.serial_connection.close()
+            self.logger.info("تم قطع الاتصال التسلسلي")
+    
+    def _frame_message(self, message: bytes, channel: int = CHANNEL_CONTROL) -> bytes:
+        if self.binary_protocol:
+            return self.packet_handler.frame_payload(message, channel)
+        return message + b'\n'
+    
+    def _bulk_chunk_size(self) -> Optional[int]:
+        # النصوص بدون إطارات لا تحمل قنوات
+        if not self.binary_protocol:
+            return None
+        return chunk_size_for_baud(self.baud_rate, self.bulk_chunk_ms) - FRAME_OVERHEAD
+    
+    def send_motor_commands(self, motors: Dict[str, int]) -> bool:
+        """إرسال أوامر المحركات"""
+        if self.binary_protocol:
+            return super().send_motor_commands(motors)
+        
+        # نفس صيغة الأمر النصي في SerialCommunication
+        command = "MOTOR" + "".join(
+            f",{motors.get(motor, 1500)}"
+            for motor in ('front_left', 'front_right', 'back_left', 'back_right', 'vertical_1', 'vertical_2')
+        )
+        return self.send_bytes(command.encode('utf-8'), KIND_MOTOR)
+    
+    def request_telemetry(self) -> bool:
+        """طلب بيانات التيليمتري"""
+        if self.binary_protocol:
+            return super().request_telemetry()
+        return self.send_bytes(b"GET_TELEMETRY")
+    
+    def request_keyframe(self) -> bool:
+        """طلب إطار تيليمتري كامل"""
+        if self.binary_protocol:
+            return super().request_keyframe()
+        return self.send_bytes(b"GET_KEYFRAME")
+    
+    def emergency_stop(self) -> bool:
+        """إيقاف طارئ"""
+        self.logger.warning("تم تنفيذ إيقاف طارئ!")
+        if self.binary_protocol:
+            # نفس حزمة SerialCommunication الموثوقة: تُعاد حتى يصل ACK
+            if not self.is_connected:
+                self.logger.warning("لا يوجد اتصال - لا يمكن إرسال البيانات")
+                return False
+            return self._send_reliable_packet(self.packet_handler.create_emergency_stop_packet(), 'EMERGENCY_STOP')
+        return self.send_bytes(b"EMERGENCY_STOP", KIND_EMERGENCY)
+    
+    def ping(self, seq: Optional[int] = None) -> bool:
+        """اختبار الاتصال"""
+        if self.binary_protocol:
+            return super().ping(seq)
+        return self.send_bytes(b"PING" if seq is None else f"PING,{seq}".encode('utf-8'))
+    
+    def _send_reliable_packet(self, packet: bytes, command: str) -> bool:
+        """إرسال حزمة ACK أو إعادة إرسال حزمة مؤطرة مسبقاً"""
+        if not self.is_connected:
+            return False
+        kind = KIND_EMERGENCY if command == 'EMERGENCY_STOP' else KIND_NORMAL
+        self.link_loop.call_soon(self._enqueue, packet, kind)
+        return True
+    
+    def _schedule_retransmit(self, delay: float):
+        """تقديم موعد فحص إعادة الإرسال (من أي خيط)"""
+        self.link_loop.call_soon(self._arm_retransmit, delay)
+    
+    def _arm_retransmit(self, delay: float):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + delay
+        if self._retransmit_timer is not None:
+            if self._retransmit_timer.when() <= deadline:
+                return
+            self._retransmit_timer.cancel()
+        self._retransmit_timer = loop.call_at(deadline, self._on_retransmit_timer)
+    
+    def _on_retransmit_timer(self):
+        self._retransmit_timer = None
+        if not self.is_connected:
+            return
+        delay = self.packet_handler.check_pending_acks()
+        if delay is not None:
+            self._arm_retransmit(delay)
+    
+    def _on_readable(self):
+        """قراءة كل البيانات المتوفرة عند جاهزية المنفذ"""
+        try:
+            waiting = self.serial_connection.in_waiting
+            data = self.serial_connection.read(waiting or 1)
+            if data:
+                self._handle_chunk(data)
+        except Exception as e:
+            asyncio.get_running_loop().remove_reader(self._fileno)
+            self._fileno = None
+            self._link_lost(str(e))
+    
+    async def _poll(self):
+        """استطلاع المنفذ عند عدم توفر واصف ملف"""
+        try:
+            while self.is_connected:
+                waiting = self.serial_connection.in_waiting
+                if waiting:
+                    self._handle_chunk(self.serial_connection.read(waiting))
+                else:
+                    await asyncio.sleep(self.poll_interval)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._link_lost(str(e))
+    
+    def _read_loop(self):
+        if self._fileno is None:
+            return self._poll()
+        return None
+    
+    def _handle_chunk(self, data: bytes):
+        """تقسيم البيانات الواردة إلى رسائل وتمريرها دفعة واحدة"""
+        if self.capture is not None:
+            self.capture.record(DIRECTION_IN, data)
+        if self.binary_protocol:
+            self._dispatch(self.packet_handler.feed_data(data))
+            return
+        
+        buffer = self._line_buffer
+        buffer += data
+        end = buffer.rfind(b'\n')
+        if end < 0:
+            if len(buffer) > self.max_line_length:
+                self.logger.warning("سطر طويل جداً بدون نهاية - تم تجاهله")
+                buffer.clear()
+            return
+        
+        text = buffer[:end].decode('utf-8', errors='replace')
+        del buffer[:end + 1]
+        self._dispatch([line for line in (part.strip() for part in text.split('\n')) if line])
+    
+    async def _write(self, data: bytes):
+        if self.capture is not None:
+            self.capture.record(DIRECTION_OUT, data)
+        view = memoryview(data)
+        while len(view):
+            written = self.serial_connection.write(view) or 0
+            view = view[written:]
+            if len(view):
+                await self._wait_writable()
+    
+    async def _wait_writable(self):
+        """انتظار جاهزية المنفذ للكتابة"""
+        if self._fileno is None:
+            await asyncio.sleep(self.poll_interval)
+            return
+        
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        loop.add_writer(self._fileno, lambda: ready.done() or ready.set_result(None))
+        try:
+            await ready
+        finally:
+            loop.remove_writer(self._fileno)
+
+def create_async_transport(kind: str, **kwargs) -> AsyncTransport:
+    """إنشاء وسيلة اتصال غير متزامنة حسب النوع: serial / tcp / udp"""
+    kind = kind.lower()
+    if kind == 'serial':
+        return AsyncSerialTransport(**kwargs)
+    if kind == 'tcp':
+        return AsyncTCPTransport(**kwargs)
+    if kind == 'udp':
+        return AsyncUDPTransport(**kwargs)
+    raise ValueError(f"نوع اتصال غير مدعوم: {kind}")
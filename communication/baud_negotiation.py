@@ -0,0 +1,469 @@
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+import yaml
+
+from utils.logger import ROVLogger
+from .link_health import parse_pong
+from .packet_handler import PacketHandler
+
+# رسائل التفاوض (المحطة تطلب والمركبة ترد بنفس السرعة الحالية قبل التبديل):
+#   نصي:  BAUD,<rate> -> BAUD_OK,<rate> | BAUD_NAK,<rate>
+#         BAUD_TEST,<count>,<size> -> count × BT,<seq>,<data>,<crc32>
+#         BAUD_CONFIRM,<rate> -> BAUD_CONFIRMED,<rate>
+#   JSON: {'type': 'baud', 'action': 'set' | 'test' | 'confirm', 'rate': r, 'count': n, 'size': s}
+#         -> {'type': 'baud', 'action': ..., 'ok': bool, 'rate': r}
+#         -> {'type': 'baud_test', 'seq': n, 'data': ..., 'crc': c}
+BAUD_MESSAGE = 'baud'
+BAUD_TEST_MESSAGE = 'baud_test'
+ACTION_SET = 'set'
+ACTION_TEST = 'test'
+ACTION_CONFIRM = 'confirm'
+
+# السرعات القياسية التي تقبلها المركبة
+STANDARD_BAUD_RATES = (9600, 19200, 38400, 57600, 115200, 230400, 460800, 921600)
+
+# المركبة تعود لسرعتها السابقة إذا لم يصل التأكيد خلال CONFIRM_TIMEOUT ثانية من التبديل،
+# ولسرعتها الآمنة إذا لم تصل رسالة سليمة خلال IDLE_REVERT ثانية بسرعة أعلى
+CONFIRM_TIMEOUT = 2.0
+IDLE_REVERT = 3.0
+
+# رقم تسلسل ping المصافحة (خارج نطاق LinkMonitor و test_connection وفحص المنافذ)
+HANDSHAKE_PING_SEQ = 0x7FFE
+
+def make_test_frame(size: int) -> Tuple[str, int]:
+    """بيانات إطار اختبار عشوائية (ست عشرية) و CRC32 لها"""
+    data = os.urandom((size + 1) // 2).hex()[:size]
+    return data, zlib.crc32(data.encode('ascii'))
+
+def parse_test_frame(message: Any) -> Optional[int]:
+    """رقم إطار الاختبار إذا كان سليماً، و -1 لإطار اختبار تالف، و None لغير ذلك"""
+    if isinstance(message, dict):
+        if message.get('type') != BAUD_TEST_MESSAGE:
+            return None
+        seq, data, crc = message.get('seq'), message.get('data'), message.get('crc')
+    elif isinstance(message, str) and message.startswith('BT,'):
+        parts = message.split(',')
+        if len(parts) != 4:
+            return -1
+        seq, data, crc = parts[1], parts[2], parts[3]
+        try:
+            seq, crc = int(seq), int(crc, 16)
+        except ValueError:
+            return -1
+    else:
+        return None
+    
+    if not isinstance(data, str) or not isinstance(seq, int):
+        return -1
+    try:
+        return seq if zlib.crc32(data.encode('ascii')) == crc else -1
+    except UnicodeEncodeError:
+        return -1
+
+def format_test_frame(seq: int, size: int, binary: bool) -> bytes:
+    """إطار اختبار بصيغة الوصلة (قبل التأطير)"""
+    data, crc = make_test_frame(size)
+    if binary:
+        return json.dumps({'type': BAUD_TEST_MESSAGE, 'seq': seq, 'data': data, 'crc': crc},
+                          separators=(',', ':')).encode('utf-8')
+    return f"BT,{seq},{data},{crc:08x}".encode('ascii')
+
+def parse_baud_reply(message: Any) -> Optional[Tuple[str, bool, int]]:
+    """رد تفاوض (action, ok, rate) أو None"""
+    if isinstance(message, dict):
+        if message.get('type') != BAUD_MESSAGE:
+            return None
+        try:
+            return str(message.get('action')), bool(message.get('ok')), int(message.get('rate', 0))
+        except (TypeError, ValueError):
+            return None
+    if not isinstance(message, str) or not message.startswith('BAUD_'):
+        return None
+    tag, _, rate = message.partition(',')
+    try:
+        rate = int(rate)
+    except ValueError:
+        return None
+    if tag == 'BAUD_OK':
+        return ACTION_SET, True, rate
+    if tag == 'BAUD_NAK':
+        return ACTION_SET, False, rate
+    if tag == 'BAUD_CONFIRMED':
+        return ACTION_CONFIRM, True, rate
+    return None
+
+class BaudRateSwitch:
+    """سرعة المنفذ من جهة المركبة: تبديل مؤقت حتى التأكيد ثم العودة عند الصمت
+    
+    المركبة تبدّل بعد إرسال الموافقة بالسرعة القديمة. إذا لم يصل BAUD_CONFIRM خلال
+    CONFIRM_TIMEOUT تعود للسرعة السابقة (المحطة فشل اختبارها أو لم تسمع الموافقة)،
+    وإذا مرت IDLE_REVERT ثانية دون رسالة سليمة بسرعة أعلى من الآمنة تعود للآمنة
+    فتجدها المحطة عند إعادة الاتصال.
+    """
+    
+    def __init__(self, safe_baud: Optional[int], rates: Iterable[int] = STANDARD_BAUD_RATES,
+                 confirm_timeout: float = CONFIRM_TIMEOUT, idle_revert: float = IDLE_REVERT,
+                 clock: Callable[[], float] = time.monotonic):
+        self.safe_baud = safe_baud
+        self.rates = set(rates)
+        self.confirm_timeout = confirm_timeout
+        self.idle_revert = idle_revert
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.baud = safe_baud
+        self.previous: Optional[int] = None
+        self._confirm_deadline: Optional[float] = None
+        self._last_valid = clock()
+        
+        self.stats = {
+            'switches': 0,
+            'confirmed': 0,
+            'reverted': 0,
+            'idle_reverts': 0
+        }
+    
+    def request(self, rate: int) -> bool:
+        """قبول طلب تبديل (التبديل الفعلي عبر switch بعد إرسال الموافقة)"""
+        return rate in self.rates
+    
+    def switch(self, rate: int, previous: Optional[int]):
+        """التبديل إلى السرعة الجديدة بانتظار التأكيد"""
+        with self._lock:
+            self.previous = previous
+            self.baud = rate
+            self._confirm_deadline = self.clock() + self.confirm_timeout
+            self._last_valid = self.clock()
+            self.stats['switches'] += 1
+    
+    def confirm(self, rate: int) -> bool:
+        """تثبيت السرعة الحالية"""
+        with self._lock:
+            if rate != self.baud:
+                return False
+            if self._confirm_deadline is not None:
+                self._confirm_deadline = None
+                self.stats['confirmed'] += 1
+            return True
+    
+    def note_valid(self):
+        """وصول رسالة سليمة (تؤجل العودة للسرعة الآمنة)"""
+        self._last_valid = self.clock()
+    
+    def poll(self) -> bool:
+        """فحص مهلة التأكيد والصمت؛ True إذا تغيرت السرعة"""
+        now = self.clock()
+        with self._lock:
+            if self._confirm_deadline is not None and now >= self._confirm_deadline:
+                self._confirm_deadline = None
+                self.baud = self.previous
+                self.stats['reverted'] += 1
+                return True
+            if self.baud != self.safe_baud and now - self._last_valid >= self.idle_revert:
+                self._confirm_deadline = None
+                self.baud = self.safe_baud
+                self.stats['idle_reverts'] += 1
+                return True
+        return False
+    
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats.update(baud=self.baud, safe_baud=self.safe_baud)
+        return stats
+
+class BaudRateCache:
+    """آخر سرعة متفاوض عليها لكل منفذ وأول سرعة فشلت فوقها (ملف YAML)"""
+    
+    def __init__(self, cache_file: Optional[str] = 'baud_cache.yaml'):
+        self.logger = ROVLogger('BaudCache')
+        self.cache_file = cache_file
+        self._lock = threading.Lock()
+        self.cache: Dict[str, Dict[str, Any]] = self._load()
+    
+    def get(self, device: str) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.cache.get(device) or {})
+    
+    def update(self, device: str, **fields):
+        with self._lock:
+            entry = self.cache.setdefault(device, {})
+            entry.update(fields)
+            entry['last_seen'] = time.strftime('%Y-%m-%d %H:%M:%S')
+            self._save()
+    
+    def forget(self, device: Optional[str] = None):
+        """حذف سرعة منفذ (أو كل المنافذ) فيُعاد التفاوض من البداية"""
+        with self._lock:
+            if device is None:
+                self.cache.clear()
+            else:
+                self.cache.pop(device, None)
+            self._save()
+    
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as file:
+                cache = yaml.safe_load(file) or {}
+            return cache if isinstance(cache, dict) else {}
+        except Exception as e:
+            self.logger.warning(f"تعذر قراءة ملف السرعات المحفوظة: {e}")
+            return {}
+    
+    def _save(self):
+        if not self.cache_file:
+            return
+        try:
+            with open(self.cache_file, 'w', encoding='utf-8') as file:
+                yaml.dump(self.cache, file, default_flow_style=False, allow_unicode=True)
+        except Exception as e:
+            self.logger.warning(f"تعذر حفظ السرعات المحفوظة: {e}")
+
+class BaudNegotiator:
+    """رفع سرعة المنفذ التسلسلي بعد الاتصال بالسرعة الآمنة
+    
+    يعمل على المنفذ مباشرة قبل بدء خيطي القراءة والكتابة. كل خطوة: طلب السرعة
+    بالسرعة الحالية، ثم التبديل ودفعة اختبار بـ CRC32 لكل إطار؛ الإطارات التالفة
+    والمفقودة تُحسب أخطاء، وإذا تجاوزت max_error_rate تعود المحطة للسرعة السابقة
+    وتنتظر عودة المركبة (لا تأكيد). السرعة المحفوظة للمنفذ تُجرَّب أولاً ثم الصعود
+    خطوة خطوة حتى أول فشل، وأول سرعة فشلت تُحفظ سقفاً للمرات التالية.
+    
+    أثناء التشغيل (الصيغة الثنائية فقط لأن الأسطر النصية بلا checksum) يراقب
+    error_rate_exceeded أخطاء checksum في المفكك؛ تجاوز fallback_error_rate ينزل
+    بالسرعة المحفوظة خطوة ويقطع الوصلة، فتُعيد إعادة الاتصال التفاوض من الآمنة.
+    """
+    
+    def __init__(self, rates: Iterable[int], binary_protocol: bool = False,
+                 cache: Optional[BaudRateCache] = None, test_frames: int = 64, test_size: int = 48,
+                 test_airtime: float = 0.5, max_error_rate: float = 0.01, fallback_error_rate: float = 0.05,
+                 fallback_window: int = 200, reply_timeout: float = 0.5, settle_time: float = 0.1,
+                 revert_timeout: float = CONFIRM_TIMEOUT, handshake_timeout: float = IDLE_REVERT + 1.0):
+        self.logger = ROVLogger('BaudNegotiator')
+        self.rates = sorted(set(int(rate) for rate in rates))
+        self.binary_protocol = binary_protocol
+        self.cache = cache or BaudRateCache(None)
+        self.test_frames = test_frames
+        self.test_size = test_size
+        self.test_airtime = test_airtime
+        self.max_error_rate = max_error_rate
+        self.fallback_error_rate = fallback_error_rate
+        self.fallback_window = fallback_window
+        self.reply_timeout = reply_timeout
+        self.settle_time = settle_time
+        self.revert_timeout = revert_timeout
+        self.handshake_timeout = handshake_timeout
+        
+        self._packet_handler = PacketHandler()
+        self._line_buffer = bytearray()
+        self._window_frames = -1
+        self._window_errors = 0
+        self._vehicle_lost = False
+        
+        self.stats = {
+            'negotiations': 0,
+            'steps': 0,
+            'failed_steps': 0,
+            'fallbacks': 0,
+            'last_error_rate': 0.0,
+            'last_negotiation_ms': 0.0
+        }
+    
+    # ---- التفاوض ----
+    
+    def negotiate(self, connection: Any, device: str) -> int:
+        """التفاوض على أعلى سرعة سليمة وإرجاعها (السرعة الحالية للمنفذ إذا لم يمكن الرفع)"""
+        start = time.perf_counter()
+        self.stats['negotiations'] += 1
+        safe = connection.baudrate
+        timeout = connection.timeout
+        connection.timeout = 0.02
+        try:
+            current = self._negotiate(connection, device, safe)
+        except Exception as e:
+            self.logger.error(f"خطأ أثناء تفاوض السرعة: {e}")
+            current = connection.baudrate
+        finally:
+            connection.timeout = timeout
+            self._line_buffer.clear()
+            self._packet_handler.stream_decoder.reset()
+        
+        self.stats['last_negotiation_ms'] = (time.perf_counter() - start) * 1000.0
+        self.reset_error_window()
+        if current != safe:
+            self.logger.info(f"سرعة {device}: {current} (من {safe}) خلال {self.stats['last_negotiation_ms']:.0f} ms")
+        return current
+    
+    def _negotiate(self, connection: Any, device: str, safe: int) -> int:
+        self._vehicle_lost = False
+        if not self._handshake(connection, self.handshake_timeout):
+            self.logger.warning(f"المركبة لم ترد على ping بسرعة {safe} - بدون تفاوض")
+            return safe
+        
+        entry = self.cache.get(device)
+        ceiling = entry.get('failed_rate') or float('inf')
+        ladder = [rate for rate in self.rates if safe < rate < ceiling]
+        failed: Optional[int] = None
+        current = safe
+        
+        cached = entry.get('baud_rate')
+        if cached in ladder:
+            if self._try_rate(connection, current, cached):
+                current = cached
+                ladder = [rate for rate in ladder if rate > cached]
+            else:
+                failed = cached
+                ladder = [] if self._vehicle_lost else [rate for rate in ladder if rate < cached]
+        
+        for rate in ladder:
+            if self._try_rate(connection, current, rate):
+                current = rate
+            else:
+                failed = rate
+                break
+        
+        self.cache.update(device, baud_rate=current, safe_baud=safe,
+                          failed_rate=failed if failed is not None else entry.get('failed_rate'))
+        return current
+    
+    def _try_rate(self, connection: Any, current: int, rate: int) -> bool:
+        """خطوة واحدة: طلب، تبديل، دفعة اختبار، تأكيد (أو العودة للسرعة الحالية)"""
+        self.stats['steps'] += 1
+        reply = self._request(connection, {'action': ACTION_SET, 'rate': rate}, f"BAUD,{rate}", ACTION_SET)
+        if reply is None or not reply[1] or reply[2] != rate:
+            self.logger.info(f"المركبة لم تقبل السرعة {rate}")
+            self.stats['failed_steps'] += 1
+            return False
+        
+        self._set_baud(connection, rate)
+        error_rate = self._test_burst(connection, rate)
+        self.stats['last_error_rate'] = error_rate
+        if error_rate <= self.max_error_rate:
+            reply = self._request(connection, {'action': ACTION_CONFIRM, 'rate': rate},
+                                  f"BAUD_CONFIRM,{rate}", ACTION_CONFIRM)
+            if reply is not None and reply[1]:
+                self.logger.info(f"تم رفع السرعة إلى {rate} (معدل الأخطاء {error_rate:.1%})")
+                return True
+            self.logger.warning(f"لم يصل تأكيد السرعة {rate}")
+        else:
+            self.logger.warning(f"معدل أخطاء {error_rate:.1%} بسرعة {rate} - العودة إلى {current}")
+        
+        # بدون تأكيد تعود المركبة للسرعة السابقة خلال revert_timeout
+        self.stats['failed_steps'] += 1
+        self._set_baud(connection, current)
+        if not self._handshake(connection, self.revert_timeout + self.reply_timeout):
+            self.logger.warning(f"المركبة لم تعد إلى السرعة {current}")
+            self._vehicle_lost = True
+        return False
+    
+    def _test_burst(self, connection: Any, rate: int) -> float:
+        """طلب دفعة اختبار وإرجاع نسبة الإطارات التالفة أو المفقودة"""
+        frame_bytes = self.test_size + 40
+        count = max(16, min(self.test_frames, int(self.test_airtime * rate / 10.0 / frame_bytes)))
+        self._send(connection, {'action': ACTION_TEST, 'count': count, 'size': self.test_size},
+                   f"BAUD_TEST,{count},{self.test_size}")
+        
+        good = set()
+        deadline = time.monotonic() + self.reply_timeout + 2.0 * count * frame_bytes * 10.0 / rate
+        while time.monotonic() < deadline and len(good) < count:
+            for message in self._read(connection):
+                seq = parse_test_frame(message)
+                if seq is not None and 0 <= seq < count:
+                    good.add(seq)
+        return 1.0 - len(good) / count
+    
+    def _handshake(self, connection: Any, timeout: float) -> bool:
+        """ping متكرر بالسرعة الحالية حتى pong (المركبة قد تحتاج وقتاً للعودة لهذه السرعة)"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.binary_protocol:
+                self._write(connection, json.dumps({'type': 'ping', 'seq': HANDSHAKE_PING_SEQ},
+                                                   separators=(',', ':')).encode('utf-8'))
+            else:
+                self._write(connection, f"PING,{HANDSHAKE_PING_SEQ}".encode('utf-8'))
+            wait_until = min(deadline, time.monotonic() + self.reply_timeout)
+            while time.monotonic() < wait_until:
+                if any(parse_pong(message)[0] for message in self._read(connection)):
+                    return True
+        return False
+    
+    def _request(self, connection: Any, fields: Dict[str, Any], line: str,
+                 action: str) -> Optional[Tuple[str, bool, int]]:
+        """إرسال طلب وانتظار رده حتى reply_timeout"""
+        self._send(connection, fields, line)
+        deadline = time.monotonic() + self.reply_timeout
+        while time.monotonic() < deadline:
+            for message in self._read(connection):
+                reply = parse_baud_reply(message)
+                if reply is not None and reply[0] == action:
+                    return reply
+        return None
+    
+    def _send(self, connection: Any, fields: Dict[str, Any], line: str):
+        if self.binary_protocol:
+            self._write(connection, json.dumps(dict(fields, type=BAUD_MESSAGE), separators=(',', ':')).encode('utf-8'))
+        else:
+            self._write(connection, line.encode('utf-8'))
+    
+    def _write(self, connection: Any, payload: bytes):
+        connection.write(self._packet_handler.frame_payload(payload) if self.binary_protocol else payload + b'\n')
+    
+    def _set_baud(self, connection: Any, rate: int):
+        """انتظار خروج كل البايتات ثم تبديل السرعة وتجاهل ما وصل أثناء التبديل"""
+        connection.flush()
+        connection.baudrate = rate
+        time.sleep(self.settle_time)
+        connection.reset_input_buffer()
+        self._line_buffer.clear()
+        self._packet_handler.stream_decoder.reset()
+    
+    def _read(self, connection: Any) -> List[Any]:
+        """الرسائل المتوفرة (التيليمتري يستمر أثناء التفاوض ويُتجاهل)"""
+        data = connection.read(max(1, connection.in_waiting))
+        if not data:
+            return []
+        if self.binary_protocol:
+            return self._packet_handler.feed_data(data)
+        line_buffer = self._line_buffer
+        line_buffer += data
+        end = line_buffer.rfind(b'\n')
+        if end < 0:
+            return []
+        text = line_buffer[:end].decode('utf-8', errors='replace')
+        del line_buffer[:end + 1]
+        return [line.strip() for line in text.split('\n') if line.strip()]
+    
+    # ---- المراقبة أثناء التشغيل ----
+    
+    def reset_error_window(self):
+        self._window_frames = -1
+    
+    def error_rate_exceeded(self, decoder_stats: Dict[str, int]) -> bool:
+        """هل تجاوزت أخطاء checksum/التأطير fallback_error_rate خلال آخر fallback_window إطار"""
+        frames = decoder_stats['frames_decoded']
+        errors = decoder_stats['checksum_errors'] + decoder_stats['framing_errors']
+        if self._window_frames < 0:
+            self._window_frames, self._window_errors = frames, errors
+            return False
+        window = frames - self._window_frames
+        failed = errors - self._window_errors
+        if window + failed < self.fallback_window:
+            return False
+        self._window_frames, self._window_errors = frames, errors
+        return failed > self.fallback_error_rate * (window + failed)
+    
+    def demote(self, device: str, rate: int) -> Optional[int]:
+        """السرعة rate لم تعد سليمة: حفظ الخطوة الأدنى التالية وإرجاعها (None = الآمنة)"""
+        self.stats['fallbacks'] += 1
+        safe = self.cache.get(device).get('safe_baud') or 0
+        lower = [step for step in self.rates if safe < step < rate]
+        fallback = lower[-1] if lower else None
+        self.cache.update(device, baud_rate=fallback, failed_rate=rate)
+        return fallback
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.stats)
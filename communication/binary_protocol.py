@@ -0,0 +1,194 @@
+import struct
+import time
+from typing import Callable, Dict, Any, Optional, Union
+from .telemetry_codec import TelemetryDeltaEncoder, TelemetryDeltaDecoder
+
+# رقم إصدار البروتوكول الثنائي - أول بايت في كل رسالة
+# (لا يتعارض مع '{' التي تبدأ بها رسائل JSON)
+PROTOCOL_VERSION = 0x01
+
+# أنواع الرسائل
+MSG_HEARTBEAT = 0x01
+MSG_MOTOR_COMMAND = 0x02
+MSG_TELEMETRY = 0x03
+MSG_EMERGENCY_STOP = 0x04
+MSG_TELEMETRY_REQUEST = 0x05
+MSG_TELEMETRY_DELTA = 0x06
+MSG_KEYFRAME_REQUEST = 0x07
+MSG_TELEMETRY_SENSORS = 0x08  # MSG_TELEMETRY مع مجموعة sensors (يُقبل القديم من المركبات السابقة)
+
+# ترتيب المحركات في الرسائل الثنائية (نفس ترتيب أمر MOTOR النصي)
+MOTOR_ORDER = ('front_left', 'front_right', 'back_left', 'back_right', 'vertical_1', 'vertical_2')
+
+# حالات ROV المرمّزة كبايت واحد
+STATUS_CODES = {'disconnected': 0, 'connected': 1, 'armed': 2, 'emergency': 3}
+STATUS_NAMES = {code: name for name, code in STATUS_CODES.items()}
+
+# Header: VERSION(1) + TYPE(1) + SEQUENCE(2) + TIME_MS(4)
+# TIME_MS: ساعة المرسل بالميلي ثانية بعرض 32 بت (تلتف كل ~49.7 يوماً)؛ المركبة ترسل
+# نفس الساعة التي تختم بها ردود pong فتحولها المحطة لساعتها عبر ClockSync
+_HEADER = struct.Struct('<BBHI')
+# Header + 6 x PWM uint16
+_MOTOR = struct.Struct('<BBHI6H')
+# Header + position(3f) + orientation(3f) + velocity(3f) + battery(B) + status(B)
+_TELEMETRY = struct.Struct('<BBHI9fBB')
+# Header + position(3f) + orientation(3f) + velocity(3f) + depth/temperature/pressure(3f) + battery(B) + status(B)
+_TELEMETRY_SENSORS = struct.Struct('<BBHI12fBB')
+# Header + status(B)
+_HEARTBEAT = struct.Struct('<BBHIB')
+
+HEADER_SIZE = _HEADER.size
+
+class BinaryMessageCodec:
+    """ترميز وفك ترميز رسائل المسار السريع (المحركات، التيليمتري، النبض) بصيغة ثنائية ثابتة"""
+    
+    def __init__(self, keyframe_interval: int = 50, resolutions: Optional[Dict[str, float]] = None,
+                 clock: Optional[Callable[[], float]] = None):
+        self.sequence = 0
+        self._time_origin = time.monotonic()
+        # ساعة الختم بالثواني (المركبة: ساعة ردود pong)؛ بدونها الزمن منذ إنشاء المُرمِّز
+        self.clock = clock
+        
+        # التيليمتري التفاضلي: المُرمِّز لجهة المركبة والمفكك لجهة المحطة
+        self.telemetry_encoder = TelemetryDeltaEncoder(keyframe_interval, resolutions)
+        self.telemetry_decoder = TelemetryDeltaDecoder(resolutions)
+    
+    @staticmethod
+    def is_binary(payload: Union[bytes, bytearray, memoryview]) -> bool:
+        """التحقق مما إذا كانت الرسالة ثنائية (وليست JSON)"""
+        return len(payload) >= HEADER_SIZE and payload[0] == PROTOCOL_VERSION
+    
+    def _next_header(self):
+        """الحصول على رقم التسلسل والزمن بالميلي ثانية للرسالة التالية"""
+        self.sequence = (self.sequence + 1) & 0xFFFF
+        if self.clock is not None:
+            time_ms = int(self.clock() * 1000) & 0xFFFFFFFF
+        else:
+            time_ms = int((time.monotonic() - self._time_origin) * 1000) & 0xFFFFFFFF
+        return self.sequence, time_ms
+    
+    def encode_motor_command(self, motors: Dict[str, int]) -> bytes:
+        """ترميز أوامر المحركات (20 بايت)"""
+        seq, time_ms = self._next_header()
+        return _MOTOR.pack(
+            PROTOCOL_VERSION, MSG_MOTOR_COMMAND, seq, time_ms,
+            *(int(motors.get(motor, 1500)) for motor in MOTOR_ORDER)
+        )
+    
+    def encode_telemetry(self, state: Dict[str, Any]) -> bytes:
+        """ترميز حقول rov_state الأساسية مع الحساسات (58 بايت)"""
+        seq, time_ms = self._next_header()
+        position = state.get('position', {})
+        orientation = state.get('orientation', {})
+        velocity = state.get('velocity', {})
+        sensors = state.get('sensors', {})
+        battery = max(0, min(255, int(state.get('battery', 0))))
+        return _TELEMETRY_SENSORS.pack(
+            PROTOCOL_VERSION, MSG_TELEMETRY_SENSORS, seq, time_ms,
+            position.get('x', 0.0), position.get('y', 0.0), position.get('z', 0.0),
+            orientation.get('roll', 0.0), orientation.get('pitch', 0.0), orientation.get('yaw', 0.0),
+            velocity.get('x', 0.0), velocity.get('y', 0.0), velocity.get('z', 0.0),
+            sensors.get('depth', 0.0), sensors.get('temperature', 0.0), sensors.get('pressure', 0.0),
+            battery, STATUS_CODES.get(state.get('status'), 0)
+        )
+    
+    def encode_heartbeat(self, status: str = 'connected') -> bytes:
+        """ترميز رسالة النبض (9 بايت)"""
+        seq, time_ms = self._next_header()
+        return _HEARTBEAT.pack(PROTOCOL_VERSION, MSG_HEARTBEAT, seq, time_ms, STATUS_CODES.get(status, 0))
+    
+    def encode_emergency_stop(self) -> bytes:
+        """ترميز أمر الإيقاف الطارئ"""
+        seq, time_ms = self._next_header()
+        return _HEADER.pack(PROTOCOL_VERSION, MSG_EMERGENCY_STOP, seq, time_ms)
+    
+    def encode_telemetry_request(self) -> bytes:
+        """ترميز طلب التيليمتري"""
+        seq, time_ms = self._next_header()
+        return _HEADER.pack(PROTOCOL_VERSION, MSG_TELEMETRY_REQUEST, seq, time_ms)
+    
+    def encode_telemetry_delta(self, state: Dict[str, Any]) -> bytes:
+        """ترميز التيليمتري كفروق مكمّمة للحقول المتغيرة (مع إطار كامل دوري)"""
+        seq, time_ms = self._next_header()
+        return _HEADER.pack(PROTOCOL_VERSION, MSG_TELEMETRY_DELTA, seq, time_ms) + \
+            self.telemetry_encoder.encode(state)
+    
+    def encode_keyframe_request(self) -> bytes:
+        """ترميز طلب إطار تيليمتري كامل"""
+        seq, time_ms = self._next_header()
+        return _HEADER.pack(PROTOCOL_VERSION, MSG_KEYFRAME_REQUEST, seq, time_ms)
+    
+    def decode(self, payload: Union[bytes, bytearray, memoryview]) -> Optional[Dict[str, Any]]:
+        """فك ترميز رسالة ثنائية إلى قاموس بنفس بنية رسائل JSON"""
+        if not self.is_binary(payload):
+            return None
+        
+        msg_type = payload[1]
+        
+        if msg_type == MSG_TELEMETRY_SENSORS and len(payload) >= _TELEMETRY_SENSORS.size:
+            (_, _, seq, time_ms, px, py, pz, roll, pitch, yaw,
+             vx, vy, vz, depth, temperature, pressure, battery, status) = _TELEMETRY_SENSORS.unpack_from(payload)
+            return {
+                'type': 'telemetry',
+                'seq': seq,
+                'time_ms': time_ms,
+                'position': {'x': px, 'y': py, 'z': pz},
+                'orientation': {'roll': roll, 'pitch': pitch, 'yaw': yaw},
+                'velocity': {'x': vx, 'y': vy, 'z': vz},
+                'sensors': {'depth': depth, 'temperature': temperature, 'pressure': pressure},
+                'battery': battery,
+                'status': STATUS_NAMES.get(status, 'disconnected')
+            }
+        
+        if msg_type == MSG_TELEMETRY and len(payload) >= _TELEMETRY.size:
+            (_, _, seq, time_ms, px, py, pz, roll, pitch, yaw,
+             vx, vy, vz, battery, status) = _TELEMETRY.unpack_from(payload)
+            return {
+                'type': 'telemetry',
+                'seq': seq,
+                'time_ms': time_ms,
+                'position': {'x': px, 'y': py, 'z': pz},
+                'orientation': {'roll': roll, 'pitch': pitch, 'yaw': yaw},
+                'velocity': {'x': vx, 'y': vy, 'z': vz},
+                'battery': battery,
+                'status': STATUS_NAMES.get(status, 'disconnected')
+            }
+        
+        if msg_type == MSG_TELEMETRY_DELTA and len(payload) >= HEADER_SIZE + 4:
+            _, _, seq, time_ms = _HEADER.unpack_from(payload)
+            changes = self.telemetry_decoder.decode(payload, HEADER_SIZE)
+            if changes is None:
+                # فُقد إطار: الفروق غير صالحة حتى وصول إطار كامل
+                return {'type': 'telemetry_out_of_sync', 'seq': seq, 'time_ms': time_ms,
+                        'request_keyframe': self.telemetry_decoder.should_request_keyframe()}
+            changes.update({'type': 'telemetry', 'seq': seq, 'time_ms': time_ms})
+            return changes
+        
+        if msg_type == MSG_MOTOR_COMMAND and len(payload) >= _MOTOR.size:
+            fields = _MOTOR.unpack_from(payload)
+            return {
+                'type': 'motor_command',
+                'seq': fields[2],
+                'time_ms': fields[3],
+                'motors': dict(zip(MOTOR_ORDER, fields[4:]))
+            }
+        
+        if msg_type == MSG_HEARTBEAT and len(payload) >= _HEARTBEAT.size:
+            _, _, seq, time_ms, status = _HEARTBEAT.unpack_from(payload)
+            return {'type': 'heartbeat', 'seq': seq, 'time_ms': time_ms,
+                    'status': STATUS_NAMES.get(status, 'disconnected')}
+        
+        if msg_type == MSG_EMERGENCY_STOP:
+            _, _, seq, time_ms = _HEADER.unpack_from(payload)
+            return {'type': 'emergency_stop', 'seq': seq, 'time_ms': time_ms}
+        
+        if msg_type == MSG_TELEMETRY_REQUEST:
+            _, _, seq, time_ms = _HEADER.unpack_from(payload)
+            return {'type': 'telemetry_request', 'seq': seq, 'time_ms': time_ms}
+        
+        if msg_type == MSG_KEYFRAME_REQUEST:
+            _, _, seq, time_ms = _HEADER.unpack_from(payload)
+            self.telemetry_encoder.request_keyframe()
+            return {'type': 'keyframe_request', 'seq': seq, 'time_ms': time_ms}
+        
+        return None
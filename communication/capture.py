@@ -0,0 +1,206 @@
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+from typing import Any, Dict, Iterator, NamedTuple, Optional, Union
+
+from utils.logger import ROVLogger
+
+# صيغة pcap بأختام نانوثانية ونوع وصلة خاص (LINKTYPE_USER0) فيفتحها Wireshark/tcpdump كبايتات خام
+PCAP_MAGIC_NS = 0xA1B23C4D
+PCAP_MAGIC_US = 0xA1B2C3D4
+LINKTYPE_USER0 = 147
+PCAP_SNAPLEN = 0x40000
+
+# كل سجل: ترويسة pcap ثم ترويسة زائفة (الاتجاه، المجرى) ثم بايتات الإطار كما على السلك
+_GLOBAL_HEADER = struct.Struct('<IHHiIII')
+_RECORD_HEADER = struct.Struct('<IIIIBB')
+_PSEUDO_SIZE = 2
+RECORD_OVERHEAD = _RECORD_HEADER.size
+
+# الاتجاه: وارد من المركبة، صادر إليها، أو سجل وصف الوصلة (JSON) في بداية الملف
+DIRECTION_IN = 0
+DIRECTION_OUT = 1
+DIRECTION_META = 2
+
+# المجرى: المقبس الرئيسي، أو مقبس الردود المباشرة في وضع multicast (مفكك FEC منفصل)
+STREAM_MAIN = 0
+STREAM_REPLY = 1
+
+_NS = 1_000_000_000
+
+class CaptureRecord(NamedTuple):
+    timestamp: float
+    direction: int
+    stream: int
+    data: bytes
+
+def describe_link(link: Any) -> Dict[str, Any]:
+    """وصف وسيلة الاتصال اللازم لإعادة تشغيل الالتقاط بنفس المحللات"""
+    if hasattr(link, 'target_system'):
+        meta = {'link': 'mavlink', 'transport': link.link, 'target_system': link.target_system,
+                'surface_pressure': link.surface_pressure, 'fluid_density': link.fluid_density}
+    elif hasattr(link, 'protocol'):
+        meta = {'link': link.protocol.lower(), 'binary_protocol': link.binary_protocol}
+        if meta['link'] == 'udp':
+            meta.update(fec_mode=link.fec_mode, multicast_group=link.multicast_group)
+    else:
+        meta = {'link': 'serial', 'binary_protocol': link.binary_protocol, 'baud_rate': link.baud_rate}
+    meta['class'] = type(link).__name__
+    return meta
+
+class WireCapture:
+    """التقاط كل الإطارات الواردة والصادرة على وصلة في ملف pcap إلحاقي
+    
+    الزمن من الساعة الرتيبة (monotonic_ns) مزاحاً لزمن الحائط عند الفتح، فلا
+    تتأثر الفروق بضبط ساعة النظام. الملف محجوز مسبقاً بأجزاء كبيرة (posix_fallocate)
+    والكتابة عبر مخزن الملف تحت قفل واحد، فكلفة الإطار حزم ترويسة ونسختان في الذاكرة
+    ونادراً استدعاء نظام. المخزن يُفرغ كل flush_interval ثانية، وعند الإغلاق يُقص
+    الملف إلى حجم السجلات الفعلي.
+    """
+    
+    def __init__(self, path: str, metadata: Optional[Dict[str, Any]] = None,
+                 preallocate: int = 16 * 1024 * 1024, max_bytes: int = 512 * 1024 * 1024,
+                 flush_interval: float = 1.0, buffer_size: int = 256 * 1024):
+        self.logger = ROVLogger('WireCapture')
+        self.path = path
+        self.max_bytes = max_bytes
+        self.preallocate = preallocate
+        self._flush_interval_ns = int(flush_interval * _NS)
+        self._lock = threading.Lock()
+        
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'wb', buffering=buffer_size)
+        self._write = self._file.write
+        self._allocated = 0
+        self._size = 0
+        # زمن الحائط (ns) عند الفتح ناقص الساعة الرتيبة: الختم = الإزاحة + monotonic_ns()
+        self._offset_ns = time.time_ns() - time.monotonic_ns()
+        self._flush_at = 0
+        
+        self.stats = {
+            'frames_in': 0,
+            'frames_out': 0,
+            'bytes': 0,
+            'dropped': 0
+        }
+        
+        self._reserve(preallocate)
+        self._write(_GLOBAL_HEADER.pack(PCAP_MAGIC_NS, 2, 4, 0, 0, PCAP_SNAPLEN, LINKTYPE_USER0))
+        self._size = _GLOBAL_HEADER.size
+        self.record(DIRECTION_META, json.dumps(metadata or {}, ensure_ascii=False).encode('utf-8'))
+        self.logger.info(f"التقاط حركة الوصلة في {path}")
+    
+    def record(self, direction: int, data: Union[bytes, bytearray, memoryview], stream: int = STREAM_MAIN):
+        """إلحاق إطار بختم زمني (آمن من عدة خيوط؛ يُتجاهل بعد الإغلاق أو بلوغ max_bytes)"""
+        size = len(data)
+        with self._lock:
+            if self._file is None or self._size + RECORD_OVERHEAD + size > self.max_bytes:
+                self.stats['dropped'] += 1
+                return
+            now = self._offset_ns + time.monotonic_ns()
+            self._write(_RECORD_HEADER.pack(now // _NS, now % _NS, size + _PSEUDO_SIZE, size + _PSEUDO_SIZE,
+                                            direction, stream))
+            self._write(data)
+            self._size += RECORD_OVERHEAD + size
+            if direction == DIRECTION_IN:
+                self.stats['frames_in'] += 1
+            elif direction == DIRECTION_OUT:
+                self.stats['frames_out'] += 1
+            if self._size > self._allocated:
+                self._reserve(self.preallocate)
+            if now >= self._flush_at:
+                self._file.flush()
+                self._flush_at = now + self._flush_interval_ns
+    
+    def _reserve(self, size: int):
+        """حجز الجزء التالي من الملف مسبقاً (القرص لا يتجزأ والكتابة لا تنتظر تخصيص الكتل)"""
+        end = self._allocated + size
+        try:
+            os.posix_fallocate(self._file.fileno(), self._allocated, size)
+        except (AttributeError, OSError):
+            # Windows أو نظام ملفات لا يدعم الحجز: تمديد الحجم فقط
+            self._file.flush()
+            os.ftruncate(self._file.fileno(), end)
+        self._allocated = end
+    
+    def close(self):
+        """تفريغ المخزن وقص الحجز الزائد"""
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.flush()
+            self._file.truncate(self._size)
+            self._file.close()
+            self._file = None
+            self.stats['bytes'] = self._size
+        self.logger.info(f"تم إغلاق الالتقاط {self.path} ({self.stats['frames_in']} وارد، "
+                         f"{self.stats['frames_out']} صادر، {self._size} بايت)")
+    
+    @property
+    def closed(self) -> bool:
+        return self._file is None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """عدد الإطارات في كل اتجاه والحجم والإطارات المتجاهلة بعد بلوغ الحد"""
+        stats = dict(self.stats)
+        stats.update(bytes=self._size, path=self.path)
+        return stats
+
+class CaptureReader:
+    """قراءة ملف التقاط: الوصف (metadata) ثم السجلات بالترتيب
+    
+    الملف يُقرأ عبر mmap دون تحميله كاملاً. ملف لم يُغلق (انقطاع التطبيق) ينتهي
+    بحجز فارغ أو سجل مقطوع فتتوقف القراءة عنده.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as handle:
+            size = os.fstat(handle.fileno()).st_size
+            if size < _GLOBAL_HEADER.size:
+                raise ValueError(f"ملف التقاط غير صالح: {path}")
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        
+        magic, _, _, _, _, _, linktype = _GLOBAL_HEADER.unpack_from(self._map, 0)
+        if magic not in (PCAP_MAGIC_NS, PCAP_MAGIC_US) or linktype != LINKTYPE_USER0:
+            self._map.close()
+            raise ValueError(f"ليس ملف التقاط للوصلة: {path}")
+        self._scale = 1e-9 if magic == PCAP_MAGIC_NS else 1e-6
+        self.truncated = False
+        
+        self.metadata: Dict[str, Any] = {}
+        first = next(self._records(), None)
+        if first is not None and first.direction == DIRECTION_META:
+            self.metadata = json.loads(first.data.decode('utf-8'))
+    
+    def __iter__(self) -> Iterator[CaptureRecord]:
+        """سجلات الإطارات (بدون سجلات الوصف)"""
+        for record in self._records():
+            if record.direction != DIRECTION_META:
+                yield record
+    
+    def _records(self) -> Iterator[CaptureRecord]:
+        data = self._map
+        end = len(data)
+        offset = _GLOBAL_HEADER.size
+        scale = self._scale
+        while offset + RECORD_OVERHEAD <= end:
+            seconds, fraction, length, _, direction, stream = _RECORD_HEADER.unpack_from(data, offset)
+            if length < _PSEUDO_SIZE:
+                # بداية الحجز غير المكتوب
+                break
+            start = offset + RECORD_OVERHEAD
+            stop = start + length - _PSEUDO_SIZE
+            if stop > end:
+                self.truncated = True
+                break
+            yield CaptureRecord(seconds + fraction * scale, direction, stream, data[start:stop])
+            offset = stop
+    
+    def close(self):
+        self._map.close()
@@ -0,0 +1,119 @@
+import argparse
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+from .capture import CaptureReader, DIRECTION_IN
+from .fec import FEC_OFF
+from .mavlink_comm import MAVLinkCommunication
+from .network_comm import NetworkCommunication
+from .serial_comm import SerialCommunication
+
+def create_replay_link(metadata: Dict[str, Any]):
+    """وسيلة اتصال غير متصلة بإعدادات الالتقاط (نفس المحللات؛ الخلفية غير المتزامنة بنفس صيغة السلك)"""
+    kind = metadata.get('link', 'serial')
+    if kind == 'mavlink':
+        return MAVLinkCommunication(metadata.get('transport', 'udp'),
+                                    target_system=metadata.get('target_system', 1),
+                                    surface_pressure=metadata.get('surface_pressure', 1013.25),
+                                    fluid_density=metadata.get('fluid_density', 1025.0))
+    if kind in ('tcp', 'udp'):
+        return NetworkCommunication(protocol=kind, binary_protocol=metadata.get('binary_protocol', False),
+                                    fec_mode=metadata.get('fec_mode', FEC_OFF))
+    return SerialCommunication(binary_protocol=metadata.get('binary_protocol', False))
+
+def message_type(item: Any) -> str:
+    """نوع الرسالة للإحصاء: type في القاموس أو الوسم في السطر النصي"""
+    if isinstance(item, dict):
+        return str(item.get('type', 'telemetry'))
+    text = str(item)
+    return 'json' if text.startswith('{') else text.split(',', 1)[0][:32]
+
+class CaptureReplayer:
+    """إعادة تشغيل ملف التقاط عبر محللات وسيلة الاتصال الأصلية
+    
+    الإطارات الواردة تُمرر إلى feed_inbound في وسيلة اتصال غير متصلة بنفس
+    إعدادات الالتقاط، فتخرج الرسائل لمعالج الدفعات كما في التشغيل الحي
+    (لتكرار خلل في المحلل أو قياس أدائه على حركة حقيقية). speed = 1 يحترم
+    الفواصل الزمنية الأصلية، وأكبر منه يسرّعها، و0 بأقصى سرعة.
+    """
+    
+    def __init__(self, path: str, handler: Optional[Callable[[List[Any]], None]] = None):
+        self.reader = CaptureReader(path)
+        self.metadata = self.reader.metadata
+        self.link = create_replay_link(self.metadata)
+        self.handler = handler
+        self.link.set_data_handler(lambda item: self._on_batch([item]))
+        if hasattr(self.link, 'set_batch_handler'):
+            self.link.set_batch_handler(self._on_batch)
+        
+        self.message_types: Counter = Counter()
+        self.stats = {
+            'frames_in': 0,
+            'frames_out': 0,
+            'bytes_in': 0,
+            'messages': 0,
+            'capture_seconds': 0.0,
+            'elapsed_seconds': 0.0
+        }
+    
+    def run(self, speed: float = 0.0) -> Dict[str, Any]:
+        """تشغيل كل السجلات وإرجاع الإحصائيات"""
+        stats = self.stats
+        feed = self.link.feed_inbound
+        first = None
+        timestamp = 0.0
+        start = time.perf_counter()
+        for timestamp, direction, stream, data in self.reader:
+            if first is None:
+                first = timestamp
+            if speed > 0:
+                delay = (timestamp - first) / speed - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            if direction != DIRECTION_IN:
+                stats['frames_out'] += 1
+                continue
+            stats['frames_in'] += 1
+            stats['bytes_in'] += len(data)
+            feed(data, stream)
+        
+        stats['elapsed_seconds'] = time.perf_counter() - start
+        stats['capture_seconds'] = timestamp - first if first is not None else 0.0
+        return dict(stats)
+    
+    def _on_batch(self, batch: List[Any]):
+        self.stats['messages'] += len(batch)
+        for item in batch:
+            self.message_types[message_type(item)] += 1
+        if self.handler:
+            self.handler(batch)
+    
+    def close(self):
+        self.reader.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='إعادة تشغيل التقاط حركة الوصلة عبر المحللات')
+    parser.add_argument('capture', help='ملف الالتقاط (.pcap)')
+    parser.add_argument('--speed', type=float, default=0.0,
+                        help='1 = الزمن الأصلي، 2 = ضعف السرعة، 0 = أقصى سرعة (افتراضي)')
+    parser.add_argument('--verbose', action='store_true', help='طباعة كل رسالة')
+    args = parser.parse_args()
+    
+    replayer = CaptureReplayer(args.capture, handler=(lambda batch: [print(item) for item in batch])
+                               if args.verbose else None)
+    print(f"الوصلة: {replayer.metadata}")
+    stats = replayer.run(args.speed)
+    replayer.close()
+    
+    rate = stats['messages'] / stats['elapsed_seconds'] if stats['elapsed_seconds'] > 0 else 0.0
+    print(f"{stats['frames_in']} إطار وارد ({stats['bytes_in']} بايت)، {stats['frames_out']} صادر، "
+          f"مدة الالتقاط {stats['capture_seconds']:.2f} ث")
+    print(f"{stats['messages']} رسالة خلال {stats['elapsed_seconds']:.3f} ث ({rate:,.0f} رسالة/ث)")
+    for name, count in replayer.message_types.most_common():
+        print(f"  {name}: {count}")
+    if replayer.reader.truncated:
+        print("تحذير: الملف ينتهي بسجل مقطوع (لم يُغلق الالتقاط)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+import struct
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from utils.logger import ROVLogger
+
+# القنوات المنطقية: البايت العلوي من حقل الطول في ترويسة الإطار (AA55 التسلسلي
+# وبادئة TCP)، فإطارات القناة 0 مطابقة بايتاً ببايت للصيغة السابقة
+CHANNEL_CONTROL = 0     # المحركات والإيقاف الطارئ و ACK و ping والطلبات
+CHANNEL_TELEMETRY = 1   # التيليمتري الدوري
+CHANNEL_BULK = 2        # أول قنوات النقل الكبير (2-255: سجلات، لقطات، سونار...)
+
+CHANNEL_SHIFT = 24
+LENGTH_MASK = (1 << CHANNEL_SHIFT) - 1   # أقصى طول إطار 16 MB
+
+# ترويسة جزء النقل الكبير: رقم النقل(2) + الإزاحة(4) + الحجم الكلي(4)
+_CHUNK_HEADER = struct.Struct('<HII')
+CHUNK_HEADER_SIZE = _CHUNK_HEADER.size
+
+# حجم الجزء على الوصلات الشبكية (السعة كبيرة فيكفي أن يبقى الجزء أصغر من MTU)
+NETWORK_CHUNK_SIZE = 1024
+
+def pack_length(length: int, channel: int = CHANNEL_CONTROL) -> int:
+    """حقل الطول مع رقم القناة في البايت العلوي"""
+    if length > LENGTH_MASK:
+        raise ValueError(f"حجم الإطار {length} أكبر من الحد {LENGTH_MASK}")
+    if not 0 <= channel <= 0xFF:
+        raise ValueError(f"رقم قناة غير صالح: {channel}")
+    return length | (channel << CHANNEL_SHIFT)
+
+def split_length(value: int) -> Tuple[int, int]:
+    """(القناة، الطول) من حقل الطول"""
+    return value >> CHANNEL_SHIFT, value & LENGTH_MASK
+
+def is_bulk_channel(channel: int) -> bool:
+    return channel >= CHANNEL_BULK
+
+def iter_bulk_chunks(data: bytes, transfer_id: int, chunk_size: int) -> Iterator[bytes]:
+    """تقسيم نقل كبير إلى أجزاء مستقلة (كل جزء يحمل إزاحته والحجم الكلي)"""
+    view = memoryview(data)
+    total = len(data)
+    payload_size = max(1, chunk_size - CHUNK_HEADER_SIZE)
+    offset = 0
+    while True:
+        chunk = view[offset:offset + payload_size]
+        yield _CHUNK_HEADER.pack(transfer_id & 0xFFFF, offset, total) + chunk
+        offset += len(chunk)
+        if offset >= total:
+            break
+
+def chunk_size_for_baud(baud_rate: int, chunk_ms: float, minimum: int = 64, maximum: int = 4096) -> int:
+    """حجم جزء يُرسل خلال chunk_ms على وصلة تسلسلية (10 بت لكل بايت)"""
+    return int(min(maximum, max(minimum, baud_rate / 10.0 * chunk_ms / 1000.0)))
+
+class BulkReassembler:
+    """تجميع أجزاء النقل الكبير الواردة وتمرير كل نقل مكتمل مرة واحدة
+    
+    الأجزاء قد تصل من أكثر من نقل متداخل؛ النقل الذي فُقد أحد أجزائه يُحذف بعد
+    timeout ثانية دون جزء جديد (لا إعادة إرسال على هذا المستوى).
+    """
+    
+    def __init__(self, handler: Optional[Callable[[int, bytes], None]] = None,
+                 max_transfer: int = 64 * 1024 * 1024, max_active: int = 8, timeout: float = 10.0):
+        self.logger = ROVLogger('BulkReassembler')
+        self.handler = handler
+        self.max_transfer = max_transfer
+        self.max_active = max_active
+        self.timeout = timeout
+        # (القناة، رقم النقل) -> [المخزن، البايتات المستلمة، آخر جزء]
+        self._active: Dict[Tuple[int, int], List] = {}
+        
+        # إحصائيات
+        self.stats = {
+            'chunks': 0,
+            'completed': 0,
+            'expired': 0,
+            'bytes': 0,
+            'invalid_chunks': 0
+        }
+    
+    def feed(self, channel: int, chunk) -> Optional[bytes]:
+        """إضافة جزء؛ يُرجع محتوى النقل عند اكتماله"""
+        if len(chunk) < CHUNK_HEADER_SIZE:
+            self.stats['invalid_chunks'] += 1
+            return None
+        transfer_id, offset, total = _CHUNK_HEADER.unpack_from(chunk)
+        data = chunk[CHUNK_HEADER_SIZE:]
+        if total > self.max_transfer or offset + len(data) > total:
+            self.stats['invalid_chunks'] += 1
+            return None
+        
+        now = time.monotonic()
+        key = (channel, transfer_id)
+        entry = self._active.get(key)
+        if entry is None or len(entry[0]) != total:
+            self._expire(now)
+            if len(self._active) >= self.max_active:
+                oldest = min(self._active, key=lambda name: self._active[name][2])
+                del self._active[oldest]
+                self.stats['expired'] += 1
+            entry = self._active[key] = [bytearray(total), 0, now]
+        
+        buffer = entry[0]
+        buffer[offset:offset + len(data)] = data
+        entry[1] += len(data)
+        entry[2] = now
+        self.stats['chunks'] += 1
+        
+        if entry[1] < total:
+            return None
+        del self._active[key]
+        self.stats['completed'] += 1
+        self.stats['bytes'] += total
+        result = bytes(buffer)
+        if self.handler:
+            try:
+                self.handler(channel, result)
+            except Exception as e:
+                self.logger.error(f"خطأ في معالج النقل الكبير: {e}")
+        return result
+    
+    def get_stats(self) -> Dict[str, int]:
+        stats = dict(self.stats)
+        stats['active'] = len(self._active)
+        return stats
+    
+    def _expire(self, now: float):
+        expired = [key for key, entry in self._active.items() if now - entry[2] > self.timeout]
+        for key in expired:
+            del self._active[key]
+        if expired:
+            self.stats['expired'] += len(expired)
+            self.logger.warning(f"انتهت مهلة {len(expired)} نقل كبير غير مكتمل")
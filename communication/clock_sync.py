@@ -0,0 +1,169 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from utils.logger import ROVLogger
+
+# أقصى انحراف مقبول لساعة المركبة (كريستال عادي ±100 ppm؛ الأكبر يعني قياساً خاطئاً)
+MAX_DRIFT = 500e-6
+
+# دورة التفاف time_ms بعرض 32 بت في الرسائل الثنائية (ثانية)
+TIME_MS_PERIOD = 2 ** 32 / 1000.0
+
+class ClockSync:
+    """تقدير فرق وانحراف ساعة المركبة عن ساعة السطح بأسلوب NTP من تبادل ping/pong
+    
+    كل تبادل يعطي أربعة أزمنة: t1 إرسال ping و t4 وصول pong بساعة السطح
+    (time.monotonic)، و t2 وصول ping و t3 إرسال pong بساعة المركبة (نفس ساعة
+    'timestamp' في التيليمتري). الفرق = ((t2 - t1) + (t3 - t4)) / 2 وخطؤه لا يزيد
+    عن نصف زمن الرحلة، لذلك يُعتمد فقط على التبادلات ذات أقل زمن رحلة في النافذة
+    ويُحسب الانحراف كميل خط المربعات الصغرى للفرق مع الزمن.
+    """
+    
+    def __init__(self, window: int = 64, best_fraction: float = 0.25, min_samples: int = 3,
+                 step_threshold: float = 1.0):
+        self.logger = ROVLogger('ClockSync')
+        self.best_fraction = best_fraction
+        self.min_samples = min_samples
+        # قفزة ساعة المركبة (إعادة تشغيل، ضبط الوقت) تمسح النافذة
+        self.step_threshold = step_threshold
+        
+        # (t4, الفرق, زمن الرحلة الصافي)
+        self._samples: Deque[Tuple[float, float, float]] = deque(maxlen=window)
+        self._lock = threading.Lock()
+        # (زمن المرجع, الفرق عنده, الانحراف, عدم اليقين) - يُستبدل كاملاً فالقراءة بدون قفل
+        self._model: Optional[Tuple[float, float, float, float]] = None
+        
+        self.uplink: Optional[float] = None       # آخر زمن باتجاه واحد سطح -> مركبة (الأوامر)
+        self.downlink: Optional[float] = None     # آخر زمن باتجاه واحد مركبة -> سطح
+        self.telemetry_latency: Optional[float] = None  # متوسط تأخر التيليمتري المُنعَّم
+        
+        # إحصائيات
+        self.stats = {
+            'exchanges': 0,
+            'rejected': 0,
+            'steps': 0
+        }
+    
+    @property
+    def synced(self) -> bool:
+        return self._model is not None
+    
+    def add_exchange(self, t1: float, t2: float, t3: float, t4: float) -> Optional[float]:
+        """تسجيل تبادل ping/pong وإرجاع الفرق المقدر منه (None إذا رُفض)"""
+        delay = (t4 - t1) - (t3 - t2)
+        if delay < 0 or t3 < t2:
+            # أزمنة غير متسقة (رد قديم أو ساعة قفزت أثناء التبادل)
+            self.stats['rejected'] += 1
+            return None
+        offset = ((t2 - t1) + (t3 - t4)) / 2.0
+        
+        with self._lock:
+            self.stats['exchanges'] += 1
+            model = self._model
+            if model is not None and abs(offset - self._predict(model, t4)) > self.step_threshold + delay:
+                self.logger.warning(f"قفزة في ساعة المركبة ({(offset - self._predict(model, t4)) * 1000.0:.0f} ms) - "
+                                    "إعادة المزامنة")
+                self.stats['steps'] += 1
+                self._samples.clear()
+                self._model = model = None
+            
+            self._samples.append((t4, offset, delay))
+            if len(self._samples) >= self.min_samples:
+                self._model = model = self._fit()
+        
+        if model is not None:
+            current = self._predict(model, t4)
+            self.uplink = max(0.0, (t2 - current) - t1)
+            self.downlink = max(0.0, t4 - (t3 - current))
+        return offset
+    
+    def offset_at(self, local_time: Optional[float] = None) -> Optional[float]:
+        """فرق ساعة المركبة عن ساعة السطح (ثانية) عند زمن سطح معين"""
+        model = self._model
+        if model is None:
+            return None
+        return self._predict(model, time.monotonic() if local_time is None else local_time)
+    
+    def to_local(self, remote_time: float) -> Optional[float]:
+        """تحويل زمن بساعة المركبة إلى time.monotonic على السطح"""
+        model = self._model
+        if model is None:
+            return None
+        reference, offset, drift, _ = model
+        # remote = local + offset + drift * (local - reference)
+        return (remote_time - offset + drift * reference) / (1.0 + drift)
+    
+    def to_remote(self, local_time: Optional[float] = None) -> Optional[float]:
+        """تحويل زمن سطح (time.monotonic) إلى ساعة المركبة (لختم الأوامر)"""
+        model = self._model
+        if model is None:
+            return None
+        local_time = time.monotonic() if local_time is None else local_time
+        return local_time + self._predict(model, local_time)
+    
+    def remote_from_ms(self, time_ms: int, local_time: Optional[float] = None) -> Optional[float]:
+        """زمن المركبة الكامل (ثانية) من time_ms الملتف: أقرب قيمة لزمن المركبة المقدر عند local_time"""
+        estimate = self.to_remote(local_time)
+        if estimate is None:
+            return None
+        base = time_ms / 1000.0
+        return base + round((estimate - base) / TIME_MS_PERIOD) * TIME_MS_PERIOD
+    
+    def observe_telemetry(self, remote_time: float, received_at: float) -> Optional[float]:
+        """تحويل ختم عينة تيليمتري وتحديث تأخرها باتجاه واحد؛ يُرجع زمنها على السطح"""
+        local_time = self.to_local(remote_time)
+        if local_time is None:
+            return None
+        latency = received_at - local_time
+        if self.telemetry_latency is None:
+            self.telemetry_latency = latency
+        else:
+            self.telemetry_latency += (latency - self.telemetry_latency) / 16.0
+        return local_time
+    
+    def reset(self):
+        """مسح التقدير (بعد إعادة الاتصال قد تكون المركبة أعيد تشغيلها)"""
+        with self._lock:
+            self._samples.clear()
+            self._model = None
+        self.uplink = self.downlink = self.telemetry_latency = None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """الفرق والانحراف ودقة المزامنة وأزمنة الاتجاه الواحد"""
+        model = self._model
+        stats = dict(self.stats)
+        stats['synced'] = model is not None
+        stats['samples'] = len(self._samples)
+        stats['offset_ms'] = self._predict(model, time.monotonic()) * 1000.0 if model else None
+        stats['drift_ppm'] = model[2] * 1e6 if model else None
+        stats['uncertainty_ms'] = model[3] * 1000.0 if model else None
+        for key, value in (('uplink_ms', self.uplink), ('downlink_ms', self.downlink),
+                           ('telemetry_latency_ms', self.telemetry_latency)):
+            stats[key] = value * 1000.0 if value is not None else None
+        return stats
+    
+    @staticmethod
+    def _predict(model: Tuple[float, float, float, float], local_time: float) -> float:
+        reference, offset, drift, _ = model
+        return offset + drift * (local_time - reference)
+    
+    def _fit(self) -> Tuple[float, float, float, float]:
+        """خط المربعات الصغرى لأفضل التبادلات (أقل زمن رحلة)"""
+        count = max(self.min_samples, int(len(self._samples) * self.best_fraction))
+        best = sorted(self._samples, key=lambda sample: sample[2])[:count]
+        
+        # المرجع هو متوسط الأزمنة فيصبح الفرق عنده هو متوسط الفروق
+        reference = sum(sample[0] for sample in best) / len(best)
+        mean_offset = sum(sample[1] for sample in best) / len(best)
+        spread = sum((sample[0] - reference) ** 2 for sample in best)
+        drift = 0.0
+        if spread > 1.0:
+            # يحتاج التقدير تبادلات موزعة على ثوانٍ على الأقل
+            drift = sum((sample[0] - reference) * (sample[1] - mean_offset) for sample in best) / spread
+            drift = max(-MAX_DRIFT, min(MAX_DRIFT, drift))
+        
+        # خطأ الفرق في أي تبادل لا يتجاوز نصف زمن رحلته
+        uncertainty = best[0][2] / 2.0
+        return reference, mean_offset, drift, uncertainty
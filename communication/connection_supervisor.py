@@ -0,0 +1,173 @@
+import random
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from utils.logger import ROVLogger
+
+# حالات الاتصال
+STATE_DISCONNECTED = 'disconnected'
+STATE_CONNECTING = 'connecting'
+STATE_CONNECTED = 'connected'
+STATE_RECONNECTING = 'reconnecting'
+STATE_FAILED = 'failed'
+
+class ConnectionSupervisor:
+    """إدارة دورة حياة الاتصال في خيط خلفي واحد
+    
+    الاتصال وقطعه وإعادة الاتصال تتم كلها في خيط المشرف، فلا ينتظر خيط الواجهة
+    مهلة connect() ولا إغلاق الخيوط. بعد فشل الاتصال أو انقطاع الوصلة يُعاد
+    المحاولة بتراجع أسي محدود مع عشوائية حتى لا تتزامن المحاولات مع تذبذب الوصلة.
+    كل تغيير حالة يُبلَّغ عبر on_state_changed(state, info) من خيط المشرف.
+    """
+    
+    def __init__(self, connect: Callable[[], bool], disconnect: Callable[[], None],
+                 is_healthy: Callable[[], bool], auto_reconnect: bool = True,
+                 initial_delay: float = 0.5, max_delay: float = 30.0, multiplier: float = 2.0,
+                 jitter: float = 0.5, check_interval: float = 0.2, seed: Optional[int] = None):
+        self.logger = ROVLogger('ConnectionSupervisor')
+        self._connect = connect
+        self._disconnect = disconnect
+        self._is_healthy = is_healthy
+        
+        self.auto_reconnect = auto_reconnect
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter  # نسبة التأخير التي تُسحب عشوائياً (0 = بدون عشوائية)
+        self.check_interval = check_interval
+        self._rng = random.Random(seed)
+        
+        self.on_state_changed: Optional[Callable[[str, Dict[str, Any]], None]] = None
+        self.state = STATE_DISCONNECTED
+        
+        self.thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        
+        # إحصائيات
+        self.stats = {
+            'connect_attempts': 0,
+            'connect_failures': 0,
+            'link_losses': 0,
+            'reconnects': 0,
+            'last_delay': 0.0
+        }
+    
+    @property
+    def is_active(self) -> bool:
+        """هل المشرف يعمل (متصل أو يحاول الاتصال)"""
+        return self.thread is not None and self.thread.is_alive()
+    
+    def start(self):
+        """بدء الاتصال في الخلفية (يعود فوراً)"""
+        if self.is_active:
+            return
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._run, name='ConnectionSupervisor', daemon=True)
+        self.thread.start()
+    
+    def stop(self, wait: bool = True, timeout: float = 12.0):
+        """قطع الاتصال وإيقاف إعادة المحاولة
+        
+        wait=False يطلب الإيقاف فقط ويترك القطع الفعلي لخيط المشرف (للواجهة)؛
+        المهلة الافتراضية تغطي connect() عالقاً حتى مهلة TCP الكاملة.
+        """
+        self._stop_event.set()
+        if wait and self.thread and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=timeout)
+    
+    def next_delay(self, attempt: int) -> float:
+        """تأخير المحاولة رقم attempt: أسي محدود بـ max_delay مع سحب عشوائي حتى نسبة jitter"""
+        delay = min(self.max_delay, self.initial_delay * (self.multiplier ** attempt))
+        return delay * (1.0 - self.jitter * self._rng.random())
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """الحصول على إحصائيات الاتصال"""
+        stats = dict(self.stats)
+        stats['state'] = self.state
+        return stats
+    
+    def _set_state(self, state: str, **info):
+        self.state = state
+        if self.on_state_changed:
+            try:
+                self.on_state_changed(state, info)
+            except Exception as e:
+                self.logger.error(f"خطأ في معالج حالة الاتصال: {e}")
+    
+    def _try_connect(self) -> bool:
+        self.stats['connect_attempts'] += 1
+        try:
+            if self._connect():
+                return True
+        except Exception as e:
+            self.logger.error(f"خطأ في الاتصال: {e}")
+        self.stats['connect_failures'] += 1
+        return False
+    
+    def _try_disconnect(self):
+        try:
+            self._disconnect()
+        except Exception as e:
+            self.logger.error(f"خطأ في قطع الاتصال: {e}")
+    
+    def _watch(self) -> bool:
+        """مراقبة الوصلة حتى انقطاعها (False) أو طلب الإيقاف (True)"""
+        while not self._stop_event.wait(self.check_interval):
+            try:
+                if not self._is_healthy():
+                    return False
+            except Exception as e:
+                self.logger.error(f"خطأ في فحص الوصلة: {e}")
+                return False
+        return True
+    
+    def _run(self):
+        """حلقة الاتصال والمراقبة وإعادة المحاولة"""
+        attempt = 0
+        was_connected = False
+        
+        while not self._stop_event.is_set():
+            # قبل أول اتصال ناجح تبقى الحالة connecting حتى مع إعادة المحاولة
+            pending_state = STATE_RECONNECTING if was_connected else STATE_CONNECTING
+            self._set_state(pending_state, attempt=attempt)
+            
+            if self._try_connect():
+                if self._stop_event.is_set():
+                    # طُلب الإيقاف أثناء انتظار connect()
+                    self._try_disconnect()
+                    break
+                
+                if was_connected:
+                    self.stats['reconnects'] += 1
+                self._set_state(STATE_CONNECTED, reconnected=was_connected)
+                was_connected = True
+                attempt = 0
+                
+                stopped = self._watch()
+                if not stopped:
+                    self.stats['link_losses'] += 1
+                    self.logger.warning("انقطعت الوصلة")
+                self._try_disconnect()
+                if stopped:
+                    break
+                
+                if not self.auto_reconnect:
+                    self._set_state(STATE_FAILED, link_lost=True)
+                    return
+                pending_state = STATE_RECONNECTING
+                delay = self.next_delay(0)
+            else:
+                if self._stop_event.is_set():
+                    break
+                if not self.auto_reconnect:
+                    self._set_state(STATE_FAILED, link_lost=False)
+                    return
+                delay = self.next_delay(attempt)
+                attempt += 1
+            
+            self.stats['last_delay'] = delay
+            self.logger.info(f"إعادة المحاولة خلال {delay:.1f} ثانية")
+            self._set_state(pending_state, attempt=attempt, retry_in=delay)
+            self._stop_event.wait(delay)
+        
+        self._set_state(STATE_DISCONNECTED)
@@ -0,0 +1,267 @@
+import os
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from utils.logger import ROVLogger
+
+# رسائل العقد (JSON دائماً لأنها نادرة):
+#   طلب:  {'type': 'control_lease', 'action': 'acquire' | 'release', 'station': ..., 'duration': s, 'seq': n}
+#   رد:   {'type': 'control_lease', 'granted': bool, 'holder': ... | None, 'expires_in': s, 'seq': n}
+LEASE_MESSAGE = 'control_lease'
+ACTION_ACQUIRE = 'acquire'
+ACTION_RELEASE = 'release'
+
+# أوضاع المحطة: بدون عقد (السلوك القديم)، قائد يطلب العقد عند الاتصال، مراقب لا يطلبه إلا صراحة
+LEASE_OFF = 'off'
+LEASE_PILOT = 'pilot'
+LEASE_OBSERVER = 'observer'
+
+def default_station_name() -> str:
+    """اسم المحطة الافتراضي: اسم الجهاز ورقم العملية (عدة نسخ على نفس الجهاز)"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+class ControlLease:
+    """تحكيم عقد التحكم على المركبة أو المرحّل: محطة واحدة فقط ترسل أوامر المحركات
+    
+    المالك (owner) هو هوية الوصلة التي وصل منها الطلب (الجلسة أو عنوان المصدر)
+    لأن أوامر المحركات الثنائية لا تحمل اسم المحطة. العقد يُمنح إذا كان شاغراً أو
+    منتهياً أو لنفس المالك (تجديد)، ويُرفض لغيره حتى يحرره صاحبه أو تنتهي مدته.
+    الإيقاف الطارئ لا يخضع للعقد.
+    """
+    
+    def __init__(self, duration: float = 2.0, max_duration: float = 10.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.duration = duration
+        self.max_duration = max_duration
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.owner: Optional[Hashable] = None
+        self.station: Optional[str] = None
+        self.expires_at = 0.0
+        
+        self.stats = {
+            'granted': 0,
+            'denied': 0,
+            'released': 0,
+            'expired': 0,
+            'rejected_commands': 0
+        }
+    
+    def handle_request(self, owner: Hashable, message: Dict[str, Any]) -> Dict[str, Any]:
+        """تنفيذ طلب acquire/release وإرجاع الرد"""
+        now = self.clock()
+        action = message.get('action', ACTION_ACQUIRE)
+        with self._lock:
+            self._expire(now)
+            if action == ACTION_RELEASE:
+                if owner == self.owner:
+                    self.owner = self.station = None
+                    self.stats['released'] += 1
+                granted = False
+            elif self.owner is None or owner == self.owner:
+                try:
+                    duration = float(message.get('duration', self.duration))
+                except (TypeError, ValueError):
+                    duration = self.duration
+                self.owner = owner
+                self.station = str(message.get('station') or owner)
+                self.expires_at = now + min(max(duration, 0.1), self.max_duration)
+                self.stats['granted'] += 1
+                granted = True
+            else:
+                self.stats['denied'] += 1
+                granted = False
+            
+            reply = {
+                'type': LEASE_MESSAGE,
+                'granted': granted,
+                'holder': self.station,
+                'expires_in': max(0.0, self.expires_at - now) if self.owner is not None else 0.0
+            }
+        if 'seq' in message:
+            reply['seq'] = message['seq']
+        return reply
+    
+    def allows(self, owner: Hashable) -> bool:
+        """هل يحق لهذا المالك إرسال أوامر التحكم الآن (الرفض يُحسب)"""
+        with self._lock:
+            self._expire(self.clock())
+            if owner == self.owner:
+                return True
+            self.stats['rejected_commands'] += 1
+            return False
+    
+    def poll(self) -> Optional[str]:
+        """فحص انتهاء العقد؛ يُرجع اسم المحطة التي انتهى عقدها الآن (لإيقاف المحركات)"""
+        with self._lock:
+            station = self.station
+            return station if self._expire(self.clock()) else None
+    
+    def drop(self, owner: Hashable):
+        """تحرير العقد عند إغلاق وصلة صاحبه"""
+        with self._lock:
+            if owner == self.owner:
+                self.owner = self.station = None
+                self.stats['released'] += 1
+    
+    def _expire(self, now: float) -> bool:
+        if self.owner is not None and now >= self.expires_at:
+            self.owner = self.station = None
+            self.stats['expired'] += 1
+            return True
+        return False
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """صاحب العقد الحالي والوقت المتبقي والعدادات"""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['holder'] = self.station
+            stats['expires_in'] = max(0.0, self.expires_at - self.clock()) if self.owner is not None else 0.0
+        return stats
+
+class ControlLeaseClient:
+    """طلب عقد التحكم وتجديده من جهة المحطة
+    
+    خيط خلفي يجدد العقد كل ثلث مدته ما دام مطلوباً، والردود تصل عبر
+    handle_message() من معالج البيانات (كما في LinkMonitor). العقد يُعتبر محتفظاً
+    به حتى زمن الإرسال + المدة الممنوحة، فإذا ضاعت ردود التجديد تتوقف المحطة عن
+    إرسال الأوامر قبل أن تنتهي المدة عند المركبة أو معها.
+    """
+    
+    def __init__(self, transport: Any, station: Optional[str] = None, duration: float = 2.0):
+        self.logger = ROVLogger('ControlLease')
+        self.transport = transport
+        self.station = station or default_station_name()
+        self.duration = duration
+        self.wanted = False
+        self.holder: Optional[str] = None
+        self._expires_at = 0.0
+        self._seq = 0
+        self._pending: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._held = False
+        
+        # استدعاء عند كسب العقد أو فقده: handler(held, holder)
+        self.on_change: Optional[Callable[[bool, Optional[str]], None]] = None
+        
+        self.thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._wake = threading.Event()
+        
+        self.stats = {
+            'requests': 0,
+            'granted': 0,
+            'denied': 0,
+            'lost': 0
+        }
+    
+    @property
+    def held(self) -> bool:
+        return time.monotonic() < self._expires_at
+    
+    def start(self):
+        """بدء خيط التجديد"""
+        if self.thread and self.thread.is_alive():
+            return
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._renew_loop, name='ControlLease', daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        """إيقاف خيط التجديد وتحرير العقد (يُطلب مجدداً عند start إذا بقي مطلوباً)"""
+        self._stop_event.set()
+        self._wake.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=2)
+        self.thread = None
+        if self.held:
+            self._send(ACTION_RELEASE)
+        self._set_expiry(0.0, None, voluntary=True)
+    
+    def acquire(self):
+        """طلب العقد (ثم تجديده تلقائياً)"""
+        self.wanted = True
+        self._wake.set()
+    
+    def release(self):
+        """تحرير العقد لمحطة أخرى"""
+        self.wanted = False
+        if self.held:
+            self._send(ACTION_RELEASE)
+        self._set_expiry(0.0, None, voluntary=True)
+    
+    def handle_message(self, message: Any) -> bool:
+        """تسجيل رد عقد وارد؛ True إذا كانت الرسالة رد عقد (لا تُمرر للتيليمتري)"""
+        if not isinstance(message, dict) or message.get('type') != LEASE_MESSAGE:
+            return False
+        
+        with self._lock:
+            sent_at = self._pending.pop(message.get('seq'), None)
+        holder = message.get('holder')
+        if not message.get('granted'):
+            if sent_at is not None and self.wanted:
+                self.stats['denied'] += 1
+                self._set_expiry(0.0, holder)
+            return True
+        if sent_at is None or not self.wanted:
+            return True
+        
+        self.stats['granted'] += 1
+        try:
+            expires_in = float(message.get('expires_in', self.duration))
+        except (TypeError, ValueError):
+            expires_in = self.duration
+        # المدة تُحسب من زمن الإرسال لا الاستقبال: تقدير محافظ لا يتجاوز انتهاءها عند المركبة
+        self._set_expiry(sent_at + expires_in, holder)
+        return True
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """حالة العقد والعدادات"""
+        stats = dict(self.stats)
+        stats.update(station=self.station, wanted=self.wanted, held=self.held, holder=self.holder,
+                     expires_in=max(0.0, self._expires_at - time.monotonic()))
+        return stats
+    
+    def _renew_loop(self):
+        while not self._stop_event.is_set():
+            if self.wanted:
+                self._send(ACTION_ACQUIRE)
+            self._wake.wait(self.duration / 3.0)
+            self._wake.clear()
+            # ضياع ردود التجديد: العقد انتهى محلياً
+            if self._held and not self.held:
+                self.stats['lost'] += 1
+                self._set_expiry(0.0, self.holder)
+    
+    def _send(self, action: str) -> bool:
+        with self._lock:
+            self._seq = (self._seq + 1) & 0xFFFF
+            seq = self._seq
+            now = time.monotonic()
+            # الطلبات التي لم يصل ردها خلال مدة العقد لن تُحتسب
+            for stale in [key for key, sent_at in self._pending.items() if now - sent_at > self.duration]:
+                del self._pending[stale]
+            if action == ACTION_ACQUIRE:
+                self._pending[seq] = now
+        self.stats['requests'] += 1
+        return self.transport.send_data({'type': LEASE_MESSAGE, 'action': action, 'station': self.station,
+                                         'duration': self.duration, 'seq': seq})
+    
+    def _set_expiry(self, expires_at: float, holder: Optional[str], voluntary: bool = False):
+        with self._lock:
+            self._expires_at = expires_at
+            self.holder = holder
+            held = self.held
+            if held == self._held:
+                return
+            self._held = held
+        if held:
+            self.logger.info(f"تم الحصول على عقد التحكم ({self.station})")
+        elif voluntary:
+            self.logger.info("تم تحرير عقد التحكم")
+        else:
+            self.logger.warning("فُقد عقد التحكم" + (f" - المتحكم الحالي: {holder}" if holder else ""))
+        if self.on_change:
+            self.on_change(held, holder)
@@ -0,0 +1,383 @@
+import math
+import struct
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from utils.logger import ROVLogger
+
+# أوضاع تصحيح الأخطاء الأمامي
+FEC_OFF = 'off'
+FEC_XOR = 'xor'   # حزمة تكافؤ واحدة (XOR) لكل مجموعة، حجم المجموعة يتكيف مع الفقد
+FEC_RS = 'rs'     # Reed-Solomon (مصفوفة Cauchy على GF(256))، عدد حزم التكافؤ يتكيف مع الفقد
+
+# ترويسة كل رسالة: العلامة، النوع، التسلسل (لقياس الفقد)، رقم المجموعة، الترتيب، k، m
+FEC_MAGIC = 0xFE   # لا يتعارض مع JSON ('{') أو الصيغة الثنائية (0x01) أو النصوص
+_HEADER = struct.Struct('<BBHHBBB')
+HEADER_SIZE = _HEADER.size
+_TYPE_DATA = 0
+_TYPE_XOR = 1
+_TYPE_RS = 2
+
+MAX_GROUP_SIZE = 64
+MAX_PARITY = 16
+_LENGTH = struct.Struct('<H')
+
+# ---- حساب GF(256) (كثير الحدود 0x11D) ----
+
+_EXP = [0] * 512
+_LOG = [0] * 256
+_value = 1
+for _power in range(255):
+    _EXP[_power] = _value
+    _LOG[_value] = _power
+    _value <<= 1
+    if _value & 0x100:
+        _value ^= 0x11D
+for _power in range(255, 512):
+    _EXP[_power] = _EXP[_power - 255]
+
+def _gf_mul(a: int, b: int) -> int:
+    if a == 0 or b == 0:
+        return 0
+    return _EXP[_LOG[a] + _LOG[b]]
+
+def _gf_inv(a: int) -> int:
+    return _EXP[255 - _LOG[a]]
+
+# جداول الضرب بمعامل ثابت لـ bytes.translate (ضرب كل البايتات بسرعة C)
+_MUL_TABLES: Dict[int, bytes] = {}
+
+def _mul_table(coefficient: int) -> bytes:
+    table = _MUL_TABLES.get(coefficient)
+    if table is None:
+        table = _MUL_TABLES[coefficient] = bytes(_gf_mul(coefficient, x) for x in range(256))
+    return table
+
+def _coefficient(kind: int, parity: int, index: int) -> int:
+    """معامل البيانات index في حزمة التكافؤ parity (XOR: كلها 1؛ RS: Cauchy)"""
+    if kind == _TYPE_XOR:
+        return 1
+    # x_j = 128 + j و y_i = i مجموعتان منفصلتان فكل مصفوفة جزئية مربعة قابلة للعكس
+    return _gf_inv((128 + parity) ^ index)
+
+def _scaled(symbol: bytes, coefficient: int) -> int:
+    """الرمز مضروباً بالمعامل كعدد صحيح (XOR الأعداد = جمع GF(256) لكل البايتات)"""
+    if coefficient != 1:
+        symbol = symbol.translate(_mul_table(coefficient))
+    return int.from_bytes(symbol, 'little')
+
+def _invert(matrix: List[List[int]]) -> List[List[int]]:
+    """عكس مصفوفة صغيرة على GF(256) بحذف Gauss-Jordan"""
+    size = len(matrix)
+    rows = [row[:] + [1 if column == index else 0 for column in range(size)] for index, row in enumerate(matrix)]
+    for column in range(size):
+        pivot = next(index for index in range(column, size) if rows[index][column])
+        rows[column], rows[pivot] = rows[pivot], rows[column]
+        scale = _gf_inv(rows[column][column])
+        rows[column] = [_gf_mul(scale, value) for value in rows[column]]
+        for index in range(size):
+            factor = rows[index][column]
+            if index != column and factor:
+                rows[index] = [value ^ _gf_mul(factor, pivot_value)
+                               for value, pivot_value in zip(rows[index], rows[column])]
+    return [row[size:] for row in rows]
+
+def _loss_tail(count: int, loss: float, tolerated: int) -> float:
+    """احتمال فقد أكثر من tolerated رسالة من count رسالة"""
+    kept = sum(math.comb(count, lost) * loss ** lost * (1.0 - loss) ** (count - lost)
+               for lost in range(tolerated + 1))
+    return max(0.0, 1.0 - kept)
+
+class FecEncoder:
+    """إضافة حزم تكافؤ عبر مجموعات من رسائل UDP
+    
+    رسائل البيانات تُرسل فوراً دون انتظار؛ تُضاف حزم التكافؤ عند اكتمال
+    المجموعة أو بعد max_delay من أول رسالة فيها، فيستعيد المستقبل أي رسائل
+    مفقودة لا يتجاوز عددها حزم التكافؤ الواصلة دون رحلة ذهاب وعودة. مقدار
+    التكرار يُختار ليبقى احتمال فقد رسالة بعد الاستعادة دون target_loss حسب
+    نسبة الفقد المقاسة (set_loss_rate).
+    
+    غير آمن للخيوط بمفرده - يُستخدم من خيط الكتابة فقط.
+    """
+    
+    def __init__(self, mode: str = FEC_XOR, group_size: int = 8, min_parity: int = 1,
+                 max_parity: int = 4, target_loss: float = 1e-3, max_delay: float = 0.04):
+        self.logger = ROVLogger('FecEncoder')
+        if mode not in (FEC_XOR, FEC_RS):
+            raise ValueError(f"وضع FEC غير معروف: {mode}")
+        self.mode = mode
+        self.group_size = min(max(group_size, 2), MAX_GROUP_SIZE)
+        self.min_parity = min(max(min_parity, 0), MAX_PARITY)
+        self.max_parity = min(max(max_parity, self.min_parity), MAX_PARITY)
+        self.target_loss = target_loss
+        self.max_delay = max_delay
+        self.loss_rate = 0.0
+        
+        self._group = 0
+        self._seq = 0
+        self._symbols: List[bytes] = []
+        self._group_started = 0.0
+        self._k = self.group_size
+        self._m = self.min_parity
+        self._adapt()
+        
+        # إحصائيات
+        self.stats = {
+            'data_sent': 0,
+            'parity_sent': 0,
+            'groups': 0,
+            'parity_bytes': 0
+        }
+    
+    def set_loss_rate(self, loss_rate: float):
+        """نسبة الفقد المقاسة على الوصلة (0-1)؛ تُطبق من المجموعة التالية"""
+        self.loss_rate = min(max(loss_rate, 0.0), 0.5)
+    
+    def encode(self, payload: bytes, now: Optional[float] = None) -> List[bytes]:
+        """رسالة البيانات مع حزم التكافؤ إذا اكتملت المجموعة بها"""
+        if len(payload) > 0xFFFF - HEADER_SIZE:
+            raise ValueError(f"حجم الرسالة {len(payload)} أكبر من حد UDP")
+        now = time.monotonic() if now is None else now
+        if not self._symbols:
+            self._adapt()
+            self._group_started = now
+        
+        index = len(self._symbols)
+        self._symbols.append(_LENGTH.pack(len(payload)) + payload)
+        self.stats['data_sent'] += 1
+        datagrams = [self._header(_TYPE_DATA, index, 0, 0) + payload]
+        if len(self._symbols) >= self._k:
+            datagrams.extend(self._close_group())
+        return datagrams
+    
+    def flush(self, now: Optional[float] = None, force: bool = False) -> List[bytes]:
+        """حزم التكافؤ لمجموعة ناقصة مضى على بدايتها max_delay"""
+        if not self._symbols:
+            return []
+        now = time.monotonic() if now is None else now
+        if not force and now - self._group_started < self.max_delay:
+            return []
+        return self._close_group()
+    
+    def next_deadline(self, now: Optional[float] = None) -> Optional[float]:
+        """الثواني حتى موعد flush التالي (None إذا لا توجد مجموعة مفتوحة)"""
+        if not self._symbols:
+            return None
+        now = time.monotonic() if now is None else now
+        return max(0.0, self._group_started + self.max_delay - now)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats['group_size'] = self._k
+        stats['parity'] = self._m
+        stats['loss_rate'] = self.loss_rate
+        stats['overhead'] = stats['parity_sent'] / max(stats['data_sent'], 1)
+        return stats
+    
+    def _adapt(self):
+        """اختيار k و m لمجموعة جديدة حسب الفقد المقاس"""
+        loss = self.loss_rate
+        if self.mode == FEC_XOR:
+            # حزمة تكافؤ واحدة: تصغير المجموعة حتى يندر فقد رسالتين منها
+            self._m = 1 if self.max_parity > 0 else 0
+            self._k = self.group_size
+            while self._k > 2 and loss > 0 and _loss_tail(self._k + self._m, loss, self._m) > self.target_loss:
+                self._k -= 1
+            return
+        
+        self._k = self.group_size
+        self._m = self.min_parity
+        while self._m < self.max_parity and loss > 0 and _loss_tail(self._k + self._m, loss, self._m) > self.target_loss:
+            self._m += 1
+    
+    def _close_group(self) -> List[bytes]:
+        symbols = self._symbols
+        count = len(symbols)
+        kind = _TYPE_XOR if self.mode == FEC_XOR else _TYPE_RS
+        width = max(len(symbol) for symbol in symbols)
+        
+        # مجموعة أغلقتها المهلة قبل اكتمالها تحتاج تكافؤاً أقل لنفس احتمال الفقد
+        parities = self._m
+        while (parities > self.min_parity and
+               _loss_tail(count + parities - 1, self.loss_rate, parities - 1) <= self.target_loss):
+            parities -= 1
+        
+        datagrams = []
+        for parity in range(parities):
+            value = 0
+            for index, symbol in enumerate(symbols):
+                value ^= _scaled(symbol, _coefficient(kind, parity, index))
+            datagrams.append(self._header(kind, parity, count, parities) + value.to_bytes(width, 'little'))
+            self.stats['parity_bytes'] += width
+        
+        self.stats['parity_sent'] += len(datagrams)
+        self.stats['groups'] += 1
+        self._group = (self._group + 1) & 0xFFFF
+        self._symbols = []
+        return datagrams
+    
+    def _header(self, kind: int, index: int, count: int, parity: int) -> bytes:
+        self._seq = (self._seq + 1) & 0xFFFF
+        return _HEADER.pack(FEC_MAGIC, kind, self._seq, self._group, index, count, parity)
+
+class _Group:
+    """حالة مجموعة واحدة عند المستقبل"""
+    
+    __slots__ = ('symbols', 'parity', 'kind', 'k', 'm')
+    
+    def __init__(self):
+        self.symbols: Dict[int, bytes] = {}
+        self.parity: Dict[int, bytes] = {}
+        self.kind = _TYPE_XOR
+        self.k = 0
+        self.m = 0
+
+class FecDecoder:
+    """استقبال رسائل FEC: تسليم البيانات فور وصولها واستعادة المفقود من التكافؤ
+    
+    الرسائل بدون علامة FEC تمر كما هي، فيعمل المستقبل مع طرف لم يفعّل FEC.
+    نسبة الفقد قبل الاستعادة (loss_rate) تُقاس من فجوات التسلسل كما في RTP.
+    """
+    
+    def __init__(self, max_groups: int = 16, loss_interval: int = 100):
+        self.logger = ROVLogger('FecDecoder')
+        self.max_groups = max_groups
+        self._groups: 'OrderedDict[int, _Group]' = OrderedDict()
+        self._newest: Optional[int] = None
+        
+        # قياس الفقد: المتوقع = التقدم في التسلسل، كل loss_interval رسالة متوقعة
+        self.loss_interval = loss_interval
+        self.loss_rate = 0.0
+        self._loss_samples = 0
+        self._highest_seq: Optional[int] = None
+        self._expected = 0
+        self._arrived = 0
+        
+        # إحصائيات
+        self.stats = {
+            'received': 0,
+            'recovered': 0,
+            'unrecoverable': 0,
+            'duplicates': 0,
+            'late': 0,
+            'invalid': 0
+        }
+    
+    def feed(self, datagram: bytes) -> List[bytes]:
+        """الرسائل الجاهزة للتسليم (رسالة البيانات نفسها و/أو المستعادة)"""
+        if len(datagram) < HEADER_SIZE or datagram[0] != FEC_MAGIC:
+            return [datagram]
+        
+        _, kind, seq, group_id, index, k, m = _HEADER.unpack_from(datagram)
+        body = datagram[HEADER_SIZE:]
+        self._track_loss(seq)
+        group = self._group(group_id)
+        if group is None:
+            self.stats['late'] += 1
+            return []
+        self.stats['received'] += 1
+        
+        if kind == _TYPE_DATA:
+            if index in group.symbols:
+                self.stats['duplicates'] += 1
+                return []
+            group.symbols[index] = _LENGTH.pack(len(body)) + body
+            output = [body]
+        elif kind in (_TYPE_XOR, _TYPE_RS) and 0 < k <= MAX_GROUP_SIZE and index < m <= MAX_PARITY:
+            if index in group.parity:
+                self.stats['duplicates'] += 1
+                return []
+            group.parity[index] = body
+            group.kind, group.k, group.m = kind, k, m
+            output = []
+        else:
+            self.stats['invalid'] += 1
+            return []
+        
+        if group.k:
+            output.extend(self._recover(group))
+        return output
+    
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self.stats)
+        stats['loss_rate'] = self.loss_rate
+        return stats
+    
+    def _group(self, group_id: int) -> Optional[_Group]:
+        group = self._groups.get(group_id)
+        if group is not None:
+            return group
+        
+        if self._newest is not None:
+            behind = (self._newest - group_id) & 0xFFFF
+            if 0 < behind < 0x8000:
+                # مجموعة أقدم من الأحدث: مقبولة فقط إذا بقيت ضمن النافذة ولم تُغلق
+                if behind >= self.max_groups:
+                    return None
+            else:
+                self._newest = group_id
+        else:
+            self._newest = group_id
+        
+        group = self._groups[group_id] = _Group()
+        while len(self._groups) > self.max_groups:
+            self._close(self._groups.popitem(last=False)[1])
+        return group
+    
+    def _recover(self, group: _Group) -> List[bytes]:
+        missing = [index for index in range(group.k) if index not in group.symbols]
+        if not missing or len(missing) > len(group.parity):
+            return []
+        
+        rows = sorted(group.parity)[:len(missing)]
+        width = max(len(group.parity[row]) for row in rows)
+        residuals = []
+        for row in rows:
+            value = int.from_bytes(group.parity[row], 'little')
+            for index, symbol in group.symbols.items():
+                if index < group.k:
+                    value ^= _scaled(symbol, _coefficient(group.kind, row, index))
+            residuals.append(value.to_bytes(width, 'little'))
+        
+        inverse = _invert([[_coefficient(group.kind, row, index) for index in missing] for row in rows])
+        recovered = []
+        for position, index in enumerate(missing):
+            value = 0
+            for column, residual in enumerate(residuals):
+                value ^= _scaled(residual, inverse[position][column])
+            symbol = value.to_bytes(width, 'little')
+            length = _LENGTH.unpack_from(symbol)[0]
+            if length > width - _LENGTH.size:
+                self.stats['invalid'] += 1
+                continue
+            group.symbols[index] = symbol
+            recovered.append(symbol[_LENGTH.size:_LENGTH.size + length])
+        
+        self.stats['recovered'] += len(recovered)
+        return recovered
+    
+    def _close(self, group: _Group):
+        """مجموعة خرجت من النافذة: عدّ ما لم يُستعد منها"""
+        if group.k:
+            self.stats['unrecoverable'] += sum(1 for index in range(group.k) if index not in group.symbols)
+    
+    def _track_loss(self, seq: int):
+        if self._highest_seq is None:
+            self._highest_seq = seq
+            self._expected = self._arrived = 1
+            return
+        
+        ahead = (seq - self._highest_seq) & 0xFFFF
+        if ahead < 0x8000:
+            self._highest_seq = seq
+            self._expected += ahead
+        self._arrived += 1
+        if self._expected < self.loss_interval:
+            return
+        
+        loss = min(max(1.0 - self._arrived / self._expected, 0.0), 1.0)
+        # متوسط متحرك سريع في البداية ثم أبطأ
+        self._loss_samples += 1
+        self.loss_rate += (loss - self.loss_rate) * max(1.0 / self._loss_samples, 0.25)
+        self._expected = self._arrived = 0
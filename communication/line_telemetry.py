@@ -0,0 +1,164 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.logger import ROVLogger
+
+# المخطط الافتراضي: الوسم ثم أسماء الحقول بترتيب ورودها في السطر
+DEFAULT_LINE_SCHEMA = 'TLM,depth,roll,pitch,yaw,temp,pressure,battery'
+
+# الأسماء المختصرة -> (المجموعة، الحقل) في rov_state (None لحقل في المستوى الأعلى)
+# ويُقبل أيضاً مسار صريح مثل sensors.salinity
+FIELD_ALIASES: Dict[str, Tuple[str, Optional[str]]] = {
+    'x': ('position', 'x'),
+    'y': ('position', 'y'),
+    'z': ('position', 'z'),
+    'roll': ('orientation', 'roll'),
+    'pitch': ('orientation', 'pitch'),
+    'yaw': ('orientation', 'yaw'),
+    'vx': ('velocity', 'x'),
+    'vy': ('velocity', 'y'),
+    'vz': ('velocity', 'z'),
+    'depth': ('sensors', 'depth'),
+    'temp': ('sensors', 'temperature'),
+    'temperature': ('sensors', 'temperature'),
+    'pressure': ('sensors', 'pressure'),
+    'voltage': ('sensors', 'voltage'),
+    'current': ('sensors', 'current'),
+    'battery': ('battery', None),
+}
+
+# حقل يُتجاهل في السطر (عمود لا يهم المحطة)
+SKIP_FIELD = '_'
+
+# الحقول الصحيحة في rov_state (المركبة قد ترسلها بفاصلة عشرية)
+_INTEGER_FIELDS = {('battery', None)}
+
+def _to_int(text: str) -> int:
+    return int(float(text))
+
+def _field_name(group: str, name: Optional[str]) -> str:
+    return group if name is None else f"{group}.{name}"
+
+class LineTelemetrySchema:
+    """مخطط سطر تيليمتري نصي واحد مثل TLM,depth,roll,pitch,yaw,temp,pressure,battery
+    
+    compile() يجهز مرة واحدة دالة خاصة بالمخطط تحوّل كل الحقول ثم تكتبها في
+    قواميس rov_state مباشرة (بدون قاموس وسيط لكل سطر)، فالسطر التالف لا يترك
+    تحديثاً جزئياً. العمق يحدّث position.z (سالب العمق) ما لم يرد z في المخطط
+    لأن فحص الأمان يقرأ العمق من الموقع.
+    """
+    
+    def __init__(self, spec: str):
+        parts = [part.strip() for part in spec.split(',')]
+        if len(parts) < 2 or not parts[0]:
+            raise ValueError(f"مخطط تيليمتري غير صالح: {spec!r}")
+        self.tag = parts[0]
+        self.fields: List[Optional[Tuple[str, Optional[str]]]] = [self._resolve(name) for name in parts[1:]]
+        self.field_count = len(parts)
+    
+    @staticmethod
+    def _resolve(name: str) -> Optional[Tuple[str, Optional[str]]]:
+        if name == SKIP_FIELD:
+            return None
+        if name in FIELD_ALIASES:
+            return FIELD_ALIASES[name]
+        group, _, field = name.partition('.')
+        if not group or not field:
+            raise ValueError(f"حقل تيليمتري غير معروف: {name!r}")
+        return group, field
+    
+    def compile(self, state: Dict[str, Any]) -> Callable[[List[str]], bool]:
+        """تجهيز دالة parse(fields) تكتب في state وتُرجع False للسطر التالف
+        
+        fields هي نتيجة line.split(',') والوسم في fields[0]. الدالة مرتبطة
+        بقواميس state الفرعية الحالية فيجب تحديثها في مكانها لا استبدالها.
+        أسماء الحقول من الإعدادات تبقى مفاتيح قواميس فقط ولا تُنفذ كشيفرة.
+        """
+        # (رقم العمود، دالة التحويل) ثم (القاموس، المفتاح، ترتيب القيمة، عكس الإشارة)
+        converts: List[Tuple[int, Callable[[str], Any]]] = []
+        writes: List[Tuple[Dict[str, Any], str, int, bool]] = []
+        has_z = ('position', 'z') in self.fields
+        for index, field in enumerate(self.fields, 1):
+            if field is None:
+                continue
+            group, name = field
+            slot = len(converts)
+            converts.append((index, _to_int if field in _INTEGER_FIELDS else float))
+            if name is None:
+                writes.append((state, group, slot, False))
+                continue
+            writes.append((state.setdefault(group, {}), name, slot, False))
+            if field == ('sensors', 'depth') and not has_z:
+                writes.append((state.setdefault('position', {}), 'z', slot, True))
+        field_count = self.field_count
+        
+        def parse(fields: List[str]) -> bool:
+            if len(fields) != field_count:
+                return False
+            try:
+                values = [convert(fields[index]) for index, convert in converts]
+            except ValueError:
+                return False
+            for target, key, slot, negate in writes:
+                target[key] = -values[slot] if negate else values[slot]
+            return True
+        
+        return parse
+    
+    def format(self, state: Dict[str, Any]) -> str:
+        """سطر بصيغة المخطط من قاموس حالة (للمحاكي والاختبار)"""
+        values = [self.tag]
+        for field in self.fields:
+            if field is None:
+                values.append('0')
+                continue
+            group, name = field
+            value = state.get(group, 0) if name is None else state.get(group, {}).get(name, 0)
+            values.append(str(int(value)) if field in _INTEGER_FIELDS else f"{value:.3f}")
+        return ','.join(values)
+    
+    def describe(self) -> str:
+        """المخطط بأسماء المسارات الكاملة (للسجل)"""
+        return ','.join([self.tag] + [SKIP_FIELD if field is None else _field_name(*field) for field in self.fields])
+
+class LineTelemetryParser:
+    """تطبيق أسطر التيليمتري النصية على rov_state حسب مخطط أو أكثر (مفصولة بـ ;)"""
+    
+    def __init__(self, spec: str = DEFAULT_LINE_SCHEMA):
+        self.logger = ROVLogger('LineTelemetry')
+        self.schemas: Dict[str, LineTelemetrySchema] = {}
+        for part in spec.split(';'):
+            if part.strip():
+                schema = LineTelemetrySchema(part)
+                self.schemas[schema.tag] = schema
+        self._parsers: Dict[str, Callable[[List[str]], bool]] = {}
+        
+        self.stats = {
+            'lines': 0,
+            'malformed': 0,
+            'unknown': 0
+        }
+    
+    def bind(self, state: Dict[str, Any]):
+        """ترجمة المخططات مرة واحدة مرتبطة بقاموس الحالة"""
+        self._parsers = {tag: schema.compile(state) for tag, schema in self.schemas.items()}
+        self.logger.info(f"مخططات التيليمتري النصي: {'; '.join(s.describe() for s in self.schemas.values())}")
+    
+    def apply(self, line: str) -> bool:
+        """تحليل سطر وكتابته في الحالة؛ False لسطر بوسم آخر أو سطر تالف"""
+        fields = line.split(',')
+        parse = self._parsers.get(fields[0])
+        if parse is None:
+            self.stats['unknown'] += 1
+            return False
+        if parse(fields):
+            self.stats['lines'] += 1
+            return True
+        self.stats['malformed'] += 1
+        if self.stats['malformed'] & (self.stats['malformed'] - 1) == 0:
+            # تسجيل متباعد (1، 2، 4، 8...) حتى لا يغرق السجل عند خلل مستمر في المركبة
+            self.logger.warning(f"سطر تيليمتري تالف ({self.stats['malformed']}): {line[:80]!r}")
+        return False
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """عدادات الأسطر المطبقة والتالفة وذات الوسم غير المعروف"""
+        return dict(self.stats)
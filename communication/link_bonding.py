@@ -0,0 +1,314 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from utils.logger import ROVLogger
+from .channels import CHANNEL_BULK
+from .clock_sync import ClockSync
+from .link_health import LinkHealth, parse_pong, pong_times
+from .reliability import DuplicateFilter
+
+# سياسات إرسال الأوامر الحرجة (المحركات)
+BOND_MODE_BEST = 'best'            # أفضل وصلة فقط
+BOND_MODE_DUPLICATE = 'duplicate'  # كل الوصلات الحية
+
+class BondedLink:
+    """تجميع عدة وسائل اتصال (تسلسلي، شبكي) خلف واجهة وسيلة اتصال واحدة
+    
+    كل الوصلات تبقى مفتوحة ويُقاس RTT والفقد لكل منها بـ ping مرقّم دوري.
+    الأوامر تُرسل على أفضل وصلة (أو تُكرر على كل الوصلات الحية)، والإيقاف
+    الطارئ يُرسل دائماً على كل الوصلات. الرسائل الواردة ذات رقم التسلسل تُزال
+    مكرراتها، فالتحويل بين الوصلات يتم خلال دورة فحص واحدة دون إعادة تشغيل.
+    """
+    
+    def __init__(self, links: Dict[str, Any], mode: str = BOND_MODE_BEST,
+                 probe_interval: float = 0.1, dead_after: Optional[float] = None,
+                 switch_margin: float = 0.2, clock: Optional[ClockSync] = None):
+        self.logger = ROVLogger('BondedLink')
+        self.mode = mode
+        self.probe_interval = probe_interval
+        # الوصلة التي لم ترد خلال ثلاث دورات فحص تُعتبر معطلة
+        self.dead_after = dead_after if dead_after is not None else probe_interval * 3
+        # لا يتم التبديل لوصلة أسرع إلا إذا كانت أفضل بهذه النسبة (منع التذبذب)
+        self.switch_margin = switch_margin
+        
+        # الوصلات بترتيب الأولوية عند التساوي
+        self.links = dict(links)
+        # كل الوصلات تغذي نفس مقدّر الساعة (يعتمد على أسرع التبادلات أياً كانت وصلتها)
+        self.health = {name: LinkHealth(name, timeout=max(1.0, self.dead_after * 2), clock=clock)
+                       for name in self.links}
+        self._health_lock = threading.Lock()
+        
+        self.active: Optional[str] = None
+        self.is_connected = False
+        
+        # إزالة المكررات: نافذة عامة، والتيليمتري يقبل الأحدث فقط
+        self._dedup_lock = threading.Lock()
+        self._message_filter = DuplicateFilter()
+        self._telemetry_filter = DuplicateFilter()
+        
+        # معالجات البيانات الواردة
+        self.data_handler: Optional[Callable] = None
+        self.batch_handler: Optional[Callable] = None
+        
+        self.probe_thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        
+        # إحصائيات
+        self.stats = {
+            'failovers': 0,
+            'duplicates_dropped': 0,
+            'send_failures': 0
+        }
+        
+        for name, link in self.links.items():
+            link.set_data_handler(self._make_data_handler(name))
+            if hasattr(link, 'set_batch_handler'):
+                link.set_batch_handler(self._make_batch_handler(name))
+    
+    # ---- واجهة وسيلة الاتصال ----
+    
+    def connect(self) -> bool:
+        """فتح كل الوصلات (ينجح إذا نجحت وصلة واحدة على الأقل)"""
+        for name, link in self.links.items():
+            try:
+                if link.connect():
+                    self.logger.info(f"الوصلة {name} متصلة")
+                else:
+                    self.logger.warning(f"فشل فتح الوصلة {name}")
+            except Exception as e:
+                self.logger.error(f"خطأ في فتح الوصلة {name}: {e}")
+        
+        connected = [name for name, link in self.links.items() if link.is_connected]
+        self.is_connected = bool(connected)
+        if not self.is_connected:
+            return False
+        
+        # أول وصلة متصلة حتى تصل قياسات RTT
+        self.active = connected[0]
+        self._stop_event.clear()
+        self.probe_thread = threading.Thread(target=self._probe_loop, name='BondProbe', daemon=True)
+        self.probe_thread.start()
+        return True
+    
+    def disconnect(self):
+        """إغلاق كل الوصلات"""
+        self._stop_event.set()
+        if self.probe_thread and self.probe_thread.is_alive():
+            self.probe_thread.join(timeout=2)
+        
+        for link in self.links.values():
+            try:
+                link.disconnect()
+            except Exception as e:
+                self.logger.error(f"خطأ في إغلاق وصلة: {e}")
+        
+        self.is_connected = False
+        self.active = None
+    
+    def send_motor_commands(self, motors: Dict[str, int]) -> bool:
+        """إرسال أوامر المحركات على أفضل وصلة أو على كل الوصلات الحية"""
+        if self.mode == BOND_MODE_DUPLICATE:
+            return self._send_all(lambda link: link.send_motor_commands(motors))
+        return self._send_best(lambda link: link.send_motor_commands(motors))
+    
+    def emergency_stop(self) -> bool:
+        """الإيقاف الطارئ يُرسل على كل الوصلات المتصلة"""
+        return self._send_all(lambda link: link.emergency_stop(), alive_only=False)
+    
+    def request_telemetry(self) -> bool:
+        return self._send_best(lambda link: link.request_telemetry())
+    
+    def request_keyframe(self) -> bool:
+        return self._send_best(lambda link: link.request_keyframe()
+                               if hasattr(link, 'request_keyframe') else False)
+    
+    def ping(self, seq: Optional[int] = None) -> bool:
+        return self._send_best(lambda link: link.ping(seq))
+    
+    def send_bulk(self, data: bytes, channel: int = CHANNEL_BULK) -> bool:
+        """النقل الكبير على الوصلة النشطة فقط (الأجزاء لا تُكرر)"""
+        return self._send_best(lambda link: link.send_bulk(data, channel)
+                               if hasattr(link, 'send_bulk') else False)
+    
+    def set_bulk_handler(self, handler: Callable[[int, bytes], None]):
+        """تعيين معالج النقل الكبير المكتمل على كل الوصلات"""
+        for link in self.links.values():
+            if hasattr(link, 'set_bulk_handler'):
+                link.set_bulk_handler(handler)
+    
+    def set_data_handler(self, handler: Callable):
+        """تعيين معالج البيانات الواردة"""
+        self.data_handler = handler
+    
+    def set_batch_handler(self, handler: Callable[[List[Any]], None]):
+        """تعيين معالج دفعات البيانات الواردة"""
+        self.batch_handler = handler
+    
+    def get_write_stats(self) -> Dict[str, Any]:
+        """إحصائيات الكتابة لكل وصلة"""
+        return {name: link.get_write_stats() for name, link in self.links.items()
+                if hasattr(link, 'get_write_stats')}
+    
+    def get_link_stats(self) -> Dict[str, Any]:
+        """RTT والفقد والحالة لكل وصلة"""
+        now = time.monotonic()
+        with self._health_lock:
+            links = {}
+            for name, health in self.health.items():
+                stats = health.get_stats()
+                stats['connected'] = self.links[name].is_connected
+                stats['alive'] = health.is_alive(self.dead_after, now)
+                stats['active'] = name == self.active
+                links[name] = stats
+        
+        stats = dict(self.stats)
+        stats['stale_dropped'] = self._telemetry_filter.stale
+        stats['mode'] = self.mode
+        stats['active'] = self.active
+        stats['links'] = links
+        return stats
+    
+    # ---- اختيار الوصلة ----
+    
+    def _usable(self, name: Optional[str], now: float) -> bool:
+        if name is None:
+            return False
+        return self.links[name].is_connected and self.health[name].is_alive(self.dead_after, now)
+    
+    def _score(self, name: str) -> float:
+        """تكلفة الوصلة: RTT المُنعَّم مضروباً في عقوبة الفقد"""
+        health = self.health[name]
+        srtt = health.srtt if health.srtt is not None else self.dead_after
+        return srtt * (1.0 + 10.0 * health.loss)
+    
+    def _select_active(self, now: float):
+        """اختيار أفضل وصلة مع منع التذبذب بين وصلتين متقاربتين"""
+        with self._health_lock:
+            usable = [name for name in self.links if self._usable(name, now)]
+            if not usable:
+                # لا توجد قياسات حية: الإبقاء على أي وصلة متصلة
+                usable = [name for name, link in self.links.items() if link.is_connected]
+                if self.active in usable or not usable:
+                    self.is_connected = bool(usable)
+                    return
+                best = usable[0]
+            else:
+                best = min(usable, key=self._score)
+                if (self.active in usable and best != self.active and
+                        self._score(best) > self._score(self.active) * (1.0 - self.switch_margin)):
+                    best = self.active
+            
+            self.is_connected = True
+            previous = self.active
+            if best == previous:
+                return
+            self.active = best
+            self.stats['failovers'] += 1
+        
+        self.logger.warning(f"تبديل الوصلة النشطة: {previous} -> {best}")
+    
+    def _send_best(self, send: Callable[[Any], bool]) -> bool:
+        """إرسال على الوصلة النشطة، ثم على أي وصلة أخرى متصلة عند الفشل"""
+        order = [self.active] + [name for name in self.links if name != self.active]
+        for name in order:
+            if name is None:
+                continue
+            link = self.links[name]
+            if not link.is_connected:
+                continue
+            if send(link):
+                return True
+            self.stats['send_failures'] += 1
+        return False
+    
+    def _send_all(self, send: Callable[[Any], bool], alive_only: bool = True) -> bool:
+        """إرسال على كل الوصلات (الحية فقط أو كل المتصلة)"""
+        now = time.monotonic()
+        targets = [name for name in self.links
+                   if self.links[name].is_connected and (not alive_only or self._usable(name, now))]
+        if not targets:
+            return self._send_best(send)
+        
+        sent = False
+        for name in targets:
+            if send(self.links[name]):
+                sent = True
+            else:
+                self.stats['send_failures'] += 1
+        return sent
+    
+    # ---- الفحص الدوري ----
+    
+    def _probe_loop(self):
+        """إرسال ping مرقّم على كل وصلة وتحديث الوصلة النشطة"""
+        while not self._stop_event.is_set():
+            now = time.monotonic()
+            for name, link in self.links.items():
+                if not link.is_connected:
+                    continue
+                with self._health_lock:
+                    health = self.health[name]
+                    health.expire(now)
+                    seq = health.next_ping(now)
+                try:
+                    link.ping(seq)
+                except Exception as e:
+                    self.logger.debug(f"فشل ping على {name}: {e}")
+            
+            self._select_active(now)
+            self._stop_event.wait(self.probe_interval)
+    
+    # ---- الرسائل الواردة ----
+    
+    def _make_data_handler(self, name: str) -> Callable[[Any], None]:
+        def handler(message: Any):
+            if self._accept(name, message):
+                self._deliver([message])
+        return handler
+    
+    def _make_batch_handler(self, name: str) -> Callable[[List[Any]], None]:
+        def handler(batch: List[Any]):
+            accepted = [message for message in batch if self._accept(name, message)]
+            if accepted:
+                self._deliver(accepted)
+        return handler
+    
+    def _accept(self, name: str, message: Any) -> bool:
+        """معالجة pong وإزالة المكررات؛ True إذا كانت الرسالة للتمرير"""
+        is_pong, seq = parse_pong(message)
+        if is_pong:
+            self._record_pong(name, seq, pong_times(message))
+            return False
+        
+        if isinstance(message, dict):
+            kind = message.get('type')
+            seq = message.get('seq')
+            # التيليمتري التفاضلي خاص بكل وصلة فلا يُقارن رقم تسلسله بين الوصلات
+            if seq is None or 'keyframe' in message or kind == 'telemetry_out_of_sync':
+                return True
+            
+            with self._dedup_lock:
+                if kind == 'telemetry':
+                    accepted = self._telemetry_filter.accept(seq, newest_only=True)
+                else:
+                    accepted = self._message_filter.accept(seq)
+            if not accepted:
+                self.stats['duplicates_dropped'] += 1
+            return accepted
+        
+        return True
+    
+    def _record_pong(self, name: str, seq: Optional[int], remote_times: Optional[Tuple[float, float]] = None):
+        with self._health_lock:
+            rtt = self.health[name].on_pong(seq, remote_times=remote_times)
+        # وصلة نشطة متوقفة عادت أو وصلة أسرع ظهرت: إعادة الاختيار فوراً عند أول رد
+        if rtt is not None and self.active != name and not self._usable(self.active, time.monotonic()):
+            self._select_active(time.monotonic())
+    
+    def _deliver(self, batch: List[Any]):
+        if self.batch_handler:
+            self.batch_handler(batch)
+        elif self.data_handler:
+            for message in batch:
+                self.data_handler(message)
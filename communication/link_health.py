@@ -0,0 +1,176 @@
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+from .clock_sync import ClockSync
+
+def parse_pong(message: Any) -> Tuple[bool, Optional[int]]:
+    """هل الرسالة pong ورقم تسلسلها (JSON/ثنائي: {'type': 'pong', 'seq': n}، نصي: PONG[,n])"""
+    if isinstance(message, dict):
+        if message.get('type') != 'pong':
+            return False, None
+        seq = message.get('seq')
+        return True, seq if isinstance(seq, int) else None
+    
+    if isinstance(message, str) and message.startswith('PONG'):
+        _, _, fields = message.partition(',')
+        seq = fields.split(',', 1)[0].strip()
+        return True, int(seq) if seq.isdigit() else None
+    
+    return False, None
+
+def pong_times(message: Any) -> Optional[Tuple[float, float]]:
+    """زمنا استقبال ping وإرسال pong بساعة المركبة إن وُجدا
+    
+    JSON/ثنائي: {'rx_time': t2, 'tx_time': t3}، نصي: PONG,<seq>,<t2>,<t3>
+    """
+    try:
+        if isinstance(message, dict):
+            if message.get('rx_time') is None or message.get('tx_time') is None:
+                return None
+            return float(message['rx_time']), float(message['tx_time'])
+        if isinstance(message, str):
+            fields = message.split(',')
+            if len(fields) >= 4:
+                return float(fields[2]), float(fields[3])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+class LinkHealth:
+    """قياس صحة وصلة واحدة من ping/pong مرقّمة: RTT مُنعَّم، مدرج RTT، التذبذب ونسبة الفقد
+    
+    لا يرسل شيئاً بنفسه - المستخدم يسجل كل ping مُرسل وكل pong وارد ويستدعي
+    expire() دورياً لاحتساب الردود التي تأخرت عن المهلة كمفقودة.
+    """
+    
+    def __init__(self, name: str, timeout: float = 1.0, loss_window: int = 50, window: int = 256,
+                 clock: Optional[ClockSync] = None):
+        self.name = name
+        # مقدّر فرق الساعة يأخذ كل تبادل مكتمل يحمل أزمنة المركبة
+        self.clock = clock
+        self.timeout = timeout
+        self._loss_alpha = 1.0 / loss_window
+        
+        # آخر window قياس لحساب المئينات (p50/p95/p99)
+        self._samples: Deque[float] = deque(maxlen=window)
+        # التذبذب بأسلوب RFC 3550: متوسط متحرك لفرق RTT بين ردين متتاليين
+        self.jitter = 0.0
+        
+        self.seq = 0
+        self._outstanding: Dict[int, float] = {}  # رقم التسلسل -> زمن الإرسال
+        
+        self.srtt: Optional[float] = None
+        self.rttvar: Optional[float] = None
+        self.last_rtt: Optional[float] = None
+        self.loss = 0.0
+        self.last_pong: Optional[float] = None
+        
+        # إحصائيات
+        self.stats = {
+            'pings_sent': 0,
+            'pongs_received': 0,
+            'lost': 0,
+            'late_pongs': 0
+        }
+    
+    def next_ping(self, now: Optional[float] = None) -> int:
+        """حجز رقم تسلسل لـ ping جديد وتسجيل زمن إرساله"""
+        now = time.monotonic() if now is None else now
+        self.seq = (self.seq + 1) & 0xFFFF
+        self._outstanding[self.seq] = now
+        self.stats['pings_sent'] += 1
+        return self.seq
+    
+    def on_pong(self, seq: Optional[int], now: Optional[float] = None,
+                remote_times: Optional[Tuple[float, float]] = None) -> Optional[float]:
+        """تسجيل pong وإرجاع RTT بالثواني (None إذا كان غير معروف أو متأخراً)
+        
+        remote_times: (t2, t3) بساعة المركبة من pong_times() لمزامنة الساعة.
+        """
+        now = time.monotonic() if now is None else now
+        
+        if seq is None:
+            # رد بدون رقم تسلسل (مثل PONG النصي): يُطابق أقدم ping معلق
+            seq = self.oldest_ping()
+            if seq is None:
+                return None
+        
+        sent_at = self._outstanding.pop(seq, None)
+        if sent_at is None:
+            self.stats['late_pongs'] += 1
+            return None
+        
+        rtt = now - sent_at
+        if self.clock is not None and remote_times is not None:
+            self.clock.add_exchange(sent_at, remote_times[0], remote_times[1], now)
+        if self.last_rtt is not None:
+            self.jitter += (abs(rtt - self.last_rtt) - self.jitter) / 16.0
+        self.last_rtt = rtt
+        self._samples.append(rtt)
+        self.last_pong = now
+        self.stats['pongs_received'] += 1
+        self.loss -= self.loss * self._loss_alpha
+        
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        return rtt
+    
+    def oldest_ping(self) -> Optional[int]:
+        """رقم تسلسل أقدم ping لم يصل رده"""
+        return next(iter(self._outstanding), None)
+    
+    def expire(self, now: Optional[float] = None) -> int:
+        """احتساب الـ ping التي تجاوزت المهلة كمفقودة وإرجاع عددها"""
+        now = time.monotonic() if now is None else now
+        expired = [seq for seq, sent_at in self._outstanding.items() if now - sent_at > self.timeout]
+        for seq in expired:
+            del self._outstanding[seq]
+            self.loss += (1.0 - self.loss) * self._loss_alpha
+        self.stats['lost'] += len(expired)
+        return len(expired)
+    
+    def is_alive(self, dead_after: float, now: Optional[float] = None) -> bool:
+        """هل وصل رد خلال dead_after ثانية"""
+        if self.last_pong is None:
+            return False
+        now = time.monotonic() if now is None else now
+        return now - self.last_pong <= dead_after
+    
+    def percentiles(self, *percents: float) -> Tuple[Optional[float], ...]:
+        """مئينات RTT بالثواني (رتبة أقرب قيمة) من نافذة القياسات الأخيرة"""
+        if not self._samples:
+            return tuple(None for _ in percents)
+        ordered = sorted(self._samples)
+        last = len(ordered) - 1
+        return tuple(ordered[min(last, max(0, int(percent / 100.0 * len(ordered) + 0.999999) - 1))]
+                     for percent in percents)
+    
+    def reset(self):
+        """مسح القياسات (بعد إعادة الاتصال)"""
+        self._outstanding.clear()
+        self._samples.clear()
+        self.srtt = self.rttvar = self.last_rtt = None
+        self.last_pong = None
+        self.jitter = 0.0
+        self.loss = 0.0
+        if self.clock is not None:
+            self.clock.reset()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """الحصول على إحصائيات الوصلة"""
+        stats = dict(self.stats)
+        stats['srtt_ms'] = self.srtt * 1000.0 if self.srtt is not None else None
+        stats['rttvar_ms'] = self.rttvar * 1000.0 if self.rttvar is not None else None
+        stats['last_rtt_ms'] = self.last_rtt * 1000.0 if self.last_rtt is not None else None
+        for percent, value in zip((50, 95, 99), self.percentiles(50, 95, 99)):
+            stats[f'p{percent}_ms'] = value * 1000.0 if value is not None else None
+        stats['jitter_ms'] = self.jitter * 1000.0
+        stats['samples'] = len(self._samples)
+        stats['loss'] = self.loss
+        stats['outstanding'] = len(self._outstanding)
+        return stats
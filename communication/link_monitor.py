@@ -0,0 +1,117 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from utils.logger import ROVLogger
+from .clock_sync import ClockSync
+from .link_health import LinkHealth, parse_pong, pong_times
+
+class LinkMonitor:
+    """ping/pong مرقّم في الخلفية لوسيلة اتصال واحدة
+    
+    يرسل ping برقم تسلسل كل interval ثانية ويطابق ردود pong الواردة لقياس
+    RTT (مع مئينات p50/p95/p99) والتذبذب ونسبة الفقد. الردود تصل عبر
+    handle_message() من معالج البيانات لأن وسيلة الاتصال تملك خيط القراءة.
+    """
+    
+    def __init__(self, transport: Any, interval: float = 1.0, timeout: float = 2.0,
+                 window: int = 256, name: str = 'link', clock: Optional[ClockSync] = None):
+        self.logger = ROVLogger('LinkMonitor')
+        self.transport = transport
+        self.interval = interval
+        # الوصلة التي لم ترد خلال ثلاث دورات تُعتبر معطلة
+        self.dead_after = max(interval * 3, timeout)
+        self.health = LinkHealth(name, timeout=timeout, window=window, clock=clock)
+        
+        self._condition = threading.Condition()
+        self._waiting: Dict[int, Optional[float]] = {}  # ping ينتظر المستدعي ردها -> RTT
+        
+        self.thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+    
+    def start(self):
+        """بدء الفحص الدوري"""
+        if self.thread and self.thread.is_alive():
+            return
+        with self._condition:
+            self.health.reset()
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._ping_loop, name='LinkMonitor', daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        """إيقاف الفحص الدوري"""
+        self._stop_event.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=2)
+        self.thread = None
+    
+    def handle_message(self, message: Any) -> bool:
+        """تسجيل pong وارد؛ True إذا كانت الرسالة pong (لا تُمرر للتيليمتري)"""
+        is_pong, seq = parse_pong(message)
+        if not is_pong:
+            return False
+        
+        with self._condition:
+            if seq is None:
+                # رد بدون رقم تسلسل (PONG النصي القديم) يطابق أقدم ping معلق
+                seq = self.health.oldest_ping()
+            rtt = self.health.on_pong(seq, remote_times=pong_times(message))
+            if seq in self._waiting:
+                self._waiting[seq] = rtt
+                self._condition.notify_all()
+        return True
+    
+    def probe(self, timeout: float = 1.0) -> Optional[float]:
+        """إرسال ping فوري وانتظار رده؛ يُرجع RTT بالثواني أو None عند انتهاء المهلة"""
+        with self._condition:
+            seq = self.health.next_ping()
+            self._waiting[seq] = None
+        
+        try:
+            if not self.transport.ping(seq):
+                return None
+            deadline = time.monotonic() + timeout
+            with self._condition:
+                while self._waiting[seq] is None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return None
+                    self._condition.wait(remaining)
+                return self._waiting[seq]
+        finally:
+            with self._condition:
+                self._waiting.pop(seq, None)
+    
+    def is_alive(self) -> bool:
+        """هل وصل رد خلال آخر dead_after ثانية"""
+        with self._condition:
+            return self.health.is_alive(self.dead_after)
+    
+    def is_silent(self) -> bool:
+        """هل توقفت الوصلة عن الرد بعد أن ردت (مركبة لا تدعم ping لا تُعتبر صامتة)"""
+        with self._condition:
+            return self.health.last_pong is not None and not self.health.is_alive(self.dead_after)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """RTT (مُنعَّم ومئينات) والتذبذب والفقد بالمللي ثانية"""
+        with self._condition:
+            stats = self.health.get_stats()
+            stats['alive'] = self.health.is_alive(self.dead_after)
+        stats['running'] = bool(self.thread and self.thread.is_alive())
+        return stats
+    
+    def _ping_loop(self):
+        """إرسال ping مرقّم كل interval واحتساب الردود المتأخرة كمفقودة"""
+        while not self._stop_event.is_set():
+            if getattr(self.transport, 'is_connected', False):
+                with self._condition:
+                    lost = self.health.expire()
+                    seq = self.health.next_ping()
+                if lost:
+                    self.logger.debug(f"لم يصل رد على {lost} ping")
+                try:
+                    self.transport.ping(seq)
+                except Exception as e:
+                    self.logger.debug(f"فشل إرسال ping: {e}")
+            self._stop_event.wait(self.interval)
@@ -0,0 +1,254 @@
+import binascii
+import struct
+from typing import Any, Dict, List, NamedTuple, Tuple, Union
+
+# علامات بداية الإطار
+MAVLINK_STX_V1 = 0xFE
+MAVLINK_STX_V2 = 0xFD
+INCOMPAT_SIGNED = 0x01
+SIGNATURE_SIZE = 13
+
+# ترويسة MAVLink 2 بعد علامة البداية: الطول، incompat، compat، التسلسل، النظام، المكون، رقم الرسالة (3 بايت)
+_HEADER_V2 = struct.Struct('<BBBBBBHB')
+_HEADER_V1 = struct.Struct('<BBBBB')
+_CRC = struct.Struct('<H')
+HEADER_V2_SIZE = 1 + _HEADER_V2.size
+HEADER_V1_SIZE = 1 + _HEADER_V1.size
+
+# أرقام الرسائل المستخدمة
+MSG_HEARTBEAT = 0
+MSG_SYS_STATUS = 1
+MSG_SCALED_PRESSURE = 29
+MSG_ATTITUDE = 30
+MSG_REQUEST_DATA_STREAM = 66
+MSG_MANUAL_CONTROL = 69
+MSG_RC_CHANNELS_OVERRIDE = 70
+MSG_COMMAND_LONG = 76
+MSG_COMMAND_ACK = 77
+MSG_TIMESYNC = 111
+MSG_SCALED_PRESSURE2 = 137
+
+# قيم من تعريف common.xml
+MAV_TYPE_GCS = 6
+MAV_TYPE_SUBMARINE = 12
+MAV_AUTOPILOT_INVALID = 8
+MAV_AUTOPILOT_ARDUPILOTMEGA = 3
+MAV_STATE_ACTIVE = 4
+MAV_MODE_FLAG_SAFETY_ARMED = 0x80
+MAV_DATA_STREAM_ALL = 0
+MAV_CMD_COMPONENT_ARM_DISARM = 400
+ARM_DISARM_FORCE = 21196
+
+class MessageSpec(NamedTuple):
+    """تعريف رسالة: الاسم، CRC_EXTRA، مُرمِّز الحقول الأساسية (بترتيب الإرسال) وأسماؤها"""
+    name: str
+    crc_extra: int
+    codec: struct.Struct
+    fields: Tuple[str, ...]
+
+def _spec(name: str, crc_extra: int, layout: str, fields: str) -> MessageSpec:
+    return MessageSpec(name, crc_extra, struct.Struct('<' + layout), tuple(fields.split()))
+
+# الحقول الأساسية فقط (بدون امتدادات MAVLink 2): CRC_EXTRA يُحسب منها، والامتدادات الواردة تُتجاهل
+MESSAGES: Dict[int, MessageSpec] = {
+    MSG_HEARTBEAT: _spec('HEARTBEAT', 50, 'IBBBBB',
+                         'custom_mode type autopilot base_mode system_status mavlink_version'),
+    MSG_SYS_STATUS: _spec('SYS_STATUS', 124, 'IIIHHhHHHHHHb',
+                          'onboard_control_sensors_present onboard_control_sensors_enabled '
+                          'onboard_control_sensors_health load voltage_battery current_battery drop_rate_comm '
+                          'errors_comm errors_count1 errors_count2 errors_count3 errors_count4 battery_remaining'),
+    MSG_SCALED_PRESSURE: _spec('SCALED_PRESSURE', 115, 'Iffh', 'time_boot_ms press_abs press_diff temperature'),
+    MSG_ATTITUDE: _spec('ATTITUDE', 39, 'Iffffff',
+                        'time_boot_ms roll pitch yaw rollspeed pitchspeed yawspeed'),
+    MSG_REQUEST_DATA_STREAM: _spec('REQUEST_DATA_STREAM', 148, 'HBBBB',
+                                   'req_message_rate target_system target_component req_stream_id start_stop'),
+    MSG_MANUAL_CONTROL: _spec('MANUAL_CONTROL', 243, 'hhhhHB', 'x y z r buttons target'),
+    MSG_RC_CHANNELS_OVERRIDE: _spec('RC_CHANNELS_OVERRIDE', 124, 'HHHHHHHHBB',
+                                    'chan1_raw chan2_raw chan3_raw chan4_raw chan5_raw chan6_raw chan7_raw '
+                                    'chan8_raw target_system target_component'),
+    MSG_COMMAND_LONG: _spec('COMMAND_LONG', 152, 'fffffffHBBB',
+                            'param1 param2 param3 param4 param5 param6 param7 command target_system '
+                            'target_component confirmation'),
+    MSG_COMMAND_ACK: _spec('COMMAND_ACK', 143, 'HB', 'command result'),
+    MSG_TIMESYNC: _spec('TIMESYNC', 34, 'qq', 'tc1 ts1'),
+    MSG_SCALED_PRESSURE2: _spec('SCALED_PRESSURE2', 195, 'Iffh', 'time_boot_ms press_abs press_diff temperature'),
+}
+
+MESSAGE_IDS: Dict[str, int] = {spec.name: msg_id for msg_id, spec in MESSAGES.items()}
+
+# ---- CRC-16/MCRF4XX (X.25) ----
+# هو CRC-CCITT المعكوس: binascii.crc_hqx (بسرعة C) على بايتات معكوسة البتات ثم عكس الناتج
+
+_REVERSE = bytes(int(f"{value:08b}"[::-1], 2) for value in range(256))
+
+def _reverse16(value: int) -> int:
+    return (_REVERSE[value & 0xFF] << 8) | _REVERSE[value >> 8]
+
+def x25_crc(data: Union[bytes, bytearray, memoryview], crc: int = 0xFFFF) -> int:
+    """CRC-16/MCRF4XX المستخدم في MAVLink (يمكن متابعته بتمرير crc السابق)"""
+    return _reverse16(binascii.crc_hqx(bytes(data).translate(_REVERSE), _reverse16(crc)))
+
+# CRC_EXTRA معكوس البتات لمتابعة crc_hqx مباشرة
+_CRC_EXTRA_REVERSED: Dict[int, bytes] = {msg_id: bytes((_REVERSE[spec.crc_extra],))
+                                         for msg_id, spec in MESSAGES.items()}
+
+def _frame_crc(header_and_payload, msg_id: int) -> int:
+    """CRC إطار: كل ما بعد علامة البداية ثم CRC_EXTRA للرسالة"""
+    crc = binascii.crc_hqx(header_and_payload.translate(_REVERSE), 0xFFFF)
+    return _reverse16(binascii.crc_hqx(_CRC_EXTRA_REVERSED[msg_id], crc))
+
+class MAVLinkCodec:
+    """ترميز رسائل MAVLink 2 بمُرمِّزات struct محسوبة مسبقاً
+    
+    كل رسالة تحمل رقم تسلسل متزايد، والأصفار في نهاية المحتوى تُحذف كما
+    يتطلب MAVLink 2 (المستقبل يعيدها).
+    """
+    
+    def __init__(self, system_id: int = 255, component_id: int = 190):
+        self.system_id = system_id
+        self.component_id = component_id
+        self._seq = 0
+    
+    def encode(self, msg_id: int, *values) -> bytes:
+        """ترميز رسالة من قيم حقولها الأساسية بترتيب الإرسال"""
+        payload = MESSAGES[msg_id].codec.pack(*values).rstrip(b'\x00') or b'\x00'
+        self._seq = (self._seq + 1) & 0xFF
+        frame = bytearray(_HEADER_V2.pack(len(payload), 0, 0, self._seq, self.system_id, self.component_id,
+                                          msg_id & 0xFFFF, msg_id >> 16))
+        frame += payload
+        crc = _frame_crc(frame, msg_id)
+        frame[0:0] = b'\xfd'
+        frame += _CRC.pack(crc)
+        return bytes(frame)
+    
+    def encode_fields(self, msg_id: int, **fields) -> bytes:
+        """ترميز رسالة من حقول مسماة (الحقول غير المذكورة أصفار)"""
+        return self.encode(msg_id, *(fields.get(name, 0) for name in MESSAGES[msg_id].fields))
+
+class MAVLinkParser:
+    """فك إطارات MAVLink 1 و 2 من تدفق بايتات بالتجزئة العشوائية
+    
+    feed() تُرجع الرسائل المعروفة كقواميس (حقولها + 'msg' و 'sysid' و 'compid').
+    الإطار ذو CRC الخاطئ أو رقم الرسالة غير المعروف يُتجاوز بايتاً واحداً
+    لإعادة التزامن. التوقيع (MAVLink 2) لا يُتحقق منه.
+    """
+    
+    def __init__(self, max_buffer: int = 64 * 1024):
+        self.max_buffer = max_buffer
+        self._buffer = bytearray()
+        # آخر تسلسل لكل (نظام، مكون) لحساب الرسائل المفقودة
+        self._last_seq: Dict[Tuple[int, int], int] = {}
+        
+        # إحصائيات
+        self.stats = {
+            'messages': 0,
+            'crc_errors': 0,
+            'unknown': 0,
+            'lost': 0,
+            'discarded_bytes': 0
+        }
+    
+    def feed(self, data: Union[bytes, bytearray, memoryview]) -> List[Dict[str, Any]]:
+        """إضافة بايتات وإرجاع كل الرسائل المكتملة"""
+        buffer = self._buffer
+        buffer += data
+        size = len(buffer)
+        # المخزن معكوس البتات مرة واحدة لكل الإطارات (CRC بلا نسخ لكل رسالة)
+        reversed_view = memoryview(buffer.translate(_REVERSE))
+        messages = []
+        position = 0
+        decoded = 0
+        last_seq = self._last_seq
+        
+        while position < size:
+            # الحالة المعتادة: الإطار التالي يبدأ مباشرة بعد السابق
+            if buffer[position] == MAVLINK_STX_V2:
+                start = position
+            else:
+                start = self._find_start(buffer, position)
+                if start < 0:
+                    self.stats['discarded_bytes'] += size - position
+                    position = size
+                    break
+                self.stats['discarded_bytes'] += start - position
+                position = start
+            
+            if buffer[start] == MAVLINK_STX_V2:
+                if size - start < HEADER_V2_SIZE:
+                    break
+                length, incompat, _, seq, sysid, compid, low, high = _HEADER_V2.unpack_from(buffer, start + 1)
+                if incompat & ~INCOMPAT_SIGNED:
+                    # علم غير معرّف: ليست بداية إطار حقيقية
+                    position = start + 1
+                    continue
+                msg_id = low | (high << 16)
+                header_size = HEADER_V2_SIZE
+                end = start + header_size + length + 2
+                if incompat & INCOMPAT_SIGNED:
+                    end += SIGNATURE_SIZE
+            else:
+                if size - start < HEADER_V1_SIZE:
+                    break
+                length, seq, sysid, compid, msg_id = _HEADER_V1.unpack_from(buffer, start + 1)
+                header_size = HEADER_V1_SIZE
+                end = start + header_size + length + 2
+            if end > size:
+                break
+            
+            spec = MESSAGES.get(msg_id)
+            if spec is None:
+                # لا يمكن التحقق من الإطار دون CRC_EXTRA فلا يُتجاوز بطوله (قد تكون بداية زائفة)
+                self.stats['unknown'] += 1
+                position = start + 1
+                continue
+            
+            payload_end = start + header_size + length
+            crc = binascii.crc_hqx(reversed_view[start + 1:payload_end], 0xFFFF)
+            crc = _reverse16(binascii.crc_hqx(_CRC_EXTRA_REVERSED[msg_id], crc))
+            if crc != _CRC.unpack_from(buffer, payload_end)[0]:
+                self.stats['crc_errors'] += 1
+                position = start + 1
+                continue
+            position = end
+            
+            # MAVLink 2 يحذف الأصفار في النهاية والامتدادات تزيد عن الحقول الأساسية
+            codec = spec.codec
+            if length >= codec.size:
+                values = codec.unpack_from(buffer, start + header_size)
+            else:
+                values = codec.unpack(bytes(buffer[start + header_size:payload_end]) + bytes(codec.size - length))
+            messages.append(dict(zip(spec.fields, values), msg=spec.name, sysid=sysid, compid=compid))
+            decoded += 1
+            
+            key = (sysid, compid)
+            last = last_seq.get(key)
+            if last is not None:
+                gap = (seq - last - 1) & 0xFF
+                if gap < 128:
+                    # القفزة للخلف (تكرار أو إعادة تشغيل المرسل) لا تُحسب فقداً
+                    self.stats['lost'] += gap
+            last_seq[key] = seq
+        
+        reversed_view.release()
+        self.stats['messages'] += decoded
+        del buffer[:position]
+        if len(buffer) > self.max_buffer:
+            self.stats['discarded_bytes'] += len(buffer)
+            buffer.clear()
+        return messages
+    
+    def reset(self):
+        self._buffer.clear()
+        self._last_seq.clear()
+    
+    def get_stats(self) -> Dict[str, int]:
+        stats = dict(self.stats)
+        stats['pending_bytes'] = len(self._buffer)
+        return stats
+    
+    @staticmethod
+    def _find_start(buffer: bytearray, position: int) -> int:
+        """أقرب علامة بداية (MAVLink 2 أو 1) من position"""
+        v2 = buffer.find(b'\xfd', position)
+        v1 = buffer.find(b'\xfe', position, v2 if v2 >= 0 else len(buffer))
+        return v1 if v1 >= 0 else v2
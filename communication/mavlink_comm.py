@@ -0,0 +1,382 @@
+import math
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import serial
+
+from utils.logger import ROVLogger
+from .mavlink import (
+    MAVLinkCodec, MAVLinkParser, MSG_HEARTBEAT, MSG_TIMESYNC, MSG_MANUAL_CONTROL, MSG_RC_CHANNELS_OVERRIDE,
+    MSG_COMMAND_LONG, MSG_REQUEST_DATA_STREAM, MAV_TYPE_GCS, MAV_AUTOPILOT_INVALID, MAV_STATE_ACTIVE,
+    MAV_MODE_FLAG_SAFETY_ARMED, MAV_DATA_STREAM_ALL, MAV_CMD_COMPONENT_ARM_DISARM, ARM_DISARM_FORCE
+)
+from .transport_writer import TransportWriter, KIND_EMERGENCY, KIND_MOTOR, KIND_NORMAL
+from .capture import DIRECTION_IN, DIRECTION_OUT
+
+# طرق إرسال أوامر الحركة لـ ArduSub
+CONTROL_MANUAL = 'manual_control'   # MANUAL_CONTROL: محاور -1000..1000 (z من 0 إلى 1000، 500 محايد)
+CONTROL_RC_OVERRIDE = 'rc_override'  # RC_CHANNELS_OVERRIDE: PWM على قنوات ArduSub
+
+NEUTRAL_PWM = 1500
+PWM_RANGE = 500
+RC_IGNORE = 65535  # قناة لا يغيرها RC_CHANNELS_OVERRIDE
+
+GRAVITY = 9.80665
+
+class MAVLinkCommunication:
+    """الاتصال بمركبة ArduSub عبر MAVLink 2 (UDP أو منفذ تسلسلي)
+    
+    واجهة وسيلة الاتصال نفسها (connect، send_motor_commands، emergency_stop،
+    ping...) فيعمل المتحكم ومراقب الوصلة دون تغيير. أوامر المحركات تُحوَّل
+    بعكس خلط MotorController إلى محاور حركة (الخلط النهائي يتم في ArduSub)،
+    والتيليمتري (ATTITUDE، SCALED_PRESSURE، SYS_STATUS) يُحوَّل إلى قواميس
+    بصيغة تيليمتري المركبة. ping يُرسل كـ TIMESYNC.
+    
+    على UDP ينتظر البرنامج على udp_port (14550 افتراضياً كأي محطة تحكم)
+    ويرسل للعنوان الذي وصل منه آخر HEARTBEAT للمركبة.
+    """
+    
+    def __init__(self, link: str = 'udp', port: str = 'COM3', baud_rate: int = 115200,
+                 host: str = '0.0.0.0', udp_port: int = 14550, target_system: int = 1,
+                 target_component: int = 1, control: str = CONTROL_MANUAL, stream_rate: int = 10,
+                 timeout: float = 5.0, heartbeat_timeout: float = 3.0,
+                 surface_pressure: float = 1013.25, fluid_density: float = 1025.0):
+        self.link = link.lower()
+        self.port = port
+        self.baud_rate = baud_rate
+        self.host = host
+        self.udp_port = udp_port
+        self.target_system = target_system
+        self.target_component = target_component
+        self.control = control
+        self.stream_rate = stream_rate
+        self.timeout = timeout
+        self.heartbeat_timeout = heartbeat_timeout
+        
+        # حساب العمق من الضغط المطلق (hPa)
+        self.surface_pressure = surface_pressure
+        self.fluid_density = fluid_density
+        
+        self.logger = ROVLogger('MAVLinkComm')
+        self.codec = MAVLinkCodec()
+        self.parser = MAVLinkParser()
+        self.is_connected = False
+        
+        self.socket_connection: Optional[socket.socket] = None
+        self.serial_connection: Optional[serial.Serial] = None
+        self._peer: Optional[Tuple[str, int]] = None
+        
+        # معالج البيانات الواردة
+        self.data_handler: Optional[Callable] = None
+        self.batch_handler: Optional[Callable] = None
+        
+        # خيط قراءة البيانات
+        self.read_thread: Optional[threading.Thread] = None
+        self.is_reading = False
+        
+        # حالة المركبة من HEARTBEAT
+        self.vehicle = {
+            'armed': False,
+            'custom_mode': None,
+            'system_status': None,
+            'last_heartbeat': None
+        }
+        self._heartbeat_event = threading.Event()
+        # بعد وصول SCALED_PRESSURE2 (الحساس الخارجي في ArduSub) يُتجاهل حساس العلبة للعمق
+        self._external_pressure = False
+        
+        # التقاط الإطارات الواردة والصادرة (WireCapture يعيّنه المتحكم، None يعطله)
+        self.capture = None
+        
+        # خيط الكتابة الوحيد؛ مؤقته يرسل HEARTBEAT المحطة كل ثانية
+        self.writer = TransportWriter(self._write_bytes, 'MAVLinkWriter')
+    
+    def connect(self) -> bool:
+        """فتح الوصلة وانتظار HEARTBEAT المركبة حتى timeout ثانية"""
+        try:
+            if self.link == 'udp':
+                self.socket_connection = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                self.socket_connection.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                self.socket_connection.bind((self.host, self.udp_port))
+                self.socket_connection.settimeout(0.5)
+            elif self.link == 'serial':
+                self.serial_connection = serial.Serial(self.port, self.baud_rate, timeout=0.5)
+            else:
+                self.logger.error(f"وصلة MAVLink غير مدعومة: {self.link}")
+                return False
+        except (OSError, serial.SerialException) as e:
+            self.logger.error(f"خطأ في فتح وصلة MAVLink: {e}")
+            self._close_handles()
+            return False
+        
+        self.parser.reset()
+        self._heartbeat_event.clear()
+        self.vehicle['last_heartbeat'] = None
+        self._peer = None
+        self.is_connected = True
+        self.writer.set_timer(self._heartbeat_timer)
+        self.writer.start()
+        self._start_reading()
+        
+        if not self._heartbeat_event.wait(self.timeout):
+            self.logger.error(f"لم يصل HEARTBEAT من النظام {self.target_system} خلال {self.timeout} ثانية")
+            self.disconnect()
+            return False
+        
+        self.logger.info(f"تم الاتصال بالمركبة {self.target_system} عبر MAVLink ({self._describe_link()})")
+        self.request_telemetry()
+        return True
+    
+    def disconnect(self):
+        """قطع الاتصال"""
+        self.is_connected = False
+        self.is_reading = False
+        
+        self.writer.stop()
+        
+        if self.read_thread and self.read_thread.is_alive() and self.read_thread is not threading.current_thread():
+            self.read_thread.join(timeout=2)
+        
+        self._close_handles()
+        self.logger.info("تم قطع اتصال MAVLink")
+    
+    def _close_handles(self):
+        if self.socket_connection:
+            self.socket_connection.close()
+            self.socket_connection = None
+        if self.serial_connection and self.serial_connection.is_open:
+            self.serial_connection.close()
+        self.serial_connection = None
+    
+    def _describe_link(self) -> str:
+        if self.link == 'udp':
+            return f"UDP {self._peer[0]}:{self._peer[1]}" if self._peer else f"UDP :{self.udp_port}"
+        return f"{self.port} @ {self.baud_rate}"
+    
+    def send_message(self, msg_id: int, *values, kind: str = KIND_NORMAL) -> bool:
+        """ترميز رسالة MAVLink وإضافتها للطابور الصادر"""
+        if not self.is_connected:
+            self.logger.warning("لا يوجد اتصال - لا يمكن إرسال رسالة MAVLink")
+            return False
+        return self.writer.submit(self.codec.encode(msg_id, *values), kind)
+    
+    def _write_bytes(self, data: bytes):
+        """الكتابة الفعلية (تُستدعى من خيط الكتابة فقط)"""
+        if self.link == 'udp':
+            # قبل أول HEARTBEAT لا يُعرف عنوان المركبة
+            if self._peer is None:
+                return
+            if self.capture is not None:
+                self.capture.record(DIRECTION_OUT, data)
+            self.socket_connection.sendto(data, self._peer)
+        else:
+            if self.capture is not None:
+                self.capture.record(DIRECTION_OUT, data)
+            self.serial_connection.write(data)
+            self.serial_connection.flush()
+    
+    def _heartbeat_timer(self) -> Optional[float]:
+        """HEARTBEAT المحطة كل ثانية (يمنع failsafe فقدان المحطة في ArduSub) وفحص صمت المركبة"""
+        if not self.is_connected:
+            return None
+        self.writer.submit(self.codec.encode(MSG_HEARTBEAT, 0, MAV_TYPE_GCS, MAV_AUTOPILOT_INVALID, 0,
+                                             MAV_STATE_ACTIVE, 3))
+        last = self.vehicle['last_heartbeat']
+        if last is not None and time.monotonic() - last > self.heartbeat_timeout:
+            self.logger.error(f"لم يصل HEARTBEAT من المركبة منذ {time.monotonic() - last:.1f} ثانية")
+            self.is_connected = False
+            return None
+        return 1.0
+    
+    def send_motor_commands(self, motors: Dict[str, int]) -> bool:
+        """تحويل أوامر المحركات إلى محاور حركة (عكس خلط MotorController) وإرسالها"""
+        thrust = {motor: max(-1.0, min(1.0, (motors.get(motor, NEUTRAL_PWM) - NEUTRAL_PWM) / PWM_RANGE))
+                  for motor in ('front_left', 'front_right', 'back_left', 'back_right', 'vertical_1', 'vertical_2')}
+        fl, fr = thrust['front_left'], thrust['front_right']
+        bl, br = thrust['back_left'], thrust['back_right']
+        forward = (fl + fr + bl + br) / 4
+        strafe = (-fl + fr + bl - br) / 4
+        yaw = (fl - fr + bl - br) / 4
+        vertical = (thrust['vertical_1'] + thrust['vertical_2']) / 2  # موجب = صعود
+        return self.send_message(*self._control_message(forward, strafe, vertical, yaw), kind=KIND_MOTOR)
+    
+    def _control_message(self, forward: float, strafe: float, vertical: float, yaw: float) -> Tuple:
+        if self.control == CONTROL_RC_OVERRIDE:
+            # قنوات ArduSub: 1 ميل أمامي، 2 ميل جانبي، 3 عمودي، 4 دوران، 5 أمامي، 6 جانبي
+            return (MSG_RC_CHANNELS_OVERRIDE, NEUTRAL_PWM, NEUTRAL_PWM,
+                    int(NEUTRAL_PWM + vertical * PWM_RANGE), int(NEUTRAL_PWM + yaw * PWM_RANGE),
+                    int(NEUTRAL_PWM + forward * PWM_RANGE), int(NEUTRAL_PWM + strafe * PWM_RANGE),
+                    RC_IGNORE, RC_IGNORE, self.target_system, self.target_component)
+        return (MSG_MANUAL_CONTROL, int(forward * 1000), int(strafe * 1000), int(500 + vertical * 500),
+                int(yaw * 1000), 0, self.target_system)
+    
+    def emergency_stop(self) -> bool:
+        """إيقاف طارئ: أمر حركة محايد ثم فك التسليح القسري"""
+        self.logger.warning("تم تنفيذ إيقاف طارئ!")
+        neutral = self.send_message(*self._control_message(0.0, 0.0, 0.0, 0.0), kind=KIND_EMERGENCY)
+        return self.set_armed(False, force=True, kind=KIND_EMERGENCY) and neutral
+    
+    def set_armed(self, armed: bool, force: bool = False, kind: str = KIND_NORMAL) -> bool:
+        """تسليح أو فك تسليح المحركات (ArduSub لا يحرك المحركات قبل التسليح)"""
+        return self.send_message(MSG_COMMAND_LONG, 1.0 if armed else 0.0,
+                                 float(ARM_DISARM_FORCE) if force else 0.0, 0.0, 0.0, 0.0, 0.0, 0.0,
+                                 MAV_CMD_COMPONENT_ARM_DISARM, self.target_system, self.target_component, 0,
+                                 kind=kind)
+    
+    def request_telemetry(self) -> bool:
+        """طلب بث التيليمتري بمعدل stream_rate"""
+        return self.send_message(MSG_REQUEST_DATA_STREAM, self.stream_rate, self.target_system,
+                                 self.target_component, MAV_DATA_STREAM_ALL, 1)
+    
+    def ping(self, seq: Optional[int] = None) -> bool:
+        """TIMESYNC برقم التسلسل في البتات الدنيا من ts1 (المركبة تعيده مع زمنها في tc1)"""
+        ts1 = (time.monotonic_ns() & ~0xFFFF) | ((seq or 0) & 0xFFFF)
+        return self.send_message(MSG_TIMESYNC, 0, ts1)
+    
+    def get_write_stats(self) -> Dict[str, float]:
+        """الحصول على إحصائيات الطابور الصادر"""
+        return self.writer.get_stats()
+    
+    def get_mavlink_stats(self) -> Dict[str, Any]:
+        """إحصائيات المحلل (CRC، الفقد من أرقام التسلسل) وحالة المركبة"""
+        stats = self.parser.get_stats()
+        stats.update(armed=self.vehicle['armed'], custom_mode=self.vehicle['custom_mode'],
+                     system_status=self.vehicle['system_status'], peer=self._describe_link())
+        return stats
+    
+    def set_data_handler(self, handler: Callable[[Any], None]):
+        """تعيين معالج البيانات الواردة"""
+        self.data_handler = handler
+    
+    def set_batch_handler(self, handler: Callable[[List[Any]], None]):
+        """تعيين معالج دفعات البيانات الواردة"""
+        self.batch_handler = handler
+    
+    def _start_reading(self):
+        """بدء خيط قراءة البيانات"""
+        if not self.is_reading:
+            self.is_reading = True
+            self.read_thread = threading.Thread(target=self._read_data, name='MAVLinkReader', daemon=True)
+            self.read_thread.start()
+    
+    def _read_data(self):
+        """قراءة الإطارات الواردة وتحويلها دفعة واحدة"""
+        read_buffer = bytearray(4096)
+        read_view = memoryview(read_buffer)
+        
+        while self.is_reading:
+            try:
+                if self.link == 'udp':
+                    count, address = self.socket_connection.recvfrom_into(read_buffer)
+                else:
+                    connection = self.serial_connection
+                    count = connection.readinto(read_view[:min(max(1, connection.in_waiting), len(read_buffer))])
+                    address = None
+                if not count:
+                    continue
+                
+                if self.capture is not None:
+                    self.capture.record(DIRECTION_IN, read_view[:count])
+                self._handle_chunk(read_view[:count], address)
+            
+            except socket.timeout:
+                continue
+            except Exception as e:
+                if self.is_reading:
+                    self.logger.error(f"خطأ في قراءة MAVLink: {e}")
+                    self.is_connected = False
+                break
+        
+        self.is_reading = False
+    
+    def _handle_chunk(self, chunk: memoryview, address: Optional[Tuple[str, int]]):
+        batch = []
+        for message in self.parser.feed(chunk):
+            item = self._translate(message, address)
+            if item is not None:
+                batch.append(item)
+        if batch:
+            self._dispatch_batch(batch)
+    
+    def feed_inbound(self, data: bytes, stream: int = 0):
+        """تمرير بايتات واردة مسجلة عبر نفس المحلل والتحويل (إعادة تشغيل الالتقاط دون وصلة)"""
+        self._handle_chunk(memoryview(data), None)
+    
+    def _dispatch_batch(self, batch: List[Any]):
+        if self.batch_handler:
+            self.batch_handler(batch)
+        elif self.data_handler:
+            for item in batch:
+                self.data_handler(item)
+    
+    def _translate(self, message: Dict[str, Any], address: Optional[Tuple[str, int]]) -> Optional[Dict[str, Any]]:
+        """تحويل رسالة MAVLink إلى قاموس بصيغة تيليمتري المركبة (None للرسائل الداخلية)"""
+        if message['sysid'] != self.target_system:
+            return None
+        name = message['msg']
+        
+        if name == 'ATTITUDE':
+            return {
+                'type': 'telemetry',
+                'timestamp': message['time_boot_ms'] / 1000.0,
+                'orientation': {
+                    'roll': math.degrees(message['roll']),
+                    'pitch': math.degrees(message['pitch']),
+                    'yaw': math.degrees(message['yaw']) % 360.0
+                }
+            }
+        
+        if name == 'SCALED_PRESSURE2' or (name == 'SCALED_PRESSURE' and not self._external_pressure):
+            self._external_pressure = self._external_pressure or name == 'SCALED_PRESSURE2'
+            pressure = message['press_abs']
+            depth = max(0.0, (pressure - self.surface_pressure) * 100.0 / (self.fluid_density * GRAVITY))
+            return {
+                'type': 'telemetry',
+                'timestamp': message['time_boot_ms'] / 1000.0,
+                'position': {'z': -depth if depth > 0 else 0.0},
+                'sensors': {'depth': depth, 'pressure': pressure, 'temperature': message['temperature'] / 100.0}
+            }
+        
+        if name == 'SYS_STATUS':
+            data = {'type': 'telemetry', 'sensors': {'voltage': message['voltage_battery'] / 1000.0}}
+            if message['current_battery'] >= 0:
+                data['sensors']['current'] = message['current_battery'] / 100.0
+            if message['battery_remaining'] >= 0:
+                data['battery'] = message['battery_remaining']
+            return data
+        
+        if name == 'HEARTBEAT':
+            return self._on_heartbeat(message, address)
+        
+        if name == 'TIMESYNC':
+            if message['tc1'] == 0:
+                # طلب مزامنة من المركبة: الرد بزمن المحطة (لا رد أثناء إعادة تشغيل التقاط)
+                if self.is_connected:
+                    self.send_message(MSG_TIMESYNC, time.monotonic_ns(), message['ts1'])
+                return None
+            # رد على ping: زمن المركبة بالنانوثانية في tc1 (نفس ساعة time_boot_ms)
+            remote_time = message['tc1'] / 1e9
+            return {'type': 'pong', 'seq': message['ts1'] & 0xFFFF, 'rx_time': remote_time, 'tx_time': remote_time}
+        
+        if name == 'COMMAND_ACK':
+            if message['command'] == MAV_CMD_COMPONENT_ARM_DISARM and message['result'] != 0:
+                self.logger.warning(f"رفضت المركبة أمر التسليح (النتيجة {message['result']})")
+        return None
+    
+    def _on_heartbeat(self, message: Dict[str, Any], address: Optional[Tuple[str, int]]) -> Optional[Dict[str, Any]]:
+        if message['type'] == MAV_TYPE_GCS:
+            return None
+        if address is not None and address != self._peer:
+            self.logger.info(f"عنوان المركبة: {address[0]}:{address[1]}")
+            self._peer = address
+        
+        armed = bool(message['base_mode'] & MAV_MODE_FLAG_SAFETY_ARMED)
+        if armed != self.vehicle['armed'] and self.vehicle['last_heartbeat'] is not None:
+            self.logger.info("تم تسليح المحركات" if armed else "تم فك تسليح المحركات")
+        self.vehicle.update(armed=armed, custom_mode=message['custom_mode'],
+                            system_status=message['system_status'], last_heartbeat=time.monotonic())
+        self._heartbeat_event.set()
+        return {'type': 'heartbeat', 'armed': armed, 'mode': message['custom_mode'],
+                'system_status': message['system_status']}
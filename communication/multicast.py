@@ -0,0 +1,49 @@
+import os
+import socket
+import struct
+
+# مجموعة افتراضية من نطاق النطاق المحلي للمؤسسة (239.192.0.0/14)
+DEFAULT_MULTICAST_GROUP = '239.192.0.1'
+
+def is_multicast_address(address: str) -> bool:
+    """هل العنوان IPv4 ضمن 224.0.0.0/4"""
+    try:
+        return 224 <= socket.inet_aton(address)[0] <= 239
+    except OSError:
+        return False
+
+def open_multicast_listener(group: str, port: int, interface: str = '0.0.0.0') -> socket.socket:
+    """مقبس يستقبل datagrams المجموعة على المنفذ
+    
+    SO_REUSEADDR/SO_REUSEPORT تسمح لعدة محطات (أو عدة نسخ على نفس الجهاز)
+    بالانضمام لنفس المجموعة والمنفذ، وكل منها يستلم نسخة من كل datagram.
+    """
+    if not is_multicast_address(group):
+        raise ValueError(f"ليس عنوان multicast: {group}")
+    
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if hasattr(socket, 'SO_REUSEPORT'):
+            try:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            except OSError:
+                pass
+        # الربط بعنوان المجموعة يرشح المجموعات الأخرى على نفس المنفذ (غير مدعوم على Windows)
+        sock.bind(('' if os.name == 'nt' else group, port))
+        membership = struct.pack('4s4s', socket.inet_aton(group), socket.inet_aton(interface))
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+def open_multicast_sender(ttl: int = 1, interface: str = '0.0.0.0', loopback: bool = True) -> socket.socket:
+    """مقبس إرسال للمجموعة (ttl = 1 يبقي الحزم في الشبكة المحلية)"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+    # loopback: محطات على نفس الجهاز (أو المحاكي) تستلم ما يُرسل
+    sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1 if loopback else 0)
+    if interface != '0.0.0.0':
+        sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(interface))
+    return sock
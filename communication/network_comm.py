@@ -1,17 +1,46 @@
 import socket
+import select
 import threading
 import json
 import time
-from typing import Optional, Callable, Dict, Any
+from typing import Optional, Callable, Dict, Any, Union
 from utils.logger import ROVLogger
+from .binary_protocol import BinaryMessageCodec
+from .stream_decoder import LengthPrefixedDecoder
+from .transport_writer import TransportWriter, KIND_EMERGENCY, KIND_MOTOR, KIND_NORMAL
+from .fec import FEC_OFF, FecDecoder, FecEncoder
+from .multicast import open_multicast_listener
+from .capture import DIRECTION_IN, DIRECTION_OUT, STREAM_MAIN, STREAM_REPLY
+from .channels import (CHANNEL_BULK, CHANNEL_CONTROL, NETWORK_CHUNK_SIZE, BulkReassembler,
+                       is_bulk_channel, iter_bulk_chunks, pack_length)
 
 class NetworkCommunication:
     """فئة الاتصال الشبكي مع ROV (TCP/UDP)"""
     
-    def __init__(self, host: str = "192.168.1.100", port: int = 8080, protocol: str = "TCP"):
+    def __init__(self, host: str = "192.168.1.100", port: int = 8080, protocol: str = "TCP",
+                 binary_protocol: bool = False, fec_mode: str = FEC_OFF, fec_group_size: int = 8,
+                 fec_max_parity: int = 4, fec_max_delay: float = 0.04, multicast_group: Optional[str] = None,
+                 multicast_interface: str = '0.0.0.0'):
         self.host = host
         self.port = port
         self.protocol = protocol.upper()
+        
+        # استقبال التيليمتري من مجموعة multicast (UDP): المركبة ترسل كل datagram مرة واحدة
+        # وتنضم إليها أي عدد من المحطات؛ الأوامر والردود المباشرة تبقى unicast
+        self.multicast_group = multicast_group or None
+        self.multicast_interface = multicast_interface
+        self._multicast_socket: Optional[socket.socket] = None
+        self._reply_fec_decoder: Optional[FecDecoder] = None
+        
+        # تصحيح الأخطاء الأمامي على UDP: حزم تكافؤ تستعيد الرسائل المفقودة دون إعادة إرسال
+        self.fec_mode = fec_mode
+        self.fec_options = {'group_size': fec_group_size, 'max_parity': fec_max_parity, 'max_delay': fec_max_delay}
+        self.fec_encoder: Optional[FecEncoder] = None
+        self.fec_decoder: Optional[FecDecoder] = None
+        
+        # الصيغة الثنائية لرسائل المسار السريع (JSON للرسائل النادرة)
+        self.binary_protocol = binary_protocol
+        self.binary_codec = BinaryMessageCodec()
         self.socket_connection: Optional[socket.socket] = None
         self.is_connected = False
         self.logger = ROVLogger('NetworkComm')
@@ -26,6 +55,19 @@ class NetworkCommunication:
         # خيط خادم UDP (للاستماع)
         self.server_thread: Optional[threading.Thread] = None
         self.is_server_running = False
+        
+        # خيط الكتابة الوحيد مع الطابور الصادر
+        self.writer = TransportWriter(self._write_message, 'NetworkWriter')
+        
+        # مستقبل رسائل TCP
+        self.tcp_decoder: Optional[LengthPrefixedDecoder] = None
+        
+        # النقل الكبير على قنوات 2-255 (TCP فقط)
+        self.bulk_reassembler = BulkReassembler()
+        self._bulk_transfer_id = 0
+        
+        # التقاط الإطارات الواردة والصادرة (WireCapture يعيّنه المتحكم، None يعطله)
+        self.capture = None
     
     def connect(self) -> bool:
         """الاتصال بـ ROV عبر الشبكة"""
@@ -53,7 +95,8 @@ class NetworkCommunication:
             
             self.logger.info(f"تم الاتصال TCP بنجاح إلى {self.host}:{self.port}")
             
-            # بدء خيط قراءة البيانات
+            # بدء خيطي الكتابة والقراءة
+            self.writer.start()
             self._start_reading()
             return True
             
@@ -71,11 +114,22 @@ class NetworkCommunication:
         """اتصال UDP"""
         try:
             self.socket_connection = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            if self.multicast_group:
+                # الردود (pong، العقد) تصل إلى منفذ مقبس الإرسال لأن port + 1 مشترك بين المحطات
+                self.socket_connection.bind(('', 0))
+                self._multicast_socket = open_multicast_listener(self.multicast_group, self.port + 1,
+                                                                 self.multicast_interface)
             self.is_connected = True
             
+            if self.fec_mode != FEC_OFF:
+                self._create_fec()
+                self.writer.set_timer(self._flush_fec)
+                self.logger.info(f"تصحيح الأخطاء الأمامي مفعّل ({self.fec_mode})")
+            
             self.logger.info(f"تم إعداد اتصال UDP إلى {self.host}:{self.port}")
             
-            # بدء خادم UDP للاستماع
+            # بدء خيط الكتابة وخادم UDP للاستماع
+            self.writer.start()
             self._start_udp_server()
             return True
             
@@ -83,13 +137,27 @@ class NetworkCommunication:
             self.logger.error(f"خطأ في اتصال UDP: {e}")
             return False
     
+    def _create_fec(self):
+        self.fec_encoder = FecEncoder(self.fec_mode, **self.fec_options)
+        self.fec_decoder = FecDecoder()
+        self._reply_fec_decoder = FecDecoder()
+    
     def disconnect(self):
         """قطع الاتصال"""
         self.is_connected = False
         self.is_reading = False
         self.is_server_running = False
         
+        # إيقاظ خيط القراءة المنتظر في recv فوراً بدلاً من انتظار المهلة
+        if self.socket_connection and self.protocol == "TCP":
+            try:
+                self.socket_connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        
         # انتظار انتهاء الخيوط
+        self.writer.stop()
+        
         if self.read_thread and self.read_thread.is_alive():
             self.read_thread.join(timeout=2)
         
@@ -100,7 +168,7 @@ class NetworkCommunication:
             self.socket_connection.close()
             self.logger.info("تم قطع الاتصال الشبكي")
     
-    def send_data(self, data: Dict[str, Any]) -> bool:
+    def send_data(self, data: Dict[str, Any], kind: str = KIND_NORMAL) -> bool:
         """إرسال البيانات إلى ROV"""
         if not self.is_connected or not self.socket_connection:
             self.logger.warning("لا يوجد اتصال - لا يمكن إرسال البيانات")
@@ -110,49 +178,128 @@ class NetworkCommunication:
             # تحويل البيانات إلى JSON
             json_data = json.dumps(data)
             
-            if self.protocol == "TCP":
-                # إرسال البيانات مع طول الرسالة
-                message = json_data.encode('utf-8')
-                length = len(message)
-                self.socket_connection.sendall(length.to_bytes(4, byteorder='big') + message)
-            
-            elif self.protocol == "UDP":
-                # إرسال البيانات UDP
-                message = json_data.encode('utf-8')
-                self.socket_connection.sendto(message, (self.host, self.port))
-            
-            self.logger.debug(f"تم إرسال البيانات: {data}")
-            return True
+            if self.writer.submit(self._frame_message(json_data.encode('utf-8')), kind):
+                self.logger.debug(f"تم إرسال البيانات: {data}")
+                return True
+            return False
             
         except Exception as e:
             self.logger.error(f"خطأ في إرسال البيانات: {e}")
             return False
     
+    def send_bytes(self, message: bytes, kind: str = KIND_NORMAL) -> bool:
+        """إرسال رسالة ثنائية إلى ROV"""
+        if not self.is_connected or not self.socket_connection:
+            self.logger.warning("لا يوجد اتصال - لا يمكن إرسال البيانات")
+            return False
+        
+        return self.writer.submit(self._frame_message(message), kind)
+    
+    def send_bulk(self, data: bytes, channel: int = CHANNEL_BULK) -> bool:
+        """إرسال نقل كبير (سجل، لقطة) على قناة 2-255 من السعة المتبقية بعد التحكم والتيليمتري"""
+        if self.protocol != "TCP" or not is_bulk_channel(channel):
+            self.logger.warning("النقل الكبير يتطلب TCP وقناة 2-255")
+            return False
+        if not self.is_connected or not self.socket_connection:
+            self.logger.warning("لا يوجد اتصال - لا يمكن إرسال البيانات")
+            return False
+        
+        self._bulk_transfer_id += 1
+        frames = [self._frame_message(chunk, channel)
+                  for chunk in iter_bulk_chunks(data, self._bulk_transfer_id, NETWORK_CHUNK_SIZE)]
+        if not self.writer.submit_bulk(frames):
+            self.logger.warning(f"طابور النقل الكبير ممتلئ - رُفض نقل {len(data)} بايت")
+            return False
+        return True
+    
+    def _frame_message(self, message: bytes, channel: int = CHANNEL_CONTROL) -> bytes:
+        """تجهيز الرسالة للإرسال حسب البروتوكول"""
+        if self.protocol == "TCP":
+            # إرسال البيانات مع طول الرسالة (القناة في البايت العلوي)
+            return pack_length(len(message), channel).to_bytes(4, byteorder='big') + message
+        return message
+    
+    def _write_message(self, data: bytes):
+        """الإرسال الفعلي على المقبس (يُستدعى من خيط الكتابة فقط)"""
+        if self.protocol == "TCP":
+            if self.capture is not None:
+                self.capture.record(DIRECTION_OUT, data)
+            self.socket_connection.sendall(data)
+        elif self.protocol == "UDP":
+            if self.fec_encoder is None:
+                self._send_datagram(data)
+                return
+            for datagram in self.fec_encoder.encode(data):
+                self._send_datagram(datagram)
+            deadline = self.fec_encoder.next_deadline()
+            if deadline is not None:
+                self.writer.wake_timer(deadline)
+    
+    def _flush_fec(self) -> Optional[float]:
+        """مؤقت خيط الكتابة: إرسال تكافؤ المجموعة الناقصة بعد max_delay"""
+        if self.fec_encoder is None or not self.is_connected:
+            return None
+        for datagram in self.fec_encoder.flush():
+            self._send_datagram(datagram)
+        return self.fec_encoder.next_deadline()
+    
+    def _send_datagram(self, datagram: bytes):
+        if self.capture is not None:
+            self.capture.record(DIRECTION_OUT, datagram)
+        self.socket_connection.sendto(datagram, (self.host, self.port))
+    
+    def get_fec_stats(self) -> Dict[str, Any]:
+        """إحصائيات التكافؤ المُرسل والاستعادة عند الاستقبال"""
+        if self.fec_encoder is None:
+            return {}
+        return {'mode': self.fec_mode, 'encoder': self.fec_encoder.get_stats(),
+                'decoder': self.fec_decoder.get_stats()}
+        
+    def get_write_stats(self) -> Dict[str, float]:
+        """الحصول على إحصائيات الطابور الصادر"""
+        return self.writer.get_stats()
+    
     def send_motor_commands(self, motors: Dict[str, int]) -> bool:
         """إرسال أوامر المحركات"""
+        if self.binary_protocol:
+            return self.send_bytes(self.binary_codec.encode_motor_command(motors), KIND_MOTOR)
+        
         command_data = {
             "type": "motor_command",
             "motors": motors,
             "timestamp": time.time()
         }
-        return self.send_data(command_data)
+        return self.send_data(command_data, KIND_MOTOR)
     
     def request_telemetry(self) -> bool:
         """طلب بيانات التيليمتري"""
+        if self.binary_protocol:
+            return self.send_bytes(self.binary_codec.encode_telemetry_request())
+        
         request_data = {
             "type": "telemetry_request",
             "timestamp": time.time()
         }
         return self.send_data(request_data)
     
+    def request_keyframe(self) -> bool:
+        """طلب إطار تيليمتري كامل (بعد فقد إطار تفاضلي)"""
+        if self.binary_protocol:
+            return self.send_bytes(self.binary_codec.encode_keyframe_request())
+        
+        return self.send_data({"type": "keyframe_request", "timestamp": time.time()})
+    
     def emergency_stop(self) -> bool:
         """إيقاف طارئ"""
         self.logger.warning("تم تنفيذ إيقاف طارئ!")
+        if self.binary_protocol:
+            return self.send_bytes(self.binary_codec.encode_emergency_stop(), KIND_EMERGENCY)
+        
         emergency_data = {
             "type": "emergency_stop",
             "timestamp": time.time()
         }
-        return self.send_data(emergency_data)
+        return self.send_data(emergency_data, KIND_EMERGENCY)
     
     def _start_reading(self):
         """بدء خيط قراءة البيانات TCP"""
@@ -170,78 +317,132 @@ class NetworkCommunication:
     
     def _read_tcp_data(self):
         """قراءة البيانات TCP"""
+        # مخزن استقبال واحد يُعاد استخدامه: recv_into ثم فك الرسائل من memoryview
+        self.tcp_decoder = LengthPrefixedDecoder()
+        
         while self.is_reading and self.is_connected:
             try:
-                # قراءة طول الرسالة (4 بايت)
-                length_bytes = self.socket_connection.recv(4)
-                if not length_bytes:
+                count = self.tcp_decoder.recv_from(self.socket_connection)
+                if count == 0:
+                    self._link_lost("أغلق الطرف الآخر الاتصال")
                     break
                 
-                message_length = int.from_bytes(length_bytes, byteorder='big')
-                
-                # قراءة الرسالة كاملة
-                message = b''
-                while len(message) < message_length:
-                    chunk = self.socket_connection.recv(message_length - len(message))
-                    if not chunk:
-                        break
-                    message += chunk
-                
-                if message:
-                    data_str = message.decode('utf-8')
-                    self.logger.debug(f"بيانات TCP واردة: {data_str}")
-                    
-                    # معالجة البيانات
-                    if self.data_handler:
-                        try:
-                            data = json.loads(data_str)
-                            self.data_handler(data)
-                        except json.JSONDecodeError:
-                            self.data_handler(data_str)
-                
+                if self.capture is not None:
+                    self.capture.record(DIRECTION_IN, self.tcp_decoder.last_received(count))
+                self._dispatch_tcp_frames()
+            
+            except socket.timeout:
+                continue
             except Exception as e:
                 self.logger.error(f"خطأ في قراءة بيانات TCP: {e}")
+                self._link_lost(str(e))
                 break
     
+    def _dispatch_tcp_frames(self):
+        for message in self.tcp_decoder.frames():
+            if is_bulk_channel(self.tcp_decoder.channel):
+                self.bulk_reassembler.feed(self.tcp_decoder.channel, message)
+            else:
+                self._dispatch_message(message)
+    
+    def _link_lost(self, reason: str):
+        """معالجة انقطاع الوصلة من جهة المركبة (قطع الاتصال الطوعي لا يُعتبر انقطاعاً)"""
+        if self.is_reading and self.is_connected:
+            self.logger.error(f"انقطع الاتصال: {reason}")
+            self.is_connected = False
+    
     def _udp_server(self):
         """خادم UDP للاستماع للبيانات الواردة"""
-        listen_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        listen_socket.bind(('', self.port + 1))  # استخدام منفذ مختلف للاستماع
-        listen_socket.settimeout(1)
-        
-        self.logger.info(f"بدء خادم UDP على المنفذ {self.port + 1}")
+        if self._multicast_socket is not None:
+            # التيليمتري من المجموعة والردود المباشرة على مقبس الإرسال (لكل منهما مفكك FEC)
+            listen_socket = self._multicast_socket
+            decoders = {listen_socket: self.fec_decoder, self.socket_connection: self._reply_fec_decoder}
+            self.logger.info(f"الانضمام لمجموعة multicast {self.multicast_group}:{self.port + 1}")
+        else:
+            listen_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            listen_socket.bind(('', self.port + 1))  # استخدام منفذ مختلف للاستماع
+            decoders = {listen_socket: self.fec_decoder}
+            self.logger.info(f"بدء خادم UDP على المنفذ {self.port + 1}")
+        sockets = list(decoders)
         
         while self.is_server_running:
             try:
-                data, addr = listen_socket.recvfrom(4096)
-                data_str = data.decode('utf-8')
+                readable, _, _ = select.select(sockets, [], [], 1)
+                for sock in readable:
+                    data, addr = sock.recvfrom(65536)
+                    if self.capture is not None:
+                        self.capture.record(DIRECTION_IN, data,
+                                            STREAM_MAIN if sock is listen_socket else STREAM_REPLY)
+                    self._handle_datagram(data, decoders[sock])
                 
-                self.logger.debug(f"بيانات UDP واردة من {addr}: {data_str}")
-                
-                # معالجة البيانات
-                if self.data_handler:
-                    try:
-                        data_obj = json.loads(data_str)
-                        self.data_handler(data_obj)
-                    except json.JSONDecodeError:
-                        self.data_handler(data_str)
-                        
-            except socket.timeout:
+            except ConnectionResetError:
+                # Windows: ICMP منفذ غير متاح لإرسال سابق على مقبس الإرسال
                 continue
             except Exception as e:
                 self.logger.error(f"خطأ في خادم UDP: {e}")
                 break
         
         listen_socket.close()
+        self._multicast_socket = None
+    
+    def _handle_datagram(self, data: bytes, decoder: Optional[FecDecoder]):
+        if decoder is None:
+            self._dispatch_message(data)
+            return
+        for message in decoder.feed(data):
+            self._dispatch_message(message)
+        # الفقد المقاس في الاتجاه الوارد تقدير للاتجاه الصادر
+        self.fec_encoder.set_loss_rate(self.fec_decoder.loss_rate)
+    
+    def feed_inbound(self, data: bytes, stream: int = STREAM_MAIN):
+        """تمرير بايتات واردة مسجلة عبر نفس المحللات (إعادة تشغيل الالتقاط دون مقبس)"""
+        if self.protocol == "TCP":
+            if self.tcp_decoder is None:
+                self.tcp_decoder = LengthPrefixedDecoder()
+            self.tcp_decoder.feed(data)
+            self._dispatch_tcp_frames()
+            return
+        if self.fec_mode != FEC_OFF and self.fec_encoder is None:
+            self._create_fec()
+        self._handle_datagram(data, self._reply_fec_decoder if stream == STREAM_REPLY else self.fec_decoder)
+    
+    def _dispatch_message(self, message: Union[bytes, memoryview]):
+        """فك ترميز رسالة واردة (ثنائية أو JSON) وتمريرها لمعالج البيانات"""
+        if not self.data_handler:
+            return
+        
+        # الرسائل الثنائية
+        if self.binary_codec.is_binary(message):
+            data = self.binary_codec.decode(message)
+            if data is not None:
+                self.data_handler(data)
+            else:
+                self.logger.warning("رسالة ثنائية غير معروفة")
+            return
+        
+        data_str = str(message, 'utf-8', errors='replace')
+        self.logger.debug(f"بيانات واردة: {data_str}")
+        
+        try:
+            data = json.loads(data_str)
+            self.data_handler(data)
+        except json.JSONDecodeError:
+            self.data_handler(data_str)
     
     def set_data_handler(self, handler: Callable):
         """تعيين معالج البيانات الواردة"""
         self.data_handler = handler
     
-    def ping(self) -> bool:
-        """اختبار الاتصال"""
+    def set_bulk_handler(self, handler: Callable[[int, bytes], None]):
+        """تعيين معالج النقل الكبير المكتمل: handler(channel, data)"""
+        self.bulk_reassembler.handler = handler
+    
+    def ping(self, seq: Optional[int] = None) -> bool:
+        """اختبار الاتصال (seq اختياري لمطابقة الرد وقياس RTT)"""
         ping_data = {
             "type": "ping",
             "timestamp": time.time()
         }
+        if seq is not None:
+            ping_data["seq"] = seq
         return self.send_data(ping_data)
@@ -1,8 +1,14 @@
 import json
 import time
 import struct
-from typing import Dict, Any, Optional
+import threading
+from typing import Dict, Any, Optional, List, Union, Callable
 from utils.logger import ROVLogger
+from .stream_decoder import PacketStreamDecoder, xor_checksum
+from .channels import (CHANNEL_CONTROL, CHANNEL_TELEMETRY, BulkReassembler, is_bulk_channel,
+                       pack_length, split_length)
+from .binary_protocol import BinaryMessageCodec
+from .reliability import RetransmissionEngine, DuplicateFilter
 
 class PacketHandler:
     """فئة معالجة الحزم والبروتوكولات"""
@@ -10,9 +16,30 @@ class PacketHandler:
     def __init__(self):
         self.logger = ROVLogger('PacketHandler')
         self.packet_id = 0
-        self.waiting_acks = {}  # الحزم التي تنتظر ACK
         self.max_retries = 3
         self.ack_timeout = 5.0
+        
+        # محرك إعادة الإرسال: مهلة متكيفة مع RTT وفحص الانتهاء بتكلفة O(المنتهية)
+        self.retransmit = RetransmissionEngine(self.max_retries, max_rto=self.ack_timeout)
+        self.waiting_acks = self.retransmit.pending  # الحزم التي تنتظر ACK
+        self._reliability_lock = threading.Lock()
+        
+        # كشف الحزم المكررة الواردة
+        self.duplicate_filter = DuplicateFilter()
+        
+        # دالة إرسال الحزم عبر وسيلة الاتصال المالكة: sender(packet, command)
+        self.packet_sender: Optional[Callable[[bytes, str], bool]] = None
+        # تنبيه مؤقت إعادة الإرسال بموعد حزمة جديدة: wakeup(delay)
+        self.retransmit_wakeup: Optional[Callable[[float], None]] = None
+        
+        # مفكك الحزم التدريجي للبيانات المتدفقة
+        self.stream_decoder = PacketStreamDecoder()
+        
+        # تجميع أجزاء النقل الكبير الواردة على قنوات 2-255
+        self.bulk_reassembler = BulkReassembler()
+        
+        # ترميز الرسائل الثنائية للمسار السريع (JSON يبقى للرسائل النادرة)
+        self.binary_codec = BinaryMessageCodec()
     
     def create_packet(self, command: str, data: Dict[str, Any], require_ack: bool = False) -> bytes:
         """إنشاء حزمة بيانات"""
@@ -35,31 +62,16 @@ class PacketHandler:
             json_str = json.dumps(packet_data, separators=(',', ':'))
             json_bytes = json_str.encode('utf-8')
             
-            # حساب checksum
-            checksum = self._calculate_checksum(json_bytes)
-            
             # بناء الحزمة النهائية
-            # Header: START_MARKER(2) + LENGTH(4) + CHECKSUM(4) + DATA + END_MARKER(2)
-            start_marker = b'\xAA\x55'
-            end_marker = b'\x55\xAA'
-            length = len(json_bytes)
-            
-            packet = (
-                start_marker +
-                struct.pack('<I', length) +  # Little Endian 4 bytes
-                struct.pack('<I', checksum) +  # Little Endian 4 bytes
-                json_bytes +
-                end_marker
-            )
+            packet = self.frame_payload(json_bytes)
             
             # حفظ الحزمة إذا كانت تتطلب ACK
             if require_ack:
-                self.waiting_acks[self.packet_id] = {
-                    'packet': packet,
-                    'timestamp': time.time(),
-                    'retries': 0,
-                    'command': command
-                }
+                with self._reliability_lock:
+                    self.retransmit.track(self.packet_id, packet, command)
+                    delay = self.retransmit.rto
+                if self.retransmit_wakeup:
+                    self.retransmit_wakeup(delay)
             
             self.logger.debug(f"تم إنشاء حزمة: ID={self.packet_id}, Command={command}")
             return packet
@@ -68,20 +80,34 @@ class PacketHandler:
             self.logger.error(f"خطأ في إنشاء الحزمة: {e}")
             return b''
     
+    def frame_payload(self, payload: bytes, channel: int = CHANNEL_CONTROL) -> bytes:
+        """تغليف محتوى (JSON أو ثنائي) في إطار الحزمة على قناة منطقية"""
+        # Header: START_MARKER(2) + LENGTH(4) + CHECKSUM(4) + DATA + END_MARKER(2)
+        # القناة في البايت العلوي من LENGTH؛ القناة 0 مطابقة للصيغة القديمة
+        return (
+            b'\xAA\x55' +
+            struct.pack('<II', pack_length(len(payload), channel),
+                        self._calculate_checksum(payload) ^ channel) +  # Little Endian
+            payload +
+            b'\x55\xAA'
+        )
+    
     def parse_packet(self, data: bytes) -> Optional[Dict[str, Any]]:
         """تحليل حزمة بيانات واردة"""
         try:
             if len(data) < 12:  # الحد الأدنى لحجم الحزمة
                 return None
             
+            view = memoryview(data)
+            
             # التحقق من بداية الحزمة
-            if data[:2] != b'\xAA\x55':
+            if view[:2] != b'\xAA\x55':
                 self.logger.warning("علامة بداية الحزمة غير صحيحة")
                 return None
             
             # قراءة الطول والـ checksum
-            length = struct.unpack('<I', data[2:6])[0]
-            expected_checksum = struct.unpack('<I', data[6:10])[0]
+            length, expected_checksum = struct.unpack_from('<II', view, 2)
+            channel, length = split_length(length)
             
             # التحقق من طول البيانات
             total_length = 12 + length  # header + data + end marker
@@ -90,34 +116,20 @@ class PacketHandler:
                 return None
             
             # التحقق من نهاية الحزمة
-            if data[total_length-2:total_length] != b'\x55\xAA':
+            if view[total_length-2:total_length] != b'\x55\xAA':
                 self.logger.warning("علامة نهاية الحزمة غير صحيحة")
                 return None
             
-            # استخراج البيانات
-            json_data = data[10:10+length]
+            # استخراج البيانات (بدون نسخ)
+            json_data = view[10:10+length]
             
             # التحقق من الـ checksum
-            calculated_checksum = self._calculate_checksum(json_data)
+            calculated_checksum = self._calculate_checksum(json_data) ^ channel
             if calculated_checksum != expected_checksum:
                 self.logger.warning("checksum غير صحيح")
                 return None
             
-            # تحويل JSON
-            json_str = json_data.decode('utf-8')
-            packet_data = json.loads(json_str)
-            
-            self.logger.debug(f"تم تحليل حزمة: ID={packet_data.get('id')}")
-            
-            # معالجة ACK إذا كان مطلوباً
-            if packet_data.get('require_ack', False):
-                self._send_ack(packet_data['id'])
-            
-            # معالجة ACK الوارد
-            if packet_data.get('command') == 'ACK':
-                self._handle_ack(packet_data)
-            
-            return packet_data
+            return self._process_payload(json_data)
             
         except json.JSONDecodeError:
             self.logger.error("خطأ في تحليل JSON")
@@ -126,25 +138,76 @@ class PacketHandler:
             self.logger.error(f"خطأ في تحليل الحزمة: {e}")
             return None
     
-    def _calculate_checksum(self, data: bytes) -> int:
+    def feed_data(self, data: Union[bytes, bytearray, memoryview]) -> List[Dict[str, Any]]:
+        """تغذية أجزاء من تدفق البايتات وإرجاع كل الحزم الكاملة المستخرجة منها"""
+        packets = []
+        decoder = self.stream_decoder
+        for payload in decoder.decode(data):
+            if is_bulk_channel(decoder.channel):
+                self.bulk_reassembler.feed(decoder.channel, payload)
+                continue
+            try:
+                packet = self._process_payload(payload)
+                if packet is not None:
+                    packets.append(packet)
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                self.logger.error("خطأ في تحليل JSON")
+            except Exception as e:
+                self.logger.error(f"خطأ في تحليل الحزمة: {e}")
+        return packets
+    
+    def _process_payload(self, payload: Union[bytes, memoryview]) -> Optional[Dict[str, Any]]:
+        """تحويل محتوى حزمة سليمة إلى قاموس ومعالجة ACK (None للحزم المكررة)"""
+        # الرسائل الثنائية لا تحمل ACK
+        if self.binary_codec.is_binary(payload):
+            message = self.binary_codec.decode(payload)
+            if message is None:
+                raise ValueError("نوع رسالة ثنائية غير معروف")
+            return message
+        
+        packet_data = json.loads(bytes(payload))
+        
+        self.logger.debug(f"تم تحليل حزمة: ID={packet_data.get('id')}")
+        
+        # معالجة ACK الوارد
+        if packet_data.get('command') == 'ACK':
+            self._handle_ack(packet_data)
+            return packet_data
+        
+        # معالجة ACK إذا كان مطلوباً (يُعاد إرسال ACK للمكرر لأن الأول ربما فُقد)
+        if packet_data.get('require_ack', False):
+            self._send_ack(packet_data['id'])
+            
+            if not self.duplicate_filter.accept(packet_data['id']):
+                self.logger.debug(f"تم تجاهل حزمة مكررة: ID={packet_data['id']}")
+                return None
+        
+        return packet_data
+    
+    def _calculate_checksum(self, data: Union[bytes, memoryview]) -> int:
         """حساب checksum للبيانات"""
-        checksum = 0
-        for byte in data:
-            checksum ^= byte
-        return checksum
+        return xor_checksum(data)
     
     def _send_ack(self, packet_id: int):
         """إرسال ACK للحزمة"""
-        # يجب تنفيذ هذا عبر نظام الاتصال
         self.logger.debug(f"إرسال ACK للحزمة {packet_id}")
+        if self.packet_sender:
+            self.packet_sender(self.create_ack_packet(packet_id), 'ACK')
     
     def _handle_ack(self, packet_data: Dict[str, Any]):
         """معالجة ACK الوارد"""
         ack_id = packet_data.get('data', {}).get('ack_id')
-        if ack_id in self.waiting_acks:
-            del self.waiting_acks[ack_id]
+        with self._reliability_lock:
+            acked = self.retransmit.acknowledge(ack_id)
+        if acked:
             self.logger.debug(f"تم استلام ACK للحزمة {ack_id}")
     
+    def set_packet_sender(self, sender: Callable[[bytes, str], bool],
+                          wakeup: Optional[Callable[[float], None]] = None):
+        """تعيين دالة إرسال الحزم (ACK وإعادة الإرسال) عبر وسيلة الاتصال"""
+        self.packet_sender = sender
+        self.retransmit_wakeup = wakeup
+    
     def create_motor_command_packet(self, motors: Dict[str, int]) -> bytes:
         """إنشاء حزمة أوامر المحركات"""
         return self.create_packet('MOTOR_COMMAND', {'motors': motors}, require_ack=True)
@@ -157,33 +220,63 @@ class PacketHandler:
         """إنشاء حزمة الإيقاف الطارئ"""
         return self.create_packet('EMERGENCY_STOP', {}, require_ack=True)
     
+    def create_binary_motor_packet(self, motors: Dict[str, int]) -> bytes:
+        """إنشاء حزمة أوامر المحركات بالصيغة الثنائية"""
+        return self.frame_payload(self.binary_codec.encode_motor_command(motors))
+    
+    def create_binary_telemetry_packet(self, state: Dict[str, Any]) -> bytes:
+        """إنشاء حزمة تيليمتري بالصيغة الثنائية"""
+        return self.frame_payload(self.binary_codec.encode_telemetry(state), CHANNEL_TELEMETRY)
+    
+    def create_heartbeat_packet(self, status: str = 'connected') -> bytes:
+        """إنشاء حزمة نبض بالصيغة الثنائية"""
+        return self.frame_payload(self.binary_codec.encode_heartbeat(status))
+    
+    def create_binary_emergency_stop_packet(self) -> bytes:
+        """إنشاء حزمة الإيقاف الطارئ بالصيغة الثنائية"""
+        return self.frame_payload(self.binary_codec.encode_emergency_stop())
+    
+    def create_binary_telemetry_delta_packet(self, state: Dict[str, Any]) -> bytes:
+        """إنشاء حزمة تيليمتري تفاضلية (الحقول المتغيرة فقط)"""
+        return self.frame_payload(self.binary_codec.encode_telemetry_delta(state), CHANNEL_TELEMETRY)
+    
+    def create_binary_keyframe_request_packet(self) -> bytes:
+        """إنشاء حزمة طلب إطار تيليمتري كامل"""
+        return self.frame_payload(self.binary_codec.encode_keyframe_request())
+    
+    def create_binary_telemetry_request_packet(self) -> bytes:
+        """إنشاء حزمة طلب التيليمتري بالصيغة الثنائية"""
+        return self.frame_payload(self.binary_codec.encode_telemetry_request())
+    
     def create_ack_packet(self, original_packet_id: int) -> bytes:
         """إنشاء حزمة ACK"""
         return self.create_packet('ACK', {'ack_id': original_packet_id}, require_ack=False)
     
-    def check_pending_acks(self):
-        """فحص الحزم التي تنتظر ACK وإعادة الإرسال إذا لزم الأمر"""
-        current_time = time.time()
-        expired_packets = []
+    def check_pending_acks(self) -> Optional[float]:
+        """إعادة إرسال الحزم التي انتهت مهلتها، وإرجاع الزمن حتى الفحص التالي بالثواني"""
+        with self._reliability_lock:
+            due = self.retransmit.poll()
+            next_deadline = self.retransmit.next_deadline()
         
-        for packet_id, packet_info in self.waiting_acks.items():
-            time_elapsed = current_time - packet_info['timestamp']
-            
-            if time_elapsed > self.ack_timeout:
-                if packet_info['retries'] < self.max_retries:
-                    # إعادة الإرسال
-                    packet_info['retries'] += 1
-                    packet_info['timestamp'] = current_time
-                    self.logger.warning(f"إعادة إرسال الحزمة {packet_id} (المحاولة {packet_info['retries']})")
-                    # يجب إعادة إرسال packet_info['packet'] عبر نظام الاتصال
-                else:
-                    # انتهت المحاولات
-                    expired_packets.append(packet_id)
-                    self.logger.error(f"فشل في إرسال الحزمة {packet_id} بعد {self.max_retries} محاولات")
+        for packet_id, packet_info in due:
+            self.logger.debug(f"إعادة إرسال الحزمة {packet_id} (المحاولة {packet_info['retries']})")
+            if self.packet_sender:
+                self.packet_sender(packet_info['packet'], packet_info['command'])
         
-        # حذف الحزم المنتهية الصلاحية
-        for packet_id in expired_packets:
-            del self.waiting_acks[packet_id]
+        if next_deadline is None:
+            return None
+        return max(0.0, next_deadline - time.monotonic())
+    
+    def get_reliability_stats(self) -> Dict[str, Any]:
+        """الحصول على إحصائيات إعادة الإرسال"""
+        with self._reliability_lock:
+            stats = self.retransmit.get_stats()
+        stats['duplicates_dropped'] = self.duplicate_filter.duplicates
+        return stats
+    
+    def get_decoder_stats(self) -> Dict[str, int]:
+        """الحصول على إحصائيات مفكك الحزم المتدفقة"""
+        return self.stream_decoder.get_stats()
     
     def get_pending_acks_count(self) -> int:
         """الحصول على عدد الحزم التي تنتظر ACK"""
@@ -191,5 +284,6 @@ class PacketHandler:
     
     def clear_pending_acks(self):
         """مسح جميع الحزم المعلقة"""
-        self.waiting_acks.clear()
+        with self._reliability_lock:
+            self.retransmit.clear()
         self.logger.info("تم مسح جميع الحزم المعلقة")
@@ -0,0 +1,242 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, List, Optional
+
+import yaml
+
+from utils.logger import ROVLogger
+from .link_health import parse_pong
+from .packet_handler import PacketHandler
+
+# سرعات الفحص الافتراضية (الأكثر شيوعاً لوحدات ROV أولاً)
+DEFAULT_BAUD_RATES = (115200, 57600, 38400, 19200, 9600)
+
+# رقم تسلسل ping الفحص (خارج نطاق LinkMonitor و test_connection)
+PROBE_PING_SEQ = 0x7FFF
+
+class SerialPortDiscovery:
+    """اكتشاف منفذ ROV التسلسلي وسرعته تلقائياً
+    
+    كل المنافذ المرشحة تُفحص في نفس الوقت (خيط لكل منفذ): يُرسل ping بكل سرعة
+    بالترتيب وأول منفذ يرد بـ pong يُعتمد وتتوقف بقية الفحوص. الزمن الكلي لا يزيد
+    عن مهلة فحص واحدة لكل سرعة مهما كان عدد المنافذ. النتيجة تُحفظ في ملف حسب
+    معرّف العتاد (hwid) فيُجرَّب المنفذ المحفوظ أولاً في التشغيل التالي حتى لو تغير اسمه.
+    """
+    
+    def __init__(self, baud_rates: Iterable[int] = DEFAULT_BAUD_RATES, probe_timeout: float = 0.3,
+                 binary_protocol: bool = False, cache_file: Optional[str] = 'port_cache.yaml',
+                 extra_ports: Iterable[str] = (), max_workers: int = 16):
+        self.logger = ROVLogger('PortDiscovery')
+        self.baud_rates = list(baud_rates)
+        self.probe_timeout = probe_timeout
+        self.binary_protocol = binary_protocol
+        self.cache_file = cache_file
+        # منافذ لا تظهر في قائمة النظام (مثل pty المحاكي)
+        self.extra_ports = [port for port in extra_ports if port]
+        self.max_workers = max_workers
+        
+        self._cache_lock = threading.Lock()
+        self.cache: Dict[str, Dict[str, Any]] = self._load_cache()
+        
+        # إحصائيات
+        self.stats = {
+            'scans': 0,
+            'cache_hits': 0,
+            'probes': 0,
+            'last_scan_ms': 0.0
+        }
+    
+    def list_ports(self) -> List[Dict[str, str]]:
+        """المنافذ المرشحة: منافذ النظام ثم المنافذ الإضافية"""
+        import serial.tools.list_ports
+        
+        ports = [{'device': port.device, 'description': port.description, 'hwid': port.hwid}
+                 for port in serial.tools.list_ports.comports()]
+        known = {port['device'] for port in ports}
+        for device in self.extra_ports:
+            if device not in known:
+                ports.append({'device': device, 'description': device, 'hwid': 'n/a'})
+        return ports
+    
+    def discover(self, preferred_baud: Optional[int] = None, use_cache: bool = True) -> Optional[Dict[str, Any]]:
+        """البحث عن ROV وإرجاع {'device', 'baud_rate', 'hwid', 'description'} أو None"""
+        start = time.perf_counter()
+        self.stats['scans'] += 1
+        ports = self.list_ports()
+        if not ports:
+            self.logger.warning("لا توجد منافذ تسلسلية")
+            return None
+        
+        result = None
+        if use_cache:
+            result = self._probe_cached(ports)
+            if result:
+                self.stats['cache_hits'] += 1
+        
+        if result is None:
+            bauds = self._baud_order(preferred_baud)
+            result = self._scan(ports, bauds)
+        
+        self.stats['last_scan_ms'] = (time.perf_counter() - start) * 1000.0
+        if result:
+            self.logger.info(f"تم العثور على ROV على {result['device']} بسرعة {result['baud_rate']} "
+                             f"خلال {self.stats['last_scan_ms']:.0f} ms")
+            self._remember(result)
+        else:
+            self.logger.warning(f"لم يتم العثور على ROV في {len(ports)} منفذ")
+        return result
+    
+    def probe(self, device: str, baud_rate: int, stop_event: Optional[threading.Event] = None) -> bool:
+        """فتح المنفذ بسرعة محددة وإرسال ping وانتظار pong حتى probe_timeout"""
+        import serial
+        
+        self.stats['probes'] += 1
+        try:
+            connection = serial.Serial(port=device, baudrate=baud_rate, timeout=0.02,
+                                       write_timeout=self.probe_timeout)
+        except (serial.SerialException, OSError, ValueError) as e:
+            self.logger.debug(f"تعذر فتح {device}: {e}")
+            return False
+        
+        try:
+            connection.reset_input_buffer()
+            connection.write(self._ping_bytes())
+            
+            packet_handler = PacketHandler()
+            line_buffer = bytearray()
+            deadline = time.monotonic() + self.probe_timeout
+            while time.monotonic() < deadline:
+                if stop_event is not None and stop_event.is_set():
+                    return False
+                data = connection.read(max(1, connection.in_waiting))
+                if not data:
+                    continue
+                for message in self._parse(packet_handler, line_buffer, data):
+                    if parse_pong(message)[0]:
+                        return True
+            return False
+        
+        except (serial.SerialException, OSError) as e:
+            self.logger.debug(f"خطأ أثناء فحص {device}: {e}")
+            return False
+        finally:
+            connection.close()
+    
+    def forget(self, hwid: Optional[str] = None):
+        """حذف منفذ محفوظ (أو كل المنافذ)"""
+        with self._cache_lock:
+            if hwid is None:
+                self.cache.clear()
+            else:
+                self.cache.pop(hwid, None)
+            self._save_cache()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """الحصول على إحصائيات الاكتشاف"""
+        stats = dict(self.stats)
+        stats['cached_ports'] = len(self.cache)
+        return stats
+    
+    def _baud_order(self, preferred_baud: Optional[int]) -> List[int]:
+        """السرعة المفضلة أولاً ثم بقية السرعات"""
+        bauds = list(self.baud_rates)
+        if preferred_baud:
+            bauds = [preferred_baud] + [baud for baud in bauds if baud != preferred_baud]
+        return bauds
+    
+    def _probe_cached(self, ports: List[Dict[str, str]]) -> Optional[Dict[str, Any]]:
+        """تجربة المنافذ المحفوظة بسرعتها المحفوظة فقط"""
+        with self._cache_lock:
+            cached = [(port, self.cache[self._cache_key(port)]) for port in ports
+                      if self._cache_key(port) in self.cache]
+        for port, entry in cached:
+            if self.probe(port['device'], entry['baud_rate']):
+                return dict(port, baud_rate=entry['baud_rate'])
+            self.logger.info(f"المنفذ المحفوظ {port['device']} لم يرد - فحص كل المنافذ")
+        return None
+    
+    def _scan(self, ports: List[Dict[str, str]], bauds: List[int]) -> Optional[Dict[str, Any]]:
+        """فحص كل المنافذ في نفس الوقت وإرجاع أول منفذ يرد"""
+        found = threading.Event()
+        
+        def scan_port(port: Dict[str, str]) -> Optional[Dict[str, Any]]:
+            for baud in bauds:
+                if found.is_set():
+                    return None
+                if self.probe(port['device'], baud, found):
+                    found.set()
+                    return dict(port, baud_rate=baud)
+            return None
+        
+        result = None
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(ports)),
+                                thread_name_prefix='PortProbe') as executor:
+            futures = [executor.submit(scan_port, port) for port in ports]
+            for future in as_completed(futures):
+                try:
+                    result = future.result()
+                except Exception as e:
+                    self.logger.debug(f"خطأ في فحص منفذ: {e}")
+                    continue
+                if result:
+                    # الخيوط الأخرى تغلق منافذها خلال مهلة قراءة واحدة
+                    found.set()
+                    break
+        return result
+    
+    def _ping_bytes(self) -> bytes:
+        """ping الفحص بصيغة وسيلة الاتصال"""
+        if self.binary_protocol:
+            payload = json.dumps({'type': 'ping', 'seq': PROBE_PING_SEQ}, separators=(',', ':')).encode('utf-8')
+            return PacketHandler().frame_payload(payload)
+        return f"PING,{PROBE_PING_SEQ}\n".encode('utf-8')
+    
+    def _parse(self, packet_handler: PacketHandler, line_buffer: bytearray, data: bytes) -> List[Any]:
+        """تقسيم البيانات الواردة إلى رسائل"""
+        if self.binary_protocol:
+            return packet_handler.feed_data(data)
+        line_buffer += data
+        end = line_buffer.rfind(b'\n')
+        if end < 0:
+            return []
+        text = line_buffer[:end].decode('utf-8', errors='replace')
+        del line_buffer[:end + 1]
+        return [line.strip() for line in text.split('\n') if line.strip()]
+    
+    @staticmethod
+    def _cache_key(port: Dict[str, str]) -> str:
+        """معرّف العتاد، أو اسم المنفذ إذا لم يكن له معرّف (pty والمنافذ الافتراضية)"""
+        hwid = port.get('hwid')
+        return hwid if hwid and hwid != 'n/a' else port['device']
+    
+    def _remember(self, result: Dict[str, Any]):
+        with self._cache_lock:
+            self.cache[self._cache_key(result)] = {
+                'device': result['device'],
+                'baud_rate': result['baud_rate'],
+                'last_seen': time.strftime('%Y-%m-%d %H:%M:%S')
+            }
+            self._save_cache()
+    
+    def _load_cache(self) -> Dict[str, Dict[str, Any]]:
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as file:
+                cache = yaml.safe_load(file) or {}
+            return cache if isinstance(cache, dict) else {}
+        except Exception as e:
+            self.logger.warning(f"تعذر قراءة ملف المنافذ المحفوظة: {e}")
+            return {}
+    
+    def _save_cache(self):
+        if not self.cache_file:
+            return
+        try:
+            with open(self.cache_file, 'w', encoding='utf-8') as file:
+                yaml.dump(self.cache, file, default_flow_style=False, allow_unicode=True)
+        except Exception as e:
+            self.logger.warning(f"تعذر حفظ المنافذ المحفوظة: {e}")
@@ -0,0 +1,198 @@
+import heapq
+import time
+from typing import Dict, Any, Optional, List, Tuple, Callable
+from utils.logger import ROVLogger
+
+class RetransmissionEngine:
+    """محرك إعادة الإرسال للحزم التي تتطلب ACK
+    
+    الحزم المعلقة مرتبة في كومة (heap) حسب موعد انتهاء مهلتها، فيكون فحص
+    الانتهاء بتكلفة O(المنتهية فقط) بدلاً من المرور على كل الحزم. مهلة إعادة
+    الإرسال (RTO) تتكيف مع زمن الذهاب والعودة المقاس (RFC 6298).
+    """
+    
+    def __init__(self, max_retries: int = 3, initial_rto: float = 1.0,
+                 min_rto: float = 0.05, max_rto: float = 5.0):
+        self.logger = ROVLogger('Retransmission')
+        self.max_retries = max_retries
+        self.min_rto = min_rto
+        self.max_rto = max_rto
+        
+        # تقدير زمن الذهاب والعودة
+        self.rto = initial_rto
+        self.srtt: Optional[float] = None
+        self.rttvar: Optional[float] = None
+        
+        # الحزم المعلقة: المعرف -> معلومات الحزمة
+        self.pending: Dict[int, Dict[str, Any]] = {}
+        # (الموعد، المعرف، رقم الإرسال) - العناصر القديمة تُهمل عند سحبها
+        self._deadlines: List[Tuple[float, int, int]] = []
+        
+        # معالج فشل الإرسال النهائي
+        self.failure_handler: Optional[Callable[[int, Dict[str, Any]], None]] = None
+        
+        # إحصائيات
+        self.stats = {
+            'tracked': 0,
+            'acked': 0,
+            'retransmitted': 0,
+            'failed': 0
+        }
+    
+    def track(self, packet_id: int, packet: bytes, command: str, now: Optional[float] = None):
+        """تسجيل حزمة تنتظر ACK"""
+        now = time.monotonic() if now is None else now
+        deadline = now + self.rto
+        
+        self.pending[packet_id] = {
+            'packet': packet,
+            'timestamp': now,
+            'sent_at': now,
+            'deadline': deadline,
+            'retries': 0,
+            'command': command
+        }
+        heapq.heappush(self._deadlines, (deadline, packet_id, 0))
+        self.stats['tracked'] += 1
+    
+    def acknowledge(self, packet_id: int, now: Optional[float] = None) -> bool:
+        """معالجة ACK وتحديث تقدير RTT"""
+        info = self.pending.pop(packet_id, None)
+        if info is None:
+            return False
+        
+        # خوارزمية Karn: لا تُقاس RTT من حزمة أعيد إرسالها
+        if info['retries'] == 0:
+            now = time.monotonic() if now is None else now
+            self._update_rto(now - info['sent_at'])
+        
+        self.stats['acked'] += 1
+        self._compact_if_needed()
+        return True
+    
+    def poll(self, now: Optional[float] = None) -> List[Tuple[int, Dict[str, Any]]]:
+        """إرجاع الحزم التي انتهت مهلتها وتجب إعادة إرسالها"""
+        now = time.monotonic() if now is None else now
+        due = []
+        
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, packet_id, attempt = heapq.heappop(self._deadlines)
+            info = self.pending.get(packet_id)
+            if info is None or info['retries'] != attempt:
+                continue  # تم استلام ACK أو أعيدت جدولتها
+            
+            if info['retries'] >= self.max_retries:
+                del self.pending[packet_id]
+                self.stats['failed'] += 1
+                self.logger.error(f"فشل في إرسال الحزمة {packet_id} بعد {self.max_retries} محاولات")
+                if self.failure_handler:
+                    self.failure_handler(packet_id, info)
+                continue
+            
+            # تراجع أسي لمهلة هذه الحزمة
+            info['retries'] += 1
+            info['sent_at'] = now
+            info['deadline'] = now + min(self.rto * (2 ** info['retries']), self.max_rto)
+            heapq.heappush(self._deadlines, (info['deadline'], packet_id, info['retries']))
+            
+            self.stats['retransmitted'] += 1
+            due.append((packet_id, info))
+        
+        return due
+    
+    def next_deadline(self) -> Optional[float]:
+        """أقرب موعد انتهاء مهلة (monotonic) أو None"""
+        while self._deadlines:
+            deadline, packet_id, attempt = self._deadlines[0]
+            info = self.pending.get(packet_id)
+            if info is not None and info['retries'] == attempt:
+                return deadline
+            heapq.heappop(self._deadlines)
+        return None
+    
+    def clear(self):
+        """مسح كل الحزم المعلقة"""
+        self.pending.clear()
+        self._deadlines.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """الحصول على إحصائيات المحرك"""
+        stats = dict(self.stats)
+        stats['in_flight'] = len(self.pending)
+        stats['rto_ms'] = self.rto * 1000.0
+        stats['srtt_ms'] = self.srtt * 1000.0 if self.srtt is not None else None
+        return stats
+    
+    def _update_rto(self, rtt: float):
+        """تحديث SRTT و RTTVAR و RTO من عينة جديدة"""
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar = 0.75 * self.rttvar + 0.25 * abs(self.srtt - rtt)
+            self.srtt = 0.875 * self.srtt + 0.125 * rtt
+        
+        self.rto = min(self.max_rto, max(self.min_rto, self.srtt + 4 * self.rttvar))
+    
+    def _compact_if_needed(self):
+        """إعادة بناء الكومة عندما تكثر العناصر القديمة فيها"""
+        if len(self._deadlines) > 64 and len(self._deadlines) > 4 * len(self.pending):
+            self._deadlines = [
+                (info['deadline'], packet_id, info['retries'])
+                for packet_id, info in self.pending.items()
+            ]
+            heapq.heapify(self._deadlines)
+
+class DuplicateFilter:
+    """كشف الحزم المكررة بنافذة bitmap على أرقام تسلسل 16 بت (مثل مرشح إعادة التشغيل في IPsec)"""
+    
+    def __init__(self, window: int = 64, modulus: int = 0x10000):
+        self.window = window
+        self.modulus = modulus
+        self.highest: Optional[int] = None
+        self.bitmap = 0
+        self.duplicates = 0
+        self.stale = 0
+    
+    def accept(self, seq: int, newest_only: bool = False) -> bool:
+        """True إذا كانت الحزمة جديدة (وتُعلَّم كمستلمة)، False إذا كانت مكررة
+        
+        newest_only: رفض أي رسالة أقدم من أحدث رسالة مستلمة (للحالة مثل التيليمتري
+        حيث تُلغي القيمة الأحدث ما قبلها).
+        """
+        if self.highest is None:
+            self._reset(seq)
+            return True
+        
+        # الفرق بحساب الأعداد التسلسلية (RFC 1982)
+        diff = (seq - self.highest) % self.modulus
+        if diff >= self.modulus // 2:
+            diff -= self.modulus
+        
+        if diff > 0:
+            self.bitmap = ((self.bitmap << diff) | 1) & ((1 << self.window) - 1)
+            self.highest = seq
+            return True
+        
+        offset = -diff
+        if offset >= self.window:
+            # قفزة كبيرة للخلف: غالباً أعاد الطرف الآخر التشغيل
+            self._reset(seq)
+            return True
+        
+        bit = 1 << offset
+        if self.bitmap & bit:
+            self.duplicates += 1
+            return False
+        
+        if newest_only:
+            self.stale += 1
+            return False
+        
+        self.bitmap |= bit
+        return True
+    
+    def _reset(self, seq: int):
+        """بدء نافذة جديدة من رقم التسلسل المعطى"""
+        self.highest = seq
+        self.bitmap = 1
@@ -1,27 +1,92 @@
 import serial
+import json
 import time
 import threading
-from typing import Optional, Callable, Dict, Any
+from typing import Optional, Callable, Dict, Any, Iterable, List
 from utils.logger import ROVLogger
+from .packet_handler import PacketHandler
+from .link_health import parse_pong
+from .transport_writer import TransportWriter, KIND_EMERGENCY, KIND_MOTOR, KIND_NORMAL
+from .capture import DIRECTION_IN, DIRECTION_OUT
+from .baud_negotiation import BaudNegotiator, BaudRateCache
+from .stream_decoder import FRAME_OVERHEAD
+from .channels import CHANNEL_BULK, chunk_size_for_baud, is_bulk_channel, iter_bulk_chunks
 
 class SerialCommunication:
     """فئة الاتصال التسلسلي مع ROV"""
     
-    def __init__(self, port: str = "COM3", baud_rate: int = 9600, timeout: float = 5.0):
+    def __init__(self, port: str = "COM3", baud_rate: int = 9600, timeout: float = 5.0,
+                 binary_protocol: bool = False, read_mode: str = "bulk", bulk_chunk_ms: float = 10.0,
+                 negotiate_baud_rates: Iterable[int] = (), baud_cache_file: Optional[str] = 'baud_cache.yaml',
+                 baud_max_error_rate: float = 0.01, baud_fallback_error_rate: float = 0.05):
         self.port = port
         self.baud_rate = baud_rate
         self.timeout = timeout
+        
+        # رفع السرعة بعد الاتصال بالسرعة الآمنة (baud_rate) بالتفاوض مع المركبة؛
+        # baud_rate يحمل السرعة الفعلية أثناء الاتصال ويعود للآمنة عند قطعه
+        self.safe_baud_rate = baud_rate
+        self.baud_negotiator: Optional[BaudNegotiator] = None
+        if negotiate_baud_rates:
+            self.baud_negotiator = BaudNegotiator(negotiate_baud_rates, binary_protocol, BaudRateCache(baud_cache_file),
+                                                  max_error_rate=baud_max_error_rate,
+                                                  fallback_error_rate=baud_fallback_error_rate)
+        
+        # النقل الكبير: زمن إرسال كل جزء = أقصى تأخير يضيفه لإطار تحكم
+        self.bulk_chunk_ms = bulk_chunk_ms
+        self._bulk_transfer_id = 0
+        
+        # الصيغة الثنائية لرسائل المسار السريع بدلاً من الأوامر النصية
+        self.binary_protocol = binary_protocol
+        self.packet_handler = PacketHandler()
         self.serial_connection: Optional[serial.Serial] = None
         self.is_connected = False
         self.logger = ROVLogger('SerialComm')
         
         # معالج البيانات الواردة
         self.data_handler: Optional[Callable] = None
+        self.batch_handler: Optional[Callable] = None
         
         # خيط قراءة البيانات
         self.read_thread: Optional[threading.Thread] = None
         self.is_reading = False
         
+        # وضع القراءة: bulk (قراءة كتلية معطّلة حتى وصول البيانات) أو line (readline القديم)
+        self.read_mode = read_mode
+        self.read_buffer_size = 4096
+        self.read_poll_timeout = 0.5  # مهلة الاستيقاظ عند عدم وجود بيانات
+        self.max_line_length = 64 * 1024
+        self._line_buffer = bytearray()
+        
+        # التقاط الإطارات الواردة والصادرة (WireCapture يعيّنه المتحكم، None يعطله)
+        self.capture = None
+        
+        # إحصائيات القراءة
+        self.read_stats = {
+            'reads': 0,
+            'bytes': 0,
+            'items': 0,
+            'last_read_latency_ms': 0.0,
+            'avg_read_latency_ms': 0.0,
+            'max_read_latency_ms': 0.0,
+            'bytes_per_second': 0.0
+        }
+        self._rate_window_start = time.monotonic()
+        self._rate_window_bytes = 0
+        
+        # انتظار pong في test_connection (الردود تُمرر للمعالج أيضاً)
+        self._pong_condition = threading.Condition()
+        self._ping_seq = 0
+        self._last_pong_seq: Optional[int] = None
+        self._pong_count = 0
+
+        # خيط الكتابة الوحيد مع الطابور الصادر
+        self.writer = TransportWriter(self._write_bytes, 'SerialWriter')
+        
+        # إعادة الإرسال و ACK تمر عبر نفس خيط الكتابة
+        self.packet_handler.set_packet_sender(self._send_reliable_packet, self.writer.wake_timer)
+        self.writer.set_timer(self.packet_handler.check_pending_acks)
+        
     def connect(self) -> bool:
         """الاتصال بـ ROV عبر المنفذ التسلسلي"""
         try:
@@ -38,7 +103,13 @@ class SerialCommunication:
                 self.is_connected = True
                 self.logger.info(f"تم الاتصال بنجاح عبر {self.port} بسرعة {self.baud_rate}")
                 
-                # بدء خيط قراءة البيانات
+                # التفاوض على المنفذ مباشرة قبل بدء الخيطين
+                if self.baud_negotiator:
+                    self.safe_baud_rate = self.baud_rate
+                    self.baud_rate = self.baud_negotiator.negotiate(self.serial_connection, self.port)
+                
+                # بدء خيطي الكتابة والقراءة
+                self.writer.start()
                 self._start_reading()
                 return True
             else:
@@ -59,14 +130,20 @@ class SerialCommunication:
         self.is_connected = False
         self.is_reading = False
         
+        self.writer.stop()
+        
         if self.read_thread and self.read_thread.is_alive():
             self.read_thread.join(timeout=2)
         
         if self.serial_connection and self.serial_connection.is_open:
             self.serial_connection.close()
             self.logger.info("تم قطع الاتصال التسلسلي")
+        
+        # إعادة الاتصال تبدأ بالسرعة الآمنة ثم تتفاوض من جديد
+        if self.baud_negotiator:
+            self.baud_rate = self.safe_baud_rate
     
-    def send_command(self, command: str) -> bool:
+    def send_command(self, command: str, kind: str = KIND_NORMAL) -> bool:
         """إرسال أمر إلى ROV"""
         if not self.is_connected or not self.serial_connection:
             self.logger.warning("لا يوجد اتصال - لا يمكن إرسال الأمر")
@@ -75,8 +152,8 @@ class SerialCommunication:
         try:
             # إضافة خط جديد في نهاية الأمر
             command_bytes = (command + '\n').encode('utf-8')
-            self.serial_connection.write(command_bytes)
-            self.serial_connection.flush()
+            if not self.writer.submit(command_bytes, kind):
+                return False
             
             self.logger.debug(f"تم إرسال الأمر: {command}")
             return True
@@ -85,8 +162,53 @@ class SerialCommunication:
             self.logger.error(f"خطأ في إرسال الأمر: {e}")
             return False
     
+    def send_bytes(self, data: bytes, kind: str = KIND_NORMAL) -> bool:
+        """إرسال بيانات ثنائية إلى ROV"""
+        if not self.is_connected or not self.serial_connection:
+            self.logger.warning("لا يوجد اتصال - لا يمكن إرسال البيانات")
+            return False
+        
+        return self.writer.submit(data, kind)
+    
+    def send_bulk(self, data: bytes, channel: int = CHANNEL_BULK) -> bool:
+        """إرسال نقل كبير (سجل، لقطة) على قناة 2-255 من السعة المتبقية بعد التحكم والتيليمتري"""
+        if not self.binary_protocol or not is_bulk_channel(channel):
+            self.logger.warning("النقل الكبير يتطلب الصيغة الثنائية وقناة 2-255")
+            return False
+        if not self.is_connected or not self.serial_connection:
+            self.logger.warning("لا يوجد اتصال - لا يمكن إرسال البيانات")
+            return False
+        
+        self._bulk_transfer_id += 1
+        chunk_size = chunk_size_for_baud(self.baud_rate, self.bulk_chunk_ms) - FRAME_OVERHEAD
+        frames = [self.packet_handler.frame_payload(chunk, channel)
+                  for chunk in iter_bulk_chunks(data, self._bulk_transfer_id, chunk_size)]
+        if not self.writer.submit_bulk(frames):
+            self.logger.warning(f"طابور النقل الكبير ممتلئ - رُفض نقل {len(data)} بايت")
+            return False
+        return True
+    
+    def _write_bytes(self, data: bytes):
+        """الكتابة الفعلية على المنفذ (تُستدعى من خيط الكتابة فقط)"""
+        if self.capture is not None:
+            self.capture.record(DIRECTION_OUT, data)
+        self.serial_connection.write(data)
+        self.serial_connection.flush()
+    
+    def _send_reliable_packet(self, packet: bytes, command: str) -> bool:
+        """إرسال حزمة ACK أو إعادة إرسال حزمة لم يصلها ACK"""
+        kind = KIND_EMERGENCY if command == 'EMERGENCY_STOP' else KIND_NORMAL
+        return self.send_bytes(packet, kind)
+    
+    def get_write_stats(self) -> Dict[str, float]:
+        """الحصول على إحصائيات الطابور الصادر"""
+        return self.writer.get_stats()
+    
     def send_motor_commands(self, motors: Dict[str, int]) -> bool:
         """إرسال أوامر المحركات"""
+        if self.binary_protocol:
+            return self.send_bytes(self.packet_handler.create_binary_motor_packet(motors), KIND_MOTOR)
+        
         try:
             # تكوين أمر المحركات
             # صيغة: MOTOR,front_left,front_right,back_left,back_right,vertical_1,vertical_2
@@ -97,7 +219,7 @@ class SerialCommunication:
                 speed = motors.get(motor, 1500)  # القيمة الافتراضية (محايد)
                 command += f",{speed}"
             
-            return self.send_command(command)
+            return self.send_command(command, KIND_MOTOR)
             
         except Exception as e:
             self.logger.error(f"خطأ في إرسال أوامر المحركات: {e}")
@@ -105,12 +227,33 @@ class SerialCommunication:
     
     def request_telemetry(self) -> bool:
         """طلب بيانات التيليمتري"""
+        if self.binary_protocol:
+            return self.send_bytes(self.packet_handler.create_binary_telemetry_request_packet())
         return self.send_command("GET_TELEMETRY")
     
+    def request_keyframe(self) -> bool:
+        """طلب إطار تيليمتري كامل (بعد فقد إطار تفاضلي)"""
+        if self.binary_protocol:
+            return self.send_bytes(self.packet_handler.create_binary_keyframe_request_packet())
+        return self.send_command("GET_KEYFRAME")
+    
     def emergency_stop(self) -> bool:
         """إيقاف طارئ"""
         self.logger.warning("تم تنفيذ إيقاف طارئ!")
-        return self.send_command("EMERGENCY_STOP")
+        if self.binary_protocol:
+            # الإيقاف الطارئ يُرسل كحزمة موثوقة تُعاد حتى يصل ACK
+            return self.send_bytes(self.packet_handler.create_emergency_stop_packet(), KIND_EMERGENCY)
+        return self.send_command("EMERGENCY_STOP", KIND_EMERGENCY)
+    
+    def ping(self, seq: Optional[int] = None) -> bool:
+        """إرسال ping (مرقّم اختيارياً لمطابقة الرد وقياس RTT)"""
+        if self.binary_protocol:
+            ping_data = {"type": "ping", "timestamp": time.time()}
+            if seq is not None:
+                ping_data["seq"] = seq
+            payload = json.dumps(ping_data, separators=(',', ':')).encode('utf-8')
+            return self.send_bytes(self.packet_handler.frame_payload(payload))
+        return self.send_command("PING" if seq is None else f"PING,{seq}")
     
     def _start_reading(self):
         """بدء خيط قراءة البيانات"""
@@ -121,29 +264,173 @@ class SerialCommunication:
     
     def _read_data(self):
         """قراءة البيانات الواردة من ROV"""
+        if self.read_mode == 'bulk' or self.binary_protocol:
+            self._read_bulk()
+            return
+        
         while self.is_reading and self.is_connected:
             try:
                 if self.serial_connection and self.serial_connection.in_waiting > 0:
                     # قراءة خط كامل
-                    line = self.serial_connection.readline().decode('utf-8').strip()
+                    raw = self.serial_connection.readline()
+                    if self.capture is not None:
+                        self.capture.record(DIRECTION_IN, raw)
+                    line = raw.decode('utf-8').strip()
                     
                     if line:
                         self.logger.debug(f"بيانات واردة: {line}")
+                        self._note_pong(line)
                         
                         # معالجة البيانات
                         if self.data_handler:
                             self.data_handler(line)
                 
                 time.sleep(0.01)  # تجنب استهلاك المعالج بشكل مفرط
+            
+            except Exception as e:
+                self.logger.error(f"خطأ في قراءة البيانات: {e}")
+                self._link_lost(str(e))
+                break
+    
+    def _read_bulk(self):
+        """قراءة كتلية: انتظار معطّل على read ثم تقسيم كل الإطارات المتوفرة دفعة واحدة"""
+        read_buffer = bytearray(self.read_buffer_size)
+        read_view = memoryview(read_buffer)
+        self._line_buffer.clear()
+        
+        if self.serial_connection:
+            self.serial_connection.timeout = self.read_poll_timeout
+        
+        while self.is_reading and self.is_connected:
+            try:
+                connection = self.serial_connection
+                if not connection:
+                    break
+                
+                # انتظار أول بايت على الأقل ثم قراءة كل ما هو متوفر
+                wanted = min(max(1, connection.in_waiting), len(read_buffer))
+                count = connection.readinto(read_view[:wanted])
+                if not count:
+                    continue
+                
+                # الزمن من وصول البيانات حتى تسليمها للمعالج
+                read_start = time.perf_counter()
+                
+                if self.capture is not None:
+                    self.capture.record(DIRECTION_IN, read_view[:count])
+                items = self._handle_chunk(read_view[:count])
                 
+                self._update_read_stats(count, items, time.perf_counter() - read_start)
+                
+                if self.baud_rate != self.safe_baud_rate and self.binary_protocol and self.baud_negotiator:
+                    self._check_baud_errors()
+            
             except Exception as e:
                 self.logger.error(f"خطأ في قراءة البيانات: {e}")
+                self._link_lost(str(e))
                 break
     
+    def _handle_chunk(self, chunk: memoryview) -> int:
+        """تقسيم جزء وارد إلى رسائل وتمريرها دفعة واحدة (يُرجع عدد الرسائل)"""
+        if self.binary_protocol:
+            batch = self.packet_handler.feed_data(chunk)
+        else:
+            batch = self._split_lines(self._line_buffer, chunk)
+        
+        if batch:
+            self._dispatch_batch(batch)
+        return len(batch)
+    
+    def _check_baud_errors(self):
+        """أخطاء checksum مرتفعة بالسرعة المتفاوض عليها: خفض السرعة المحفوظة وإعادة الاتصال"""
+        if not self.baud_negotiator.error_rate_exceeded(self.packet_handler.stream_decoder.stats):
+            return
+        rate = self.baud_rate
+        fallback = self.baud_negotiator.demote(self.port, rate)
+        self._link_lost(f"معدل أخطاء CRC مرتفع بسرعة {rate} - السرعة التالية {fallback or self.safe_baud_rate}")
+    
+    def get_baud_stats(self) -> Dict[str, Any]:
+        """السرعة الحالية والآمنة وإحصائيات التفاوض"""
+        stats = self.baud_negotiator.get_stats() if self.baud_negotiator else {}
+        stats.update(baud_rate=self.baud_rate, safe_baud_rate=self.safe_baud_rate)
+        return stats
+    
+    def feed_inbound(self, data: bytes, stream: int = 0) -> int:
+        """تمرير بايتات واردة مسجلة عبر نفس المحللات (إعادة تشغيل الالتقاط دون منفذ)"""
+        return self._handle_chunk(memoryview(data))
+    
+    def _link_lost(self, reason: str):
+        """معالجة انقطاع الوصلة (فصل الكابل أو إغلاق المنفذ) - قطع الاتصال الطوعي لا يُعتبر انقطاعاً"""
+        if self.is_reading and self.is_connected:
+            self.logger.error(f"انقطع الاتصال التسلسلي: {reason}")
+            self.is_connected = False
+    
+    def _split_lines(self, line_buffer: bytearray, chunk: memoryview) -> List[str]:
+        """تقسيم الأسطر الكاملة من المخزن دفعة واحدة والاحتفاظ بالسطر الناقص"""
+        line_buffer += chunk
+        end = line_buffer.rfind(b'\n')
+        if end < 0:
+            if len(line_buffer) > self.max_line_length:
+                self.logger.warning("سطر طويل جداً بدون نهاية - تم تجاهله")
+                line_buffer.clear()
+            return []
+        
+        text = line_buffer[:end].decode('utf-8', errors='replace')
+        del line_buffer[:end + 1]
+        return [line for line in (part.strip() for part in text.split('\n')) if line]
+    
+    def _dispatch_batch(self, batch: List[Any]):
+        """تمرير دفعة من الرسائل لمعالج الدفعات أو لمعالج البيانات رسالة برسالة"""
+        for item in batch:
+            self._note_pong(item)
+        
+        if self.batch_handler:
+            self.batch_handler(batch)
+        elif self.data_handler:
+            for item in batch:
+                self.data_handler(item)
+    
+    def _update_read_stats(self, count: int, items: int, latency: float):
+        """تحديث عدادات زمن القراءة ومعدل البايتات"""
+        stats = self.read_stats
+        latency_ms = latency * 1000.0
+        
+        stats['reads'] += 1
+        stats['bytes'] += count
+        stats['items'] += items
+        stats['last_read_latency_ms'] = latency_ms
+        if stats['reads'] == 1:
+            stats['avg_read_latency_ms'] = latency_ms
+        else:
+            stats['avg_read_latency_ms'] += (latency_ms - stats['avg_read_latency_ms']) * 0.05
+        if latency_ms > stats['max_read_latency_ms']:
+            stats['max_read_latency_ms'] = latency_ms
+        
+        # معدل البايتات على نافذة ثانية واحدة
+        self._rate_window_bytes += count
+        now = time.monotonic()
+        elapsed = now - self._rate_window_start
+        if elapsed >= 1.0:
+            stats['bytes_per_second'] = self._rate_window_bytes / elapsed
+            self._rate_window_start = now
+            self._rate_window_bytes = 0
+    
+    def get_read_stats(self) -> Dict[str, float]:
+        """الحصول على إحصائيات القراءة"""
+        return dict(self.read_stats)
+    
     def set_data_handler(self, handler: Callable[[str], None]):
         """تعيين معالج البيانات الواردة"""
         self.data_handler = handler
     
+    def set_batch_handler(self, handler: Callable[[List[Any]], None]):
+        """تعيين معالج دفعات البيانات الواردة (وضع القراءة الكتلية)"""
+        self.batch_handler = handler
+    
+    def set_bulk_handler(self, handler: Callable[[int, bytes], None]):
+        """تعيين معالج النقل الكبير المكتمل: handler(channel, data)"""
+        self.packet_handler.bulk_reassembler.handler = handler
+    
     def get_available_ports(self) -> list:
         """الحصول على قائمة المنافذ المتاحة"""
         import serial.tools.list_ports
@@ -158,20 +445,43 @@ class SerialCommunication:
         
         return ports
     
-    def test_connection(self) -> bool:
-        """اختبار الاتصال"""
+    def test_connection(self, timeout: float = 1.0) -> bool:
+        """اختبار الاتصال: إرسال ping مرقّم وانتظار الرد المطابق حتى timeout ثانية"""
         if not self.is_connected:
             return False
         
         try:
-            # إرسال أمر اختبار
-            self.send_command("PING")
+            with self._pong_condition:
+                # نطاق أرقام منفصل عن الفحص الدوري (LinkMonitor) لتجنب التطابق الخاطئ
+                self._ping_seq = (self._ping_seq + 1) & 0x7FFF
+                seq = 0x8000 | self._ping_seq
+                pongs_before = self._pong_count
             
-            # انتظار الرد (يجب تنفيذ آلية انتظار الرد)
-            time.sleep(0.5)
+            sent_at = time.perf_counter()
+            if not self.ping(seq):
+                return False
             
-            return True
+            with self._pong_condition:
+                # PONG بدون رقم تسلسل (برامج ROV القديمة) يُقبل أيضاً
+                answered = self._pong_condition.wait_for(
+                    lambda: self._last_pong_seq == seq or
+                    (self._last_pong_seq is None and self._pong_count > pongs_before), timeout)
             
+            if answered:
+                self.logger.debug(f"رد PONG خلال {(time.perf_counter() - sent_at) * 1000.0:.1f} ms")
+            else:
+                self.logger.warning(f"لم يصل رد على PING خلال {timeout} ثانية")
+            return answered
+        
         except Exception as e:
             self.logger.error(f"فشل في اختبار الاتصال: {e}")
             return False
+    
+    def _note_pong(self, message: Any):
+        """تنبيه test_connection عند وصول pong"""
+        is_pong, seq = parse_pong(message)
+        if is_pong:
+            with self._pong_condition:
+                self._last_pong_seq = seq
+                self._pong_count += 1
+                self._pong_condition.notify_all()
@@ -0,0 +1,333 @@
+import struct
+from typing import Dict, Iterator, Union
+from utils.logger import ROVLogger
+from .channels import CHANNEL_CONTROL, CHANNEL_SHIFT, LENGTH_MASK
+
+START_MARKER = b'\xAA\x55'
+END_MARKER = b'\x55\xAA'
+
+# Header: START_MARKER(2) + LENGTH(4) + CHECKSUM(4)
+# البايت العلوي من LENGTH هو رقم القناة المنطقية ويدخل في الـ checksum
+HEADER_SIZE = 10
+TRAILER_SIZE = 2
+FRAME_OVERHEAD = HEADER_SIZE + TRAILER_SIZE
+
+_HEADER_STRUCT = struct.Struct('<II')
+
+def xor_checksum(data: Union[bytes, bytearray, memoryview]) -> int:
+    """حساب checksum (XOR لكل البايتات) بعمليات على أعداد كبيرة بدلاً من حلقة بايت ببايت"""
+    size = len(data)
+    if size == 0:
+        return 0
+    
+    # طي العدد على نفسه: XOR النصف العلوي مع النصف السفلي حتى يبقى بايت واحد
+    value = int.from_bytes(data, 'little')
+    while size > 1:
+        half = size // 2
+        shift = half * 8
+        value = (value & ((1 << shift) - 1)) ^ (value >> shift)
+        size -= half
+    return value
+
+class PacketStreamDecoder:
+    """مفكك حزم تدريجي يعيد المزامنة على علامة البداية بعد التلف
+    
+    يستقبل أجزاء عشوائية من تدفق البايتات في مخزن مؤقت قابل لإعادة الاستخدام،
+    ويُرجع محتوى كل حزمة كاملة كـ memoryview دون نسخ. المقاطع المُرجعة صالحة
+    فقط حتى الاستدعاء التالي لـ feed()، وقناة آخر حزمة مُرجعة في self.channel.
+    """
+    
+    def __init__(self, buffer_size: int = 64 * 1024, max_payload: int = 1024 * 1024):
+        self.logger = ROVLogger('StreamDecoder')
+        self.max_payload = max_payload
+        
+        # المخزن المؤقت: البيانات غير المعالجة بين _start و _end
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._end = 0
+        # موضع البحث عن حزمة سليمة داخل حزمة ناقصة (لتجنب إعادة فحص نفس البايتات)
+        self._probe_frame = -1
+        self._probe_pos = 0
+        self.channel = CHANNEL_CONTROL
+        
+        # إحصائيات
+        self.stats = {
+            'bytes_received': 0,
+            'frames_decoded': 0,
+            'checksum_errors': 0,
+            'framing_errors': 0,
+            'bytes_discarded': 0
+        }
+    
+    def feed(self, data: Union[bytes, bytearray, memoryview]):
+        """إضافة جزء من البيانات الواردة إلى المخزن"""
+        size = len(data)
+        if size == 0:
+            return
+        
+        if self._end + size > len(self._buffer):
+            self._make_room(size)
+        
+        self._buffer[self._end:self._end + size] = data
+        self._end += size
+        self.stats['bytes_received'] += size
+    
+    def frames(self) -> Iterator[memoryview]:
+        """استخراج كل الحزم الكاملة المتوفرة في المخزن"""
+        buffer = self._buffer
+        view = self._view
+        
+        while True:
+            available = self._end - self._start
+            if available < FRAME_OVERHEAD:
+                break
+            
+            # البحث عن علامة البداية
+            if buffer[self._start] != 0xAA or buffer[self._start + 1] != 0x55:
+                marker = buffer.find(START_MARKER, self._start, self._end)
+                if marker < 0:
+                    # الاحتفاظ بآخر بايت فقد يكون بداية علامة مقطوعة
+                    keep_from = self._end - 1
+                    self._discard(keep_from - self._start)
+                    break
+                self._discard(marker - self._start)
+                continue
+            
+            length, expected_checksum = _HEADER_STRUCT.unpack_from(buffer, self._start + 2)
+            channel = length >> CHANNEL_SHIFT
+            length &= LENGTH_MASK
+            if length > self.max_payload:
+                self.stats['framing_errors'] += 1
+                self._discard(1)
+                continue
+            
+            total_length = FRAME_OVERHEAD + length
+            if available < total_length:
+                # طول تالف قد يجعل المفكك ينتظر بيانات لن تأتي: إذا ظهرت بعده حزمة
+                # كاملة وسليمة فالترويسة الحالية هي التالفة
+                resync = self._find_valid_frame()
+                if resync < 0:
+                    break
+                self.stats['framing_errors'] += 1
+                self._discard(resync - self._start)
+                continue
+            
+            payload_start = self._start + HEADER_SIZE
+            payload_end = payload_start + length
+            
+            # التحقق من علامة النهاية
+            if buffer[payload_end] != 0x55 or buffer[payload_end + 1] != 0xAA:
+                self.stats['framing_errors'] += 1
+                self._discard(1)
+                continue
+            
+            payload = view[payload_start:payload_end]
+            if xor_checksum(payload) ^ channel != expected_checksum:
+                payload.release()
+                self.stats['checksum_errors'] += 1
+                self._discard(1)
+                continue
+            
+            self._start += total_length
+            self.stats['frames_decoded'] += 1
+            self.channel = channel
+            yield payload
+        
+        if self._start == self._end:
+            self._start = self._end = 0
+    
+    def decode(self, data: Union[bytes, bytearray, memoryview]) -> Iterator[memoryview]:
+        """إضافة البيانات واستخراج الحزم الكاملة في خطوة واحدة"""
+        self.feed(data)
+        return self.frames()
+    
+    def reset(self):
+        """مسح المخزن المؤقت"""
+        self._start = self._end = 0
+    
+    def pending_bytes(self) -> int:
+        """عدد البايتات التي تنتظر اكتمال الحزمة"""
+        return self._end - self._start
+    
+    def get_stats(self) -> Dict[str, int]:
+        """الحصول على إحصائيات المفكك"""
+        return dict(self.stats)
+    
+    def _find_valid_frame(self) -> int:
+        """إذا وُجدت حزمة كاملة سليمة بعد بداية الحزمة الناقصة الحالية يُرجع موضع أول علامة بداية بعدها (وإلا -1)"""
+        buffer = self._buffer
+        if self._probe_frame != self._start:
+            self._probe_frame = self._start
+            self._probe_pos = self._start + 2
+        
+        while True:
+            marker = buffer.find(START_MARKER, self._probe_pos, self._end)
+            if marker < 0 or self._end - marker < FRAME_OVERHEAD:
+                # إعادة الفحص لاحقاً من هنا (قد تكون علامة مقطوعة في النهاية)
+                self._probe_pos = marker if marker >= 0 else max(self._probe_pos, self._end - 1)
+                return -1
+            
+            # الحزم المرشحة الناقصة تُتخطى حتى لا يتوقف الفحص عند طول تالف آخر
+            self._probe_pos = marker + 1
+            length, expected_checksum = _HEADER_STRUCT.unpack_from(buffer, marker + 2)
+            channel = length >> CHANNEL_SHIFT
+            length &= LENGTH_MASK
+            payload_end = marker + HEADER_SIZE + length
+            if length > self.max_payload or payload_end + TRAILER_SIZE > self._end:
+                continue
+            
+            if (buffer[payload_end] == 0x55 and buffer[payload_end + 1] == 0xAA and
+                    xor_checksum(self._view[marker + HEADER_SIZE:payload_end]) ^ channel == expected_checksum):
+                return buffer.find(START_MARKER, self._start + 2, marker + 1)
+    
+    def _discard(self, count: int):
+        """تجاهل بايتات تالفة أثناء إعادة المزامنة"""
+        if count <= 0:
+            return
+        self._start += count
+        self.stats['bytes_discarded'] += count
+    
+    def _make_room(self, incoming: int):
+        """إفساح المجال في المخزن: نقل البيانات المتبقية للبداية أو تكبيره"""
+        pending = self._end - self._start
+        needed = pending + incoming
+        
+        if needed <= len(self._buffer):
+            # نقل البيانات غير المعالجة إلى بداية المخزن (نفس الحجم، بدون إعادة تخصيص)
+            # المصدر والهدف قد يتداخلان لذا يُنسخ الجزء المتبقي أولاً
+            self._buffer[0:pending] = self._buffer[self._start:self._end]
+        else:
+            # تخصيص مخزن جديد؛ المقاطع المُرجعة سابقاً تبقى صالحة على المخزن القديم
+            new_size = len(self._buffer)
+            while new_size < needed:
+                new_size *= 2
+            new_buffer = bytearray(new_size)
+            new_buffer[0:pending] = self._view[self._start:self._end]
+            self._buffer = new_buffer
+            self._view = memoryview(new_buffer)
+            self.logger.debug(f"تم تكبير مخزن المفكك إلى {new_size} بايت")
+        
+        self._start = 0
+        self._end = pending
+
+class LengthPrefixedDecoder:
+    """مستقبل رسائل TCP ذات البادئة الطولية (4 بايت big-endian) بدون نسخ
+
+    يقرأ من المقبس مباشرة إلى مخزن مخصص مسبقاً عبر recv_into، ويتعامل مع
+    البادئات الناقصة، ويُرجع كل رسالة كاملة كـ memoryview. الرسائل الكبيرة
+    (سجلات، سونار) تُفك في زمن خطي دون تخصيص ذاكرة لكل جزء. البايت العلوي من
+    البادئة هو رقم القناة المنطقية (قناة آخر رسالة مُرجعة في self.channel).
+    """
+    
+    def __init__(self, buffer_size: int = 64 * 1024, max_message: int = LENGTH_MASK):
+        self.logger = ROVLogger('LengthPrefixedDecoder')
+        self.max_message = max_message
+        
+        self._buffer = bytearray(buffer_size)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._end = 0
+        self._large_messages = False
+        self.channel = CHANNEL_CONTROL
+        
+        # إحصائيات
+        self.stats = {
+            'bytes_received': 0,
+            'messages_decoded': 0,
+            'buffer_grows': 0
+        }
+    
+    def recv_from(self, sock) -> int:
+        """قراءة ما هو متوفر من المقبس مباشرة إلى المخزن (0 يعني إغلاق الاتصال)"""
+        if self._end == len(self._buffer):
+            self._make_room(self._required_size())
+        
+        limit = len(self._buffer) - self._end
+        pending = self._end - self._start
+        if pending >= 4:
+            # رسالة كبيرة جارية: القراءة حتى نهايتها فقط ليفرغ المخزن بعدها دون نقل بيانات
+            message_size = 4 + (int.from_bytes(self._view[self._start:self._start + 4], 'big') & LENGTH_MASK)
+            if message_size > len(self._buffer) // 4:
+                limit = min(limit, message_size - pending)
+        elif self._large_messages:
+            # الرسائل الكبيرة: قراءة البادئة وحدها أولاً ثم الرسالة كاملة في مكانها
+            limit = min(limit, 4 - pending)
+        
+        count = sock.recv_into(self._view[self._end:self._end + limit])
+        self._end += count
+        self.stats['bytes_received'] += count
+        return count
+    
+    def last_received(self, count: int) -> memoryview:
+        """آخر count بايت قرأها recv_from (صالحة حتى استدعاء frames())"""
+        return self._view[self._end - count:self._end]
+    
+    def feed(self, data: Union[bytes, bytearray, memoryview]):
+        """إضافة بيانات جاهزة إلى المخزن (للاختبار وإعادة التشغيل)"""
+        size = len(data)
+        if self._end + size > len(self._buffer):
+            self._make_room(self._end - self._start + size)
+        self._buffer[self._end:self._end + size] = data
+        self._end += size
+        self.stats['bytes_received'] += size
+    
+    def frames(self) -> Iterator[memoryview]:
+        """استخراج كل الرسائل الكاملة المتوفرة"""
+        while self._end - self._start >= 4:
+            length = int.from_bytes(self._view[self._start:self._start + 4], 'big')
+            channel = length >> CHANNEL_SHIFT
+            length &= LENGTH_MASK
+            if length > self.max_message:
+                raise ValueError(f"طول رسالة غير صالح: {length}")
+            
+            message_end = self._start + 4 + length
+            if message_end > self._end:
+                # رسالة ناقصة: تجهيز مساحة كافية لها قبل القراءة التالية
+                if message_end > len(self._buffer):
+                    self._make_room(4 + length)
+                break
+            
+            message = self._view[self._start + 4:message_end]
+            self._start = message_end
+            self._large_messages = 4 + length > len(self._buffer) // 4
+            self.stats['messages_decoded'] += 1
+            self.channel = channel
+            yield message
+        
+        if self._start == self._end:
+            self._start = self._end = 0
+    
+    def get_stats(self) -> Dict[str, int]:
+        """الحصول على إحصائيات المستقبل"""
+        stats = dict(self.stats)
+        stats['buffer_size'] = len(self._buffer)
+        return stats
+    
+    def _required_size(self) -> int:
+        """الحجم اللازم للرسالة الجارية (أو ضعف المخزن إذا لم يُعرف الطول بعد)"""
+        pending = self._end - self._start
+        if pending >= 4:
+            return 4 + (int.from_bytes(self._view[self._start:self._start + 4], 'big') & LENGTH_MASK)
+        return pending + 4
+    
+    def _make_room(self, needed: int):
+        """نقل البيانات المعلقة لبداية المخزن أو تكبيره حتى يتسع needed بايت"""
+        pending = self._end - self._start
+        needed = max(needed, pending + 1)
+        
+        if needed <= len(self._buffer):
+            if self._start > 0:
+                self._buffer[0:pending] = self._buffer[self._start:self._end]
+        else:
+            new_size = len(self._buffer)
+            while new_size < needed:
+                new_size *= 2
+            new_buffer = bytearray(new_size)
+            new_buffer[0:pending] = self._view[self._start:self._end]
+            self._buffer = new_buffer
+            self._view = memoryview(new_buffer)
+            self.stats['buffer_grows'] += 1
+        
+        self._start = 0
+        self._end = pending
@@ -0,0 +1,230 @@
+import struct
+import time
+from typing import Dict, Any, Optional, List, Tuple, Union
+
+# حقول التيليمتري ودقة التكميم الافتراضية (بوحدة الحقل)
+# المجموعة، الحقل (None لحقل في المستوى الأعلى)، الدقة
+TELEMETRY_FIELDS: Tuple[Tuple[str, Optional[str], float], ...] = (
+    ('position', 'x', 0.01),
+    ('position', 'y', 0.01),
+    ('position', 'z', 0.01),
+    ('orientation', 'roll', 0.1),
+    ('orientation', 'pitch', 0.1),
+    ('orientation', 'yaw', 0.1),
+    ('velocity', 'x', 0.01),
+    ('velocity', 'y', 0.01),
+    ('velocity', 'z', 0.01),
+    ('sensors', 'depth', 0.01),
+    ('sensors', 'temperature', 0.1),
+    ('sensors', 'pressure', 0.1),
+    ('battery', None, 1.0),
+)
+
+FLAG_KEYFRAME = 0x01
+
+# FLAGS(1) + FRAME_COUNTER(1) + CHANGED_MASK(2)
+_BODY_HEADER = struct.Struct('<BBH')
+
+def _field_name(group: str, name: Optional[str]) -> str:
+    return group if name is None else f"{group}.{name}"
+
+def _decimals(resolution: float) -> int:
+    """عدد الخانات العشرية اللازمة لعرض قيمة بهذه الدقة"""
+    text = f"{resolution:g}"
+    return len(text.split('.')[1]) if '.' in text else 0
+
+def _resolve_resolutions(resolutions: Optional[Dict[str, float]]) -> List[float]:
+    """دقة كل حقل: 'position.x' لحقل محدد أو 'position' لكل حقول المجموعة"""
+    resolutions = resolutions or {}
+    result = []
+    for group, name, default in TELEMETRY_FIELDS:
+        value = resolutions.get(_field_name(group, name), resolutions.get(group, default))
+        if value <= 0:
+            raise ValueError(f"دقة غير صالحة للحقل {_field_name(group, name)}: {value}")
+        result.append(float(value))
+    return result
+
+class TelemetryDeltaEncoder:
+    """ترميز التيليمتري كفروق مكمّمة للحقول المتغيرة فقط مع إطار كامل دوري
+    
+    كل قيمة تُحوَّل إلى عدد صحيح بالدقة المحددة (مثل 0.01 م للعمق و 0.1° للزوايا)،
+    ويُرسل الفرق عن آخر قيمة مُرسلة كـ varint بترميز zigzag، فالحقل الذي تغير
+    قليلاً يأخذ بايتاً واحداً والحقل الثابت لا يُرسل أصلاً.
+    """
+    
+    def __init__(self, keyframe_interval: int = 50, resolutions: Optional[Dict[str, float]] = None):
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.resolutions = _resolve_resolutions(resolutions)
+        
+        # آخر القيم المُرسلة (مكمّمة) - مرجع الفروق
+        self._last: List[int] = [0] * len(TELEMETRY_FIELDS)
+        self._frames_since_keyframe = 0
+        self._keyframe_pending = True
+        self._counter = 0
+    
+    def request_keyframe(self):
+        """إرسال إطار كامل مع الإطار التالي"""
+        self._keyframe_pending = True
+    
+    def encode(self, state: Dict[str, Any]) -> bytes:
+        """ترميز حالة ROV الكاملة إلى جسم رسالة (فروق أو إطار كامل)"""
+        keyframe = self._keyframe_pending or self._frames_since_keyframe >= self.keyframe_interval
+        last = self._last
+        out = bytearray(_BODY_HEADER.size)
+        mask = 0
+        
+        for index, (group, name, _) in enumerate(TELEMETRY_FIELDS):
+            value = state.get(group, 0) if name is None else state.get(group, {}).get(name, 0)
+            quantized = int(round(float(value or 0) / self.resolutions[index]))
+            
+            if keyframe:
+                diff = quantized
+            else:
+                diff = quantized - last[index]
+                if diff == 0:
+                    continue
+            
+            mask |= 1 << index
+            last[index] = quantized
+            _write_varint(out, diff << 1 if diff >= 0 else (-diff << 1) - 1)
+        
+        if keyframe:
+            self._keyframe_pending = False
+            self._frames_since_keyframe = 0
+        self._frames_since_keyframe += 1
+        
+        self._counter = (self._counter + 1) & 0xFF
+        _BODY_HEADER.pack_into(out, 0, FLAG_KEYFRAME if keyframe else 0, self._counter, mask)
+        return bytes(out)
+
+class TelemetryDeltaDecoder:
+    """إعادة بناء حالة التيليمتري الكاملة تدريجياً من الفروق
+    
+    يحتفظ بالقيم المكمّمة الحالية ويُرجع الحقول التي تغيرت فقط. إذا فُقد إطار
+    (قفزة في عداد الإطارات) تتوقف الفروق حتى وصول إطار كامل لأن الفرق يعتمد
+    على قيمة لم تصل.
+    """
+    
+    def __init__(self, resolutions: Optional[Dict[str, float]] = None,
+                 keyframe_request_interval: float = 1.0):
+        self.resolutions = _resolve_resolutions(resolutions)
+        self._decimals = [_decimals(resolution) for resolution in self.resolutions]
+        self.keyframe_request_interval = keyframe_request_interval
+        
+        self._values: List[int] = [0] * len(TELEMETRY_FIELDS)
+        self._synced = False
+        self._expected_counter: Optional[int] = None
+        self._last_keyframe_request = 0.0
+        
+        # الحالة الكاملة المعاد بناؤها
+        self.state: Dict[str, Any] = {}
+        
+        # إحصائيات
+        self.stats = {
+            'keyframes': 0,
+            'deltas': 0,
+            'dropped_out_of_sync': 0,
+            'gaps': 0,
+            'malformed': 0,
+            'bytes': 0
+        }
+    
+    @property
+    def synced(self) -> bool:
+        return self._synced
+    
+    def decode(self, body: Union[bytes, bytearray, memoryview],
+               offset: int = 0) -> Optional[Dict[str, Any]]:
+        """تطبيق جسم رسالة وإرجاع الحقول المتغيرة (None إذا كان المفكك غير متزامن)"""
+        flags, counter, mask = _BODY_HEADER.unpack_from(body, offset)
+        self.stats['bytes'] += len(body) - offset
+        offset += _BODY_HEADER.size
+        keyframe = bool(flags & FLAG_KEYFRAME)
+        
+        if keyframe:
+            self.stats['keyframes'] += 1
+            self._synced = True
+        else:
+            if self._synced and counter != self._expected_counter:
+                self.stats['gaps'] += 1
+                self._synced = False
+            if not self._synced:
+                self.stats['dropped_out_of_sync'] += 1
+                return None
+            self.stats['deltas'] += 1
+        
+        self._expected_counter = (counter + 1) & 0xFF
+        
+        values = self._values
+        changes: Dict[str, Any] = {}
+        index = 0
+        while mask:
+            if mask & 1:
+                try:
+                    encoded, offset = _read_varint(body, offset)
+                except IndexError:
+                    # رسالة مبتورة أو تالفة: القيم الحالية لم تعد موثوقة
+                    self.stats['malformed'] += 1
+                    self._synced = False
+                    return None
+                diff = (encoded >> 1) ^ -(encoded & 1)
+                values[index] = diff if keyframe else values[index] + diff
+                
+                group, name, _ = TELEMETRY_FIELDS[index]
+                decimals = self._decimals[index]
+                value = round(values[index] * self.resolutions[index], decimals)
+                if decimals == 0:
+                    value = int(value)
+                
+                if name is None:
+                    changes[group] = value
+                    self.state[group] = value
+                else:
+                    changes.setdefault(group, {})[name] = value
+                    self.state.setdefault(group, {})[name] = value
+            mask >>= 1
+            index += 1
+        
+        changes['keyframe'] = keyframe
+        return changes
+    
+    def should_request_keyframe(self, now: Optional[float] = None) -> bool:
+        """هل يجب طلب إطار كامل الآن (مع تحديد معدل الطلبات)"""
+        if self._synced:
+            return False
+        now = time.monotonic() if now is None else now
+        if now - self._last_keyframe_request < self.keyframe_request_interval:
+            return False
+        self._last_keyframe_request = now
+        return True
+    
+    def reset(self):
+        """إعادة ضبط المفكك (بعد إعادة الاتصال)"""
+        self._synced = False
+        self._expected_counter = None
+        self._last_keyframe_request = 0.0
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """الحصول على إحصائيات المفكك"""
+        stats = dict(self.stats)
+        stats['synced'] = self._synced
+        return stats
+
+def _write_varint(out: bytearray, value: int):
+    """كتابة عدد صحيح غير سالب بترميز varint (7 بت لكل بايت)"""
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _read_varint(data: Union[bytes, bytearray, memoryview], offset: int) -> Tuple[int, int]:
+    """قراءة varint وإرجاع (القيمة، الموضع التالي)"""
+    result = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        result |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return result, offset
+        shift += 7
@@ -0,0 +1,321 @@
+import time
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+from utils.logger import ROVLogger
+
+# أنواع الرسائل الصادرة حسب الأولوية
+KIND_EMERGENCY = 'emergency'  # تتجاوز الطابور دائماً
+KIND_MOTOR = 'motor'          # آخر قيمة فقط (الأوامر القديمة تُستبدل)
+KIND_NORMAL = 'normal'        # طابور FIFO عادي (رسائل التحكم: ACK، ping، الطلبات)
+KIND_TELEMETRY = 'telemetry'  # حصة مضمونة مما يتبقى بعد التحكم
+KIND_BULK = 'bulk'            # ما يتبقى فقط، أجزاء صغيرة لا تؤخر التحكم أكثر من جزء واحد
+
+class OutboundQueue:
+    """طابور صادر بالأولويات: طوارئ أولاً، ثم آخر أمر محركات، ثم رسائل التحكم بالترتيب،
+    ثم التيليمتري والنقل الكبير بجدولة موزونة بالبايتات
+
+    التحكم له أولوية مطلقة. بين التيليمتري والنقل الكبير يُختار الصنف الأقل
+    (بايتات مُرسلة / وزنه)، فيأخذ التيليمتري telemetry_share من السعة عند
+    الازدحام ويأخذ النقل الكبير الباقي، وأي صنف وحده يأخذ السعة كاملة.
+
+    غير آمن للخيوط بمفرده - يحميه المستخدم بقفل أو يستخدمه من خيط واحد.
+    """
+    
+    def __init__(self, max_queue: int = 256, telemetry_share: float = 0.8,
+                 max_bulk_bytes: int = 4 * 1024 * 1024):
+        self.max_queue = max_queue
+        self._emergency: deque = deque()
+        self._normal: deque = deque()
+        self._motor: Optional[Tuple[bytes, float]] = None
+        
+        self._telemetry: deque = deque()
+        self._bulk: deque = deque()
+        self.telemetry_weight = min(max(telemetry_share, 0.05), 0.95)
+        self.bulk_weight = 1.0 - self.telemetry_weight
+        self.max_bulk_bytes = max_bulk_bytes
+        self._bulk_bytes = 0
+        # البايتات المُرسلة مقسومة على الوزن لكل صنف
+        self._telemetry_service = 0.0
+        self._bulk_service = 0.0
+        
+        # إحصائيات
+        self.stats = {
+            'written': 0,
+            'bytes_written': 0,
+            'dropped_stale': 0,
+            'dropped_overflow': 0,
+            'write_errors': 0,
+            'avg_write_latency_ms': 0.0,
+            'max_write_latency_ms': 0.0,
+            'avg_queue_delay_ms': 0.0,
+            'max_control_wait_ms': 0.0,
+            'telemetry_bytes': 0,
+            'bulk_bytes': 0
+        }
+    
+    def push(self, data: bytes, kind: str = KIND_NORMAL):
+        """إضافة رسالة حسب نوعها"""
+        entry = (data, time.perf_counter())
+        if kind == KIND_EMERGENCY:
+            # أمر المحركات المعلق لم يعد صالحاً بعد الإيقاف الطارئ
+            if self._motor is not None:
+                self._motor = None
+                self.stats['dropped_stale'] += 1
+            self._emergency.append(entry)
+        elif kind == KIND_MOTOR:
+            if self._motor is not None:
+                self.stats['dropped_stale'] += 1
+            self._motor = entry
+        elif kind == KIND_TELEMETRY:
+            if len(self._telemetry) >= self.max_queue:
+                self._telemetry.popleft()
+                self.stats['dropped_overflow'] += 1
+            self._telemetry.append(entry)
+        elif kind == KIND_BULK:
+            # المستدعي يتحقق من bulk_space() قبل تقسيم النقل
+            self._bulk_bytes += len(data)
+            self._bulk.append(entry)
+        else:
+            if len(self._normal) >= self.max_queue:
+                self._normal.popleft()
+                self.stats['dropped_overflow'] += 1
+            self._normal.append(entry)
+    
+    def pop(self) -> Optional[Tuple[bytes, float]]:
+        """اختيار الرسالة التالية حسب الأولوية"""
+        entry = self._pop_control()
+        if entry is not None:
+            wait_ms = (time.perf_counter() - entry[1]) * 1000.0
+            if wait_ms > self.stats['max_control_wait_ms']:
+                self.stats['max_control_wait_ms'] = wait_ms
+            return entry
+        
+        if not self._telemetry and not self._bulk:
+            return None
+        
+        # الصنف الخامل لا يدخر رصيداً: يبدأ من مستوى الصنف النشط
+        if not self._bulk:
+            self._bulk_service = max(self._bulk_service, self._telemetry_service)
+        elif not self._telemetry:
+            self._telemetry_service = max(self._telemetry_service, self._bulk_service)
+        
+        if self._telemetry and (not self._bulk or self._telemetry_service <= self._bulk_service):
+            entry = self._telemetry.popleft()
+            self._telemetry_service += len(entry[0]) / self.telemetry_weight
+            self.stats['telemetry_bytes'] += len(entry[0])
+        else:
+            entry = self._bulk.popleft()
+            self._bulk_bytes -= len(entry[0])
+            self._bulk_service += len(entry[0]) / self.bulk_weight
+            self.stats['bulk_bytes'] += len(entry[0])
+        return entry
+    
+    def _pop_control(self) -> Optional[Tuple[bytes, float]]:
+        if self._emergency:
+            return self._emergency.popleft()
+        
+        if self._motor is not None:
+            entry = self._motor
+            self._motor = None
+            return entry
+        
+        if self._normal:
+            return self._normal.popleft()
+        
+        return None
+    
+    def bulk_space(self) -> int:
+        """البايتات المتاحة لنقل كبير جديد"""
+        return self.max_bulk_bytes - self._bulk_bytes
+    
+    def clear(self):
+        """مسح كل الرسائل المعلقة"""
+        self._emergency.clear()
+        self._normal.clear()
+        self._motor = None
+        self._telemetry.clear()
+        self._bulk.clear()
+        self._bulk_bytes = 0
+    
+    def depth(self) -> int:
+        """عدد الرسائل المعلقة"""
+        return (len(self._emergency) + len(self._normal) + (1 if self._motor is not None else 0) +
+                len(self._telemetry) + len(self._bulk))
+    
+    def record_write(self, size: int, queued_at: float, write_start: float, write_end: float):
+        """تحديث عدادات زمن الكتابة"""
+        stats = self.stats
+        queue_delay_ms = (write_start - queued_at) * 1000.0
+        write_ms = (write_end - write_start) * 1000.0
+        
+        stats['written'] += 1
+        stats['bytes_written'] += size
+        
+        if stats['written'] == 1:
+            stats['avg_write_latency_ms'] = write_ms
+            stats['avg_queue_delay_ms'] = queue_delay_ms
+        else:
+            stats['avg_write_latency_ms'] += (write_ms - stats['avg_write_latency_ms']) * 0.05
+            stats['avg_queue_delay_ms'] += (queue_delay_ms - stats['avg_queue_delay_ms']) * 0.05
+        
+        if write_ms > stats['max_write_latency_ms']:
+            stats['max_write_latency_ms'] = write_ms
+    
+    def get_stats(self) -> Dict[str, float]:
+        """الحصول على إحصائيات الطابور"""
+        stats = dict(self.stats)
+        stats['queue_depth'] = self.depth()
+        stats['bulk_queued_bytes'] = self._bulk_bytes
+        return stats
+
+class TransportWriter:
+    """خيط كتابة واحد لكل وسيلة اتصال مع طابور صادر يدمج أوامر المحركات
+    
+    أوامر المحركات تعمل بمبدأ "آخر قيمة تفوز" فلا يتراكم طابور من الأوامر
+    القديمة على وصلة بطيئة، والإيقاف الطارئ يُكتب قبل أي رسالة أخرى.
+    """
+    
+    def __init__(self, write_func: Callable[[bytes], None], name: str = 'Writer',
+                 max_queue: int = 256, telemetry_share: float = 0.8):
+        self.write_func = write_func
+        self.name = name
+        self.logger = ROVLogger(name)
+        
+        self._condition = threading.Condition()
+        self.queue = OutboundQueue(max_queue, telemetry_share)
+        
+        self.thread: Optional[threading.Thread] = None
+        self.is_running = False
+        
+        # مؤقت دوري يعمل في خيط الكتابة (مثل إعادة الإرسال): يُرجع الثواني حتى استدعائه التالي أو None
+        self._timer: Optional[Callable[[], Optional[float]]] = None
+        self._timer_deadline: Optional[float] = None
+    
+    def start(self):
+        """بدء خيط الكتابة"""
+        if not self.is_running:
+            self.is_running = True
+            self.thread = threading.Thread(target=self._write_loop, name=self.name, daemon=True)
+            self.thread.start()
+    
+    def stop(self, timeout: float = 2.0):
+        """إيقاف خيط الكتابة بعد إفراغ الرسائل المعلقة"""
+        with self._condition:
+            self.is_running = False
+            self._condition.notify_all()
+        
+        if self.thread and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=timeout)
+        
+        self.clear()
+    
+    def submit(self, data: bytes, kind: str = KIND_NORMAL) -> bool:
+        """إضافة رسالة إلى الطابور الصادر"""
+        if not self.is_running:
+            return False
+        
+        with self._condition:
+            self.queue.push(data, kind)
+            self._condition.notify()
+        
+        return True
+    
+    def submit_bulk(self, chunks: List[bytes]) -> bool:
+        """إضافة أجزاء نقل كبير كاملة أو رفضها كلها إذا لم يتسع لها الطابور"""
+        if not self.is_running:
+            return False
+        
+        with self._condition:
+            if sum(len(chunk) for chunk in chunks) > self.queue.bulk_space():
+                return False
+            for chunk in chunks:
+                self.queue.push(chunk, KIND_BULK)
+            self._condition.notify()
+        
+        return True
+    
+    def set_timer(self, callback: Optional[Callable[[], Optional[float]]]):
+        """تعيين مؤقت ينفذه خيط الكتابة عند حلول موعده"""
+        with self._condition:
+            self._timer = callback
+            self._timer_deadline = time.monotonic() if callback else None
+            self._condition.notify()
+    
+    def wake_timer(self, delay: float = 0.0):
+        """تقديم موعد المؤقت (مثلاً بعد تسجيل حزمة جديدة تنتظر ACK)"""
+        with self._condition:
+            if self._timer is None:
+                return
+            deadline = time.monotonic() + delay
+            if self._timer_deadline is None or deadline < self._timer_deadline:
+                self._timer_deadline = deadline
+                self._condition.notify()
+    
+    def clear(self):
+        """مسح كل الرسائل المعلقة"""
+        with self._condition:
+            self.queue.clear()
+    
+    def queue_depth(self) -> int:
+        """عدد الرسائل المعلقة"""
+        with self._condition:
+            return self.queue.depth()
+    
+    def get_stats(self) -> Dict[str, float]:
+        """الحصول على إحصائيات الكتابة"""
+        with self._condition:
+            return self.queue.get_stats()
+    
+    def _write_loop(self):
+        """حلقة خيط الكتابة"""
+        while True:
+            with self._condition:
+                entry = self.queue.pop()
+                while entry is None and self.is_running:
+                    if self._timer_due():
+                        break
+                    timeout = None
+                    if self._timer_deadline is not None:
+                        timeout = max(0.0, self._timer_deadline - time.monotonic())
+                    self._condition.wait(timeout)
+                    entry = self.queue.pop()
+                
+                if entry is None and not self.is_running:
+                    break
+                
+                timer = self._timer if self._timer_due() else None
+            
+            if timer is not None:
+                self._run_timer(timer)
+            
+            if entry is None:
+                continue
+            
+            data, queued_at = entry
+            write_start = time.perf_counter()
+            
+            try:
+                self.write_func(data)
+            except Exception as e:
+                self.queue.stats['write_errors'] += 1
+                self.logger.error(f"خطأ في الكتابة: {e}")
+                continue
+            
+            self.queue.record_write(len(data), queued_at, write_start, time.perf_counter())
+    
+    def _timer_due(self) -> bool:
+        """هل حل موعد المؤقت (يُستدعى مع القفل)"""
+        return self._timer_deadline is not None and time.monotonic() >= self._timer_deadline
+    
+    def _run_timer(self, timer: Callable[[], Optional[float]]):
+        """تنفيذ المؤقت خارج القفل وجدولة موعده التالي"""
+        try:
+            delay = timer()
+        except Exception as e:
+            self.logger.error(f"خطأ في المؤقت: {e}")
+            delay = 1.0
+        
+        with self._condition:
+            if self._timer is timer:
+                self._timer_deadline = time.monotonic() + delay if delay is not None else None
@@ -0,0 +1,407 @@
+import asyncio
+import json
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from utils.logger import ROVLogger
+from utils.telemetry_bus import TOPIC_TELEMETRY, TOPIC_IMU, TOPIC_PRESSURE, TOPIC_TEMPERATURE
+
+# حالة المركبة الكاملة (ROVController.get_rov_status) تُقرأ فقط عند وجود مشترك
+TOPIC_STATUS = 'status'
+STREAM_TOPICS = (TOPIC_STATUS, TOPIC_TELEMETRY, TOPIC_IMU, TOPIC_PRESSURE, TOPIC_TEMPERATURE)
+
+# أقصى عدد ردود تحكم (hello / subscribed / error) تنتظر الإرسال لعميل واحد
+MAX_PENDING_REPLIES = 16
+
+class _Stream:
+    """مصدر واحد (مركبة/موضوع): يُسلسل مرة واحدة لكل قيمة جديدة مهما كان عدد العملاء"""
+    
+    def __init__(self, key: str, vehicle: str, topic: str, controller):
+        self.key = key
+        self.vehicle = vehicle
+        self.topic = topic
+        self.controller = controller
+        self.subscribers: Dict[int, '_Client'] = {}
+        self.version = -1
+        self.frame: Optional[str] = None
+        self._last_read = 0.0
+    
+    def min_interval(self) -> float:
+        """أقصر فترة يطلبها أي مشترك"""
+        return min((client.intervals[self.key] for client in self.subscribers.values()), default=0.0)
+    
+    def refresh(self, now: float) -> bool:
+        """قراءة آخر قيمة وتسلسلها إذا تغيرت؛ True عند وجود إطار جديد"""
+        if self.topic == TOPIC_STATUS:
+            # get_rov_status مكلفة نسبياً: تُقرأ بأعلى معدل مطلوب فقط
+            if now - self._last_read < self.min_interval():
+                return False
+            self._last_read = now
+            version = self.version + 1
+            value = self.controller.get_rov_status()
+        else:
+            topic = self.controller.telemetry_bus.topic(self.topic)
+            version = topic.seq
+            if version == self.version or not version:
+                return False
+            value = topic.latest()
+        
+        try:
+            self.frame = json.dumps({'vehicle': self.vehicle, 'topic': self.topic, 'seq': version,
+                                     't': time.time(), 'data': value},
+                                    separators=(',', ':'), ensure_ascii=False, default=str)
+        except (TypeError, ValueError, RuntimeError):
+            # قاموس تغير أثناء التسلسل من خيط آخر: المحاولة في الدورة التالية
+            return False
+        self.version = version
+        return True
+
+class _Client:
+    """عميل واحد: خانة واحدة لكل موضوع (آخر إطار فقط) فالذاكرة لا تنمو مع البطء"""
+    
+    def __init__(self, client_id: int, websocket, address: str):
+        self.id = client_id
+        self.websocket = websocket
+        self.address = address
+        self.intervals: Dict[str, float] = {}
+        self.versions: Dict[str, int] = {}
+        self.last_sent: Dict[str, float] = {}
+        self.pending: Dict[str, str] = {}
+        self.replies: deque = deque(maxlen=MAX_PENDING_REPLIES)
+        self.wake = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+        self.connected_at = time.time()
+    
+    def offer(self, stream: _Stream, now: float):
+        """وضع إطار الموضوع في خانته إذا حان وقته حسب معدل العميل"""
+        key = stream.key
+        if self.versions.get(key) == stream.version:
+            return
+        if now - self.last_sent.get(key, 0.0) < self.intervals[key]:
+            return
+        if key in self.pending:
+            # الإطار السابق لم يُرسل بعد: يُستبدل بالأحدث (تخفيض المعدل)
+            self.dropped += 1
+        self.pending[key] = stream.frame
+        self.versions[key] = stream.version
+        self.last_sent[key] = now
+        self.wake.set()
+    
+    def reply(self, message: Dict[str, Any]):
+        self.replies.append(json.dumps(message, separators=(',', ':'), ensure_ascii=False))
+        self.wake.set()
+
+class TelemetryWebSocketServer:
+    """خادم WebSocket لبث حالة المركبات ومواضيع الحساسات لأي عدد من المراقبين
+    
+    يعمل على حلقة asyncio في خيط خاص بعيداً عن حلقة الاتصال وخيط الواجهة. كل دورة
+    تقرأ آخر قيمة لكل موضوع عليه مشتركون وتسلسلها JSON مرة واحدة، ثم يأخذ كل عميل
+    نفس النص حسب المواضيع والمعدل الذي اختاره. لكل عميل خانة واحدة لكل موضوع: إذا
+    لم يُرسل الإطار السابق بعد يُستبدل بالأحدث، والعميل الذي يبقى الإرسال إليه
+    متوقفاً أكثر من send_timeout يُفصل.
+    
+    العميل يرسل: {"subscribe": {"status": 5, "imu": 30}} أو
+    {"subscribe": ["status", "rov2/imu"], "max_rate": 10} و {"unsubscribe": ["imu"]}،
+    أو يحدد ذلك في الرابط: ws://host:8765/?topics=status,imu&rate=10
+    """
+    
+    def __init__(self, host: str = '0.0.0.0', port: int = 8765, max_rate: float = 30.0,
+                 default_rate: float = 5.0, default_topics: Iterable[str] = (TOPIC_STATUS,),
+                 max_clients: int = 100, send_timeout: float = 5.0, write_limit: int = 64 * 1024):
+        self.logger = ROVLogger('TelemetryWebSocket')
+        self.host = host
+        self.port = port
+        self.max_rate = max_rate
+        self.default_rate = min(default_rate, max_rate)
+        self.default_topics = list(default_topics)
+        self.max_clients = max_clients
+        self.send_timeout = send_timeout
+        self.write_limit = write_limit
+        
+        self.vehicles: Dict[str, Any] = {}
+        self.default_vehicle: Optional[str] = None
+        self.streams: Dict[str, _Stream] = {}
+        self.clients: Dict[int, _Client] = {}
+        self._next_client_id = 1
+        self._closed_dropped = 0
+        
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self._server = None
+        self._fanout_task: Optional[asyncio.Task] = None
+        self.running = False
+        
+        # إحصائيات
+        self.stats = {
+            'connections': 0,
+            'rejected': 0,
+            'slow_disconnects': 0,
+            'frames_serialized': 0,
+            'frames_sent': 0,
+            'tick_ms': 0.0,
+            'max_tick_ms': 0.0
+        }
+    
+    def add_vehicle(self, name: str, controller):
+        """تسجيل مركبة (أول مركبة هي المقصودة بأسماء المواضيع بدون بادئة)"""
+        self.vehicles[name] = controller
+        if self.default_vehicle is None:
+            self.default_vehicle = name
+    
+    def start(self) -> bool:
+        """بدء الخادم في خيطه الخاص"""
+        if self.running:
+            return True
+        try:
+            import websockets  # noqa: F401
+        except ImportError:
+            self.logger.error("مكتبة websockets غير مثبتة - لا يمكن تشغيل خادم التيليمتري")
+            return False
+        
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self._run, name='TelemetryWebSocket', daemon=True)
+        self.thread.start()
+        try:
+            asyncio.run_coroutine_threadsafe(self._start_server(), self.loop).result(timeout=5)
+        except Exception as e:
+            self.logger.error(f"فشل بدء خادم WebSocket على {self.host}:{self.port}: {e}")
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout=2)
+            return False
+        
+        self.running = True
+        self.logger.info(f"خادم WebSocket للتيليمتري يعمل على ws://{self.host}:{self.port}")
+        return True
+    
+    def stop(self):
+        """إيقاف الخادم وفصل كل العملاء"""
+        if not self.running:
+            return
+        self.running = False
+        try:
+            asyncio.run_coroutine_threadsafe(self._stop_server(), self.loop).result(timeout=3)
+        except Exception as e:
+            self.logger.warning(f"خطأ في إيقاف خادم WebSocket: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join(timeout=2)
+        self.logger.info("تم إيقاف خادم WebSocket")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات الخادم وكل عميل"""
+        stats = dict(self.stats)
+        clients = list(self.clients.values())
+        stats['clients'] = len(clients)
+        stats['frames_dropped'] = self._closed_dropped + sum(client.dropped for client in clients)
+        stats['streams'] = {key: len(stream.subscribers) for key, stream in list(self.streams.items())
+                            if stream.subscribers}
+        stats['per_client'] = {
+            client.id: {
+                'address': client.address,
+                'topics': self._client_topics(client),
+                'sent': client.sent,
+                'dropped': client.dropped
+            }
+            for client in clients
+        }
+        return stats
+    
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_forever()
+        finally:
+            self.loop.close()
+    
+    async def _start_server(self):
+        import websockets
+        
+        # write_limit يحدد ذاكرة الإرسال لكل عميل؛ بعدها ينتظر send() ويتولى offer() التخفيض
+        self._server = await websockets.serve(self._handle_client, self.host, self.port,
+                                              write_limit=self.write_limit, max_size=64 * 1024,
+                                              compression=None)
+        self._fanout_task = asyncio.get_running_loop().create_task(self._fanout_loop())
+    
+    async def _stop_server(self):
+        if self._fanout_task:
+            self._fanout_task.cancel()
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+    
+    async def _fanout_loop(self):
+        """دورة البث: تسلسل كل موضوع مرة واحدة وتوزيعه على مشتركيه"""
+        interval = 1.0 / self.max_rate
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            now = time.monotonic()
+            for stream in list(self.streams.values()):
+                if not stream.subscribers:
+                    continue
+                try:
+                    if stream.refresh(now):
+                        self.stats['frames_serialized'] += 1
+                except Exception as e:
+                    self.logger.debug(f"خطأ في قراءة {stream.key}: {e}")
+                    continue
+                if stream.frame is None:
+                    continue
+                for client in list(stream.subscribers.values()):
+                    client.offer(stream, now)
+            
+            elapsed = loop.time() - started
+            self.stats['tick_ms'] = elapsed * 1000.0
+            self.stats['max_tick_ms'] = max(self.stats['max_tick_ms'], self.stats['tick_ms'])
+            await asyncio.sleep(max(0.0, interval - elapsed))
+    
+    async def _handle_client(self, websocket):
+        """جلسة عميل واحد: استقبال أوامر الاشتراك وإرسال الإطارات في مهمة منفصلة"""
+        from websockets.exceptions import ConnectionClosed
+        
+        address = self._client_address(websocket)
+        if len(self.clients) >= self.max_clients:
+            self.stats['rejected'] += 1
+            self.logger.warning(f"رفض العميل {address}: الحد الأقصى {self.max_clients} عميل")
+            await websocket.close(1013, 'server full')
+            return
+        
+        client = _Client(self._next_client_id, websocket, address)
+        self._next_client_id += 1
+        self.clients[client.id] = client
+        self.stats['connections'] += 1
+        self.logger.info(f"عميل WebSocket جديد: {address} ({len(self.clients)} متصل)")
+        
+        client.reply({'type': 'hello', 'vehicles': list(self.vehicles), 'topics': list(STREAM_TOPICS),
+                      'max_rate': self.max_rate})
+        topics, rate = self._query_subscription(websocket)
+        try:
+            self._subscribe(client, topics or self.default_topics, rate)
+        except (ValueError, TypeError) as e:
+            client.reply({'type': 'error', 'message': str(e)})
+        
+        sender = asyncio.get_running_loop().create_task(self._sender(client))
+        try:
+            async for message in websocket:
+                self._handle_message(client, message)
+        except ConnectionClosed:
+            pass
+        finally:
+            sender.cancel()
+            self._unsubscribe(client, list(client.intervals))
+            self.clients.pop(client.id, None)
+            self._closed_dropped += client.dropped
+            self.logger.info(f"انقطع عميل WebSocket: {address} (أُرسل {client.sent}، خُفض {client.dropped})")
+    
+    async def _sender(self, client: _Client):
+        """إرسال محتوى خانات العميل؛ العميل المتوقف يُفصل بدلاً من تخزين إطاراته"""
+        from websockets.exceptions import ConnectionClosed
+        
+        websocket = client.websocket
+        while True:
+            await client.wake.wait()
+            client.wake.clear()
+            frames = list(client.replies) + list(client.pending.values())
+            client.replies.clear()
+            client.pending.clear()
+            for frame in frames:
+                try:
+                    await asyncio.wait_for(websocket.send(frame), self.send_timeout)
+                except asyncio.TimeoutError:
+                    self.stats['slow_disconnects'] += 1
+                    self.logger.warning(f"فصل العميل البطيء {client.address}: "
+                                        f"لم يستقبل شيئاً خلال {self.send_timeout} ث")
+                    websocket.transport.abort()
+                    return
+                except ConnectionClosed:
+                    return
+                client.sent += 1
+                self.stats['frames_sent'] += 1
+    
+    def _handle_message(self, client: _Client, message):
+        """أوامر العميل: subscribe / unsubscribe"""
+        try:
+            request = json.loads(message)
+            if not isinstance(request, dict):
+                raise ValueError('expected a JSON object')
+            
+            if 'unsubscribe' in request:
+                self._unsubscribe(client, [self._resolve(topic) for topic in request['unsubscribe']])
+            
+            if 'subscribe' in request:
+                topics = request['subscribe']
+                rate = request.get('max_rate')
+                if isinstance(topics, dict):
+                    for topic, topic_rate in topics.items():
+                        self._subscribe(client, [topic], topic_rate or rate)
+                else:
+                    self._subscribe(client, topics, rate)
+        
+        except (ValueError, TypeError, KeyError) as e:
+            client.reply({'type': 'error', 'message': str(e)})
+            return
+        
+        client.reply({'type': 'subscribed', 'topics': self._client_topics(client)})
+    
+    def _client_topics(self, client: _Client) -> Dict[str, float]:
+        """مواضيع العميل ومعدلاتها الفعلية"""
+        return {key: round(1.0 / interval, 2) if interval else self.max_rate
+                for key, interval in client.intervals.items()}
+    
+    def _subscribe(self, client: _Client, topics: Iterable[str], rate: Optional[float]):
+        rate = self.default_rate if rate is None else float(rate)
+        if rate <= 0:
+            raise ValueError(f'invalid rate: {rate}')
+        interval = 1.0 / min(rate, self.max_rate)
+        
+        for topic in topics:
+            key = self._resolve(topic)
+            stream = self.streams.get(key)
+            if stream is None:
+                vehicle, name = key.split('/', 1)
+                stream = _Stream(key, vehicle, name, self.vehicles[vehicle])
+                self.streams[key] = stream
+            client.intervals[key] = interval
+            stream.subscribers[client.id] = client
+    
+    def _unsubscribe(self, client: _Client, keys: List[str]):
+        for key in keys:
+            client.intervals.pop(key, None)
+            client.versions.pop(key, None)
+            client.pending.pop(key, None)
+            stream = self.streams.get(key)
+            if stream:
+                stream.subscribers.pop(client.id, None)
+    
+    def _resolve(self, topic: str) -> str:
+        """'imu' -> '<المركبة الافتراضية>/imu' و 'rov2/imu' كما هي"""
+        if not isinstance(topic, str):
+            raise TypeError(f'invalid topic: {topic!r}')
+        vehicle, _, name = topic.rpartition('/')
+        vehicle = vehicle or self.default_vehicle
+        if vehicle not in self.vehicles:
+            raise ValueError(f'unknown vehicle: {vehicle}')
+        if name not in STREAM_TOPICS:
+            raise ValueError(f'unknown topic: {name}')
+        return f"{vehicle}/{name}"
+    
+    @staticmethod
+    def _query_subscription(websocket) -> Tuple[List[str], Optional[float]]:
+        """المواضيع والمعدل من رابط الاتصال (?topics=status,imu&rate=10)"""
+        request = getattr(websocket, 'request', None)
+        path = request.path if request is not None else getattr(websocket, 'path', '')
+        query = parse_qs(urlsplit(path or '').query)
+        topics = [topic for value in query.get('topics', []) for topic in value.split(',') if topic]
+        try:
+            rate = float(query['rate'][0]) if 'rate' in query else None
+        except ValueError:
+            rate = None
+        return topics, rate
+    
+    @staticmethod
+    def _client_address(websocket) -> str:
+        address = getattr(websocket, 'remote_address', None)
+        return f"{address[0]}:{address[1]}" if address else 'unknown'
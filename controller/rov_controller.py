@@ -1,26 +1,64 @@
-from typing import Dict, Optional, Any
+import os
+import threading
+import time
+from typing import Dict, Optional, Any, List, Callable, Collection
 from utils.logger import ROVLogger
 from utils.config import Config
+from utils.telemetry_bus import TelemetryBus, TOPIC_TELEMETRY, TOPIC_IMU, TOPIC_PRESSURE, TOPIC_TEMPERATURE
+from utils.shared_telemetry import SharedTelemetryPublisher
 from .motors import MotorController
 from .joystick_input import JoystickInput
 from communication.serial_comm import SerialCommunication
 from communication.network_comm import NetworkCommunication
+from communication.async_transport import create_async_transport, AsyncSerialTransport
+from communication.link_bonding import BondedLink
+from communication.mavlink_comm import MAVLinkCommunication
+from communication.line_telemetry import LineTelemetryParser, DEFAULT_LINE_SCHEMA
+from communication.control_lease import ControlLeaseClient, LEASE_OFF, LEASE_PILOT
+from communication.capture import WireCapture, describe_link
+from communication.link_monitor import LinkMonitor
+from communication.clock_sync import ClockSync
+from communication.channels import CHANNEL_BULK
+from communication.port_discovery import SerialPortDiscovery, DEFAULT_BAUD_RATES
+from communication.connection_supervisor import (
+    ConnectionSupervisor, STATE_RECONNECTING, STATE_DISCONNECTED, STATE_FAILED
+)
 
 class ROVController:
     """المتحكم الرئيسي لـ ROV"""
     
-    def __init__(self, config: Config):
+    def __init__(self, config: Config, joystick: Optional[JoystickInput] = None, name: Optional[str] = None):
         self.config = config
-        self.logger = ROVLogger('ROVController')
+        # اسم المركبة عند إدارة عدة مركبات في عملية واحدة (VehicleSessionManager)
+        self.name = name or 'ROV'
+        self.logger = ROVLogger(f'ROVController.{name}' if name else 'ROVController')
         
         # تهيئة الأنظمة الفرعية
         self.motor_controller = MotorController(config)
-        self.joystick = JoystickInput()
+        # جويستيك مشترك يوجهه مدير الجلسات للمركبة النشطة، أو جويستيك خاص
+        self._owns_joystick = joystick is None
+        self.joystick = joystick if joystick is not None else JoystickInput()
+        
+        # ناقل التيليمتري: خيط القراءة ينشر فقط، والمستهلكون يقرؤون بسرعتهم
+        self.telemetry_bus = TelemetryBus(self.config.get_int('SENSORS', 'bus_capacity', 256))
+        
+        # فرق وانحراف ساعة المركبة من تبادل ping/pong (لتحويل أختام التيليمتري لساعة السطح)
+        self.clock_sync = ClockSync()
         
         # نظام الاتصال
         self.communication = None
         self._setup_communication()
         
+        # الاتصال وإعادة الاتصال في الخلفية (تراجع أسي محدود مع عشوائية)
+        self.connection_supervisor = ConnectionSupervisor(
+            self._open_link, self._close_link, self._link_healthy,
+            auto_reconnect=self.config.get_bool('COMMUNICATION', 'auto_reconnect', True),
+            initial_delay=self.config.get_float('COMMUNICATION', 'reconnect_initial_delay', 0.5),
+            max_delay=self.config.get_float('COMMUNICATION', 'reconnect_max_delay', 30.0)
+        )
+        self.connection_supervisor.on_state_changed = self._on_connection_state
+        self.connection_state_handler: Optional[Callable[[str, Dict[str, Any]], None]] = None
+        
         # حالة ROV
         self.rov_state = {
             'position': {'x': 0, 'y': 0, 'z': 0},
@@ -31,6 +69,21 @@ class ROVController:
             'status': 'disconnected'
         }
         
+        # أسطر التيليمتري النصية (مثل TLM,depth,roll,...) تُكتب في rov_state مباشرة
+        # بدالة مجهزة مرة واحدة من المخطط (مخطط فارغ يعطلها)
+        self.line_telemetry: Optional[LineTelemetryParser] = None
+        line_schema = self.config.get('COMMUNICATION', 'line_telemetry_schema', DEFAULT_LINE_SCHEMA).strip()
+        if line_schema:
+            self.line_telemetry = LineTelemetryParser(line_schema)
+            self.line_telemetry.bind(self.rov_state)
+            # ما يحدّثه كل وسم من الاتجاه والحساسات (لنشر مواضيع الحساسات)
+            self._line_sensor_fields = {
+                tag: frozenset(group if group == 'orientation' else name
+                               for group, name in filter(None, schema.fields)
+                               if group in ('orientation', 'sensors'))
+                for tag, schema in self.line_telemetry.schemas.items()
+            }
+        
         # أوضاع التحكم
         self.control_modes = {
             'MANUAL': 'manual',
@@ -44,6 +97,21 @@ class ROVController:
         self.safety_enabled = True
         self.max_depth = self.config.get_float('SAFETY', 'max_depth', 50.0)
         self.auto_surface = self.config.get_bool('SAFETY', 'auto_surface', True)
+        # مراقب الأمان مستهلك على الناقل في خيطه الخاص (لا يعمل على خيط القراءة)
+        self._safety_subscription = self.telemetry_bus.subscribe(TOPIC_TELEMETRY, 'safety')
+        self._safety_thread: Optional[threading.Thread] = None
+        self._safety_stop = threading.Event()
+        
+        # نشر الحالة و IMU والمحركات في ذاكرة مشتركة للعمليات الأخرى (اختياري)
+        self.shared_telemetry: Optional[SharedTelemetryPublisher] = None
+        if self.config.get_bool('SENSORS', 'shared_memory', False):
+            segment = self.config.get('SENSORS', 'shared_memory_name', 'rov_telemetry')
+            self.shared_telemetry = SharedTelemetryPublisher(
+                self.telemetry_bus, f"{segment}_{name}" if name else segment,
+                motor_names=list(self.motor_controller.motor_speeds),
+                imu_capacity=self.config.get_int('SENSORS', 'shared_imu_samples', 1024)
+            )
+            self.shared_telemetry.start(lambda: self.rov_state)
         
         # ربط الأحداث
         self._setup_event_handlers()
@@ -53,92 +121,435 @@ class ROVController:
     def _setup_communication(self):
         """إعداد نظام الاتصال"""
         use_network = self.config.get_bool('COMMUNICATION', 'use_network', False)
+        # MAVLink 2 لمركبات ArduSub بدلاً من بروتوكول المركبة الخاص
+        mavlink = self.config.get_bool('COMMUNICATION', 'mavlink', False)
         
-        if use_network:
-            # اتصال شبكي
-            host = self.config.get('COMMUNICATION', 'network_ip', '192.168.1.100')
-            port = self.config.get_int('COMMUNICATION', 'network_port', 8080)
-            self.communication = NetworkCommunication(host, port)
+        if mavlink:
+            self.communication = self._create_mavlink_link(use_network)
+        elif self.config.get_bool('COMMUNICATION', 'link_bonding', False):
+            # الوصلتان مفتوحتان معاً مع التحويل التلقائي حسب RTT والفقد
+            self.communication = BondedLink(
+                {'network': self._create_network_link(), 'serial': self._create_serial_link()},
+                mode=self.config.get('COMMUNICATION', 'bonding_mode', 'best'),
+                probe_interval=self.config.get_float('COMMUNICATION', 'bonding_probe_interval', 0.1),
+                clock=self.clock_sync
+            )
+        elif use_network:
+            self.communication = self._create_network_link()
         else:
-            # اتصال تسلسلي
-            port = self.config.get('COMMUNICATION', 'serial_port', 'COM3')
-            baud = self.config.get_int('COMMUNICATION', 'baud_rate', 9600)
-            self.communication = SerialCommunication(port, baud)
+            self.communication = self._create_serial_link()
+        
+        # serial_port = auto: البحث عن المنفذ والسرعة عند كل اتصال (المنفذ المحفوظ يُجرَّب أولاً)
+        self.port_discovery: Optional[SerialPortDiscovery] = None
+        if not mavlink and self.config.get('COMMUNICATION', 'serial_port', 'COM3').lower() == 'auto':
+            bauds = self.config.get('COMMUNICATION', 'probe_baud_rates', '')
+            self.port_discovery = SerialPortDiscovery(
+                baud_rates=[int(baud) for baud in bauds.split(',') if baud.strip()] or DEFAULT_BAUD_RATES,
+                probe_timeout=self.config.get_float('COMMUNICATION', 'probe_timeout', 0.3),
+                binary_protocol=self.config.get_bool('COMMUNICATION', 'binary_protocol', False),
+                cache_file=self.config.get('COMMUNICATION', 'port_cache_file', 'port_cache.yaml'),
+                extra_ports=[port.strip() for port in self.config.get('COMMUNICATION', 'probe_ports', '').split(',')]
+            )
+        
+        # قياس RTT والتذبذب والفقد في الخلفية (الوصلة المجمعة تقيس كل وصلة بنفسها)
+        self.link_monitor: Optional[LinkMonitor] = None
+        if not isinstance(self.communication, BondedLink):
+            self.link_monitor = LinkMonitor(
+                self.communication,
+                interval=self.config.get_float('COMMUNICATION', 'ping_interval', 1.0),
+                timeout=self.config.get_float('COMMUNICATION', 'ping_timeout', 2.0),
+                name=self._communication_type(),
+                clock=self.clock_sync
+            )
+        
+        # عقد التحكم: أي عدد من المحطات يستقبل التيليمتري ومحطة واحدة فقط ترسل أوامر المحركات
+        # (pilot يطلب العقد عند الاتصال، observer لا يطلبه إلا عبر request_control)
+        self.control_lease: Optional[ControlLeaseClient] = None
+        lease_mode = self.config.get('COMMUNICATION', 'control_lease', LEASE_OFF).lower()
+        if lease_mode != LEASE_OFF:
+            if hasattr(self.communication, 'send_data'):
+                self.control_lease = ControlLeaseClient(
+                    self.communication,
+                    station=self.config.get('COMMUNICATION', 'control_station', '').strip() or None,
+                    duration=self.config.get_float('COMMUNICATION', 'control_lease_duration', 2.0)
+                )
+                self.control_lease.wanted = lease_mode == LEASE_PILOT
+            else:
+                self.logger.warning("عقد التحكم غير مدعوم على هذه الوصلة - تم تجاهله")
+        
+        # التقاط حركة الوصلة في ملف pcap لكل وصلة (يُفتح عند الاتصال ويُغلق عند قطعه)
+        self._captures: List[WireCapture] = []
         
         # ربط معالج البيانات
         self.communication.set_data_handler(self._handle_telemetry_data)
+        if hasattr(self.communication, 'set_batch_handler'):
+            self.communication.set_batch_handler(self._handle_telemetry_batch)
         
         # ربط إرسال أوامر المحركات
         self.motor_controller.set_command_sender(self._send_motor_commands)
     
+    def _create_network_link(self):
+        """إنشاء وسيلة الاتصال الشبكي حسب الإعدادات"""
+        binary_protocol = self.config.get_bool('COMMUNICATION', 'binary_protocol', False)
+        # threaded: خيوط خاصة بكل وصلة، asyncio: حلقة أحداث واحدة مشتركة لكل الوصلات
+        backend = self.config.get('COMMUNICATION', 'transport_backend', 'threaded')
+        host = self.config.get('COMMUNICATION', 'network_ip', '192.168.1.100')
+        port = self.config.get_int('COMMUNICATION', 'network_port', 8080)
+        protocol = self.config.get('COMMUNICATION', 'network_protocol', 'TCP')
+        options = {'binary_protocol': binary_protocol}
+        if protocol.upper() == 'UDP':
+            # تصحيح الأخطاء الأمامي: off أو xor أو rs
+            options.update(
+                fec_mode=self.config.get('COMMUNICATION', 'fec_mode', 'off').lower(),
+                fec_group_size=self.config.get_int('COMMUNICATION', 'fec_group_size', 8),
+                fec_max_parity=self.config.get_int('COMMUNICATION', 'fec_max_parity', 4),
+                fec_max_delay=self.config.get_float('COMMUNICATION', 'fec_max_delay_ms', 40.0) / 1000.0,
+                # التيليمتري من مجموعة multicast مشتركة بين عدة محطات (فارغ: unicast على port + 1)
+                multicast_group=self.config.get('COMMUNICATION', 'multicast_group', '').strip(),
+                multicast_interface=self.config.get('COMMUNICATION', 'multicast_interface', '0.0.0.0')
+            )
+        if backend == 'asyncio':
+            return create_async_transport(protocol, host=host, port=port, **options)
+        return NetworkCommunication(host, port, protocol, **options)
+    
+    def _create_serial_link(self):
+        """إنشاء وسيلة الاتصال التسلسلي حسب الإعدادات"""
+        binary_protocol = self.config.get_bool('COMMUNICATION', 'binary_protocol', False)
+        backend = self.config.get('COMMUNICATION', 'transport_backend', 'threaded')
+        port = self.config.get('COMMUNICATION', 'serial_port', 'COM3')
+        baud = self.config.get_int('COMMUNICATION', 'baud_rate', 9600)
+        # زمن جزء النقل الكبير = أقصى تأخير يضيفه لإطار تحكم على الوصلة التسلسلية
+        bulk_chunk_ms = self.config.get_float('COMMUNICATION', 'bulk_chunk_ms', 10.0)
+        if backend == 'asyncio':
+            return create_async_transport('serial', port=port, baud_rate=baud,
+                                          binary_protocol=binary_protocol, bulk_chunk_ms=bulk_chunk_ms)
+        read_mode = self.config.get('COMMUNICATION', 'serial_read_mode', 'bulk')
+        # التفاوض على سرعة أعلى بعد الاتصال بـ baud_rate (قائمة فارغة تعطله)
+        negotiate = self.config.get('COMMUNICATION', 'negotiate_baud_rates', '')
+        return SerialCommunication(port, baud, binary_protocol=binary_protocol, read_mode=read_mode,
+                                   bulk_chunk_ms=bulk_chunk_ms,
+                                   negotiate_baud_rates=[int(rate) for rate in negotiate.split(',') if rate.strip()],
+                                   baud_cache_file=self.config.get('COMMUNICATION', 'baud_cache_file', 'baud_cache.yaml'),
+                                   baud_max_error_rate=self.config.get_float('COMMUNICATION', 'baud_max_error_rate', 0.01),
+                                   baud_fallback_error_rate=self.config.get_float('COMMUNICATION',
+                                                                                  'baud_fallback_error_rate', 0.05))
+    
+    def _create_mavlink_link(self, use_network: bool) -> MAVLinkCommunication:
+        """إنشاء وصلة MAVLink (UDP عند use_network وإلا المنفذ التسلسلي)"""
+        return MAVLinkCommunication(
+            'udp' if use_network else 'serial',
+            port=self.config.get('COMMUNICATION', 'serial_port', 'COM3'),
+            baud_rate=self.config.get_int('COMMUNICATION', 'baud_rate', 9600),
+            udp_port=self.config.get_int('COMMUNICATION', 'mavlink_udp_port', 14550),
+            target_system=self.config.get_int('COMMUNICATION', 'mavlink_target_system', 1),
+            control=self.config.get('COMMUNICATION', 'mavlink_control', 'manual_control').lower(),
+            stream_rate=self.config.get_int('COMMUNICATION', 'mavlink_stream_rate', 10),
+            timeout=self.config.get_float('COMMUNICATION', 'timeout', 5.0)
+        )
+    
     def _setup_event_handlers(self):
         """إعداد معالجات الأحداث"""
+        if not self._owns_joystick:
+            return
+        
         # ربط الجويستيك
         self.joystick.set_movement_handler(self._handle_joystick_movement)
         self.joystick.set_button_handler(self._handle_joystick_button)
     
     def connect(self) -> bool:
-        """الاتصال بـ ROV"""
+        """الاتصال بـ ROV (ينتظر حتى نجاح أو فشل المحاولة - الواجهة تستخدم connect_async)"""
         try:
-            if self.communication.connect():
-                self.rov_state['status'] = 'connected'
-                self.motor_controller.start_control_loop()
+            if self._open_link():
                 self.logger.info("تم الاتصال بـ ROV بنجاح")
                 return True
             else:
                 self.logger.error("فشل في الاتصال بـ ROV")
                 return False
-                
+        
         except Exception as e:
             self.logger.error(f"خطأ في الاتصال: {e}")
             return False
     
+    def connect_async(self):
+        """بدء الاتصال في الخلفية مع إعادة الاتصال التلقائية (يعود فوراً)
+        
+        الحالة تُبلَّغ عبر connection_state_handler من خيط المشرف.
+        """
+        self.connection_supervisor.start()
+    
+    def disconnect_async(self):
+        """طلب قطع الاتصال دون انتظار (يكتمل في خيط المشرف)"""
+        self.motor_controller.stop_all_motors()
+        self._send_motor_commands(self.motor_controller.motor_speeds.copy())
+        self.connection_supervisor.stop(wait=False)
+    
+    def is_connection_active(self) -> bool:
+        """هل الاتصال قائم أو جارٍ (بما في ذلك انتظار إعادة المحاولة)"""
+        return self.connection_supervisor.is_active or self.rov_state['status'] == 'connected'
+    
+    def set_connection_state_handler(self, handler: Callable[[str, Dict[str, Any]], None]):
+        """تعيين معالج تغيّر حالة الاتصال (connecting/connected/reconnecting/failed/disconnected)"""
+        self.connection_state_handler = handler
+    
     def disconnect(self):
         """قطع الاتصال مع ROV"""
         try:
             self.motor_controller.stop_control_loop()
             self.motor_controller.stop_all_motors()
             
-            if self.communication:
-                self.communication.disconnect()
+            if self.connection_supervisor.is_active:
+                # المشرف يقطع الاتصال في خيطه بعد انتهاء أي محاولة جارية
+                self.connection_supervisor.stop()
+            else:
+                self._close_link()
+            self._stop_capture()
             
-            self.rov_state['status'] = 'disconnected'
             self.logger.info("تم قطع الاتصال مع ROV")
-            
+        
         except Exception as e:
             self.logger.error(f"خطأ في قطع الاتصال: {e}")
     
+    def _open_link(self) -> bool:
+        """فتح وسيلة الاتصال وتشغيل حلقة التحكم وإعادة مزامنة آخر أوامر المحركات"""
+        if self.port_discovery and not self._discover_serial_port():
+            # الوصلة المجمعة قد تتصل عبر الشبكة وحدها
+            if not isinstance(self.communication, BondedLink):
+                return False
+        
+        # الالتقاط يبدأ قبل الاتصال (رسائل المصافحة) ويستمر عبر إعادات الاتصال
+        self._start_capture()
+        
+        if not self.communication.connect():
+            return False
+        
+        self.rov_state['status'] = 'connected'
+        if self.link_monitor:
+            self.link_monitor.start()
+        if self.control_lease:
+            self.control_lease.start()
+        
+        # المركبة قد تكون فقدت آخر أوامر أثناء الانقطاع: إرسالها فوراً دون انتظار دورة التحكم
+        if self.motor_controller.emergency_stop:
+            self.communication.emergency_stop()
+        else:
+            self._send_motor_commands(self.motor_controller.motor_speeds.copy())
+        
+        self.motor_controller.start_control_loop()
+        self._start_safety_monitor()
+        return True
+    
+    def _discover_serial_port(self) -> bool:
+        """تحديد منفذ وسرعة الوصلة التسلسلية قبل فتحها (من خيط المشرف)"""
+        link = self.communication.links.get('serial') if isinstance(self.communication, BondedLink) else self.communication
+        if link is None:
+            return False
+        
+        preferred = self.config.get_int('COMMUNICATION', 'baud_rate', 9600)
+        result = self.port_discovery.discover(preferred_baud=preferred)
+        if not result:
+            return False
+        
+        link.port = result['device']
+        link.baud_rate = result['baud_rate']
+        return True
+    
+    def _close_link(self):
+        """إغلاق وسيلة الاتصال (حلقة التحكم تبقى أثناء إعادة الاتصال ولا ترسل شيئاً)"""
+        self.rov_state['status'] = 'disconnected'
+        if self.link_monitor:
+            self.link_monitor.stop()
+        if self.control_lease:
+            self.control_lease.stop()
+        if self.communication:
+            self.communication.disconnect()
+    
+    def _start_capture(self):
+        """فتح ملف التقاط لكل وصلة حسب capture_file ({time}، {link}، {name})"""
+        template = self.config.get('COMMUNICATION', 'capture_file', '').strip()
+        if not template or self._captures:
+            return
+        
+        if isinstance(self.communication, BondedLink):
+            links = self.communication.links
+        else:
+            links = {self._communication_type(): self.communication}
+        stamp = time.strftime('%Y%m%d_%H%M%S')
+        max_bytes = int(self.config.get_float('COMMUNICATION', 'capture_max_mb', 512.0) * 1024 * 1024)
+        for link_name, link in links.items():
+            path = template.replace('{time}', stamp).replace('{link}', link_name).replace('{name}', self.name)
+            if len(links) > 1 and '{link}' not in template:
+                root, ext = os.path.splitext(path)
+                path = f"{root}_{link_name}{ext}"
+            try:
+                capture = WireCapture(path, describe_link(link), max_bytes=max_bytes)
+            except OSError as e:
+                self.logger.error(f"تعذر فتح ملف الالتقاط {path}: {e}")
+                continue
+            link.capture = capture
+            self._captures.append(capture)
+    
+    def _stop_capture(self):
+        """إغلاق ملفات الالتقاط (الوصلة قد تكون ما زالت تُغلق فالتسجيل بعد الإغلاق يُتجاهل)"""
+        links = self.communication.links.values() if isinstance(self.communication, BondedLink) else [self.communication]
+        for link in links:
+            link.capture = None
+        for capture in self._captures:
+            capture.close()
+        self._captures = []
+    
+    def _link_healthy(self) -> bool:
+        """الوصلة سليمة: وسيلة الاتصال متصلة والمركبة لم تتوقف عن الرد على ping"""
+        if not self.communication.is_connected:
+            return False
+        return not (self.link_monitor and self.link_monitor.is_silent())
+    
+    def _on_connection_state(self, state: str, info: Dict[str, Any]):
+        """تحديث الحالة عند تغيّر حالة الاتصال (من خيط المشرف)"""
+        if state == STATE_RECONNECTING:
+            self.rov_state['status'] = 'reconnecting'
+        elif state in (STATE_DISCONNECTED, STATE_FAILED):
+            self.motor_controller.stop_control_loop()
+            self.rov_state['status'] = 'disconnected'
+        
+        if self.connection_state_handler:
+            self.connection_state_handler(state, info)
+    
     def _send_motor_commands(self, motors: Dict[str, int]) -> bool:
         """إرسال أوامر المحركات"""
+        if self.shared_telemetry:
+            self.shared_telemetry.write_motors(motors, self.motor_controller.emergency_stop)
+        if self.control_lease and not self.control_lease.held:
+            return False
         if self.communication and self.rov_state['status'] == 'connected':
             return self.communication.send_motor_commands(motors)
         return False
     
+    def request_control(self):
+        """طلب عقد التحكم (يُمنح إذا كان شاغراً أو انتهت مدة صاحبه)"""
+        if self.control_lease:
+            self.control_lease.acquire()
+    
+    def release_control(self):
+        """تحرير عقد التحكم لمحطة أخرى (الإيقاف الطارئ يبقى متاحاً)"""
+        if self.control_lease:
+            self.control_lease.release()
+    
+    def has_control(self) -> bool:
+        """هل ترسل هذه المحطة أوامر المحركات (دائماً بدون عقد)"""
+        return self.control_lease.held if self.control_lease else True
+    
     def _handle_telemetry_data(self, data: Any):
         """معالجة بيانات التيليمتري الواردة"""
         try:
-            if isinstance(data, dict):
-                # تحديث حالة ROV
-                if 'position' in data:
-                    self.rov_state['position'].update(data['position'])
-                
-                if 'orientation' in data:
-                    self.rov_state['orientation'].update(data['orientation'])
-                
-                if 'sensors' in data:
-                    self.rov_state['sensors'].update(data['sensors'])
-                
-                if 'battery' in data:
-                    self.rov_state['battery'] = data['battery']
-                
-                self.logger.debug(f"تم تحديث بيانات التيليمتري: {data}")
-                
-                # فحص الأمان
-                self._check_safety_conditions()
-            
+            self._apply_telemetry(data)
+        
+        except Exception as e:
+            self.logger.error(f"خطأ في معالجة بيانات التيليمتري: {e}")
+    
+    def _handle_telemetry_batch(self, batch: List[Any]):
+        """معالجة دفعة من رسائل التيليمتري (فحص الأمان يتم في خيط المراقب)"""
+        try:
+            for data in batch:
+                self._apply_telemetry(data)
+        
         except Exception as e:
             self.logger.error(f"خطأ في معالجة بيانات التيليمتري: {e}")
     
+    def _apply_telemetry(self, data: Any) -> bool:
+        """تطبيق رسالة تيليمتري على حالة ROV"""
+        # ردود ping الخاصة بقياس جودة الوصلة
+        if self.link_monitor and self.link_monitor.handle_message(data):
+            return False
+        
+        # ردود عقد التحكم
+        if self.control_lease and self.control_lease.handle_message(data):
+            return False
+        
+        # سطر نصي: تحديث الحالة في مكانها ونشر السطر نفسه على الناقل (بدون قاموس لكل سطر)
+        if isinstance(data, str):
+            if self.line_telemetry and self.line_telemetry.apply(data):
+                self.telemetry_bus.publish(TOPIC_TELEMETRY, data)
+                self._publish_sensor_topics(self._line_sensor_fields.get(data[:data.find(',')], ()))
+                return True
+            return False
+        
+        if not isinstance(data, dict):
+            return False
+        
+        # فُقد إطار تيليمتري تفاضلي: طلب إطار كامل لإعادة المزامنة
+        if data.get('type') == 'telemetry_out_of_sync':
+            if data.get('request_keyframe') and hasattr(self.communication, 'request_keyframe'):
+                self.communication.request_keyframe()
+            return False
+        
+        # ختم المركبة (ساعتها) بساعة السطح time.monotonic لترتيب الأحداث ومطابقة الفيديو
+        # (timestamp في JSON، أو time_ms الملتف كل 2^32 ms في الرسائل الثنائية والتفاضلية)
+        received_at = time.monotonic()
+        data['received_at'] = received_at
+        remote_time = data.get('timestamp')
+        if not isinstance(remote_time, (int, float)) and isinstance(data.get('time_ms'), int):
+            remote_time = self.clock_sync.remote_from_ms(data['time_ms'], received_at)
+        if isinstance(remote_time, (int, float)):
+            local_time = self.clock_sync.observe_telemetry(remote_time, received_at)
+            if local_time is not None:
+                data['local_time'] = local_time
+        
+        # تحديث حالة ROV
+        if 'position' in data:
+            self.rov_state['position'].update(data['position'])
+        
+        if 'orientation' in data:
+            self.rov_state['orientation'].update(data['orientation'])
+        
+        if 'velocity' in data:
+            self.rov_state['velocity'].update(data['velocity'])
+        
+        if 'sensors' in data:
+            self.rov_state['sensors'].update(data['sensors'])
+        
+        if 'battery' in data:
+            self.rov_state['battery'] = data['battery']
+        
+        self.telemetry_bus.publish(TOPIC_TELEMETRY, data)
+        updated = set(data['sensors']) if isinstance(data.get('sensors'), dict) else set()
+        if 'orientation' in data:
+            updated.add('orientation')
+        self._publish_sensor_topics(updated, data)
+        return True
+    
+    def _publish_sensor_topics(self, updated: Collection[str], data: Optional[Dict[str, Any]] = None):
+        """نشر قراءات المركبة على مواضيع imu و pressure و temperature
+        
+        updated أسماء ما غيّرته الرسالة ('orientation' وحقول sensors). القيم تُقرأ من
+        rov_state بعد التطبيق وبنفس صيغة get_all_data في sensors/، والتسارع
+        والجايروسكوب من الرسالة نفسها إن أرسلتها المركبة.
+        """
+        if not updated:
+            return
+        now = time.time()
+        sensors = self.rov_state['sensors']
+        
+        if 'orientation' in updated:
+            sample = {'orientation': dict(self.rov_state['orientation']), 'timestamp': now}
+            if data:
+                for key in ('acceleration', 'gyroscope', 'magnetometer'):
+                    if key in data:
+                        sample[key] = data[key]
+            self.telemetry_bus.publish(TOPIC_IMU, sample)
+        
+        if 'pressure' in updated or 'depth' in updated:
+            reading = {key: sensors[key] for key in ('pressure', 'depth', 'temperature') if key in sensors}
+            reading['timestamp'] = now
+            self.telemetry_bus.publish(TOPIC_PRESSURE, reading)
+        
+        if 'temperature' in updated:
+            celsius = sensors['temperature']
+            self.telemetry_bus.publish(TOPIC_TEMPERATURE, {
+                'temperature_celsius': celsius,
+                'temperature_fahrenheit': (celsius * 9/5) + 32,
+                'timestamp': now
+            })
+    
     def _handle_joystick_movement(self, forward: float, strafe: float, vertical: float, yaw: float):
         """معالجة حركة الجويستيك"""
         if self.current_mode == self.control_modes['MANUAL']:
@@ -199,6 +610,25 @@ class ROVController:
         if battery_level < battery_warning:
             self.logger.warning(f"مستوى البطارية منخفض: {battery_level}%")
     
+    def _start_safety_monitor(self):
+        """بدء خيط مراقب الأمان إذا لم يكن يعمل"""
+        if self._safety_thread and self._safety_thread.is_alive():
+            return
+        self._safety_stop.clear()
+        self._safety_thread = threading.Thread(target=self._safety_loop, name='SafetyMonitor', daemon=True)
+        self._safety_thread.start()
+    
+    def _safety_loop(self):
+        """فحص الأمان عند وصول تيليمتري جديد (دفعة واحدة لكل ما وصل منذ الفحص السابق)"""
+        while not self._safety_stop.is_set():
+            if not self._safety_subscription.wait(0.5):
+                continue
+            self._safety_subscription.drain()
+            try:
+                self._check_safety_conditions()
+            except Exception as e:
+                self.logger.error(f"خطأ في فحص الأمان: {e}")
+    
     def emergency_stop(self):
         """إيقاف طارئ"""
         self.motor_controller.emergency_stop_all()
@@ -253,8 +683,19 @@ class ROVController:
             'joystick_info': self.joystick.get_joystick_info(),
             'communication_status': {
                 'connected': self.communication.is_connected if self.communication else False,
-                'type': 'network' if isinstance(self.communication, NetworkCommunication) else 'serial'
+                'type': self._communication_type(),
+                'write_stats': self.communication.get_write_stats() if self.communication else {},
+                'links': self.communication.get_link_stats() if isinstance(self.communication, BondedLink) else {},
+                'link_quality': self.get_link_quality(),
+                'clock_sync': self.clock_sync.get_stats(),
+                'fec': self.communication.get_fec_stats() if hasattr(self.communication, 'get_fec_stats') else {},
+                'mavlink': self.communication.get_mavlink_stats() if isinstance(self.communication, MAVLinkCommunication) else {},
+                'line_telemetry': self.line_telemetry.get_stats() if self.line_telemetry else {},
+                'control_lease': self.control_lease.get_stats() if self.control_lease else {},
+                'capture': [capture.get_stats() for capture in self._captures],
+                'baud': self.communication.get_baud_stats() if hasattr(self.communication, 'get_baud_stats') else {}
             },
+            'bus': self.telemetry_bus.get_stats(),
             'safety': {
                 'enabled': self.safety_enabled,
                 'max_depth': self.max_depth,
@@ -262,11 +703,49 @@ class ROVController:
             }
         }
     
+    def get_link_quality(self) -> Dict[str, Any]:
+        """جودة الوصلة: RTT (p50/p95/p99) والتذبذب والفقد بالمللي ثانية
+        
+        في الوضع المجمع تُرجع قياسات الوصلة النشطة.
+        """
+        if isinstance(self.communication, BondedLink):
+            stats = self.communication.get_link_stats()
+            active = stats['active']
+            quality = dict(stats['links'].get(active, {})) if active else {}
+            quality['link'] = active
+            return quality
+        if self.link_monitor:
+            quality = self.link_monitor.get_stats()
+            quality['link'] = self._communication_type()
+            return quality
+        return {}
+    
+    def _communication_type(self) -> str:
+        """نوع وسيلة الاتصال الحالية"""
+        if isinstance(self.communication, BondedLink):
+            return 'bonded'
+        if isinstance(self.communication, MAVLinkCommunication):
+            return 'mavlink'
+        if isinstance(self.communication, (SerialCommunication, AsyncSerialTransport)):
+            return 'serial'
+        return 'network'
+    
     def request_telemetry(self):
         """طلب بيانات التيليمتري"""
         if self.communication:
             self.communication.request_telemetry()
     
+    def send_bulk(self, data: bytes, channel: int = CHANNEL_BULK) -> bool:
+        """إرسال نقل كبير (ملف إعدادات، سجل) دون تأخير أوامر التحكم أكثر من جزء واحد"""
+        if not self.communication or not hasattr(self.communication, 'send_bulk'):
+            return False
+        return self.communication.send_bulk(data, channel)
+    
+    def set_bulk_handler(self, handler: Callable[[int, bytes], None]):
+        """تعيين معالج النقل الكبير الوارد من المركبة: handler(channel, data)"""
+        if self.communication and hasattr(self.communication, 'set_bulk_handler'):
+            self.communication.set_bulk_handler(handler)
+    
     def setup_joystick(self, joystick_id: int = 0) -> bool:
         """إعداد الجويستيك"""
         try:
@@ -284,13 +763,21 @@ class ROVController:
         self.logger.info("بدء إغلاق النظام...")
         
         try:
-            # إيقاف الجويستيك
-            self.joystick.stop_input()
-            self.joystick.disconnect_joystick()
+            # إيقاف الجويستيك (المشترك يُغلقه مدير الجلسات)
+            if self._owns_joystick:
+                self.joystick.stop_input()
+                self.joystick.disconnect_joystick()
             
             # قطع الاتصال
             self.disconnect()
             
+            self._safety_stop.set()
+            if self._safety_thread and self._safety_thread.is_alive():
+                self._safety_thread.join(timeout=1)
+            
+            if self.shared_telemetry:
+                self.shared_telemetry.close()
+            
             self.logger.info("تم إغلاق النظام بنجاح")
             
         except Exception as e:
@@ -0,0 +1,160 @@
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+from utils.logger import ROVLogger
+from utils.config import Config, VehicleConfig
+from communication.async_transport import AsyncLinkLoop
+from communication.websocket_server import TelemetryWebSocketServer
+from .joystick_input import JoystickInput
+from .rov_controller import ROVController
+
+class VehicleSessionManager:
+    """إدارة عدة مركبات من عملية واحدة فوق إدخال/إخراج مشترك
+    
+    كل مركبة لها ROVController خاص بإعداداتها ([<المركبة>:<القسم>])، لكن:
+    - كل الوصلات (تسلسلي، TCP، UDP) تعمل على حلقة asyncio واحدة في خيط واحد،
+      وفك الترميز يتم في نفس الخيط، فلا توجد خيوط قراءة/كتابة لكل مركبة.
+    - جويستيك واحد (pygame) يُوجَّه للمركبة النشطة، والإيقاف الطارئ منه يشمل الكل.
+    بدون [VEHICLES] names يعمل بمركبة واحدة بالإعدادات المشتركة كما في السابق.
+    """
+    
+    def __init__(self, config: Config):
+        self.config = config
+        self.logger = ROVLogger('VehicleSessionManager')
+        
+        names = config.get_vehicle_names()
+        self.multi_vehicle = bool(names)
+        if not names:
+            names = ['ROV']
+        
+        self.link_loop = AsyncLinkLoop.shared()
+        self.joystick = JoystickInput()
+        self.joystick.set_movement_handler(self._handle_joystick_movement)
+        self.joystick.set_button_handler(self._handle_joystick_button)
+        
+        self.controllers: Dict[str, ROVController] = {}
+        for name in names:
+            if self.multi_vehicle:
+                # وسيلة الاتصال المشتركة مفروضة على كل المركبات
+                vehicle_config = VehicleConfig(config, name, {'COMMUNICATION': {'transport_backend': 'asyncio'}})
+                self.controllers[name] = ROVController(vehicle_config, self.joystick, name)
+            else:
+                self.controllers[name] = ROVController(config, self.joystick)
+        
+        self.active_name = names[0]
+        self._lock = threading.Lock()
+        self.active_changed_handler: Optional[Callable[[str], None]] = None
+        
+        # بث الحالة والحساسات للمراقبين عبر WebSocket (اختياري)
+        self.telemetry_server: Optional[TelemetryWebSocketServer] = None
+        if config.get_bool('WEBSOCKET', 'enabled', False):
+            self._start_telemetry_server()
+        
+        self.logger.info(f"تم تهيئة {len(self.controllers)} مركبة: {', '.join(names)}")
+    
+    @property
+    def names(self) -> List[str]:
+        return list(self.controllers)
+    
+    @property
+    def active(self) -> ROVController:
+        """المركبة التي يتحكم بها الجويستيك ولوحة التحكم"""
+        return self.controllers[self.active_name]
+    
+    def set_active(self, name: str) -> bool:
+        """تغيير المركبة النشطة (أوامر الجويستيك السابقة تبقى على المركبة القديمة)"""
+        if name not in self.controllers:
+            self.logger.warning(f"مركبة غير معروفة: {name}")
+            return False
+        with self._lock:
+            if name == self.active_name:
+                return True
+            previous = self.active
+            self.active_name = name
+        # إيقاف حركة المركبة السابقة حتى لا تستمر بآخر أمر جويستيك
+        previous.motor_controller.stop_all_motors()
+        self.logger.info(f"المركبة النشطة: {name}")
+        if self.active_changed_handler:
+            self.active_changed_handler(name)
+        return True
+    
+    def get(self, name: str) -> Optional[ROVController]:
+        return self.controllers.get(name)
+    
+    def connect_all(self):
+        """بدء اتصال كل المركبات في الخلفية"""
+        for controller in self.controllers.values():
+            controller.connect_async()
+    
+    def disconnect_all(self):
+        """طلب قطع اتصال كل المركبات دون انتظار"""
+        for controller in self.controllers.values():
+            controller.disconnect_async()
+    
+    def emergency_stop_all(self):
+        """إيقاف طارئ لكل المركبات"""
+        for controller in self.controllers.values():
+            try:
+                controller.emergency_stop()
+            except Exception as e:
+                self.logger.error(f"خطأ في الإيقاف الطارئ للمركبة {controller.name}: {e}")
+    
+    def setup_joystick(self, joystick_id: int = 0) -> bool:
+        """إعداد الجويستيك المشترك"""
+        try:
+            if self.joystick.connect_joystick(joystick_id):
+                self.joystick.start_input()
+                self.logger.info("تم إعداد الجويستيك بنجاح")
+                return True
+            return False
+        except Exception as e:
+            self.logger.error(f"خطأ في إعداد الجويستيك: {e}")
+            return False
+    
+    def get_status(self) -> Dict[str, Dict[str, Any]]:
+        """حالة كل المركبات"""
+        return {name: controller.get_rov_status() for name, controller in self.controllers.items()}
+    
+    def _start_telemetry_server(self):
+        """تشغيل خادم WebSocket لكل المركبات"""
+        server = TelemetryWebSocketServer(
+            host=self.config.get('WEBSOCKET', 'host', '0.0.0.0'),
+            port=self.config.get_int('WEBSOCKET', 'port', 8765),
+            max_rate=self.config.get_float('WEBSOCKET', 'max_rate', 30.0),
+            default_rate=self.config.get_float('WEBSOCKET', 'default_rate', 5.0),
+            max_clients=self.config.get_int('WEBSOCKET', 'max_clients', 100),
+            send_timeout=self.config.get_float('WEBSOCKET', 'send_timeout', 5.0)
+        )
+        for name, controller in self.controllers.items():
+            server.add_vehicle(name, controller)
+        if server.start():
+            self.telemetry_server = server
+    
+    def get_resource_stats(self) -> Dict[str, Any]:
+        """الخيوط والوصلات المشتركة (للتحقق من أن الكلفة لا تتضاعف مع كل مركبة)"""
+        return {
+            'vehicles': len(self.controllers),
+            'threads': threading.active_count(),
+            'shared_link_loop': self.link_loop.thread is not None and self.link_loop.thread.is_alive(),
+            'links_on_shared_loop': len(self.link_loop.links),
+            'websocket_clients': len(self.telemetry_server.clients) if self.telemetry_server else 0
+        }
+    
+    def shutdown(self):
+        """إغلاق كل المركبات والجويستيك المشترك"""
+        if self.telemetry_server:
+            self.telemetry_server.stop()
+        self.joystick.stop_input()
+        self.joystick.disconnect_joystick()
+        for controller in self.controllers.values():
+            controller.shutdown()
+        self.logger.info("تم إغلاق مدير الجلسات")
+    
+    def _handle_joystick_movement(self, forward: float, strafe: float, vertical: float, yaw: float):
+        self.active._handle_joystick_movement(forward, strafe, vertical, yaw)
+    
+    def _handle_joystick_button(self, button_name: str, pressed: bool):
+        if button_name == 'emergency_stop' and pressed:
+            self.emergency_stop_all()
+            return
+        self.active._handle_joystick_button(button_name, pressed)
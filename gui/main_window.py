@@ -1,10 +1,10 @@
 from PyQt6.QtWidgets import (
     QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, QTabWidget,
     QMenuBar, QStatusBar, QLabel, QPushButton, QFrame, QSplitter,
-    QMessageBox, QApplication, QSystemTrayIcon, QMenu
+    QMessageBox, QApplication, QSystemTrayIcon, QMenu, QTabBar
 )
 from PyQt6.QtCore import QTimer, pyqtSignal, Qt, QThread, pyqtSlot
-from PyQt6.QtGui import QIcon, QPixmap, QAction, QFont
+from PyQt6.QtGui import QIcon, QPixmap, QAction, QFont, QColor
 
 import sys
 import time
@@ -12,7 +12,9 @@ from typing import Dict, Any
 
 from utils.config import Config
 from utils.logger import ROVLogger
+from utils.telemetry_bus import TOPIC_TELEMETRY
 from controller.rov_controller import ROVController
+from controller.session_manager import VehicleSessionManager
 from .camera_feed import CameraFeedWidget
 from .control_panel import ControlPanelWidget
 from .telemetry_display import TelemetryDisplayWidget
@@ -24,17 +26,25 @@ class MainWindow(QMainWindow):
     rov_connected = pyqtSignal()
     rov_disconnected = pyqtSignal()
     emergency_stop_signal = pyqtSignal()
+    # حالة اتصال مركبة (الاسم، الحالة، التفاصيل) من خيط المشرف (تُنقل لخيط الواجهة عبر الطابور)
+    connection_state_changed = pyqtSignal(str, str, dict)
     
     def __init__(self, config: Config):
         super().__init__()
         self.config = config
         self.logger = ROVLogger('MainWindow')
         
-        # تهيئة متحكم ROV
-        self.rov_controller = ROVController(config)
+        # تهيئة متحكمات المركبات (مركبة واحدة ما لم تُحدد [VEHICLES] names)
+        self.session_manager = VehicleSessionManager(config)
         
         # حالة التطبيق
         self.is_connected = False
+        self.connection_states = {name: 'disconnected' for name in self.session_manager.names}
+        # الواجهة مستهلك على ناقل التيليمتري لكل مركبة (آخر قيمة فقط)
+        self.telemetry_subscriptions = {
+            name: controller.telemetry_bus.subscribe(TOPIC_TELEMETRY, 'gui')
+            for name, controller in self.session_manager.controllers.items()
+        }
         self.is_fullscreen = False
         
         # مؤقتات
@@ -57,6 +67,15 @@ class MainWindow(QMainWindow):
         # محاولة الاتصال التلقائي
         QTimer.singleShot(1000, self._auto_connect)
     
+    @property
+    def rov_controller(self) -> ROVController:
+        """متحكم المركبة المعروضة حالياً"""
+        return self.session_manager.active
+    
+    @property
+    def connection_state(self) -> str:
+        return self.connection_states[self.session_manager.active_name]
+    
     def _setup_ui(self):
         """إعداد واجهة المستخدم"""
         # النافذة الرئيسية
@@ -71,10 +90,17 @@ class MainWindow(QMainWindow):
         self.setCentralWidget(central_widget)
         
         # التخطيط الرئيسي
-        main_layout = QHBoxLayout(central_widget)
+        main_layout = QVBoxLayout(central_widget)
         main_layout.setContentsMargins(5, 5, 5, 5)
         main_layout.setSpacing(5)
         
+        # تبويب لكل مركبة (يظهر فقط عند وجود أكثر من مركبة)
+        self.vehicle_tabs = QTabBar()
+        for name in self.session_manager.names:
+            self.vehicle_tabs.addTab(name)
+        self.vehicle_tabs.setVisible(len(self.session_manager.names) > 1)
+        main_layout.addWidget(self.vehicle_tabs)
+        
         # إنشاء المقسم الرئيسي
         main_splitter = QSplitter(Qt.Orientation.Horizontal)
         main_layout.addWidget(main_splitter)
@@ -204,6 +230,14 @@ class MainWindow(QMainWindow):
         self.rov_connected.connect(self._on_rov_connected)
         self.rov_disconnected.connect(self._on_rov_disconnected)
         self.emergency_stop_signal.connect(self._on_emergency_stop)
+        
+        # الاتصال يتم في خيط خلفي: الحالة تصل كإشارة
+        self.connection_state_changed.connect(self._on_connection_state_changed)
+        for name, controller in self.session_manager.controllers.items():
+            controller.set_connection_state_handler(
+                lambda state, info, name=name: self.connection_state_changed.emit(name, state, info))
+        
+        self.vehicle_tabs.currentChanged.connect(self._on_vehicle_tab_changed)
     
     def _connect_widget_signals(self):
         """ربط إشارات الأدوات"""
@@ -223,7 +257,7 @@ class MainWindow(QMainWindow):
         
         # مؤقت فحص الاتصال
         self.connection_timer.timeout.connect(self._check_connection)
-        self.connection_timer.start(5000)  # كل 5 ثوانٍ
+        self.connection_timer.start(1000)  # كل ثانية (القياس نفسه يعمل في الخلفية)
     
     def _apply_theme(self):
         """تطبيق المظهر"""
@@ -288,42 +322,109 @@ class MainWindow(QMainWindow):
     def _auto_connect(self):
         """محاولة الاتصال التلقائي"""
         if self.config.get_bool('COMMUNICATION', 'auto_connect', False):
-            self._connect_rov()
+            self.status_bar.showMessage("جارٍ الاتصال...")
+            self.session_manager.connect_all()
     
     def _toggle_connection(self):
-        """تبديل حالة الاتصال"""
-        if self.is_connected:
-            self._disconnect_rov()
-        else:
+        """تبديل حالة الاتصال (أثناء محاولة الاتصال أو إعادته: إلغاء)"""
+        if self.connection_state in ('disconnected', 'failed'):
             self._connect_rov()
+        else:
+            self._disconnect_rov()
     
     def _connect_rov(self):
-        """الاتصال بـ ROV"""
+        """الاتصال بـ ROV في الخلفية (الواجهة لا تنتظر مهلة الاتصال)"""
         try:
             self.status_bar.showMessage("جارٍ الاتصال...")
-            
-            if self.rov_controller.connect():
-                self.is_connected = True
-                self.rov_connected.emit()
-                self.status_bar.showMessage("تم الاتصال بنجاح", 3000)
-            else:
-                self.status_bar.showMessage("فشل في الاتصال", 5000)
-                QMessageBox.warning(self, "خطأ في الاتصال", "فشل في الاتصال بـ ROV")
-                
+            self.rov_controller.connect_async()
+        
         except Exception as e:
             self.logger.error(f"خطأ في الاتصال: {e}")
             QMessageBox.critical(self, "خطأ", f"خطأ في الاتصال: {e}")
     
     def _disconnect_rov(self):
-        """قطع الاتصال مع ROV"""
+        """قطع الاتصال مع ROV (يكتمل في الخلفية ويُبلَّغ بإشارة disconnected)"""
         try:
-            self.rov_controller.disconnect()
+            self.status_bar.showMessage("جارٍ قطع الاتصال...")
+            self.rov_controller.disconnect_async()
+        
+        except Exception as e:
+            self.logger.error(f"خطأ في قطع الاتصال: {e}")
+    
+    @pyqtSlot(int)
+    def _on_vehicle_tab_changed(self, index: int):
+        """تبديل المركبة المعروضة والمتحكم بها"""
+        name = self.vehicle_tabs.tabText(index)
+        if not self.session_manager.set_active(name):
+            return
+        
+        self.control_panel.rov_controller = self.rov_controller
+        self.setWindowTitle(f"ROV Control System v1.0 - {name}")
+        
+        # عرض حالة اتصال المركبة الجديدة
+        state = self.connection_states[name]
+        self.is_connected = state == 'connected'
+        if state == 'connected':
+            self._on_rov_connected()
+        elif state in ('connecting', 'reconnecting'):
+            self._on_rov_disconnected()
+            self.connection_status.setText("جارٍ الاتصال...")
+            self.connection_status.setStyleSheet("color: orange; font-weight: bold;")
+            self.connect_action.setText("إلغاء الاتصال")
+        else:
+            self._on_rov_disconnected()
+    
+    def _update_vehicle_tab(self, name: str, state: str):
+        """تلوين تبويب المركبة حسب حالة اتصالها"""
+        index = self.session_manager.names.index(name)
+        color = {'connected': 'green', 'connecting': 'orange', 'reconnecting': 'orange'}.get(state, 'red')
+        self.vehicle_tabs.setTabTextColor(index, QColor(color))
+        self.vehicle_tabs.setTabToolTip(index, state)
+    
+    @pyqtSlot(str, str, dict)
+    def _on_connection_state_changed(self, name: str, state: str, info: Dict[str, Any]):
+        """تحديث الواجهة حسب حالة الاتصال القادمة من خيط المشرف"""
+        self.connection_states[name] = state
+        self._update_vehicle_tab(name, state)
+        
+        if name != self.session_manager.active_name:
+            # مركبة غير معروضة: رسالة في شريط الحالة فقط
+            if state in ('connected', 'failed'):
+                text = "متصلة" if state == 'connected' else "فشل الاتصال"
+                self.status_bar.showMessage(f"{name}: {text}", 3000)
+            return
+        
+        if state == 'connected':
+            self.is_connected = True
+            self.rov_connected.emit()
+            if info.get('reconnected'):
+                self.status_bar.showMessage("أعيد الاتصال وتمت مزامنة أوامر المحركات", 3000)
+            else:
+                self.status_bar.showMessage("تم الاتصال بنجاح", 3000)
+        
+        elif state in ('connecting', 'reconnecting'):
+            self.is_connected = False
+            if 'retry_in' in info:
+                text = f"إعادة المحاولة خلال {info['retry_in']:.1f} ث"
+            elif state == 'connecting':
+                text = "جارٍ الاتصال..."
+            else:
+                text = f"إعادة الاتصال (محاولة {info.get('attempt', 0) + 1})"
+            self.connection_status.setText(text)
+            self.connection_status.setStyleSheet("color: orange; font-weight: bold;")
+            self.connect_action.setText("إلغاء الاتصال")
+        
+        elif state == 'failed':
+            self.is_connected = False
+            self.rov_disconnected.emit()
+            self.status_bar.showMessage("فشل في الاتصال", 5000)
+            message = "انقطع الاتصال بـ ROV" if info.get('link_lost') else "فشل في الاتصال بـ ROV"
+            QMessageBox.warning(self, "خطأ في الاتصال", message)
+        
+        elif state == 'disconnected':
             self.is_connected = False
             self.rov_disconnected.emit()
             self.status_bar.showMessage("تم قطع الاتصال", 3000)
-            
-        except Exception as e:
-            self.logger.error(f"خطأ في قطع الاتصال: {e}")
     
     @pyqtSlot()
     def _on_rov_connected(self):
@@ -343,6 +444,7 @@ class MainWindow(QMainWindow):
         """معالجة حدث قطع الاتصال"""
         self.connection_status.setText("غير متصل")
         self.connection_status.setStyleSheet("color: red; font-weight: bold;")
+        self.connection_status.setToolTip("")
         self.connect_action.setText("اتصال")
         
         # تعطيل أدوات التحكم
@@ -352,8 +454,8 @@ class MainWindow(QMainWindow):
         self.logger.info("تم قطع الاتصال مع ROV")
     
     def _emergency_stop(self):
-        """تنفيذ الإيقاف الطارئ"""
-        self.rov_controller.emergency_stop()
+        """تنفيذ الإيقاف الطارئ (لكل المركبات)"""
+        self.session_manager.emergency_stop_all()
         self.emergency_stop_signal.emit()
         self.status_bar.showMessage("تم تنفيذ الإيقاف الطارئ!", 5000)
         
@@ -402,15 +504,35 @@ class MainWindow(QMainWindow):
             mode_text = {'manual': 'يدوي', 'stabilized': 'مستقر', 'position': 'موقعي'}.get(control_mode, control_mode)
             self.control_mode_status.setText(f"الوضع: {mode_text}")
             
-            # تحديث أدوات التيليمتري
-            self.telemetry_widget.update_data(rov_status['state'])
+            # تحديث أدوات التيليمتري عند وصول تيليمتري جديد فقط (الرسوم لا تكرر آخر قيمة)
+            subscription = self.telemetry_subscriptions[self.session_manager.active_name]
+            if subscription.lag:
+                subscription.latest()
+                self.telemetry_widget.update_data(rov_status['state'])
     
     def _check_connection(self):
-        """فحص حالة الاتصال"""
-        if self.is_connected:
-            # فحص الاتصال مع ROV
-            # TODO: تنفيذ فحص الاتصال
-            pass
+        """فحص حالة الاتصال من قياسات ping/pong الخلفية"""
+        if not self.is_connected:
+            return
+        
+        quality = self.rov_controller.get_link_quality()
+        if not quality or not quality.get('samples'):
+            return
+        
+        if not quality.get('alive'):
+            self.connection_status.setText("متصل - لا يوجد رد")
+            self.connection_status.setStyleSheet("color: orange; font-weight: bold;")
+            return
+        
+        self.connection_status.setText(f"متصل | RTT {quality['p50_ms']:.0f} ms")
+        color = 'green' if quality['loss'] < 0.05 else 'orange'
+        self.connection_status.setStyleSheet(f"color: {color}; font-weight: bold;")
+        self.connection_status.setToolTip(
+            f"الوصلة: {quality.get('link')}\n"
+            f"RTT p50/p95/p99: {quality['p50_ms']:.1f} / {quality['p95_ms']:.1f} / {quality['p99_ms']:.1f} ms\n"
+            f"التذبذب: {quality['jitter_ms']:.1f} ms\n"
+            f"الفقد: {quality['loss'] * 100:.1f}%"
+        )
     
     def _toggle_fullscreen(self):
         """تبديل الشاشة الكاملة"""
@@ -471,12 +593,8 @@ class MainWindow(QMainWindow):
         # حفظ الإعدادات
         self._save_settings()
         
-        # قطع الاتصال إذا كان متصلاً
-        if self.is_connected:
-            self._disconnect_rov()
-        
-        # إغلاق متحكم ROV
-        self.rov_controller.shutdown()
+        # إغلاق متحكمات المركبات (يقطع الاتصال وينتظر انتهاء خيوط الاتصال)
+        self.session_manager.shutdown()
         
         self.logger.info("تم إغلاق التطبيق")
         event.accept()
@@ -0,0 +1 @@
+# Simulator Package for ROV Control System
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+محاكي ROV محلي للاختبار بدون مركبة
+يفتح منفذاً تسلسلياً وهمياً (pty) ومنافذ TCP/UDP بنفس بروتوكولات نظام الاتصال
+
+مثال:
+    python -m simulator --serial --tcp 8080 --udp 8080 --rate 200 --latency-ms 20 --loss 0.01
+"""
+
+import sys
+import os
+import time
+import argparse
+
+# إضافة مجلد المشروع لـ Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from communication.line_telemetry import DEFAULT_LINE_SCHEMA
+from simulator.impairment import LinkImpairment
+from simulator.server import ROVSimulator, MAX_RATE_HZ
+
+def main():
+    parser = argparse.ArgumentParser(description='محاكي ROV محلي (pty + TCP + UDP)')
+    parser.add_argument('--serial', action='store_true', help='فتح منفذ تسلسلي وهمي')
+    parser.add_argument('--tcp', type=int, metavar='PORT', help='منفذ خادم TCP')
+    parser.add_argument('--udp', type=int, metavar='PORT', help='منفذ UDP (الرد إلى PORT + 1)')
+    parser.add_argument('--host', default='0.0.0.0', help='عنوان الاستماع')
+    parser.add_argument('--rate', type=float, default=50.0, help=f'معدل التيليمتري بالـ Hz (حتى {MAX_RATE_HZ:.0f})')
+    parser.add_argument('--binary', action='store_true', help='الصيغة الثنائية (binary_protocol = True)')
+    parser.add_argument('--delta', action='store_true', help='تيليمتري تفاضلي (مع --binary)')
+    parser.add_argument('--keyframe-interval', type=int, default=50, help='إطار كامل كل N إطار')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='تأخير الوصلة في كل اتجاه')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='تذبذب التأخير (±)')
+    parser.add_argument('--loss', type=float, default=0.0, help='احتمال فقد الرسالة (0-1)')
+    parser.add_argument('--corrupt', type=float, default=0.0, help='احتمال تلف الرسالة (0-1)')
+    parser.add_argument('--clock-offset-ms', type=float, default=0.0, help='فرق ساعة المركبة عن ساعة الجهاز')
+    parser.add_argument('--clock-drift-ppm', type=float, default=0.0, help='انحراف ساعة المركبة (جزء في المليون)')
+    parser.add_argument('--fec', choices=['off', 'xor', 'rs'], default='off',
+                        help='تصحيح الأخطاء الأمامي على UDP (نفس fec_mode في الإعدادات)')
+    parser.add_argument('--line-telemetry', metavar='SCHEMA', nargs='?', const=DEFAULT_LINE_SCHEMA,
+                        help='مخطط أسطر التيليمتري النصي (نفس line_telemetry_schema) لكل الجلسات؛ '
+                             'المنفذ التسلسلي النصي يرسل المخطط الافتراضي بدونه')
+    parser.add_argument('--multicast', metavar='GROUP', help='بث تيليمتري UDP مرة واحدة لمجموعة multicast (نفس multicast_group)')
+    parser.add_argument('--multicast-ttl', type=int, default=1, help='TTL حزم المجموعة (1 = الشبكة المحلية فقط)')
+    parser.add_argument('--control-lease', metavar='SECONDS', type=float, nargs='?', const=2.0,
+                        help='رفض أوامر المحركات من غير صاحب عقد التحكم')
+    parser.add_argument('--serial-baud', type=int, metavar='RATE',
+                        help='سرعة المركبة الآمنة: اختلاف سرعة المحطة عنها يحوّل البايتات لضجيج (تفاوض السرعة)')
+    parser.add_argument('--serial-max-baud', type=int, metavar='RATE',
+                        help='أعلى سرعة يحملها الكابل: فوقها يتلف كل بايت باحتمال --serial-byte-error')
+    parser.add_argument('--serial-byte-error', type=float, default=0.002, help='احتمال تلف البايت فوق --serial-max-baud')
+    parser.add_argument('--seed', type=int, help='بذرة عشوائية لنتائج قابلة للتكرار')
+    parser.add_argument('--stats-interval', type=float, default=5.0, help='الفاصل بين طباعة الإحصائيات (ثانية)')
+    args = parser.parse_args()
+    
+    if not (args.serial or args.tcp is not None or args.udp is not None):
+        parser.error('حدد نقطة اتصال واحدة على الأقل: --serial أو --tcp أو --udp')
+    
+    impairment = LinkImpairment(args.latency_ms, args.jitter_ms, args.loss, args.corrupt, args.seed)
+    simulator = ROVSimulator(
+        rate_hz=args.rate,
+        binary_protocol=args.binary,
+        delta_telemetry=args.delta,
+        keyframe_interval=args.keyframe_interval,
+        impairment=impairment,
+        seed=args.seed,
+        clock_offset=args.clock_offset_ms / 1000.0,
+        clock_drift_ppm=args.clock_drift_ppm,
+        fec_mode=args.fec,
+        line_schema=args.line_telemetry,
+        control_lease=args.control_lease,
+        serial_baud=args.serial_baud,
+        serial_max_baud=args.serial_max_baud,
+        serial_byte_error=args.serial_byte_error
+    )
+    
+    if args.serial:
+        print(f"المنفذ التسلسلي: {simulator.start_serial()}")
+    if args.tcp is not None:
+        print(f"TCP: {args.host}:{simulator.start_tcp(args.tcp, args.host)}")
+    if args.udp is not None:
+        port = simulator.start_udp(args.udp, args.host, multicast_group=args.multicast, multicast_ttl=args.multicast_ttl)
+        print(f"UDP: {args.host}:{port}" + (f" (التيليمتري إلى {args.multicast}:{port + 1})" if args.multicast else ""))
+    
+    simulator.start()
+    print(f"بث التيليمتري بمعدل {simulator.rate_hz:.0f} Hz - Ctrl+C للإيقاف")
+    
+    try:
+        while True:
+            time.sleep(args.stats_interval)
+            stats = simulator.get_stats()
+            print(f"معدل فعلي {stats['actual_rate_hz']:.1f} Hz | "
+                  f"تيليمتري {stats['telemetry_sent']} | "
+                  f"رسائل واردة {stats['messages_received']} | "
+                  f"أوامر محركات {stats['motor_commands']} | "
+                  f"جلسات {len(stats['sessions'])}")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+import heapq
+import random
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from utils.logger import ROVLogger
+
+class LinkImpairment:
+    """إعدادات تشويه الوصلة: تأخير مع تذبذب، فقد، وتلف بايتات"""
+    
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, loss: float = 0.0,
+                 corruption: float = 0.0, seed: Optional[int] = None):
+        self.latency = latency_ms / 1000.0
+        self.jitter = jitter_ms / 1000.0
+        self.loss = loss              # احتمال فقد الرسالة
+        self.corruption = corruption  # احتمال تلف الرسالة (قلب بايت عشوائي)
+        self.rng = random.Random(seed)
+    
+    @property
+    def has_delay(self) -> bool:
+        return self.latency > 0 or self.jitter > 0
+    
+    @property
+    def is_clean(self) -> bool:
+        return not self.has_delay and self.loss <= 0 and self.corruption <= 0
+    
+    def delay(self) -> float:
+        """زمن التأخير لرسالة واحدة بالثواني"""
+        if self.jitter > 0:
+            return max(0.0, self.latency + self.rng.uniform(-self.jitter, self.jitter))
+        return self.latency
+    
+    def should_drop(self) -> bool:
+        return self.loss > 0 and self.rng.random() < self.loss
+    
+    def corrupt(self, data: bytes, protected: int = 0) -> Optional[bytes]:
+        """إرجاع نسخة تالفة من الرسالة أو None إذا لم تُتلف
+        
+        protected: عدد البايتات الأولى التي لا تُتلف (مثل بادئة الطول في TCP
+        التي لا يتلفها النقل الحقيقي أبداً).
+        """
+        if self.corruption <= 0 or len(data) <= protected or self.rng.random() >= self.corruption:
+            return None
+        corrupted = bytearray(data)
+        position = self.rng.randrange(protected, len(corrupted))
+        corrupted[position] ^= 1 << self.rng.randrange(8)
+        return bytes(corrupted)
+
+class ImpairedLink:
+    """تمرير الرسائل عبر وصلة مُشوَّهة (في أي اتجاه) مع خيط تأخير عند الحاجة
+    
+    بدون تأخير تُمرَّر الرسائل مباشرة في خيط المستدعي. مع التأخير تُرتب في
+    كومة حسب موعد التسليم، فالتذبذب الكبير قد يعيد ترتيب الرسائل كما في UDP؛
+    أما الوصلات التدفقية (تسلسلي، TCP) فتحافظ على الترتيب (preserve_order).
+    """
+    
+    def __init__(self, deliver: Callable[[bytes], None], impairment: Optional[LinkImpairment] = None,
+                 name: str = 'ImpairedLink', protected: int = 0, preserve_order: bool = False):
+        self.deliver = deliver
+        self.impairment = impairment or LinkImpairment()
+        self.protected = protected
+        self.preserve_order = preserve_order
+        self._last_due = 0.0
+        self.logger = ROVLogger(name)
+        self.name = name
+        
+        self._condition = threading.Condition()
+        self._pending: List[Tuple[float, int, bytes]] = []
+        self._counter = 0
+        self.thread: Optional[threading.Thread] = None
+        self.is_running = False
+        
+        # إحصائيات
+        self.stats = {
+            'messages': 0,
+            'bytes': 0,
+            'dropped': 0,
+            'corrupted': 0,
+            'delivery_errors': 0
+        }
+    
+    def start(self):
+        """بدء خيط التأخير (فقط إذا كان هناك تأخير مطلوب)"""
+        if self.impairment.has_delay and not self.is_running:
+            self.is_running = True
+            self.thread = threading.Thread(target=self._delay_loop, name=self.name, daemon=True)
+            self.thread.start()
+    
+    def stop(self):
+        """إيقاف خيط التأخير وإهمال الرسائل المعلقة"""
+        with self._condition:
+            self.is_running = False
+            self._pending.clear()
+            self._condition.notify_all()
+        if self.thread and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=1.0)
+    
+    def send(self, data: bytes):
+        """تمرير رسالة عبر الوصلة"""
+        impairment = self.impairment
+        stats = self.stats
+        stats['messages'] += 1
+        stats['bytes'] += len(data)
+        
+        if not impairment.is_clean:
+            if impairment.should_drop():
+                stats['dropped'] += 1
+                return
+            
+            corrupted = impairment.corrupt(data, self.protected)
+            if corrupted is not None:
+                stats['corrupted'] += 1
+                data = corrupted
+            
+            if self.is_running:
+                due = time.monotonic() + impairment.delay()
+                with self._condition:
+                    if self.preserve_order:
+                        due = max(due, self._last_due)
+                        self._last_due = due
+                    self._counter += 1
+                    heapq.heappush(self._pending, (due, self._counter, data))
+                    self._condition.notify()
+                return
+        
+        self._deliver(data)
+    
+    def get_stats(self) -> Dict[str, int]:
+        """الحصول على إحصائيات الوصلة"""
+        with self._condition:
+            stats = dict(self.stats)
+            stats['in_flight'] = len(self._pending)
+        return stats
+    
+    def _deliver(self, data: bytes):
+        try:
+            self.deliver(data)
+        except Exception as e:
+            self.stats['delivery_errors'] += 1
+            self.logger.debug(f"خطأ في التسليم: {e}")
+    
+    def _delay_loop(self):
+        """تسليم الرسائل عند حلول مواعيدها"""
+        while True:
+            with self._condition:
+                while self.is_running:
+                    if self._pending:
+                        wait = self._pending[0][0] - time.monotonic()
+                        if wait <= 0:
+                            break
+                        self._condition.wait(wait)
+                    else:
+                        self._condition.wait()
+                
+                if not self.is_running:
+                    return
+                _, _, data = heapq.heappop(self._pending)
+            
+            self._deliver(data)
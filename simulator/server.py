@@ -0,0 +1,823 @@
+import json
+import math
+import os
+import random
+import select
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from communication.baud_negotiation import (ACTION_CONFIRM, ACTION_SET, ACTION_TEST, BAUD_MESSAGE, BaudRateSwitch,
+                                            format_test_frame)
+from communication.binary_protocol import BinaryMessageCodec, MOTOR_ORDER
+from communication.channels import (CHANNEL_CONTROL, CHANNEL_TELEMETRY, BulkReassembler, is_bulk_channel,
+                                    pack_length)
+from communication.fec import FEC_OFF, FecDecoder, FecEncoder
+from communication.line_telemetry import DEFAULT_LINE_SCHEMA, LineTelemetrySchema
+from communication.control_lease import ControlLease, LEASE_MESSAGE
+from communication.multicast import open_multicast_sender
+from communication.packet_handler import PacketHandler
+from communication.stream_decoder import LengthPrefixedDecoder
+from utils.logger import ROVLogger
+from .impairment import ImpairedLink, LinkImpairment
+from .vehicle import SimulatedVehicle, NEUTRAL_PWM
+
+MAX_RATE_HZ = 1000.0
+
+# سرعات المنفذ الوهمي التي تُقرأ من termios، وأوامر تفاوض السرعة النصية
+_TERMIOS_RATES = (1200, 2400, 4800, 9600, 19200, 38400, 57600, 115200, 230400, 460800, 500000, 576000,
+                  921600, 1000000)
+_TEXT_BAUD_ACTIONS = {'BAUD': ACTION_SET, 'BAUD_TEST': ACTION_TEST, 'BAUD_CONFIRM': ACTION_CONFIRM}
+
+class SimulatorSession:
+    """جلسة عميل واحد: تأطير الرسائل حسب نوع الوصلة وتمريرها عبر وصلة مُشوَّهة في الاتجاهين"""
+    
+    def __init__(self, simulator: 'ROVSimulator', name: str, protected: int = 0,
+                 preserve_order: bool = True):
+        self.simulator = simulator
+        self.name = name
+        self.logger = ROVLogger(name)
+        self.is_open = True
+        self.streaming = True
+        # الجلسة التي تستلم التيليمتري نيابة عن هذا العميل (جلسة المجموعة في وضع multicast)
+        self.telemetry_session: SimulatorSession = self
+        # مخطط أسطر التيليمتري النصية (None = JSON)
+        self.line_schema: Optional[LineTelemetrySchema] = simulator.line_schema
+        
+        # مُرمِّز خاص بكل جلسة لأن التيليمتري التفاضلي يعتمد على ما استلمه هذا العميل
+        self.codec = BinaryMessageCodec(simulator.keyframe_interval, clock=simulator.vehicle_time)
+        
+        # النقل الكبير الوارد (قنوات 2-255) يُجمع ويُحسب فقط
+        self.bulk_reassembler = BulkReassembler(simulator.handle_bulk)
+        
+        self._write_lock = threading.Lock()
+        self.outgoing = ImpairedLink(self._write_wire, simulator.impairment, f'{name}Out',
+                                     protected, preserve_order)
+        self.incoming = ImpairedLink(self._receive, simulator.impairment, f'{name}In',
+                                     preserve_order=preserve_order)
+        self.outgoing.start()
+        self.incoming.start()
+    
+    def send_payload(self, payload: bytes, channel: int = CHANNEL_CONTROL):
+        """إرسال رسالة (JSON أو ثنائية) بتأطير الوصلة على قناة منطقية"""
+        if self.is_open:
+            self.outgoing.send(self._frame(payload, channel))
+    
+    def receive_wire(self, data: bytes):
+        """بيانات واردة من الوصلة (تمر عبر التشويه قبل المعالجة)"""
+        self.incoming.send(data)
+    
+    def close(self):
+        """إغلاق الجلسة"""
+        if not self.is_open:
+            return
+        self.is_open = False
+        self.outgoing.stop()
+        self.incoming.stop()
+        self._close()
+        self.logger.info("تم إغلاق الجلسة")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات الاتجاهين"""
+        return {'outgoing': self.outgoing.get_stats(), 'incoming': self.incoming.get_stats()}
+    
+    def poll(self, now: float):
+        """عمل دوري من حلقة المحاكاة (مثل تكافؤ FEC المتأخر)"""
+        pass
+    
+    def handle_baud(self, action: str, rate: int, count: int = 0, size: int = 0) -> bool:
+        """طلب تفاوض السرعة (المنفذ التسلسلي فقط)؛ False = رسالة غير معروفة"""
+        return False
+    
+    def _write_wire(self, data: bytes):
+        with self._write_lock:
+            self._write(data)
+    
+    def _receive(self, data: bytes):
+        """فك ترميز الرسائل الواردة وتمريرها للمحاكي"""
+        for message in self._decode(data):
+            self.simulator.handle_message(self, message)
+    
+    # ---- تنفذها الفئات الفرعية ----
+    
+    def _frame(self, payload: bytes, channel: int) -> bytes:
+        return payload
+        
+    def _decode(self, data: bytes) -> List[Any]:
+        return [_decode_message(self.codec, data)]
+    
+    def _write(self, data: bytes):
+        raise NotImplementedError
+    
+    def _close(self):
+        pass
+
+class SerialSession(SimulatorSession):
+    """منفذ تسلسلي وهمي (pseudo-terminal) بنفس بروتوكول SerialCommunication"""
+    
+    def __init__(self, simulator: 'ROVSimulator', binary: bool):
+        import termios
+        import tty
+        
+        self.binary = binary
+        self.master_fd, self.slave_fd = os.openpty()
+        tty.setraw(self.slave_fd)
+        # بدون عميل على المنفذ تُفقد البايتات كما في خط تسلسلي حقيقي بدلاً من تعطيل البث
+        os.set_blocking(self.master_fd, False)
+        self.dropped_bytes = 0
+        self.port = os.ttyname(self.slave_fd)
+        self._line_buffer = bytearray()
+        
+        # سرعة المركبة: بدون serial_baud تتبع سرعة المحطة حتى أول تفاوض. اختلاف سرعة
+        # المحطة (termios على المنفذ) عن سرعة المركبة يحوّل البايتات لضجيج في الاتجاهين،
+        # وفوق serial_max_baud يتلف كل بايت باحتمال serial_byte_error (كابل طويل)
+        self.baud_switch = BaudRateSwitch(simulator.serial_baud)
+        self._termios_speeds = {getattr(termios, f'B{rate}'): rate for rate in _TERMIOS_RATES
+                                if hasattr(termios, f'B{rate}')}
+        self._tcgetattr = termios.tcgetattr
+        self._noise_rng = random.Random(simulator.seed)
+        self.noise_bytes = 0
+        self.corrupted_bytes = 0
+        
+        # الوضع الثنائي: نفس تأطير PacketHandler مع ACK للحزم الموثوقة
+        self.packet_handler = PacketHandler()
+        
+        super().__init__(simulator, 'SimSerial')
+        # المحطة تطبق أسطر المخطط فقط على الوصلة التسلسلية النصية (لا JSON) كما تفعل المركبة
+        if not binary and self.line_schema is None:
+            self.line_schema = LineTelemetrySchema(DEFAULT_LINE_SCHEMA)
+        self.packet_handler.binary_codec = self.codec
+        self.packet_handler.bulk_reassembler = self.bulk_reassembler
+        self.packet_handler.set_packet_sender(lambda packet, command: self.outgoing.send(packet))
+        
+        self.thread = threading.Thread(target=self._read_loop, name='SimSerialReader', daemon=True)
+        self.thread.start()
+    
+    def _frame(self, payload: bytes, channel: int) -> bytes:
+        if self.binary:
+            return self.packet_handler.frame_payload(payload, channel)
+        return payload + b'\n'
+    
+    def _decode(self, data: bytes) -> List[Any]:
+        if self.binary:
+            return self.packet_handler.feed_data(data)
+        
+        self._line_buffer += data
+        end = self._line_buffer.rfind(b'\n')
+        if end < 0:
+            return []
+        text = self._line_buffer[:end].decode('utf-8', errors='replace')
+        del self._line_buffer[:end + 1]
+        return [line.strip() for line in text.split('\n') if line.strip()]
+    
+    def handle_baud(self, action: str, rate: int, count: int = 0, size: int = 0) -> bool:
+        switch = self.baud_switch
+        if action == ACTION_SET:
+            accepted = switch.request(rate)
+            self._send_baud_reply(ACTION_SET, accepted, rate)
+            if accepted:
+                # التبديل بعد خروج الموافقة بالسرعة القديمة (تأخير الوصلة المحاكى + هامش)
+                impairment = self.simulator.impairment
+                timer = threading.Timer(impairment.latency + impairment.jitter + 0.02, self._switch_baud,
+                                        (rate, switch.baud))
+                timer.daemon = True
+                timer.start()
+        elif action == ACTION_TEST:
+            for seq in range(min(count, 1024)):
+                self.send_payload(format_test_frame(seq, min(size, 1024), self.binary))
+        elif action == ACTION_CONFIRM:
+            if switch.confirm(rate):
+                self.logger.info(f"تم تثبيت السرعة {rate}")
+                self._send_baud_reply(ACTION_CONFIRM, True, rate)
+        else:
+            return False
+        return True
+    
+    def poll(self, now: float):
+        baud = self.baud_switch.baud
+        if self.baud_switch.poll():
+            self.logger.warning(f"العودة من السرعة {baud} إلى {self.baud_switch.baud or 'سرعة المحطة'}")
+    
+    def _switch_baud(self, rate: int, previous: Optional[int]):
+        self.baud_switch.switch(rate, previous)
+        self.logger.info(f"تبديل السرعة إلى {rate} بانتظار التأكيد")
+    
+    def _send_baud_reply(self, action: str, ok: bool, rate: int):
+        if self.binary:
+            self.send_payload(json.dumps({'type': BAUD_MESSAGE, 'action': action, 'ok': ok, 'rate': rate}).encode('utf-8'))
+        elif action == ACTION_CONFIRM:
+            self.send_payload(f"BAUD_CONFIRMED,{rate}".encode('utf-8'))
+        else:
+            self.send_payload(f"{'BAUD_OK' if ok else 'BAUD_NAK'},{rate}".encode('utf-8'))
+    
+    def _receive(self, data: bytes):
+        messages = self._decode(data)
+        # الرسائل السليمة تؤجل عودة المركبة للسرعة الآمنة
+        if any(_is_clean_message(message) for message in messages):
+            self.baud_switch.note_valid()
+        for message in messages:
+            self.simulator.handle_message(self, message)
+    
+    def _station_baud(self) -> Optional[int]:
+        """السرعة التي ضبطتها المحطة على المنفذ"""
+        try:
+            return self._termios_speeds.get(self._tcgetattr(self.slave_fd)[5])
+        except (OSError, ValueError):
+            return None
+    
+    def _line_noise(self, data: bytes) -> bytes:
+        """أثر السرعة على البايتات: ضجيج عند اختلاف السرعتين وتلف عشوائي فوق serial_max_baud"""
+        station = self._station_baud()
+        vehicle = self.baud_switch.baud
+        if vehicle is not None and station is not None and station != vehicle:
+            self.noise_bytes += len(data)
+            return self._noise_rng.randbytes(len(data))
+        
+        rate = vehicle or station
+        max_baud = self.simulator.serial_max_baud
+        error = self.simulator.serial_byte_error
+        if not max_baud or not rate or rate <= max_baud or error <= 0:
+            return data
+        
+        corrupted = None
+        position = -1
+        log_keep = math.log(1.0 - error) if error < 1.0 else -math.inf
+        while True:
+            # المسافة للبايت التالف التالي (توزيع هندسي)
+            position += 1 + int(math.log(1.0 - self._noise_rng.random()) / log_keep)
+            if position >= len(data):
+                break
+            if corrupted is None:
+                corrupted = bytearray(data)
+            corrupted[position] ^= 1 << self._noise_rng.randrange(8)
+            self.corrupted_bytes += 1
+        return bytes(corrupted) if corrupted is not None else data
+    
+    def _write(self, data: bytes):
+        data = self._line_noise(data)
+        view = memoryview(data)
+        while view:
+            try:
+                written = os.write(self.master_fd, view)
+            except BlockingIOError:
+                self.dropped_bytes += len(view)
+                return
+            view = view[written:]
+    
+    def _read_loop(self):
+        while self.is_open:
+            try:
+                readable, _, _ = select.select([self.master_fd], [], [], 0.5)
+                if not readable:
+                    continue
+                data = os.read(self.master_fd, 65536)
+            except BlockingIOError:
+                continue
+            except (OSError, ValueError):
+                # لا يوجد طرف مفتوح على المنفذ حالياً (EIO) - الانتظار
+                if not self.is_open:
+                    break
+                time.sleep(0.05)
+                continue
+            if data:
+                self.receive_wire(self._line_noise(data))
+    
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        stats['dropped_bytes'] = self.dropped_bytes
+        stats['baud'] = self.baud_switch.get_stats()
+        stats.update(station_baud=self._station_baud(), noise_bytes=self.noise_bytes,
+                     corrupted_bytes=self.corrupted_bytes)
+        return stats
+    
+    def _close(self):
+        for fd in (self.master_fd, self.slave_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+class TCPSession(SimulatorSession):
+    """عميل TCP برسائل ذات بادئة طولية (4 بايت big-endian) مثل NetworkCommunication"""
+    
+    def __init__(self, simulator: 'ROVSimulator', connection: socket.socket, address: Tuple[str, int]):
+        self.connection = connection
+        self.address = address
+        self.decoder = LengthPrefixedDecoder()
+        # بادئة الطول محمية من التلف: TCP لا يتلف البايتات لكن التطبيق قد يتلفها
+        super().__init__(simulator, f'SimTCP[{address[0]}:{address[1]}]', protected=4)
+        
+        self.thread = threading.Thread(target=self._read_loop, name='SimTCPReader', daemon=True)
+        self.thread.start()
+    
+    def _frame(self, payload: bytes, channel: int) -> bytes:
+        return pack_length(len(payload), channel).to_bytes(4, 'big') + payload
+    
+    def _write(self, data: bytes):
+        self.connection.sendall(data)
+    
+    def _read_loop(self):
+        try:
+            while self.is_open:
+                if self.decoder.recv_from(self.connection) == 0:
+                    break
+                for message in self.decoder.frames():
+                    if is_bulk_channel(self.decoder.channel):
+                        # البادئة لا تمر عبر التشويه فالنقل الكبير يُجمع مباشرة
+                        self.bulk_reassembler.feed(self.decoder.channel, message)
+                    else:
+                        self.receive_wire(bytes(message))
+        except OSError as e:
+            if self.is_open:
+                self.logger.warning(f"انقطع اتصال العميل: {e}")
+        finally:
+            self.simulator.remove_session(self)
+    
+    def _close(self):
+        try:
+            self.connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.connection.close()
+
+class UDPSession(SimulatorSession):
+    """عميل UDP: الأوامر تصل إلى المنفذ والرد يُرسل إلى منفذ العميل + 1"""
+    
+    def __init__(self, simulator: 'ROVSimulator', sock: socket.socket, reply_address: Tuple[str, int]):
+        self.sock = sock
+        self.reply_address = reply_address
+        self.last_seen = time.monotonic()
+        
+        # FEC: التكافؤ يُضاف قبل الوصلة المُشوَّهة فيتعرض للفقد مثل البيانات
+        self.fec_encoder: Optional[FecEncoder] = None
+        if simulator.fec_mode != FEC_OFF:
+            self.fec_encoder = FecEncoder(simulator.fec_mode, **simulator.fec_options)
+        self.fec_decoder = FecDecoder()
+        self._fec_lock = threading.Lock()
+        
+        # UDP قد يعيد ترتيب الرسائل مع التذبذب
+        super().__init__(simulator, f'SimUDP[{reply_address[0]}:{reply_address[1]}]', preserve_order=False)
+    
+    def send_payload(self, payload: bytes, channel: int = CHANNEL_CONTROL):
+        if self.fec_encoder is None:
+            super().send_payload(payload, channel)
+            return
+        if self.is_open:
+            with self._fec_lock:
+                datagrams = self.fec_encoder.encode(payload)
+            for datagram in datagrams:
+                self.outgoing.send(datagram)
+    
+    def poll(self, now: float):
+        if self.fec_encoder is None or not self.is_open:
+            return
+        with self._fec_lock:
+            datagrams = self.fec_encoder.flush(now)
+        for datagram in datagrams:
+            self.outgoing.send(datagram)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        stats = super().get_stats()
+        stats['fec_decoder'] = self.fec_decoder.get_stats()
+        if self.fec_encoder is not None:
+            stats['fec_encoder'] = self.fec_encoder.get_stats()
+        return stats
+    
+    def _decode(self, data: bytes) -> List[Any]:
+        messages = self.fec_decoder.feed(data)
+        if self.fec_encoder is not None:
+            self.fec_encoder.set_loss_rate(self.fec_decoder.loss_rate)
+        return [_decode_message(self.codec, message) for message in messages]
+    
+    def _write(self, data: bytes):
+        self.sock.sendto(data, self.reply_address)
+
+class MulticastSession(UDPSession):
+    """بث التيليمتري مرة واحدة لمجموعة multicast تنضم إليها أي عدد من المحطات"""
+    
+    def __init__(self, simulator: 'ROVSimulator', group: str, port: int, ttl: int = 1):
+        super().__init__(simulator, open_multicast_sender(ttl), (group, port))
+    
+    def _close(self):
+        self.sock.close()
+
+class ROVSimulator:
+    """محاكي مركبة ROV محلي يعرض منفذاً تسلسلياً وهمياً ومنافذ TCP/UDP
+    
+    يتكلم نفس بروتوكولات SerialCommunication و NetworkCommunication (نصي،
+    JSON، ثنائي، تيليمتري تفاضلي)، ويبث التيليمتري بمعدل حتى 1 kHz، ويحقن
+    تأخيراً وفقداً وتلفاً قابلاً للتكرار عبر بذرة عشوائية.
+    """
+    
+    def __init__(self, rate_hz: float = 50.0, binary_protocol: bool = False,
+                 delta_telemetry: bool = False, keyframe_interval: int = 50,
+                 impairment: Optional[LinkImpairment] = None, seed: Optional[int] = None,
+                 clock_offset: float = 0.0, clock_drift_ppm: float = 0.0, fec_mode: str = FEC_OFF,
+                 fec_group_size: int = 8, fec_max_parity: int = 4, fec_max_delay: float = 0.04,
+                 line_schema: Optional[str] = None, control_lease: Optional[float] = None,
+                 serial_baud: Optional[int] = None, serial_max_baud: Optional[int] = None,
+                 serial_byte_error: float = 0.002):
+        self.logger = ROVLogger('ROVSimulator')
+        self.seed = seed
+        self.rate_hz = min(max(rate_hz, 0.1), MAX_RATE_HZ)
+        self.binary_protocol = binary_protocol
+        self.delta_telemetry = delta_telemetry
+        self.keyframe_interval = keyframe_interval
+        self.impairment = impairment or LinkImpairment(seed=seed)
+        self.vehicle = SimulatedVehicle(seed=seed)
+        # ترميز مشترك للتيليمتري الكامل: نفس رقم التسلسل على كل الوصلات
+        # (لإزالة المكررات عند تجميع الوصلات)؛ التفاضلي يبقى لكل جلسة
+        self.codec = BinaryMessageCodec(keyframe_interval, clock=self.vehicle_time)
+        self._codec_lock = threading.Lock()
+        self._telemetry_seq = 0
+        # ساعة المركبة: time.time() مع فرق وانحراف اختياريين لاختبار مزامنة الساعة
+        self.clock_offset = clock_offset
+        self.clock_drift = clock_drift_ppm * 1e-6
+        self._clock_origin = time.monotonic()
+        # FEC على جلسات UDP (الوارد يُفك دائماً، والرسائل بدون علامة FEC تمر كما هي)
+        self.fec_mode = fec_mode
+        self.fec_options = {'group_size': fec_group_size, 'max_parity': fec_max_parity, 'max_delay': fec_max_delay}
+        # تيليمتري نصي بمخطط أسطر (مثل TLM,depth,roll,...) بدلاً من JSON في الصيغة النصية
+        # على كل الجلسات (المنفذ التسلسلي النصي يرسل المخطط الافتراضي دائماً)
+        self.line_schema = LineTelemetrySchema(line_schema) if line_schema else None
+        # عقد التحكم: طلبات العقد تُحكَّم دائماً، وأوامر المحركات من غير صاحبه تُرفض فقط
+        # عند control_lease (المدة الافتراضية)؛ انتهاء العقد يعيد المحركات للوضع المحايد
+        self.control_lease = ControlLease(control_lease or 2.0)
+        self.enforce_lease = control_lease is not None
+        # سرعة المنفذ التسلسلي الآمنة للمركبة (None = تتبع المحطة) وحد الكابل لتفاوض السرعة
+        self.serial_baud = serial_baud
+        self.serial_max_baud = serial_max_baud
+        self.serial_byte_error = serial_byte_error
+        
+        self._sessions: List[SimulatorSession] = []
+        self._sessions_lock = threading.Lock()
+        self._udp_sessions: Dict[Tuple[str, int], UDPSession] = {}
+        self._sockets: List[socket.socket] = []
+        self._threads: List[threading.Thread] = []
+        self.is_running = False
+        self._stopped = False
+        self.serial_session: Optional[SerialSession] = None
+        
+        # إحصائيات
+        self.stats = {
+            'ticks': 0,
+            'late_ticks': 0,
+            'telemetry_sent': 0,
+            'messages_received': 0,
+            'motor_commands': 0,
+            'pings': 0,
+            'unknown_messages': 0,
+            'bulk_transfers': 0,
+            'bulk_bytes': 0,
+            'actual_rate_hz': 0.0
+        }
+    
+    # ---- نقاط الاتصال ----
+    
+    def start_serial(self) -> str:
+        """فتح منفذ تسلسلي وهمي وإرجاع مساره (مثل /dev/pts/5)"""
+        self.serial_session = SerialSession(self, self.binary_protocol)
+        self.add_session(self.serial_session)
+        self.logger.info(f"المنفذ التسلسلي الوهمي: {self.serial_session.port}")
+        return self.serial_session.port
+    
+    def start_tcp(self, port: int = 8080, host: str = '0.0.0.0') -> int:
+        """بدء خادم TCP وإرجاع رقم المنفذ الفعلي (0 لمنفذ تلقائي)"""
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind((host, port))
+        server.listen(8)
+        server.settimeout(0.5)
+        self._sockets.append(server)
+        self._start_thread(self._accept_loop, 'SimTCPAccept', server)
+        
+        actual_port = server.getsockname()[1]
+        self.logger.info(f"خادم TCP على المنفذ {actual_port}")
+        return actual_port
+    
+    def start_udp(self, port: int = 8080, host: str = '0.0.0.0', reply_port: Optional[int] = None,
+                  multicast_group: Optional[str] = None, multicast_ttl: int = 1) -> int:
+        """بدء مستقبل UDP؛ الردود تُرسل إلى reply_port (افتراضياً port + 1 كما في NetworkCommunication)
+        
+        مع multicast_group يُبث التيليمتري مرة واحدة للمجموعة على reply_port، وكل
+        محطة جلسة مستقلة بعنوان مصدرها تُرسل إليه الردود المباشرة (pong، العقد).
+        """
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind((host, port))
+        sock.settimeout(0.5)
+        self._sockets.append(sock)
+        
+        actual_port = sock.getsockname()[1]
+        reply_port = reply_port if reply_port is not None else actual_port + 1
+        multicast_session = None
+        if multicast_group:
+            multicast_session = MulticastSession(self, multicast_group, reply_port, multicast_ttl)
+            self.add_session(multicast_session)
+        self._start_thread(self._udp_loop, 'SimUDP', sock, reply_port, multicast_session)
+        if multicast_session:
+            self.logger.info(f"مستقبل UDP على المنفذ {actual_port} (التيليمتري إلى {multicast_group}:{reply_port})")
+        else:
+            self.logger.info(f"مستقبل UDP على المنفذ {actual_port} (الرد إلى {reply_port})")
+        return actual_port
+    
+    def start(self):
+        """بدء حلقة المحاكاة وبث التيليمتري"""
+        if not self.is_running:
+            self.is_running = True
+            self._start_thread(self._simulation_loop, 'SimLoop')
+    
+    def stop(self):
+        """إيقاف المحاكي وإغلاق كل الجلسات"""
+        self.is_running = False
+        self._stopped = True
+        for thread in self._threads:
+            if thread.is_alive():
+                thread.join(timeout=2.0)
+        self._threads = []
+        
+        with self._sessions_lock:
+            sessions = list(self._sessions)
+            self._sessions.clear()
+            self._udp_sessions.clear()
+        for session in sessions:
+            session.close()
+        
+        for sock in self._sockets:
+            sock.close()
+        self._sockets = []
+        self.logger.info("تم إيقاف المحاكي")
+    
+    # ---- الجلسات ----
+    
+    def add_session(self, session: SimulatorSession):
+        with self._sessions_lock:
+            self._sessions.append(session)
+    
+    def remove_session(self, session: SimulatorSession):
+        with self._sessions_lock:
+            if session in self._sessions:
+                self._sessions.remove(session)
+        self.control_lease.drop(session)
+        session.close()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """إحصائيات المحاكي والجلسات"""
+        stats = dict(self.stats)
+        with self._sessions_lock:
+            stats['sessions'] = {session.name: session.get_stats() for session in self._sessions}
+        stats['vehicle_motor_commands'] = self.vehicle.motor_commands
+        stats['control_lease'] = self.control_lease.get_stats()
+        return stats
+    
+    def handle_bulk(self, channel: int, data: bytes):
+        """نقل كبير مكتمل من السطح (ملف إعدادات، تحديث)"""
+        self.stats['bulk_transfers'] += 1
+        self.stats['bulk_bytes'] += len(data)
+        self.logger.info(f"تم استلام نقل كبير على القناة {channel}: {len(data)} بايت")
+    
+    def vehicle_time(self) -> float:
+        """ساعة المركبة المستخدمة في أختام التيليمتري وردود ping"""
+        return time.time() + self.clock_offset + self.clock_drift * (time.monotonic() - self._clock_origin)
+    
+    # ---- معالجة الرسائل ----
+    
+    def handle_message(self, session: SimulatorSession, message: Any):
+        """تنفيذ أمر وارد من أي جلسة"""
+        if message is None:
+            return
+        received_at = self.vehicle_time()
+        self.stats['messages_received'] += 1
+        
+        if isinstance(message, str):
+            self._handle_text_command(session, message, received_at)
+            return
+        
+        if not isinstance(message, dict):
+            self.stats['unknown_messages'] += 1
+            return
+        
+        # رسائل JSON/ثنائية ('type') أو حزم PacketHandler ('command')
+        kind = str(message.get('type') or message.get('command') or '').lower()
+        data = message.get('data') if isinstance(message.get('data'), dict) else message
+        
+        if kind == 'motor_command':
+            if self.enforce_lease and not self.control_lease.allows(session):
+                return
+            self.stats['motor_commands'] += 1
+            self.vehicle.apply_motor_command(data.get('motors', {}))
+        elif kind == LEASE_MESSAGE:
+            reply = self.control_lease.handle_request(session, message)
+            session.send_payload(json.dumps(reply).encode('utf-8'))
+        elif kind == 'emergency_stop':
+            self.vehicle.emergency_stop()
+            self.logger.warning(f"إيقاف طارئ من {session.name}")
+        elif kind == 'telemetry_request':
+            self._send_telemetry(session, self.vehicle.snapshot(), None)
+        elif kind == 'keyframe_request':
+            session.telemetry_session.codec.telemetry_encoder.request_keyframe()
+        elif kind == 'ping':
+            self.stats['pings'] += 1
+            pong = {
+                'type': 'pong',
+                'timestamp': message.get('timestamp'),
+                'sim_time': time.monotonic(),
+                'rx_time': received_at
+            }
+            if 'seq' in message:
+                pong['seq'] = message['seq']
+            pong['tx_time'] = self.vehicle_time()
+            session.send_payload(json.dumps(pong).encode('utf-8'))
+        elif kind == BAUD_MESSAGE:
+            if not session.handle_baud(str(message.get('action')), _int_field(message, 'rate'),
+                                       _int_field(message, 'count'), _int_field(message, 'size')):
+                self.stats['unknown_messages'] += 1
+        elif kind in ('ack', 'heartbeat', 'pong'):
+            pass
+        else:
+            self.stats['unknown_messages'] += 1
+    
+    def _handle_text_command(self, session: SimulatorSession, line: str, received_at: float):
+        """أوامر SerialCommunication النصية"""
+        command, _, arguments = line.partition(',')
+        command = command.strip().upper()
+        
+        if command == 'MOTOR':
+            try:
+                values = [int(float(value)) for value in arguments.split(',')]
+            except ValueError:
+                self.stats['unknown_messages'] += 1
+                return
+            if self.enforce_lease and not self.control_lease.allows(session):
+                return
+            self.stats['motor_commands'] += 1
+            self.vehicle.apply_motor_command(dict(zip(MOTOR_ORDER, values)))
+        elif command == 'GET_TELEMETRY':
+            self._send_telemetry(session, self.vehicle.snapshot(), None)
+        elif command == 'GET_KEYFRAME':
+            session.telemetry_session.codec.telemetry_encoder.request_keyframe()
+        elif command == 'EMERGENCY_STOP':
+            self.vehicle.emergency_stop()
+            self.logger.warning(f"إيقاف طارئ من {session.name}")
+        elif command == 'PING':
+            self.stats['pings'] += 1
+            seq = arguments.strip()
+            if seq:
+                # PONG,<seq>,<زمن الاستقبال>,<زمن الإرسال> بساعة المركبة
+                session.send_payload(f"PONG,{seq},{received_at:.6f},{self.vehicle_time():.6f}".encode('utf-8'))
+            else:
+                session.send_payload(b'PONG')
+        elif command in _TEXT_BAUD_ACTIONS:
+            try:
+                values = [int(value) for value in arguments.split(',')]
+            except ValueError:
+                self.stats['unknown_messages'] += 1
+                return
+            if command == 'BAUD_TEST':
+                handled = len(values) == 2 and session.handle_baud(ACTION_TEST, 0, values[0], values[1])
+            else:
+                handled = len(values) == 1 and session.handle_baud(_TEXT_BAUD_ACTIONS[command], values[0])
+            if not handled:
+                self.stats['unknown_messages'] += 1
+        else:
+            self.stats['unknown_messages'] += 1
+    
+    # ---- التيليمتري ----
+    
+    def _send_telemetry(self, session: SimulatorSession, state: Dict[str, Any],
+                        shared_payload: Optional[bytes]) -> Optional[bytes]:
+        """إرسال التيليمتري بصيغة الجلسة؛ يُرجع الرسالة المشتركة لإعادة استخدامها في نفس الدورة"""
+        if self.binary_protocol and self.delta_telemetry:
+            payload = session.codec.encode_telemetry_delta(state)
+        elif not self.binary_protocol and session.line_schema is not None:
+            payload = session.line_schema.format(state).encode('utf-8')
+        else:
+            if shared_payload is None:
+                shared_payload = self._encode_shared_telemetry(state)
+            payload = shared_payload
+        
+        session.send_payload(payload, CHANNEL_TELEMETRY)
+        self.stats['telemetry_sent'] += 1
+        return shared_payload
+    
+    def _encode_shared_telemetry(self, state: Dict[str, Any]) -> bytes:
+        """ترميز إطار تيليمتري واحد برقم تسلسل مشترك بين كل الجلسات"""
+        with self._codec_lock:
+            if self.binary_protocol:
+                return self.codec.encode_telemetry(state)
+            self._telemetry_seq = (self._telemetry_seq + 1) & 0xFFFF
+            message = dict(state)
+            message['type'] = 'telemetry'
+            message['seq'] = self._telemetry_seq
+            message['timestamp'] = self.vehicle_time()
+        return json.dumps(message).encode('utf-8')
+    
+    def _simulation_loop(self):
+        """تقدم النموذج وبث التيليمتري بمعدل ثابت مع تعويض التأخر"""
+        period = 1.0 / self.rate_hz
+        next_tick = time.monotonic()
+        last_tick = next_tick
+        window_start = next_tick
+        window_ticks = 0
+        
+        while self.is_running:
+            now = time.monotonic()
+            if now < next_tick:
+                time.sleep(next_tick - now)
+                now = time.monotonic()
+            
+            self.vehicle.step(now - last_tick)
+            last_tick = now
+            
+            expired = self.control_lease.poll()
+            if expired:
+                # المحطة المتحكمة اختفت دون تحرير العقد: إيقاف الدفع
+                self.vehicle.apply_motor_command({motor: NEUTRAL_PWM for motor in MOTOR_ORDER})
+                self.logger.warning(f"انتهى عقد التحكم للمحطة {expired} - المحركات على الوضع المحايد")
+            
+            state = self.vehicle.snapshot()
+            shared_payload = None
+            with self._sessions_lock:
+                sessions = list(self._sessions)
+            for session in sessions:
+                if session.streaming:
+                    shared_payload = self._send_telemetry(session, state, shared_payload)
+                session.poll(now)
+            
+            self.stats['ticks'] += 1
+            window_ticks += 1
+            if now - window_start >= 1.0:
+                self.stats['actual_rate_hz'] = window_ticks / (now - window_start)
+                window_start = now
+                window_ticks = 0
+            
+            next_tick += period
+            if now - next_tick > period * 10:
+                # تأخر كبير (النظام مشغول): عدم محاولة تعويض كل الدورات الفائتة
+                self.stats['late_ticks'] += 1
+                next_tick = now + period
+    
+    # ---- الخيوط ----
+    
+    def _start_thread(self, target, name: str, *args):
+        thread = threading.Thread(target=target, args=args, name=name, daemon=True)
+        self._threads.append(thread)
+        thread.start()
+    
+    def _accept_loop(self, server: socket.socket):
+        while not self._stopped:
+            try:
+                connection, address = server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection.settimeout(None)
+            self.logger.info(f"عميل TCP جديد: {address[0]}:{address[1]}")
+            self.add_session(TCPSession(self, connection, address))
+    
+    def _udp_loop(self, sock: socket.socket, reply_port: int, multicast_session: Optional[MulticastSession]):
+        while not self._stopped:
+            try:
+                data, address = sock.recvfrom(65536)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            
+            # multicast: عدة محطات قد تشترك في نفس الجهاز فالجلسة بعنوان المصدر كاملاً
+            key = address[:2] if multicast_session else (address[0], reply_port)
+            session = self._udp_sessions.get(key)
+            if session is None:
+                session = UDPSession(self, sock, key)
+                if multicast_session:
+                    session.streaming = False
+                    session.telemetry_session = multicast_session
+                self._udp_sessions[key] = session
+                self.add_session(session)
+                self.logger.info(f"عميل UDP جديد: {address[0]} (الرد إلى {key[1]})")
+            session.last_seen = time.monotonic()
+            session.receive_wire(data)
+
+def _int_field(message: Dict[str, Any], key: str) -> int:
+    try:
+        return int(message.get(key, 0))
+    except (TypeError, ValueError):
+        return 0
+
+def _is_clean_message(message: Any) -> bool:
+    """رسالة سليمة (لا ضجيج سرعة خاطئة): قاموس، أو سطر نصي مطبوع دون بايتات غير صالحة"""
+    if isinstance(message, str):
+        return message.isprintable() and '\ufffd' not in message
+    return message is not None
+
+def _decode_message(codec: BinaryMessageCodec, message: bytes) -> Any:
+    """فك ترميز رسالة كاملة (ثنائية أو JSON أو نص) كما تفعل وسائل الاتصال"""
+    if codec.is_binary(message):
+        return codec.decode(message)
+    text = message.decode('utf-8', errors='replace')
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return text.strip()
@@ -0,0 +1,129 @@
+import math
+import random
+import threading
+from typing import Dict, Any, Optional
+
+from communication.binary_protocol import MOTOR_ORDER
+
+NEUTRAL_PWM = 1500
+PWM_RANGE = 500  # 1000 - 2000
+
+class SimulatedVehicle:
+    """نموذج حركي مبسط لمركبة ROV يحوّل أوامر المحركات إلى حالة بنفس بنية rov_state
+    
+    يعكس خلط المحركات في MotorController (أمامي، جانبي، عمودي، دوران) مع
+    استجابة من الدرجة الأولى للسرعات، ويولّد قراءات حساسات متسقة مع العمق.
+    """
+    
+    def __init__(self, max_speed: float = 1.0, max_vertical_speed: float = 0.5,
+                 max_yaw_rate: float = 45.0, time_constant: float = 0.5, seed: Optional[int] = None):
+        self.max_speed = max_speed                    # م/ث
+        self.max_vertical_speed = max_vertical_speed  # م/ث
+        self.max_yaw_rate = max_yaw_rate              # درجة/ث
+        self.time_constant = time_constant            # ثابت زمن الاستجابة
+        self.rng = random.Random(seed)
+        
+        self._lock = threading.Lock()
+        self.motors = {motor: NEUTRAL_PWM for motor in MOTOR_ORDER}
+        self.emergency = False
+        self.elapsed = 0.0
+        self.motor_commands = 0
+        
+        self.state: Dict[str, Any] = {
+            'position': {'x': 0.0, 'y': 0.0, 'z': 0.0},
+            'orientation': {'roll': 0.0, 'pitch': 0.0, 'yaw': 0.0},
+            'velocity': {'x': 0.0, 'y': 0.0, 'z': 0.0},
+            'sensors': {'depth': 0.0, 'temperature': 18.0, 'pressure': 1013.25},
+            'battery': 100,
+            'status': 'connected'
+        }
+        self._yaw_rate = 0.0
+        self._battery_charge = 100.0
+    
+    def apply_motor_command(self, motors: Dict[str, Any]):
+        """تطبيق أمر محركات (قيم PWM)"""
+        with self._lock:
+            if self.emergency:
+                return
+            for motor in MOTOR_ORDER:
+                if motor in motors:
+                    self.motors[motor] = int(motors[motor])
+            self.motor_commands += 1
+    
+    def emergency_stop(self):
+        """إيقاف طارئ: كل المحركات على الوضع المحايد"""
+        with self._lock:
+            self.emergency = True
+            self.motors = {motor: NEUTRAL_PWM for motor in MOTOR_ORDER}
+            self.state['status'] = 'emergency'
+    
+    def reset_emergency(self):
+        """إلغاء حالة الإيقاف الطارئ"""
+        with self._lock:
+            self.emergency = False
+            self.state['status'] = 'connected'
+    
+    def step(self, dt: float):
+        """تقدم المحاكاة بمقدار dt ثانية"""
+        with self._lock:
+            thrust = {motor: (pwm - NEUTRAL_PWM) / PWM_RANGE for motor, pwm in self.motors.items()}
+            
+            # عكس خلط المحركات الأفقية في MotorController
+            fl, fr = thrust['front_left'], thrust['front_right']
+            bl, br = thrust['back_left'], thrust['back_right']
+            forward = (fl + fr + bl + br) / 4
+            strafe = (-fl + fr + bl - br) / 4
+            yaw_cmd = (fl - fr + bl - br) / 4
+            vertical = (thrust['vertical_1'] + thrust['vertical_2']) / 2
+            
+            state = self.state
+            position = state['position']
+            orientation = state['orientation']
+            velocity = state['velocity']
+            sensors = state['sensors']
+            
+            # استجابة من الدرجة الأولى للسرعات في إطار المركبة
+            alpha = min(1.0, dt / self.time_constant)
+            heading = math.radians(orientation['yaw'])
+            target_vx = (forward * math.cos(heading) - strafe * math.sin(heading)) * self.max_speed
+            target_vy = (forward * math.sin(heading) + strafe * math.cos(heading)) * self.max_speed
+            target_vz = vertical * self.max_vertical_speed
+            
+            velocity['x'] += (target_vx - velocity['x']) * alpha
+            velocity['y'] += (target_vy - velocity['y']) * alpha
+            velocity['z'] += (target_vz - velocity['z']) * alpha
+            self._yaw_rate += (yaw_cmd * self.max_yaw_rate - self._yaw_rate) * alpha
+            
+            position['x'] += velocity['x'] * dt
+            position['y'] += velocity['y'] * dt
+            # z سالب تحت الماء؛ لا يمكن الصعود فوق السطح
+            position['z'] = min(0.0, position['z'] + velocity['z'] * dt)
+            
+            self.elapsed += dt
+            orientation['yaw'] = (orientation['yaw'] + self._yaw_rate * dt) % 360
+            # تمايل خفيف بسبب الأمواج والتسارع
+            orientation['roll'] = 2.0 * math.sin(self.elapsed * 0.9) + strafe * 5.0
+            orientation['pitch'] = 1.0 * math.sin(self.elapsed * 0.6) - forward * 5.0
+            
+            depth = -position['z']
+            sensors['depth'] = depth + self.rng.gauss(0, 0.005)
+            sensors['pressure'] = 1013.25 + depth * 100.52 + self.rng.gauss(0, 0.05)
+            sensors['temperature'] = 18.0 - depth * 0.05 + self.rng.gauss(0, 0.01)
+            
+            # استهلاك البطارية يتناسب مع الدفع
+            load = sum(abs(value) for value in thrust.values()) / len(thrust)
+            self._battery_charge = max(0.0, self._battery_charge - dt * (0.002 + load * 0.02))
+            state['battery'] = max(0, int(self._battery_charge))
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """نسخة من الحالة الحالية للإرسال"""
+        with self._lock:
+            state = self.state
+            return {
+                'position': dict(state['position']),
+                'orientation': dict(state['orientation']),
+                'velocity': dict(state['velocity']),
+                'sensors': dict(state['sensors']),
+                'battery': state['battery'],
+                'status': state['status']
+            }
@@ -1,7 +1,7 @@
 import configparser
 import os
 import yaml
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 class Config:
     """فئة إدارة إعدادات المشروع"""
@@ -22,7 +22,45 @@ class Config:
                 'timeout': '5',
                 'use_network': 'False',
                 'network_ip': '192.168.1.100',
-                'network_port': '8080'
+                'network_port': '8080',
+                'binary_protocol': 'False',
+                'serial_read_mode': 'bulk',
+                'network_protocol': 'TCP',
+                'transport_backend': 'threaded',
+                'link_bonding': 'False',
+                'bonding_mode': 'best',
+                'bonding_probe_interval': '0.1',
+                'ping_interval': '1.0',
+                'ping_timeout': '2.0',
+                'auto_reconnect': 'True',
+                'reconnect_initial_delay': '0.5',
+                'reconnect_max_delay': '30',
+                'probe_baud_rates': '115200,57600,38400,19200,9600',
+                'probe_timeout': '0.3',
+                'probe_ports': '',
+                'port_cache_file': 'port_cache.yaml',
+                'bulk_chunk_ms': '10',
+                'fec_mode': 'off',
+                'fec_group_size': '8',
+                'fec_max_parity': '4',
+                'fec_max_delay_ms': '40',
+                'mavlink': 'False',
+                'mavlink_udp_port': '14550',
+                'mavlink_target_system': '1',
+                'mavlink_control': 'manual_control',
+                'mavlink_stream_rate': '10',
+                'line_telemetry_schema': 'TLM,depth,roll,pitch,yaw,temp,pressure,battery',
+                'multicast_group': '',
+                'multicast_interface': '0.0.0.0',
+                'control_lease': 'off',
+                'control_station': '',
+                'control_lease_duration': '2.0',
+                'capture_file': '',
+                'capture_max_mb': '512',
+                'negotiate_baud_rates': '',
+                'baud_cache_file': 'baud_cache.yaml',
+                'baud_max_error_rate': '0.01',
+                'baud_fallback_error_rate': '0.05'
             },
             'GUI': {
                 'window_width': '1200',
@@ -43,13 +81,29 @@ class Config:
                 'imu_enabled': 'True',
                 'pressure_enabled': 'True',
                 'temperature_enabled': 'True',
-                'data_logging': 'True'
+                'data_logging': 'True',
+                'bus_capacity': '256',
+                'shared_memory': 'False',
+                'shared_memory_name': 'rov_telemetry',
+                'shared_imu_samples': '1024'
             },
             'SAFETY': {
                 'emergency_stop': 'True',
                 'max_depth': '50',
                 'auto_surface': 'True',
                 'battery_warning': '20'
+            },
+            'VEHICLES': {
+                'names': ''
+            },
+            'WEBSOCKET': {
+                'enabled': 'False',
+                'host': '0.0.0.0',
+                'port': '8765',
+                'max_rate': '30',
+                'default_rate': '5',
+                'max_clients': '100',
+                'send_timeout': '5'
             }
         }
     
@@ -118,3 +172,37 @@ class Config:
             return value in ['true', '1', 'yes', 'on']
         except:
             return default
+    
+    def get_vehicle_names(self) -> List[str]:
+        """أسماء المركبات من [VEHICLES] names (فارغة = مركبة واحدة بالإعدادات المشتركة)"""
+        names = self.get('VEHICLES', 'names', '') or ''
+        return [name.strip() for name in names.split(',') if name.strip()]
+
+class VehicleConfig(Config):
+    """إعدادات مركبة واحدة ضمن عملية تدير عدة مركبات
+    
+    القيمة تُقرأ من القسم [<المركبة>:<القسم>] إن وُجدت ثم من القسم المشترك،
+    مثل [rov2:COMMUNICATION] network_port = 8081. overrides تفرض قيماً على كل
+    المركبات (مثل وسيلة الاتصال المشتركة). الكتابة تذهب للإعدادات المشتركة.
+    """
+    
+    def __init__(self, base: Config, vehicle: str, overrides: Optional[Dict[str, Dict[str, str]]] = None):
+        self.base = base
+        self.vehicle = vehicle
+        self.overrides = overrides or {}
+        self.config_file = base.config_file
+        self.config = base.config
+        self.settings = base.settings
+    
+    def get(self, section: str, key: str, default=None):
+        """الحصول على قيمة إعداد للمركبة"""
+        if key in self.overrides.get(section, {}):
+            return self.overrides[section][key]
+        value = self.base.get(f"{self.vehicle}:{section}", key)
+        if value is not None:
+            return value
+        return self.base.get(section, key, default)
+    
+    def set(self, section: str, key: str, value: str):
+        """تعديل قيمة إعداد مشترك"""
+        self.base.set(section, key, value)
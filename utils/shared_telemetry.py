@@ -0,0 +1,365 @@
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Set
+
+import numpy as np
+
+from utils.logger import ROVLogger
+from utils.telemetry_bus import TelemetryBus, TOPIC_TELEMETRY, TOPIC_IMU
+
+# تعريف الذاكرة المشتركة (يُتحقق منه عند الربط)
+SHARED_MAGIC = 0x524F5654  # 'ROVT'
+SHARED_VERSION = 1
+MAX_MOTORS = 8
+
+# كل كتلة محمية بـ seqlock: seq فردي أثناء الكتابة وزوجي بعدها
+STATE_DTYPE = np.dtype([
+    ('seq', '<u8'),
+    ('timestamp', '<f8'),
+    ('position', '<f8', (3,)),      # x, y, z
+    ('orientation', '<f8', (3,)),   # roll, pitch, yaw
+    ('velocity', '<f8', (3,)),
+    ('depth', '<f8'),
+    ('temperature', '<f8'),
+    ('pressure', '<f8'),
+    ('battery', '<f8'),
+    ('status', 'S16')
+], align=True)
+
+MOTORS_DTYPE = np.dtype([
+    ('seq', '<u8'),
+    ('timestamp', '<f8'),
+    ('pwm', '<i4', (MAX_MOTORS,)),
+    ('emergency_stop', 'u1')
+], align=True)
+
+IMU_SAMPLE_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('orientation', '<f8', (3,)),
+    ('acceleration', '<f8', (3,)),  # NaN إذا لم ترسلها المركبة
+    ('gyroscope', '<f8', (3,))
+], align=True)
+
+HEADER_DTYPE = np.dtype([
+    ('magic', '<u4'),
+    ('version', '<u4'),
+    ('imu_capacity', '<u4'),
+    ('motor_count', '<u4'),
+    ('motor_names', 'S16', (MAX_MOTORS,))
+], align=True)
+
+def shared_layout(imu_capacity: int) -> np.dtype:
+    """تخطيط المقطع: الترويسة، الحالة، المحركات، ثم حلقة عينات IMU"""
+    return np.dtype([
+        ('header', HEADER_DTYPE),
+        ('state', STATE_DTYPE),
+        ('motors', MOTORS_DTYPE),
+        ('imu_head', '<u8'),  # عدد العينات المكتوبة (العينة التالية في imu_head % imu_capacity)
+        ('imu', IMU_SAMPLE_DTYPE, (imu_capacity,))
+    ], align=True)
+
+# الكاتب يستخدم struct.pack_into مباشرة على الإزاحات (أسرع بكثير من إسناد حقول NumPy)
+_SEQ = struct.Struct('<Q')
+_STATE_BODY = struct.Struct('<14d16s')       # timestamp ثم position حتى status
+_MOTORS_BODY = struct.Struct(f'<d{MAX_MOTORS}i')
+_EMERGENCY = struct.Struct('<B')
+_IMU_SAMPLE = struct.Struct('<10d')
+
+assert _STATE_BODY.size == STATE_DTYPE.itemsize - 8
+assert _IMU_SAMPLE.size == IMU_SAMPLE_DTYPE.itemsize
+
+# المقاطع التي أنشأها كاتب في هذه العملية (resource_tracker يتتبعها للكاتب)
+_OWNED_SEGMENTS: Set[str] = set()
+
+def _xyz(values: Dict[str, Any], keys=('x', 'y', 'z')) -> List[float]:
+    return [float(values.get(key, np.nan)) for key in keys]
+
+class SharedTelemetryPublisher:
+    """نشر آخر حالة ROV وعينات IMU ومخرجات المحركات في ذاكرة مشتركة
+    
+    أدوات التحليل ولوحة الويب وعمليات التحكم الأخرى تقرأ المقطع مباشرة
+    (SharedTelemetryReader) دون المرور بعملية الواجهة. الكاتب لا ينتظر القراء
+    أبداً: كل كتلة محمية بـ seqlock والقارئ هو من يعيد المحاولة.
+    الحالة و IMU تُكتب من خيط مستهلك على ناقل التيليمتري، والمحركات عند كل إرسال.
+    """
+    
+    def __init__(self, bus: TelemetryBus, name: str = 'rov_telemetry',
+                 motor_names: Optional[List[str]] = None, imu_capacity: int = 1024):
+        self.logger = ROVLogger('SharedTelemetry')
+        self.bus = bus
+        self.name = name
+        self.motor_names = list(motor_names or [])[:MAX_MOTORS]
+        self._motor_index = {motor: index for index, motor in enumerate(self.motor_names)}
+        self.imu_capacity = imu_capacity
+        
+        layout = shared_layout(imu_capacity)
+        self.shm = self._create_segment(name, layout.itemsize)
+        _OWNED_SEGMENTS.add(self.shm._name)
+        self._view = np.ndarray((), dtype=layout, buffer=self.shm.buf)
+        self._view[...] = np.zeros((), dtype=layout)
+        
+        header = self._view['header']
+        header['magic'] = SHARED_MAGIC
+        header['version'] = SHARED_VERSION
+        header['imu_capacity'] = imu_capacity
+        header['motor_count'] = len(self.motor_names)
+        for index, motor in enumerate(self.motor_names):
+            header['motor_names'][index] = motor.encode('utf-8')[:16]
+        
+        del header
+        
+        # إزاحات الكتل داخل المقطع
+        self._buf = self.shm.buf
+        self._state_offset = layout.fields['state'][1]
+        self._motors_offset = layout.fields['motors'][1]
+        self._emergency_offset = self._motors_offset + MOTORS_DTYPE.fields['emergency_stop'][1]
+        self._imu_head_offset = layout.fields['imu_head'][1]
+        self._imu_offset = layout.fields['imu'][1]
+        
+        self._state_seq = 0
+        self._motors_seq = 0
+        self._imu_head = 0
+        self._pwm = [0] * MAX_MOTORS
+        
+        # كاتب واحد لكل كتلة (الإيقاف الطارئ قد يُرسل من خيط آخر غير حلقة التحكم)
+        self._motors_lock = threading.Lock()
+        
+        self._telemetry_subscription = bus.subscribe(TOPIC_TELEMETRY, 'shared_memory')
+        self._imu_subscription = bus.subscribe(TOPIC_IMU, 'shared_memory')
+        self.thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        
+        # إحصائيات
+        self.stats = {
+            'state_writes': 0,
+            'motor_writes': 0,
+            'imu_samples': 0
+        }
+        
+        self.logger.info(f"تم إنشاء مقطع الذاكرة المشتركة {name} ({layout.itemsize} بايت)")
+    
+    def start(self, state_source: Callable[[], Dict[str, Any]]):
+        """بدء خيط النشر؛ state_source تُرجع rov_state الحالية"""
+        if self.thread and self.thread.is_alive():
+            return
+        self._state_source = state_source
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._publish_loop, name='SharedTelemetry', daemon=True)
+        self.thread.start()
+    
+    def close(self):
+        """إيقاف النشر وحذف المقطع"""
+        self._stop_event.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=1)
+        self._telemetry_subscription.close()
+        self._imu_subscription.close()
+        
+        # المصفوفات تشير لذاكرة المقطع ويجب تحريرها قبل إغلاقه
+        self._view = self._buf = None
+        _OWNED_SEGMENTS.discard(self.shm._name)
+        try:
+            self.shm.close()
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+    
+    def write_state(self, state: Dict[str, Any]):
+        """كتابة آخر حالة ROV"""
+        position = state.get('position', {})
+        sensors = state.get('sensors', {})
+        offset = self._state_offset
+        
+        self._state_seq += 1
+        _SEQ.pack_into(self._buf, offset, self._state_seq)
+        _STATE_BODY.pack_into(
+            self._buf, offset + 8, time.time(),
+            *_xyz(position),
+            *_xyz(state.get('orientation', {}), ('roll', 'pitch', 'yaw')),
+            *_xyz(state.get('velocity', {})),
+            float(sensors.get('depth', abs(position.get('z', 0.0)))),
+            float(sensors.get('temperature', np.nan)),
+            float(sensors.get('pressure', np.nan)),
+            float(state.get('battery', np.nan)),
+            str(state.get('status', '')).encode('utf-8')[:16]
+        )
+        self._state_seq += 1
+        _SEQ.pack_into(self._buf, offset, self._state_seq)
+        self.stats['state_writes'] += 1
+    
+    def write_motors(self, motors: Dict[str, int], emergency_stop: bool = False):
+        """كتابة مخرجات المحركات (PWM) بترتيب motor_names"""
+        with self._motors_lock:
+            pwm = self._pwm
+            for motor, value in motors.items():
+                index = self._motor_index.get(motor)
+                if index is not None:
+                    pwm[index] = int(value)
+            
+            offset = self._motors_offset
+            self._motors_seq += 1
+            _SEQ.pack_into(self._buf, offset, self._motors_seq)
+            _MOTORS_BODY.pack_into(self._buf, offset + 8, time.time(), *pwm)
+            _EMERGENCY.pack_into(self._buf, self._emergency_offset, 1 if emergency_stop else 0)
+            self._motors_seq += 1
+            _SEQ.pack_into(self._buf, offset, self._motors_seq)
+            self.stats['motor_writes'] += 1
+    
+    def write_imu(self, sample: Dict[str, Any], timestamp: Optional[float] = None):
+        """إضافة عينة IMU للحلقة (الخانة تُكتب كاملة قبل تقديم imu_head)"""
+        head = self._imu_head
+        _IMU_SAMPLE.pack_into(
+            self._buf, self._imu_offset + (head % self.imu_capacity) * _IMU_SAMPLE.size,
+            time.time() if timestamp is None else timestamp,
+            *_xyz(sample.get('orientation', {}), ('roll', 'pitch', 'yaw')),
+            *_xyz(sample.get('acceleration', {})),
+            *_xyz(sample.get('gyroscope', {}))
+        )
+        self._imu_head = head + 1
+        _SEQ.pack_into(self._buf, self._imu_head_offset, self._imu_head)
+        self.stats['imu_samples'] += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """الحصول على إحصائيات النشر"""
+        stats = dict(self.stats)
+        stats['name'] = self.name
+        stats['size'] = self.shm.size
+        return stats
+    
+    def _publish_loop(self):
+        """كتابة عينات موضوع imu كلها وآخر حالة مرة واحدة لكل دفعة تيليمتري"""
+        while not self._stop_event.is_set():
+            if not self._telemetry_subscription.wait(0.5) and not self._imu_subscription.lag:
+                continue
+            try:
+                # الحالة تُقرأ من rov_state؛ الرسائل نفسها تُتجاوز (المتحكم ينشر عينة IMU لكل رسالة)
+                self._telemetry_subscription.latest()
+                for sample in self._imu_subscription.drain():
+                    self.write_imu(sample)
+                self.write_state(self._state_source())
+            except Exception as e:
+                self.logger.error(f"خطأ في كتابة الذاكرة المشتركة: {e}")
+    
+    def _create_segment(self, name: str, size: int) -> shared_memory.SharedMemory:
+        try:
+            return shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # مقطع متبقٍ من تشغيل سابق انتهى دون إغلاق
+            self.logger.warning(f"إعادة إنشاء مقطع الذاكرة المشتركة المتبقي {name}")
+            stale = shared_memory.SharedMemory(name=name)
+            stale.close()
+            stale.unlink()
+            return shared_memory.SharedMemory(name=name, create=True, size=size)
+
+class SharedTelemetryReader:
+    """قراءة مقطع SharedTelemetryPublisher من أي عملية
+    
+    read() تمرر للدالة عرضاً (view) مباشراً على الذاكرة المشتركة دون نسخ وتعيد
+    المحاولة إذا تغيرت الكتلة أثناء القراءة، فيجب ألا يكون للدالة أثر جانبي.
+    القارئ لا يكتب في المقطع ولا يأخذ أي قفل، فلا يمكنه إبطاء الكاتب.
+    """
+    
+    def __init__(self, name: str = 'rov_telemetry'):
+        self.name = name
+        self.shm = shared_memory.SharedMemory(name=name)
+        self._untrack()
+        
+        header = np.ndarray((), dtype=HEADER_DTYPE, buffer=self.shm.buf)
+        if int(header['magic']) != SHARED_MAGIC or int(header['version']) != SHARED_VERSION:
+            self.shm.close()
+            raise ValueError(f"المقطع {name} ليس ذاكرة تيليمتري ROV متوافقة")
+        
+        self.imu_capacity = int(header['imu_capacity'])
+        self.motor_names = [bytes(name).decode('utf-8') for name in
+                            header['motor_names'][:int(header['motor_count'])]]
+        del header
+        
+        self._view = np.ndarray((), dtype=shared_layout(self.imu_capacity), buffer=self.shm.buf)
+        self.state_view = self._view['state']
+        self.motors_view = self._view['motors']
+        self._imu = self._view['imu']
+        self._imu_head = self._view['imu_head']
+        
+        # إحصائيات
+        self.retries = 0
+    
+    def read(self, fn: Callable[[np.ndarray], Any], block: str = 'state', max_retries: int = 10000) -> Any:
+        """تنفيذ fn على عرض الكتلة ('state' أو 'motors') وإرجاع نتيجة متسقة (None عند الفشل)"""
+        view = self.state_view if block == 'state' else self.motors_view
+        seq = view['seq']
+        for _ in range(max_retries):
+            before = int(seq)
+            if before & 1:
+                # الكاتب في منتصف الكتابة
+                self.retries += 1
+                time.sleep(0)
+                continue
+            result = fn(view)
+            if int(seq) == before:
+                return result
+            self.retries += 1
+        return None
+    
+    def state(self) -> Optional[Dict[str, Any]]:
+        """آخر حالة كقاموس (نسخة)"""
+        return self.read(lambda view: {
+            'timestamp': float(view['timestamp']),
+            'position': dict(zip(('x', 'y', 'z'), view['position'].tolist())),
+            'orientation': dict(zip(('roll', 'pitch', 'yaw'), view['orientation'].tolist())),
+            'velocity': dict(zip(('x', 'y', 'z'), view['velocity'].tolist())),
+            'depth': float(view['depth']),
+            'temperature': float(view['temperature']),
+            'pressure': float(view['pressure']),
+            'battery': float(view['battery']),
+            'status': view['status'].item().decode('utf-8', errors='replace'),
+            'seq': int(view['seq'])
+        })
+    
+    def motors(self) -> Optional[Dict[str, Any]]:
+        """آخر مخرجات المحركات كقاموس (نسخة)"""
+        return self.read(lambda view: {
+            'timestamp': float(view['timestamp']),
+            'pwm': dict(zip(self.motor_names, view['pwm'][:len(self.motor_names)].tolist())),
+            'emergency_stop': bool(view['emergency_stop'])
+        }, block='motors')
+    
+    @property
+    def imu_count(self) -> int:
+        """عدد عينات IMU المكتوبة منذ إنشاء المقطع"""
+        return int(self._imu_head)
+    
+    def imu_history(self, count: int, max_retries: int = 1000) -> Optional[np.ndarray]:
+        """آخر count عينة IMU (نسخة مرتبة من الأقدم، حتى سعة الحلقة ناقص واحد)
+        
+        الخانة التالية في الحلقة (أقدم عينة بعد الالتفاف) قد تكون قيد الكتابة قبل
+        تقديم imu_head، فلا تُقرأ أبداً.
+        """
+        count = min(count, self.imu_capacity - 1)
+        for _ in range(max_retries):
+            head = int(self._imu_head)
+            available = min(count, head)
+            indices = np.arange(head - available, head) % self.imu_capacity
+            samples = self._imu[indices]
+            # صالحة إذا لم يصل الكاتب لأقدم خانة مقروءة أثناء القراءة
+            if int(self._imu_head) - (head - available) < self.imu_capacity:
+                return samples
+            self.retries += 1
+        return None
+    
+    def close(self):
+        """فك الربط (المقطع يبقى للكاتب)"""
+        self.state_view = self.motors_view = self._imu = self._imu_head = self._view = None
+        self.shm.close()
+    
+    def _untrack(self):
+        # القارئ لا يملك المقطع: منع resource_tracker من حذفه عند خروج عملية القارئ
+        # (إلا إذا أنشأه كاتب في العملية نفسها فإلغاء التتبع يخص الكاتب)
+        if self.shm._name in _OWNED_SEGMENTS:
+            return
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+        except Exception:
+            pass
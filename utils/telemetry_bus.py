@@ -0,0 +1,178 @@
+import threading
+from typing import Any, Dict, List, Optional
+
+# المواضيع المعروفة
+TOPIC_TELEMETRY = 'telemetry'      # رسائل التيليمتري المفكوكة من وسيلة الاتصال
+TOPIC_IMU = 'imu'
+TOPIC_PRESSURE = 'pressure'
+TOPIC_TEMPERATURE = 'temperature'
+
+class Topic:
+    """مخزن حلقي ثابت الحجم لموضوع واحد
+    
+    الناشر يكتب في الخانة التالية ويزيد العداد فقط (O(1) تحت قفل قصير) ولا ينتظر
+    أي مستهلك أبداً؛ المستهلك البطيء يفقد أقدم الرسائل التي كُتب فوقها وتُحتسب له.
+    """
+    
+    def __init__(self, name: str, capacity: int = 256):
+        self.name = name
+        self.capacity = capacity
+        self._buffer: List[Any] = [None] * capacity
+        self.seq = 0  # عدد الرسائل المنشورة (رقم الرسالة التالية)
+        self._condition = threading.Condition(threading.Lock())
+        self._subscriptions: List['Subscription'] = []
+        self.dropped = 0
+    
+    def publish(self, value: Any):
+        """نشر رسالة (لا ينتظر المستهلكين)"""
+        with self._condition:
+            self._buffer[self.seq % self.capacity] = value
+            self.seq += 1
+            self._condition.notify_all()
+    
+    def latest(self) -> Any:
+        """آخر رسالة منشورة (None إذا لم يُنشر شيء)"""
+        with self._condition:
+            if not self.seq:
+                return None
+            return self._buffer[(self.seq - 1) % self.capacity]
+    
+    def subscribe(self, name: str) -> 'Subscription':
+        """مستهلك جديد يبدأ من الرسالة التالية"""
+        subscription = Subscription(self, name)
+        with self._condition:
+            self._subscriptions.append(subscription)
+        return subscription
+    
+    def unsubscribe(self, subscription: 'Subscription'):
+        with self._condition:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """الرسائل المنشورة والمفقودة والتأخر لكل مستهلك"""
+        with self._condition:
+            subscriptions = {sub.name: sub._stats_locked() for sub in self._subscriptions}
+            return {
+                'published': self.seq,
+                'capacity': self.capacity,
+                'dropped': self.dropped + sum(max(0, sub.lag_locked() - self.capacity)
+                                              for sub in self._subscriptions),
+                'max_lag': max((stats['lag'] for stats in subscriptions.values()), default=0),
+                'subscribers': subscriptions
+            }
+
+class Subscription:
+    """مؤشر قراءة مستهلك واحد على موضوع
+    
+    drain() تُرجع كل ما وصل منذ آخر قراءة (حتى سعة المخزن)، و latest() تُرجع
+    آخر قيمة فقط وتتجاوز ما قبلها دون احتسابه مفقوداً.
+    """
+    
+    def __init__(self, topic: Topic, name: str):
+        self.topic = topic
+        self.name = name
+        self.cursor = topic.seq
+        self.received = 0
+        self.dropped = 0
+    
+    @property
+    def lag(self) -> int:
+        """عدد الرسائل التي لم تُقرأ بعد"""
+        with self.topic._condition:
+            return self.lag_locked()
+    
+    def lag_locked(self) -> int:
+        return self.topic.seq - self.cursor
+    
+    def drain(self, max_items: Optional[int] = None) -> List[Any]:
+        """كل الرسائل الجديدة بالترتيب (أو أقدم max_items منها)"""
+        topic = self.topic
+        with topic._condition:
+            head = topic.seq
+            oldest = head - topic.capacity
+            if self.cursor < oldest:
+                # كُتب فوقها قبل قراءتها
+                lost = oldest - self.cursor
+                self.dropped += lost
+                topic.dropped += lost
+                self.cursor = oldest
+            
+            end = head if max_items is None else min(head, self.cursor + max_items)
+            buffer = topic._buffer
+            capacity = topic.capacity
+            items = [buffer[index % capacity] for index in range(self.cursor, end)]
+            self.cursor = end
+        
+        self.received += len(items)
+        return items
+    
+    def latest(self) -> Any:
+        """آخر قيمة منشورة (None إذا لم يُنشر شيء) مع اعتبار كل ما قبلها مقروءاً"""
+        topic = self.topic
+        with topic._condition:
+            if self.cursor < topic.seq:
+                self.received += 1
+            self.cursor = topic.seq
+            if not topic.seq:
+                return None
+            return topic._buffer[(topic.seq - 1) % topic.capacity]
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """انتظار وصول رسالة جديدة؛ False عند انتهاء المهلة"""
+        with self.topic._condition:
+            return self.topic._condition.wait_for(lambda: self.topic.seq > self.cursor, timeout)
+    
+    def close(self):
+        """إلغاء الاشتراك"""
+        self.topic.unsubscribe(self)
+    
+    def _stats_locked(self) -> Dict[str, int]:
+        lag = self.lag_locked()
+        return {
+            'received': self.received,
+            'dropped': self.dropped + max(0, lag - self.topic.capacity),
+            'lag': min(lag, self.topic.capacity)
+        }
+
+class TelemetryBus:
+    """ناقل مواضيع داخل العملية: ناشرون بلا انتظار ومستهلكون بسرعتهم الخاصة
+    
+    كل موضوع مخزن حلقي ثابت الحجم، ولكل مستهلك (الواجهة، المسجل، مراقب الأمان،
+    حلقة التحكم) مؤشر قراءة خاص به مع عدادي المفقود والتأخر.
+    """
+    
+    def __init__(self, capacity: int = 256):
+        self.capacity = capacity
+        self._topics: Dict[str, Topic] = {}
+        self._lock = threading.Lock()
+    
+    def topic(self, name: str, capacity: Optional[int] = None) -> Topic:
+        """الحصول على موضوع (يُنشأ عند أول استخدام)"""
+        topic = self._topics.get(name)
+        if topic is None:
+            with self._lock:
+                topic = self._topics.get(name)
+                if topic is None:
+                    topic = Topic(name, capacity or self.capacity)
+                    self._topics[name] = topic
+        return topic
+    
+    def publish(self, name: str, value: Any):
+        """نشر رسالة على موضوع"""
+        self.topic(name).publish(value)
+    
+    def subscribe(self, name: str, subscriber: str) -> Subscription:
+        """اشتراك مستهلك في موضوع"""
+        return self.topic(name).subscribe(subscriber)
+    
+    def latest(self, name: str) -> Any:
+        """آخر قيمة على موضوع"""
+        return self.topic(name).latest()
+    
+    def topics(self) -> List[str]:
+        return list(self._topics)
+    
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """إحصائيات كل المواضيع"""
+        return {name: topic.get_stats() for name, topic in list(self._topics.items())}